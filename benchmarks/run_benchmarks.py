@@ -0,0 +1,452 @@
+"""Benchmarks of performance-critical parts of ChainerRL.
+
+All the benchmarks run on CPU and need neither GPUs nor Atari ROMs. Results
+are written to a JSON file so that those of different commits can be
+compared:
+
+    python benchmarks/run_benchmarks.py --out before.json
+    # (check out another commit)
+    python benchmarks/run_benchmarks.py --out after.json --compare before.json
+
+See benchmarks/README.md for details.
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import argparse
+import collections
+import functools
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+
+import chainer
+from chainer import optimizers
+import gym
+import gym.spaces
+import numpy as np
+
+import chainerrl
+from chainerrl.agents.categorical_dqn import _apply_categorical_projection
+from chainerrl.agents import a3c
+from chainerrl.agents import DQN
+from chainerrl.agents import iqn
+from chainerrl.agents import PPO
+from chainerrl.envs.abc import ABC
+from chainerrl import explorers
+from chainerrl.misc.conjugate_gradient import conjugate_gradient
+from chainerrl.misc.prioritized import SumTreeQueue
+from chainerrl import policies
+from chainerrl import q_functions
+from chainerrl import replay_buffer
+from chainerrl import v_functions
+
+
+# List of (name, generator function)
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a benchmark.
+
+    A benchmark is a generator function that receives `quick` (bool) and
+    yields tuples of (case name, params, func, n_ops) after setting up each
+    case, where calling func once performs n_ops operations. Code after each
+    yield can be used for cleanup.
+    """
+    def decorator(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return decorator
+
+
+def _sizes(quick):
+    return [10 ** 4, 10 ** 5] if quick else [10 ** 4, 10 ** 5, 10 ** 6]
+
+
+def _make_transition(obs, next_obs):
+    return dict(state=obs, action=0, reward=1.0, next_state=next_obs,
+                next_action=0, is_state_terminal=False)
+
+
+def _observations(n, shape, dtype):
+    # Transitions share a few observation arrays so that large buffers fit in
+    # memory. Only the overhead of the buffers is measured.
+    return [np.full(shape, i, dtype=dtype) for i in range(n)]
+
+
+@benchmark('replay_buffer')
+def bench_replay_buffer(quick):
+    obss = _observations(10, (4, 84, 84), np.uint8)
+    for capacity in _sizes(quick):
+        rbuf = replay_buffer.ReplayBuffer(capacity)
+        for i in range(capacity):
+            rbuf.append(**_make_transition(obss[i % 10], obss[(i + 1) % 10]))
+        params = {'capacity': capacity}
+
+        def append():
+            for i in range(1000):
+                rbuf.append(
+                    **_make_transition(obss[i % 10], obss[(i + 1) % 10]))
+        yield 'replay_buffer_append', params, append, 1000
+
+        def sample():
+            for _ in range(100):
+                rbuf.sample(32)
+        yield 'replay_buffer_sample32', params, sample, 100
+
+
+@benchmark('prioritized_replay_buffer')
+def bench_prioritized_replay_buffer(quick):
+    obss = _observations(10, (4, 84, 84), np.uint8)
+    for capacity in _sizes(quick):
+        rbuf = replay_buffer.PrioritizedReplayBuffer(capacity)
+        for i in range(capacity):
+            rbuf.append(**_make_transition(obss[i % 10], obss[(i + 1) % 10]))
+        params = {'capacity': capacity}
+
+        def append():
+            for i in range(1000):
+                rbuf.append(
+                    **_make_transition(obss[i % 10], obss[(i + 1) % 10]))
+        yield 'prioritized_replay_buffer_append', params, append, 1000
+
+        def sample_and_update():
+            for _ in range(100):
+                rbuf.sample(32)
+                rbuf.update_errors(np.random.uniform(size=32))
+        yield ('prioritized_replay_buffer_sample32_update', params,
+               sample_and_update, 100)
+
+
+@benchmark('batch_experiences')
+def bench_batch_experiences(quick):
+    obss = _observations(10, (4, 84, 84), np.uint8)
+    for n_steps in [1, 3]:
+        experiences = [
+            [_make_transition(obss[(i + j) % 10], obss[(i + j + 1) % 10])
+             for j in range(n_steps)]
+            for i in range(32)]
+
+        def batch():
+            replay_buffer.batch_experiences(
+                experiences, np, lambda x: np.asarray(x, dtype=np.float32),
+                gamma=0.99)
+        yield ('batch_experiences', {'batch_size': 32, 'n_steps': n_steps},
+               batch, 1)
+
+
+@benchmark('sum_tree_queue')
+def bench_sum_tree_queue(quick):
+    for size in _sizes(quick):
+        tree = SumTreeQueue()
+        for _ in range(size):
+            tree.append(1.0)
+        params = {'size': size}
+        indices = np.random.randint(size, size=1000).tolist()
+        values = np.random.uniform(size=1000).tolist()
+
+        def update():
+            for i, v in zip(indices, values):
+                tree[i] = v
+        yield 'sum_tree_queue_update', params, update, 1000
+
+        def sample():
+            for _ in range(100):
+                tree.prioritized_sample(32, remove=False)
+        yield 'sum_tree_queue_sample32', params, sample, 100
+
+
+@benchmark('categorical_projection')
+def bench_categorical_projection(quick):
+    n_atoms = 51
+    z = np.linspace(-10, 10, n_atoms, dtype=np.float32)
+    for batch_size in [32, 256, 512]:
+        y = np.random.normal(
+            scale=5, size=(batch_size, n_atoms)).astype(np.float32)
+        y_probs = np.random.dirichlet(
+            np.ones(n_atoms), size=batch_size).astype(np.float32)
+
+        def project():
+            _apply_categorical_projection(y, y_probs, z)
+        yield ('categorical_projection',
+               {'batch_size': batch_size, 'n_atoms': n_atoms}, project, 1)
+
+
+@benchmark('conjugate_gradient')
+def bench_conjugate_gradient(quick):
+    for dim in [100, 1000]:
+        a = np.random.normal(size=(dim, dim)).astype(np.float32)
+        A = a.dot(a.T) + dim * np.eye(dim, dtype=np.float32)
+        b = np.random.normal(size=dim).astype(np.float32)
+
+        def solve():
+            conjugate_gradient(lambda v: A.dot(v), b, max_iter=10)
+        yield ('conjugate_gradient', {'dim': dim, 'max_iter': 10}, solve, 1)
+
+
+class DummyImageEnv(gym.Env):
+    """Env that returns Atari-sized frames without emulation."""
+
+    observation_space = gym.spaces.Box(
+        low=0, high=255, shape=(210, 160, 3), dtype=np.uint8)
+    action_space = gym.spaces.Discrete(4)
+
+    def __init__(self):
+        self.frame = np.zeros((210, 160, 3), dtype=np.uint8)
+        self.t = 0
+
+    def reset(self):
+        self.t = 0
+        return self.frame
+
+    def step(self, action):
+        self.t += 1
+        self.frame[self.t % 210] = self.t % 256
+        return self.frame, 0.0, self.t >= 1000, {}
+
+
+@benchmark('multiprocess_vector_env')
+def bench_multiprocess_vector_env(quick):
+    for num_envs in [4, 8]:
+        env = chainerrl.envs.MultiprocessVectorEnv(
+            [DummyImageEnv for _ in range(num_envs)])
+        try:
+            env.reset()
+            actions = [0] * num_envs
+
+            def step():
+                for _ in range(100):
+                    env.step(actions)
+            yield ('multiprocess_vector_env_step', {'num_envs': num_envs},
+                   step, 100 * num_envs)
+        finally:
+            env.close()
+
+
+def _run_steps(agent, env, n_steps, state):
+    # state holds obs and r between calls so that episodes continue
+    obs, r = state
+    for _ in range(n_steps):
+        action = agent.act_and_train(obs, r)
+        obs, r, done, _ = env.step(action)
+        if done:
+            agent.stop_episode_and_train(obs, r, done=True)
+            obs, r = env.reset(), 0
+    state[:] = [obs, r]
+
+
+@benchmark('dqn')
+def bench_dqn(quick):
+    env = ABC(size=5)
+    n_dim_obs = env.observation_space.low.size
+    q_func = q_functions.FCStateQFunctionWithDiscreteAction(
+        n_dim_obs, env.action_space.n, n_hidden_channels=64,
+        n_hidden_layers=2)
+    opt = optimizers.Adam()
+    opt.setup(q_func)
+    agent = DQN(
+        q_func, opt, replay_buffer.ReplayBuffer(10 ** 5), gamma=0.99,
+        explorer=explorers.ConstantEpsilonGreedy(
+            0.1, env.action_space.sample),
+        replay_start_size=1000, minibatch_size=32,
+        target_update_interval=100)
+    state = [env.reset(), 0]
+    # Fill the replay buffer so that every measured step updates the model
+    _run_steps(agent, env, 1000, state)
+    yield ('dqn_train_steps', {'minibatch_size': 32, 'update_interval': 1},
+           functools.partial(_run_steps, agent, env, 200, state), 200)
+
+
+@benchmark('iqn')
+def bench_iqn(quick):
+    env = ABC(size=5)
+    n_dim_obs = env.observation_space.low.size
+    hidden_size = 64
+    q_func = iqn.ImplicitQuantileQFunction(
+        psi=chainerrl.links.Sequence(
+            chainer.links.Linear(n_dim_obs, hidden_size),
+            chainer.functions.relu),
+        phi=chainerrl.links.Sequence(
+            iqn.CosineBasisLinear(64, hidden_size), chainer.functions.relu),
+        f=chainer.links.Linear(hidden_size, env.action_space.n),
+    )
+    opt = optimizers.Adam()
+    opt.setup(q_func)
+    agent = iqn.IQN(
+        q_func, opt, replay_buffer.ReplayBuffer(10 ** 5), gamma=0.99,
+        explorer=explorers.ConstantEpsilonGreedy(
+            0.1, env.action_space.sample),
+        replay_start_size=1000, minibatch_size=32,
+        target_update_interval=100, quantile_thresholds_N=64,
+        quantile_thresholds_N_prime=64, quantile_thresholds_K=32)
+    state = [env.reset(), 0]
+    _run_steps(agent, env, 1000, state)
+    yield ('iqn_train_steps',
+           {'minibatch_size': 32, 'N': 64, 'N_prime': 64, 'K': 32},
+           functools.partial(_run_steps, agent, env, 100, state), 100)
+
+
+@benchmark('ppo')
+def bench_ppo(quick):
+    num_envs = 8
+    env = chainerrl.envs.SerialVectorEnv(
+        [ABC(size=5, discrete=False) for _ in range(num_envs)])
+    n_dim_obs = env.observation_space.low.size
+    n_dim_actions = env.action_space.low.size
+    model = a3c.A3CSeparateModel(
+        pi=policies.FCGaussianPolicy(
+            n_dim_obs, n_dim_actions, n_hidden_layers=2,
+            n_hidden_channels=64),
+        v=v_functions.FCVFunction(
+            n_dim_obs, n_hidden_layers=2, n_hidden_channels=64))
+    opt = optimizers.Adam()
+    opt.setup(model)
+    agent = PPO(model, opt, update_interval=512, minibatch_size=64,
+                epochs=4)
+    obss = [env.reset()]
+
+    def run(n_batch_steps):
+        for _ in range(n_batch_steps):
+            actions = agent.batch_act_and_train(obss[0])
+            obs, rs, dones, infos = env.step(actions)
+            resets = np.zeros(num_envs, dtype=bool)
+            agent.batch_observe_and_train(obs, rs, dones, resets)
+            obss[0] = env.reset(np.logical_not(dones))
+
+    # Each call performs exactly one update
+    n_batch_steps = 512 // num_envs
+    yield ('ppo_train_steps',
+           {'num_envs': num_envs, 'update_interval': 512, 'epochs': 4},
+           functools.partial(run, n_batch_steps), n_batch_steps * num_envs)
+
+
+def measure(func, repeat, min_time):
+    """Measure the time of calls of func.
+
+    func is called at least `repeat` times and until `min_time` seconds
+    elapse, after a warm-up call.
+    """
+    func()
+    times = []
+    start = time.time()
+    while len(times) < repeat or time.time() - start < min_time:
+        t = time.time()
+        func()
+        times.append(time.time() - t)
+    return times
+
+
+def get_environment():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=root,
+            stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return collections.OrderedDict([
+        ('git_commit', commit),
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('processor', platform.processor()),
+        ('numpy', np.__version__),
+        ('chainer', chainer.__version__),
+    ])
+
+
+def _key(result):
+    return (result['name'], json.dumps(result['params'], sort_keys=True))
+
+
+def compare(base_results, results):
+    """Print the ratio of ops/sec of results to that of base_results."""
+    base = dict((_key(r), r) for r in base_results)
+    print('{:<45} {:<35} {:>12} {:>12} {:>7}'.format(
+        'name', 'params', 'base ops/s', 'ops/s', 'ratio'))
+    for r in results:
+        b = base.get(_key(r))
+        print('{:<45} {:<35} {:>12} {:>12.1f} {:>7}'.format(
+            r['name'],
+            json.dumps(r['params'], sort_keys=True),
+            '{:.1f}'.format(b['ops_per_sec']) if b else '-',
+            r['ops_per_sec'],
+            '{:.2f}'.format(r['ops_per_sec'] / b['ops_per_sec'])
+            if b else '-'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--out', type=str, default='benchmark_results.json',
+                        help='Path to the output JSON file.')
+    parser.add_argument('--filter', type=str, default=None,
+                        help='Regular expression. Only benchmarks whose'
+                             ' names match it are run.')
+    parser.add_argument('--quick', action='store_true',
+                        help='Skip the largest sizes.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Minimum number of measurements per case.')
+    parser.add_argument('--min-time', type=float, default=1.0,
+                        help='Minimum total seconds of measurements per'
+                             ' case.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Path to a JSON file of previous results to'
+                             ' compare with.')
+    parser.add_argument('--list', action='store_true',
+                        help='List the names of the benchmarks and exit.')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, _ in BENCHMARKS:
+            print(name)
+        return
+
+    results = []
+    for name, bench in BENCHMARKS:
+        if args.filter is not None and not re.search(args.filter, name):
+            continue
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        for case_name, params, func, n_ops in bench(args.quick):
+            times = measure(func, args.repeat, args.min_time)
+            result = collections.OrderedDict([
+                ('name', case_name),
+                ('params', params),
+                ('n_ops', n_ops),
+                ('n_measurements', len(times)),
+                ('min_sec', min(times)),
+                ('median_sec', float(np.median(times))),
+                ('ops_per_sec', n_ops / float(np.median(times))),
+            ])
+            results.append(result)
+            print('{} {} {:.1f} ops/s'.format(
+                case_name, json.dumps(params, sort_keys=True),
+                result['ops_per_sec']))
+            sys.stdout.flush()
+
+    with open(args.out, 'w') as f:
+        json.dump(collections.OrderedDict([
+            ('environment', get_environment()),
+            ('args', vars(args)),
+            ('results', results),
+        ]), f, indent=2)
+    print('Saved results to {}'.format(args.out))
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            base_results = json.load(f)['results']
+        compare(base_results, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,52 +1,43 @@
-from chainerrl import action_value  # NOQA
-from chainerrl import agent  # NOQA
-from chainerrl import agents  # NOQA
-from chainerrl import distribution  # NOQA
-from chainerrl import env  # NOQA
-from chainerrl import envs  # NOQA
-from chainerrl import experiments  # NOQA
-from chainerrl import explorer  # NOQA
-from chainerrl import explorers  # NOQA
-from chainerrl import functions  # NOQA
-from chainerrl import links  # NOQA
-from chainerrl import misc  # NOQA
-from chainerrl import optimizers  # NOQA
-from chainerrl import policies  # NOQA
-from chainerrl import policy  # NOQA
-from chainerrl import q_function  # NOQA
-from chainerrl import q_functions  # NOQA
-from chainerrl import recurrent  # NOQA
-from chainerrl import replay_buffer  # NOQA
-from chainerrl import v_function  # NOQA
-from chainerrl import v_functions  # NOQA
-from chainerrl import wrappers  # NOQA
+import importlib
+import sys
 
-# For backward compatibility while avoiding circular import
-policy.SoftmaxPolicy = policies.SoftmaxPolicy
-policy.FCSoftmaxPolicy = policies.FCSoftmaxPolicy
-policy.ContinuousDeterministicPolicy = policies.ContinuousDeterministicPolicy
-policy.FCDeterministicPolicy = policies.FCDeterministicPolicy
-policy.FCBNDeterministicPolicy = policies.FCBNDeterministicPolicy
-policy.FCLSTMDeterministicPolicy = policies.FCLSTMDeterministicPolicy
-policy.FCGaussianPolicy = policies.FCGaussianPolicy
-policy.MellowmaxPolicy = policies.MellowmaxPolicy
+from chainerrl.lazy_import import install_lazy_attributes
 
-q_function.DuelingDQN = q_functions.DuelingDQN
-q_function.SingleModelStateActionQFunction = \
-    q_functions.SingleModelStateActionQFunction
-q_function.FCSAQFunction = q_functions.FCSAQFunction
-q_function.FCLSTMSAQFunction = q_functions.FCLSTMSAQFunction
-q_function.FCBNSAQFunction = q_functions.FCBNSAQFunction
-q_function.FCBNLateActionSAQFunction = q_functions.FCBNLateActionSAQFunction
-q_function.FCLateActionSAQFunction = q_functions.FCLateActionSAQFunction
-q_function.SingleModelStateActionQFunction = \
-    q_functions.SingleModelStateActionQFunction
-q_function.FCStateQFunctionWithDiscreteAction = \
-    q_functions.FCStateQFunctionWithDiscreteAction
-q_function.FCLSTMStateQFunction = q_functions.FCLSTMStateQFunction
-q_function.FCQuadraticStateQFunction = q_functions.FCQuadraticStateQFunction
-q_function.FCBNQuadraticStateQFunction = \
-    q_functions.FCBNQuadraticStateQFunction
+# Subpackages are imported on their first access so that `import chainerrl`
+# stays fast
+install_lazy_attributes(__name__, submodules=[
+    'action_value',
+    'agent',
+    'agents',
+    'distribution',
+    'env',
+    'envs',
+    'experiments',
+    'explorer',
+    'explorers',
+    'functions',
+    'links',
+    'misc',
+    'optimizers',
+    'policies',
+    'policy',
+    'q_function',
+    'q_functions',
+    'recurrent',
+    'replay_buffer',
+    'v_function',
+    'v_functions',
+    'wrappers',
+])
 
-v_function.SingleModelVFunction = v_functions.SingleModelVFunction
-v_function.FCVFunction = v_functions.FCVFunction
+if sys.version_info < (3, 7):
+    # For backward compatibility, set the aliases of classes moved to other
+    # modules. On newer versions, they are resolved lazily by the modules
+    # themselves.
+    from chainerrl import policy  # NOQA
+    from chainerrl import q_function  # NOQA
+    from chainerrl import v_function  # NOQA
+    for _module in (policy, q_function, v_function):
+        for _name, _source in _module._moved_attributes.items():
+            setattr(_module, _name,
+                    getattr(importlib.import_module(_source), _name))
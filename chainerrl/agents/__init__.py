@@ -1,22 +1,27 @@
-from chainerrl.agents.a2c import A2C  # NOQA
-from chainerrl.agents.a3c import A3C  # NOQA
-from chainerrl.agents.acer import ACER  # NOQA
-from chainerrl.agents.al import AL  # NOQA
-from chainerrl.agents.categorical_double_dqn import CategoricalDoubleDQN  # NOQA
-from chainerrl.agents.categorical_dqn import CategoricalDQN  # NOQA
-from chainerrl.agents.ddpg import DDPG  # NOQA
-from chainerrl.agents.double_dqn import DoubleDQN  # NOQA
-from chainerrl.agents.double_pal import DoublePAL  # NOQA
-from chainerrl.agents.dpp import DPP  # NOQA
-from chainerrl.agents.dqn import DQN  # NOQA
-from chainerrl.agents.iqn import IQN  # NOQA
-from chainerrl.agents.nsq import NSQ  # NOQA
-from chainerrl.agents.pal import PAL  # NOQA
-from chainerrl.agents.pcl import PCL  # NOQA
-from chainerrl.agents.pgt import PGT  # NOQA
-from chainerrl.agents.ppo import PPO  # NOQA
-from chainerrl.agents.reinforce import REINFORCE  # NOQA
-from chainerrl.agents.residual_dqn import ResidualDQN  # NOQA
-from chainerrl.agents.sarsa import SARSA  # NOQA
-from chainerrl.agents.td3 import TD3  # NOQA
-from chainerrl.agents.trpo import TRPO  # NOQA
+from chainerrl.lazy_import import install_lazy_attributes
+
+install_lazy_attributes(__name__, attributes={
+    'A2C': 'chainerrl.agents.a2c',
+    'A3C': 'chainerrl.agents.a3c',
+    'ACER': 'chainerrl.agents.acer',
+    'AL': 'chainerrl.agents.al',
+    'CategoricalDoubleDQN': 'chainerrl.agents.categorical_double_dqn',
+    'CategoricalDQN': 'chainerrl.agents.categorical_dqn',
+    'DDPG': 'chainerrl.agents.ddpg',
+    'DoubleDQN': 'chainerrl.agents.double_dqn',
+    'DoublePAL': 'chainerrl.agents.double_pal',
+    'DPP': 'chainerrl.agents.dpp',
+    'DQN': 'chainerrl.agents.dqn',
+    'IMPALA': 'chainerrl.agents.impala',
+    'IQN': 'chainerrl.agents.iqn',
+    'NSQ': 'chainerrl.agents.nsq',
+    'PAL': 'chainerrl.agents.pal',
+    'PCL': 'chainerrl.agents.pcl',
+    'PGT': 'chainerrl.agents.pgt',
+    'PPO': 'chainerrl.agents.ppo',
+    'REINFORCE': 'chainerrl.agents.reinforce',
+    'ResidualDQN': 'chainerrl.agents.residual_dqn',
+    'SARSA': 'chainerrl.agents.sarsa',
+    'TD3': 'chainerrl.agents.td3',
+    'TRPO': 'chainerrl.agents.trpo',
+})
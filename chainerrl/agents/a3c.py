@@ -17,6 +17,7 @@ from chainerrl import agent
 from chainerrl.misc import async_
 from chainerrl.misc.batch_states import batch_states
 from chainerrl.misc import copy_param
+from chainerrl.recurrent import is_recurrent
 from chainerrl.recurrent import Recurrent
 from chainerrl.recurrent import RecurrentChainMixin
 from chainerrl.recurrent import state_kept
@@ -77,11 +78,16 @@ class A3CSharedModel(chainer.Chain, A3CModel, RecurrentChainMixin):
         return pout, vout
 
 
-class A3C(agent.AttributeSavingMixin, agent.AsyncAgent):
+class A3C(agent.AttributeSavingMixin, agent.AsyncAgent, agent.BatchAgent):
     """A3C: Asynchronous Advantage Actor-Critic.
 
     See http://arxiv.org/abs/1602.01783
 
+    Each process can interact with multiple envs at once via the BatchAgent
+    interface, in which case the model is updated after every t_max batch
+    steps using the transitions of all the envs. Recurrent models are not
+    supported in that case.
+
     Args:
         model (A3CModel): Model to train
         optimizer (chainer.Optimizer): optimizer used to train the model
@@ -216,7 +222,17 @@ class A3C(agent.AttributeSavingMixin, agent.AsyncAgent):
             logger.debug('pi_loss:%s v_loss:%s', pi_loss.array, v_loss.array)
 
         total_loss = F.squeeze(pi_loss) + F.squeeze(v_loss)
+        self._update_shared_model(total_loss)
+
+        self.past_action_log_prob = {}
+        self.past_action_entropy = {}
+        self.past_states = {}
+        self.past_rewards = {}
+        self.past_values = {}
+
+        self.t_start = self.t
 
+    def _update_shared_model(self, total_loss):
         # Compute gradients using thread-specific model
         self.model.zerograds()
         total_loss.backward()
@@ -237,14 +253,61 @@ class A3C(agent.AttributeSavingMixin, agent.AsyncAgent):
         if isinstance(self.model, Recurrent):
             self.model.unchain_backward()
 
-        self.past_action_log_prob = {}
-        self.past_action_entropy = {}
-        self.past_states = {}
-        self.past_rewards = {}
-        self.past_values = {}
-
+    def _init_batch_history(self):
+        self.batch_past_log_probs = []
+        self.batch_past_entropies = []
+        self.batch_past_values = []
+        self.batch_past_rewards = []
+        self.batch_past_ends = []
+        self.batch_past_bootstrap_values = []
         self.t_start = self.t
 
+    def batch_update(self):
+        """Update the model using the transitions of a batch of envs.
+
+        Every env contributes t_max transitions. Returns are truncated at the
+        ends of episodes, where they are bootstrapped from the values stored
+        by batch_observe_and_train.
+        """
+        assert self.t_start < self.t
+
+        R = np.zeros_like(self.batch_past_rewards[-1])
+        pi_loss = 0
+        v_loss = 0
+        for i in reversed(range(self.t - self.t_start)):
+            R = np.where(self.batch_past_ends[i],
+                         self.batch_past_bootstrap_values[i], R)
+            R = self.batch_past_rewards[i] + self.gamma * R
+            if self.use_average_reward:
+                R -= self.average_reward
+            v = self.batch_past_values[i]
+            advantage = R - v.array
+            if self.use_average_reward:
+                self.average_reward += self.average_reward_tau * \
+                    float(advantage.mean())
+            # Log probability is increased proportionally to advantage
+            pi_loss -= F.sum(self.batch_past_log_probs[i] * advantage)
+            # Entropy is maximized
+            pi_loss -= self.beta * F.sum(self.batch_past_entropies[i])
+            # Accumulate gradients of value function
+            v_loss += F.sum((v - R) ** 2) / 2
+
+        if self.pi_loss_coef != 1.0:
+            pi_loss *= self.pi_loss_coef
+
+        if self.v_loss_coef != 1.0:
+            v_loss *= self.v_loss_coef
+
+        if self.normalize_grad_by_t_max:
+            pi_loss /= self.t - self.t_start
+            v_loss /= self.t - self.t_start
+
+        if self.process_idx == 0:
+            logger.debug('pi_loss:%s v_loss:%s', pi_loss.array, v_loss.array)
+
+        self._update_shared_model(pi_loss + v_loss)
+        self._init_batch_history()
+
     def act_and_train(self, obs, reward):
 
         statevar = self.batch_states([obs], np, self.phi)
@@ -299,6 +362,66 @@ class A3C(agent.AttributeSavingMixin, agent.AsyncAgent):
         if isinstance(self.model, Recurrent):
             self.model.reset_state()
 
+    def batch_act(self, batch_obs):
+        # Use the process-local model for acting
+        with chainer.no_backprop_mode():
+            statevar = self.batch_states(batch_obs, np, self.phi)
+            pout, _ = self.model.pi_and_v(statevar)
+            if self.act_deterministically:
+                return pout.most_probable.array
+            else:
+                return pout.sample().array
+
+    def batch_act_and_train(self, batch_obs):
+        assert not is_recurrent(self.model),\
+            'Recurrent models are not supported in batch training.'
+        if self.t == self.t_start:
+            self._init_batch_history()
+
+        statevar = self.batch_states(batch_obs, np, self.phi)
+        pout, vout = self.model.pi_and_v(statevar)
+        # Do not backprop through sampled actions
+        batch_action = pout.sample().array
+        self.batch_past_log_probs.append(pout.log_prob(batch_action))
+        self.batch_past_entropies.append(pout.entropy)
+        self.batch_past_values.append(F.reshape(vout, (-1,)))
+        self.t += 1
+
+        # Update stats
+        self.average_value += (
+            (1 - self.average_value_decay) *
+            (float(vout.array.mean()) - self.average_value))
+        self.average_entropy += (
+            (1 - self.average_entropy_decay) *
+            (float(pout.entropy.array.mean()) - self.average_entropy))
+        return batch_action
+
+    def batch_observe(self, batch_obs, batch_reward, batch_done, batch_reset):
+        pass
+
+    def batch_observe_and_train(self, batch_obs, batch_reward,
+                                batch_done, batch_reset):
+        batch_done = np.asarray(batch_done, dtype=bool)
+        ends = np.logical_or(batch_done, batch_reset)
+        need_update = self.t - self.t_start == self.t_max
+        if need_update:
+            # Returns are bootstrapped for all the envs at the last step
+            ends.fill(True)
+        if np.any(np.logical_and(ends, np.logical_not(batch_done))):
+            with chainer.no_backprop_mode():
+                statevar = self.batch_states(batch_obs, np, self.phi)
+                _, vout = self.model.pi_and_v(statevar)
+            bootstrap_values = vout.array.ravel() * np.logical_not(batch_done)
+        else:
+            bootstrap_values = np.zeros(len(batch_done), dtype=np.float32)
+        self.batch_past_rewards.append(
+            np.asarray(batch_reward, dtype=np.float32))
+        self.batch_past_ends.append(ends)
+        self.batch_past_bootstrap_values.append(bootstrap_values)
+
+        if need_update:
+            self.batch_update()
+
     def load(self, dirname):
         super().load(dirname)
         copy_param.copy_param(target_link=self.shared_model,
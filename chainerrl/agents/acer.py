@@ -19,7 +19,9 @@ from chainerrl import agent
 from chainerrl import distribution
 from chainerrl import links
 from chainerrl.misc import async_
+from chainerrl.misc.batch_states import batch_states
 from chainerrl.misc import copy_param
+from chainerrl.recurrent import is_recurrent
 from chainerrl.recurrent import Recurrent
 from chainerrl.recurrent import RecurrentChainMixin
 from chainerrl.recurrent import state_kept
@@ -242,11 +244,29 @@ def compute_loss_with_kl_constraint(distrib, another_distrib, original_loss,
     return F.reshape(loss, original_loss.shape), float(kl.array)
 
 
-class ACER(agent.AttributeSavingMixin, agent.AsyncAgent):
+def _slice_action_value(action_value, i, batch_size):
+    """Slice a batch of action values, including SingleActionValue."""
+    if not isinstance(action_value, SingleActionValue):
+        return action_value[i:i + 1]
+
+    def evaluator(action):
+        xp = chainer.cuda.get_array_module(action)
+        batch_action = xp.repeat(action, batch_size, axis=0)
+        return action_value.evaluate_actions(batch_action)[i:i + 1]
+
+    return SingleActionValue(evaluator)
+
+
+class ACER(agent.AttributeSavingMixin, agent.AsyncAgent, agent.BatchAgent):
     """ACER (Actor-Critic with Experience Replay).
 
     See http://arxiv.org/abs/1611.01224
 
+    Each process can interact with multiple envs at once via the BatchAgent
+    interface, in which case the model is updated after every t_max batch
+    steps using the transitions of all the envs. Recurrent models are not
+    supported in that case.
+
     Args:
         model (ACERModel): Model to train. It must be a callable that accepts
             observations as input and return three values: action distributions
@@ -256,7 +276,9 @@ class ACER(agent.AttributeSavingMixin, agent.AsyncAgent):
         t_max (int): The model is updated after every t_max local steps
         gamma (float): Discount factor [0,1]
         replay_buffer (EpisodicReplayBuffer): Replay buffer to use. If set
-            None, this agent won't use experience replay.
+            None, this agent won't use experience replay. Use
+            SharedEpisodicReplayBuffer for the processes of train_agent_async
+            to replay transitions of each other.
         beta (float): Weight coefficient for the entropy regularizaiton term.
         phi (callable): Feature extractor function
         pi_loss_coef (float): Weight coefficient for the loss of the policy
@@ -362,6 +384,13 @@ class ACER(agent.AttributeSavingMixin, agent.AsyncAgent):
 
         self.init_history_data_for_online_update()
 
+        # Variables used by the BatchAgent interface
+        self.batch_segments = None
+        self.batch_finished_segments = []
+        self.batch_last_state = None
+        self.batch_last_action = None
+        self.batch_last_action_distrib = None
+
     def init_history_data_for_online_update(self):
         self.past_states = {}
         self.past_actions = {}
@@ -514,6 +543,9 @@ class ACER(agent.AttributeSavingMixin, agent.AsyncAgent):
             action_distribs_mu=action_distribs_mu,
             avg_action_distribs=avg_action_distribs)
 
+        self._update_shared_model(total_loss)
+
+    def _update_shared_model(self, total_loss):
         # Compute gradients using thread-specific model
         self.model.zerograds()
         F.squeeze(total_loss).backward()
@@ -718,6 +750,152 @@ class ACER(agent.AttributeSavingMixin, agent.AsyncAgent):
             self.model.reset_state()
             self.shared_average_model.reset_state()
 
+    def _make_empty_segment(self):
+        return {
+            'states': {},
+            'actions': {},
+            'rewards': {},
+            'values': {},
+            'action_values': {},
+            'action_distribs': {},
+            'avg_action_distribs': {},
+        }
+
+    def _initialize_batch_variables(self, num_envs):
+        self.batch_segments = [
+            self._make_empty_segment() for _ in range(num_envs)]
+        self.batch_finished_segments = []
+        self.batch_last_state = [None] * num_envs
+        self.batch_last_action = [None] * num_envs
+        self.batch_last_action_distrib = [None] * num_envs
+        self.t_start = self.t
+
+    def batch_update_on_policy(self):
+        """Update the model using the segments of a batch of envs.
+
+        The losses of the segments finished since the last update are summed
+        up to compute a single update.
+        """
+        if not self.disable_online_update and self.batch_finished_segments:
+            total_loss = 0
+            for R, segment in self.batch_finished_segments:
+                total_loss += self.compute_loss(
+                    t_start=0, t_stop=len(segment['actions']), R=R,
+                    states=segment['states'],
+                    actions=segment['actions'],
+                    rewards=segment['rewards'],
+                    values=segment['values'],
+                    action_values=segment['action_values'],
+                    action_distribs=segment['action_distribs'],
+                    action_distribs_mu=None,
+                    avg_action_distribs=segment['avg_action_distribs'])
+            self._update_shared_model(total_loss)
+        self.batch_finished_segments = []
+        self.t_start = self.t
+
+    def batch_act(self, batch_obs):
+        # Use the process-local model for acting
+        with chainer.no_backprop_mode():
+            statevar = batch_states(batch_obs, np, self.phi)
+            action_distrib, _, _ = self.model(statevar)
+            if self.act_deterministically:
+                return action_distrib.most_probable.array
+            else:
+                return action_distrib.sample().array
+
+    def batch_act_and_train(self, batch_obs):
+        assert not is_recurrent(self.model),\
+            'Recurrent models are not supported in batch training.'
+        num_envs = len(batch_obs)
+        if self.batch_segments is None:
+            self._initialize_batch_variables(num_envs)
+        assert len(self.batch_segments) == num_envs
+
+        statevar = batch_states(batch_obs, np, self.phi)
+        action_distrib, action_value, v = self.model(statevar)
+        batch_action = action_distrib.sample().array
+        with chainer.no_backprop_mode():
+            avg_action_distrib, _, _ = self.shared_average_model(statevar)
+
+        # Save values for a later update
+        for i, segment in enumerate(self.batch_segments):
+            k = len(segment['actions'])
+            segment['states'][k] = statevar[i:i + 1]
+            segment['actions'][k] = batch_action[i]
+            segment['values'][k] = v[i:i + 1]
+            segment['action_values'][k] = _slice_action_value(
+                action_value, i, num_envs)
+            segment['action_distribs'][k] = action_distrib[i:i + 1]
+            segment['avg_action_distribs'][k] = avg_action_distrib[i:i + 1]
+
+        self.t += 1
+
+        # Update stats
+        self.average_value += (
+            (1 - self.average_value_decay) *
+            (float(v.array.mean()) - self.average_value))
+        self.average_entropy += (
+            (1 - self.average_entropy_decay) *
+            (float(action_distrib.entropy.array.mean())
+             - self.average_entropy))
+
+        mu = action_distrib.copy()
+        self.batch_last_state = list(batch_obs)
+        self.batch_last_action = list(batch_action)
+        self.batch_last_action_distrib = [
+            mu[i:i + 1] for i in range(num_envs)]
+
+        return batch_action
+
+    def batch_observe(self, batch_obs, batch_reward, batch_done, batch_reset):
+        pass
+
+    def batch_observe_and_train(self, batch_obs, batch_reward,
+                                batch_done, batch_reset):
+        batch_done = np.asarray(batch_done, dtype=bool)
+        ends = np.logical_or(batch_done, batch_reset)
+        need_update = self.t - self.t_start == self.t_max
+        if need_update:
+            bootstrapped = np.logical_not(batch_done)
+        else:
+            bootstrapped = np.logical_and(ends, np.logical_not(batch_done))
+        if np.any(bootstrapped):
+            with chainer.no_backprop_mode():
+                _, _, next_v = self.model(
+                    batch_states(batch_obs, np, self.phi))
+
+        for i, segment in enumerate(self.batch_segments):
+            if self.batch_last_state[i] is None:
+                continue
+            segment['rewards'][len(segment['actions']) - 1] = batch_reward[i]
+            if self.replay_buffer is not None:
+                # Add a transition to the replay buffer
+                self.replay_buffer.append(
+                    state=self.batch_last_state[i],
+                    action=self.batch_last_action[i],
+                    reward=batch_reward[i],
+                    next_state=batch_obs[i],
+                    next_action=None,
+                    is_state_terminal=batch_done[i],
+                    mu=self.batch_last_action_distrib[i],
+                    env_id=i,
+                )
+                if ends[i]:
+                    self.replay_buffer.stop_current_episode(env_id=i)
+            if ends[i] or need_update:
+                R = float(next_v.array[i]) if bootstrapped[i] else 0
+                self.batch_finished_segments.append((R, segment))
+                self.batch_segments[i] = self._make_empty_segment()
+            if ends[i]:
+                self.batch_last_state[i] = None
+                self.batch_last_action[i] = None
+                self.batch_last_action_distrib[i] = None
+
+        if need_update:
+            self.batch_update_on_policy()
+            for _ in range(self.n_times_replay):
+                self.update_from_replay()
+
     def load(self, dirname):
         super().load(dirname)
         copy_param.copy_param(target_link=self.shared_model,
@@ -45,31 +45,42 @@ def _apply_categorical_projection(y, y_probs, z):
     # Avoid the error caused by inexact delta_z
     bj = xp.clip(bj, 0, n_atoms - 1)
 
-    # l, u: (batch_size, n_atoms)
-    l, u = xp.floor(bj), xp.ceil(bj)
+    # l: (batch_size, n_atoms)
+    l = xp.floor(bj)
     assert l.shape == (batch_size, n_atoms)
-    assert u.shape == (batch_size, n_atoms)
+
+    # Probabilities accumulated to l and u. Note that u - bj in the original
+    # paper is replaced with 1 - (bj - l) to deal with the case when bj is an
+    # integer, i.e., l = u = bj, where m_u is zero.
+    bj -= l
+    m_u = y_probs * bj
+    m_l = y_probs - m_u
 
     if cuda.available and xp is cuda.cupy:
-        scatter_add = xp.scatter_add
+        u = l + (bj > 0)
+        z_probs = xp.zeros((batch_size, n_atoms), dtype=xp.float32)
+        offset = xp.arange(
+            0, batch_size * n_atoms, n_atoms, dtype=xp.int32)[..., None]
+        xp.scatter_add(
+            z_probs.ravel(), (l.astype(xp.int32) + offset).ravel(),
+            m_l.ravel())
+        xp.scatter_add(
+            z_probs.ravel(), (u.astype(xp.int32) + offset).ravel(),
+            m_u.ravel())
     else:
-        scatter_add = np.add.at
-
-    z_probs = xp.zeros((batch_size, n_atoms), dtype=xp.float32)
-    offset = xp.arange(
-        0, batch_size * n_atoms, n_atoms, dtype=xp.int32)[..., None]
-    # Accumulate m_l
-    # Note that u - bj in the original paper is replaced with 1 - (bj - l) to
-    # deal with the case when bj is an integer, i.e., l = u = bj
-    scatter_add(
-        z_probs.ravel(),
-        (l.astype(xp.int32) + offset).ravel(),
-        (y_probs * (1 - (bj - l))).ravel())
-    # Accumulate m_u
-    scatter_add(
-        z_probs.ravel(),
-        (u.astype(xp.int32) + offset).ravel(),
-        (y_probs * (bj - l)).ravel())
+        # np.bincount is much faster than np.add.at of old NumPy, which is
+        # unbuffered. Since u = l + 1 unless m_u is zero, m_u is accumulated
+        # to l and shifted by one atom so that indices are computed once.
+        # Weights are given as float64, which bincount uses internally.
+        size = batch_size * n_atoms
+        indices = (l.astype(np.intp) +
+                   np.arange(0, size, n_atoms)[:, None]).ravel()
+        z_probs = np.bincount(
+            indices, weights=m_l.astype(np.float64).ravel(), minlength=size)
+        z_probs[1:] += np.bincount(
+            indices, weights=m_u.astype(np.float64).ravel(),
+            minlength=size)[:-1]
+        z_probs = z_probs.astype(np.float32).reshape(batch_size, n_atoms)
     return z_probs
 
 
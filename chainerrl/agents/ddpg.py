@@ -21,6 +21,8 @@ from chainerrl.recurrent import Recurrent
 from chainerrl.recurrent import RecurrentChainMixin
 from chainerrl.recurrent import state_kept
 from chainerrl.replay_buffer import batch_experiences
+from chainerrl.replay_buffer import check_phi_for_replay_buffer
+from chainerrl.replay_buffer import identity_phi
 from chainerrl.replay_buffer import ReplayUpdater
 
 
@@ -60,7 +62,9 @@ class DDPG(AttributeSavingMixin, BatchAgent):
         minibatch_size (int): Minibatch size
         update_interval (int): Model update interval in step
         target_update_interval (int): Target model update interval in step
-        phi (callable): Feature extractor applied to observations
+        phi (callable): Feature extractor applied to observations. It must
+            be identity_phi for DeviceReplayBuffer, to which observations
+            must be given after they are preprocessed, e.g. by env wrappers.
         target_update_method (str): 'hard' or 'soft'.
         soft_update_tau (float): Tau of soft target update.
         n_times_update (int): Number of repetition of update
@@ -90,7 +94,7 @@ class DDPG(AttributeSavingMixin, BatchAgent):
                  gpu=None, replay_start_size=50000,
                  minibatch_size=32, update_interval=1,
                  target_update_interval=10000,
-                 phi=lambda x: x,
+                 phi=identity_phi,
                  target_update_method='hard',
                  soft_update_tau=1e-2,
                  n_times_update=1, average_q_decay=0.999,
@@ -115,6 +119,7 @@ class DDPG(AttributeSavingMixin, BatchAgent):
         self.gpu = gpu
         self.target_update_interval = target_update_interval
         self.phi = phi
+        check_phi_for_replay_buffer(replay_buffer, phi)
         self.target_update_method = target_update_method
         self.soft_update_tau = soft_update_tau
         self.logger = logger
@@ -394,10 +399,8 @@ class DDPG(AttributeSavingMixin, BatchAgent):
                             for _ in range(len(batch_obs))]
         else:
             batch_greedy_action = self.batch_act(batch_obs)
-            batch_action = [
-                self.explorer.select_action(
-                    self.t, lambda: batch_greedy_action[i])
-                for i in range(len(batch_greedy_action))]
+            batch_action = self.explorer.batch_select_action(
+                self.t, lambda: batch_greedy_action)
 
         self.batch_last_obs = list(batch_obs)
         self.batch_last_action = list(batch_action)
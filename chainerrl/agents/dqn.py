@@ -12,14 +12,22 @@ from logging import getLogger
 import chainer
 from chainer import cuda
 import chainer.functions as F
+import numpy as np
 
 from chainerrl import agent
 from chainerrl.misc.batch_states import batch_states
 from chainerrl.misc.copy_param import synchronize_parameters
+from chainerrl.misc.phase_timer import PhaseTimer
+from chainerrl.recurrent import concatenate_states
+from chainerrl.recurrent import detach_state
 from chainerrl.recurrent import Recurrent
+from chainerrl.recurrent import select_states
 from chainerrl.recurrent import state_reset
 from chainerrl.replay_buffer import batch_experiences
+from chainerrl.replay_buffer import check_phi_for_replay_buffer
+from chainerrl.replay_buffer import identity_phi
 from chainerrl.replay_buffer import ReplayUpdater
+from chainerrl.replay_buffer import SequenceReplayBuffer
 
 
 def compute_value_loss(y, t, clip_delta=True, batch_accumulator='mean'):
@@ -87,7 +95,10 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
     Args:
         q_function (StateQFunction): Q-function
         optimizer (Optimizer): Optimizer that is already setup
-        replay_buffer (ReplayBuffer): Replay buffer
+        replay_buffer (ReplayBuffer): Replay buffer. If it is a
+            SequenceReplayBuffer, recurrent states of the model are stored
+            with transitions and the model is updated by
+            update_from_sequences, which is not supported in batch training.
         gamma (float): Discount factor
         explorer (Explorer): Explorer that specifies an exploration strategy.
         gpu (int): GPU device id if not None nor negative.
@@ -112,6 +123,10 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
         logger (Logger): Logger used
         batch_states (callable): method which makes a batch of observations.
             default is `chainerrl.misc.batch_states.batch_states`
+        store_phi_in_replay (bool): If set True, observations are stored in
+            the replay buffer after phi is applied so that phi is not
+            recomputed every time they are sampled for updates. It is
+            required for DeviceReplayBuffer unless phi is identity_phi.
     """
 
     saved_attributes = ('model', 'target_model', 'optimizer')
@@ -120,7 +135,7 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
                  explorer, gpu=None, replay_start_size=50000,
                  minibatch_size=32, update_interval=1,
                  target_update_interval=10000, clip_delta=True,
-                 phi=lambda x: x,
+                 phi=identity_phi,
                  target_update_method='hard',
                  soft_update_tau=1e-2,
                  n_times_update=1, average_q_decay=0.999,
@@ -128,7 +143,8 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
                  batch_accumulator='mean', episodic_update=False,
                  episodic_update_len=None,
                  logger=getLogger(__name__),
-                 batch_states=batch_states):
+                 batch_states=batch_states,
+                 store_phi_in_replay=False):
         self.model = q_function
         self.q_function = q_function  # For backward compatibility
 
@@ -151,8 +167,15 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
         assert batch_accumulator in ('mean', 'sum')
         self.logger = logger
         self.batch_states = batch_states
+        self.store_phi_in_replay = store_phi_in_replay
+        # Disabled by default. Enable it to measure time spent in each phase.
+        self.phase_timer = PhaseTimer(enabled=False)
+        # Recurrent states are stored only for sequence replay
+        self.sequence_update = isinstance(replay_buffer, SequenceReplayBuffer)
         if episodic_update:
             update_func = self.update_from_episodes
+        elif self.sequence_update:
+            update_func = self.update_from_sequences
         else:
             update_func = self.update
         self.replay_updater = ReplayUpdater(
@@ -164,11 +187,13 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
             n_times_update=n_times_update,
             replay_start_size=replay_start_size,
             update_interval=update_interval,
+            phase_timer=self.phase_timer,
         )
 
         self.t = 0
         self.last_state = None
         self.last_action = None
+        self.last_recurrent_state = None
         self.target_model = None
         self.sync_target_network()
         # For backward compatibility
@@ -185,6 +210,22 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
             raise ValueError(
                 'Replay start size cannot exceed '
                 'replay buffer capacity.')
+        check_phi_for_replay_buffer(self.replay_buffer, self._replay_phi)
+
+    def _to_replay_state(self, obs):
+        """Convert an observation to what is stored in the replay buffer."""
+        if self.store_phi_in_replay:
+            return self.phi(obs)
+        else:
+            return obs
+
+    @property
+    def _replay_phi(self):
+        """Feature extractor applied to states sampled from replay."""
+        if self.store_phi_in_replay:
+            return identity_phi
+        else:
+            return self.phi
 
     def sync_target_network(self):
         """Synchronize target network with current network."""
@@ -208,7 +249,8 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
         """Update the model from experiences
 
         Args:
-            experiences (list): List of lists of dicts.
+            experiences (list or dict): List of lists of dicts, or a dict of
+                batched arrays sampled from DeviceReplayBuffer.
                 For DQN, each dict must contains:
                   - state (object): State
                   - action (object): Action
@@ -223,18 +265,21 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
         Returns:
             None
         """
-        has_weight = 'weight' in experiences[0][0]
-        exp_batch = batch_experiences(
-            experiences, xp=self.xp,
-            phi=self.phi, gamma=self.gamma,
-            batch_states=self.batch_states)
-        if has_weight:
-            exp_batch['weights'] = self.xp.asarray(
-                [elem[0]['weight']for elem in experiences],
-                dtype=self.xp.float32)
-            if errors_out is None:
-                errors_out = []
-        loss = self._compute_loss(exp_batch, errors_out=errors_out)
+        has_weight = (not isinstance(experiences, dict) and
+                      'weight' in experiences[0][0])
+        with self.phase_timer.measure('batch'):
+            exp_batch = batch_experiences(
+                experiences, xp=self.xp,
+                phi=self._replay_phi, gamma=self.gamma,
+                batch_states=self.batch_states)
+            if has_weight:
+                exp_batch['weights'] = self.xp.asarray(
+                    [elem[0]['weight']for elem in experiences],
+                    dtype=self.xp.float32)
+        if has_weight and errors_out is None:
+            errors_out = []
+        with self.phase_timer.measure('loss_forward'):
+            loss = self._compute_loss(exp_batch, errors_out=errors_out)
         if has_weight:
             self.replay_buffer.update_errors(errors_out)
 
@@ -242,9 +287,11 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
         self.average_loss *= self.average_loss_decay
         self.average_loss += (1 - self.average_loss_decay) * float(loss.array)
 
-        self.model.cleargrads()
-        loss.backward()
-        self.optimizer.update()
+        with self.phase_timer.measure('loss_backward'):
+            self.model.cleargrads()
+            loss.backward()
+        with self.phase_timer.measure('optimizer_update'):
+            self.optimizer.update()
 
     def input_initial_batch_to_target_model(self, batch):
         self.target_model(batch['state'])
@@ -262,6 +309,8 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
             for _ in episodes:
                 errors_out.append(0.0)
             errors_out_step = []
+        # Per-step errors, which a prioritized buffer can reduce by itself
+        step_errors = [[] for _ in episodes]
 
         with state_reset(self.model), state_reset(self.target_model):
             loss = 0
@@ -279,23 +328,26 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
                     transitions.append([ep[i]])
                     if has_weights:
                         weights_step.append(weights[index])
-                batch = batch_experiences(
-                    transitions,
-                    xp=self.xp,
-                    phi=self.phi,
-                    gamma=self.gamma,
-                    batch_states=self.batch_states)
-                assert len(batch['state']) == len(transitions)
-                if i == 0:
-                    self.input_initial_batch_to_target_model(batch)
-                if has_weights:
-                    batch['weights'] = self.xp.asarray(
-                        weights_step, dtype=self.xp.float32)
-                loss += self._compute_loss(batch,
-                                           errors_out=errors_out_step)
+                with self.phase_timer.measure('batch'):
+                    batch = batch_experiences(
+                        transitions,
+                        xp=self.xp,
+                        phi=self._replay_phi,
+                        gamma=self.gamma,
+                        batch_states=self.batch_states)
+                    assert len(batch['state']) == len(transitions)
+                    if has_weights:
+                        batch['weights'] = self.xp.asarray(
+                            weights_step, dtype=self.xp.float32)
+                with self.phase_timer.measure('loss_forward'):
+                    if i == 0:
+                        self.input_initial_batch_to_target_model(batch)
+                    loss += self._compute_loss(batch,
+                                               errors_out=errors_out_step)
                 if errors_out is not None:
                     for err, index in zip(errors_out_step, indices):
                         errors_out[index] += err
+                        step_errors[index].append(err)
             loss /= max_epi_len
 
             # Update stats
@@ -303,11 +355,97 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
             self.average_loss += \
                 (1 - self.average_loss_decay) * float(loss.array)
 
-            self.model.cleargrads()
-            loss.backward()
-            self.optimizer.update()
+            with self.phase_timer.measure('loss_backward'):
+                self.model.cleargrads()
+                loss.backward()
+            with self.phase_timer.measure('optimizer_update'):
+                self.optimizer.update()
         if has_weights:
-            self.replay_buffer.update_errors(errors_out)
+            self.replay_buffer.update_errors(step_errors)
+
+    def update_from_sequences(self, sequences, errors_out=None):
+        """Update the model from sequences with stored recurrent states.
+
+        The model and the target model start from the stored states of
+        sequences and consume burn-in transitions without computing
+        gradients. The loss is then computed on the remaining transitions in
+        batches of a fixed size, where sequences that are shorter than the
+        longest one are masked out.
+
+        Args:
+            sequences (list): List of sequences sampled from a
+                SequenceReplayBuffer.
+            errors_out (list or None): If set to a list, then mean absolute
+                TD-errors of sequences will be stored in it.
+        """
+        xp = self.xp
+        batch_size = len(sequences)
+        burn_ins = np.asarray([seq[0]['burn_in'] for seq in sequences])
+        lengths = np.asarray([len(seq) for seq in sequences]) - burn_ins
+
+        def batch_state_at(indices):
+            return self.batch_states(
+                [seq[i]['state'] for seq, i in zip(sequences, indices)],
+                xp, self._replay_phi)
+
+        with state_reset(self.model), state_reset(self.target_model):
+            initial_state = concatenate_states(
+                [seq[0]['recurrent_state'] for seq in sequences], xp)
+            self.model.set_state(initial_state)
+            self.target_model.set_state(initial_state)
+
+            # Burn-in: sequences that finish burn-in keep their states
+            with chainer.no_backprop_mode(), \
+                    self.phase_timer.measure('burn_in'):
+                for i in range(burn_ins.max()):
+                    in_burn_in = xp.asarray(i < burn_ins)
+                    batch_state = batch_state_at(np.minimum(i, burn_ins))
+                    for model in (self.model, self.target_model):
+                        prev_state = model.get_state()
+                        model(batch_state)
+                        model.set_state(select_states(
+                            in_burn_in, model.get_state(), prev_state))
+
+            loss = 0
+            errors = np.zeros(batch_size, dtype=np.float32)
+            errors_step = [] if errors_out is not None else None
+            for i in range(lengths.max()):
+                valid = i < lengths
+                transitions = [
+                    [seq[b + min(i, length - 1)]]
+                    for seq, b, length in zip(sequences, burn_ins, lengths)]
+                with self.phase_timer.measure('batch'):
+                    batch = batch_experiences(
+                        transitions,
+                        xp=xp,
+                        phi=self._replay_phi,
+                        gamma=self.gamma,
+                        batch_states=self.batch_states)
+                    batch['weights'] = xp.asarray(valid, dtype=np.float32)
+                with self.phase_timer.measure('loss_forward'):
+                    if i == 0:
+                        self.input_initial_batch_to_target_model(batch)
+                    loss += self._compute_loss(batch, errors_out=errors_step)
+                if errors_out is not None:
+                    errors += valid * np.asarray(errors_step)
+            if self.batch_accumulator == 'mean':
+                # Each step is averaged over the batch including masked ones
+                loss *= batch_size / lengths.sum()
+
+            # Update stats
+            self.average_loss *= self.average_loss_decay
+            self.average_loss += \
+                (1 - self.average_loss_decay) * float(loss.array)
+
+            with self.phase_timer.measure('loss_backward'):
+                self.model.cleargrads()
+                loss.backward()
+            with self.phase_timer.measure('optimizer_update'):
+                self.optimizer.update()
+
+        if errors_out is not None:
+            del errors_out[:]
+            errors_out.extend(errors / lengths)
 
     def _compute_target_values(self, exp_batch):
         batch_next_state = exp_batch['next_state']
@@ -385,7 +523,13 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
 
     def act_and_train(self, obs, reward):
 
-        with chainer.using_config('train', False), chainer.no_backprop_mode():
+        if self.sequence_update:
+            # Recurrent state before observing obs is stored with obs
+            recurrent_state = detach_state(self.model.get_state())
+
+        with chainer.using_config('train', False), \
+                chainer.no_backprop_mode(), \
+                self.phase_timer.measure('act_forward'):
             action_value = self.model(
                 self.batch_states([obs], self.xp, self.phi))
             q = float(action_value.max.array)
@@ -403,21 +547,27 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
 
         # Update the target network
         if self.t % self.target_update_interval == 0:
-            self.sync_target_network()
+            with self.phase_timer.measure('target_sync'):
+                self.sync_target_network()
 
+        replay_state = self._to_replay_state(obs)
         if self.last_state is not None:
             assert self.last_action is not None
             # Add a transition to the replay buffer
-            self.replay_buffer.append(
-                state=self.last_state,
-                action=self.last_action,
-                reward=reward,
-                next_state=obs,
-                next_action=action,
-                is_state_terminal=False)
-
-        self.last_state = obs
+            with self.phase_timer.measure('replay_append'):
+                self.replay_buffer.append(
+                    state=self.last_state,
+                    action=self.last_action,
+                    reward=reward,
+                    next_state=replay_state,
+                    next_action=action,
+                    is_state_terminal=False,
+                    **self._recurrent_state_kwargs())
+
+        self.last_state = replay_state
         self.last_action = action
+        if self.sequence_update:
+            self.last_recurrent_state = recurrent_state
 
         self.replay_updater.update_if_necessary(self.t)
 
@@ -426,18 +576,18 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
         return self.last_action
 
     def batch_act_and_train(self, batch_obs):
-        with chainer.using_config('train', False), chainer.no_backprop_mode():
+        assert not self.sequence_update,\
+            'SequenceReplayBuffer is not supported in batch training.'
+        with chainer.using_config('train', False), \
+                chainer.no_backprop_mode(), \
+                self.phase_timer.measure('act_forward'):
             batch_xs = self.batch_states(batch_obs, self.xp, self.phi)
             batch_av = self.model(batch_xs)
             batch_maxq = batch_av.max.array
             batch_argmax = cuda.to_cpu(batch_av.greedy_actions.array)
-        batch_action = [
-            self.explorer.select_action(
-                self.t, lambda: batch_argmax[i],
-                action_value=batch_av[i:i + 1],
-            )
-            for i in range(len(batch_obs))]
-        self.batch_last_obs = list(batch_obs)
+        batch_action = self.explorer.batch_select_action(
+            self.t, lambda: batch_argmax, action_value=batch_av)
+        self.batch_last_obs = [self._to_replay_state(obs) for obs in batch_obs]
         self.batch_last_action = list(batch_action)
 
         # Update stats
@@ -455,23 +605,27 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
 
     def batch_observe_and_train(self, batch_obs, batch_reward,
                                 batch_done, batch_reset):
+        assert not self.sequence_update,\
+            'SequenceReplayBuffer is not supported in batch training.'
         for i in range(len(batch_obs)):
             self.t += 1
             # Update the target network
             if self.t % self.target_update_interval == 0:
-                self.sync_target_network()
+                with self.phase_timer.measure('target_sync'):
+                    self.sync_target_network()
             if self.batch_last_obs[i] is not None:
                 assert self.batch_last_action[i] is not None
                 # Add a transition to the replay buffer
-                self.replay_buffer.append(
-                    state=self.batch_last_obs[i],
-                    action=self.batch_last_action[i],
-                    reward=batch_reward[i],
-                    next_state=batch_obs[i],
-                    next_action=None,
-                    is_state_terminal=batch_done[i],
-                    env_id=i,
-                )
+                with self.phase_timer.measure('replay_append'):
+                    self.replay_buffer.append(
+                        state=self.batch_last_obs[i],
+                        action=self.batch_last_action[i],
+                        reward=batch_reward[i],
+                        next_state=self._to_replay_state(batch_obs[i]),
+                        next_action=None,
+                        is_state_terminal=batch_done[i],
+                        env_id=i,
+                    )
                 if batch_reset[i] or batch_done[i]:
                     self.batch_last_obs[i] = None
                     self.replay_buffer.stop_current_episode(env_id=i)
@@ -491,26 +645,37 @@ class DQN(agent.AttributeSavingMixin, agent.BatchAgent):
         assert self.last_action is not None
 
         # Add a transition to the replay buffer
-        self.replay_buffer.append(
-            state=self.last_state,
-            action=self.last_action,
-            reward=reward,
-            next_state=state,
-            next_action=self.last_action,
-            is_state_terminal=done)
+        with self.phase_timer.measure('replay_append'):
+            self.replay_buffer.append(
+                state=self.last_state,
+                action=self.last_action,
+                reward=reward,
+                next_state=self._to_replay_state(state),
+                next_action=self.last_action,
+                is_state_terminal=done,
+                **self._recurrent_state_kwargs())
 
         self.stop_episode()
 
+    def _recurrent_state_kwargs(self):
+        if self.sequence_update:
+            return {'recurrent_state': self.last_recurrent_state}
+        return {}
+
     def stop_episode(self):
         self.last_state = None
         self.last_action = None
+        self.last_recurrent_state = None
         if isinstance(self.model, Recurrent):
             self.model.reset_state()
         self.replay_buffer.stop_current_episode()
 
     def get_statistics(self):
-        return [
+        stats = [
             ('average_q', self.average_q),
             ('average_loss', self.average_loss),
             ('n_updates', self.optimizer.t),
         ]
+        if self.phase_timer.enabled:
+            stats.extend(self.phase_timer.get_statistics())
+        return stats
@@ -0,0 +1,294 @@
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import chainer
+from chainer import cuda
+from chainer import functions as F
+import numpy as np
+
+from chainerrl import agent
+from chainerrl.agents.a2c import A2CModel
+from chainerrl.misc.batch_states import batch_states
+
+
+def compute_vtrace(behavior_log_probs, target_log_probs, rewards, discounts,
+                   values, bootstrap_value, rho_bar=1.0, c_bar=1.0):
+    """Compute V-trace targets and policy gradient advantages.
+
+    All the arguments except bootstrap_value are arrays of shape (T, B),
+    where T is the length of trajectories and B is the batch size. See
+    https://arxiv.org/abs/1802.01561 for V-trace.
+
+    Args:
+        behavior_log_probs (numpy.ndarray): Log probabilities of actions
+            under the behavior policy.
+        target_log_probs (numpy.ndarray): Log probabilities of actions under
+            the target policy.
+        rewards (numpy.ndarray): Rewards.
+        discounts (numpy.ndarray): Discount factors, which are zero at the
+            end of episodes.
+        values (numpy.ndarray): Values of states.
+        bootstrap_value (numpy.ndarray): Values of states after the last
+            step, whose shape is (B,).
+        rho_bar (float): Threshold of clipping importance weights used for
+            value targets and advantages.
+        c_bar (float): Threshold of clipping importance weights used for
+            traces.
+
+    Returns:
+        tuple of two numpy.ndarray: V-trace targets and advantages.
+    """
+    rhos = np.exp(target_log_probs - behavior_log_probs)
+    clipped_rhos = np.minimum(rho_bar, rhos)
+    cs = np.minimum(c_bar, rhos)
+    next_values = np.concatenate([values[1:], bootstrap_value[None]])
+    deltas = clipped_rhos * (rewards + discounts * next_values - values)
+
+    vs_minus_values = np.empty_like(deltas)
+    acc = np.zeros_like(bootstrap_value)
+    for t in reversed(range(len(deltas))):
+        acc = deltas[t] + discounts[t] * cs[t] * acc
+        vs_minus_values[t] = acc
+    vs = vs_minus_values + values
+
+    next_vs = np.concatenate([vs[1:], bootstrap_value[None]])
+    advantages = clipped_rhos * (rewards + discounts * next_vs - values)
+    return vs, advantages
+
+
+class IMPALA(agent.AttributeSavingMixin, agent.BatchAgent):
+    """IMPALA: Importance Weighted Actor-Learner Architecture.
+
+    The agent updates its model from batched trajectories generated by
+    possibly stale behavior policies, correcting them by V-trace. See
+    https://arxiv.org/abs/1802.01561
+
+    Trajectories are usually generated by actor processes of
+    chainerrl.experiments.train_agent_impala, which call update. The agent can
+    also be trained by itself via the BatchAgent interface, where the
+    behavior policy is the current policy and V-trace reduces to n-step
+    returns.
+
+    Resetting an env without reaching a terminal state is regarded as
+    reaching a terminal state, as A2C does.
+
+    Args:
+        model (A2CModel): Model to train
+        optimizer (chainer.Optimizer): optimizer used to train the model
+        gamma (float): Discount factor [0,1]
+        gpu (int): GPU device id if not None nor negative.
+        update_steps (int): Length of trajectories used for each update.
+        phi (callable): Feature extractor function
+        v_loss_coef (float): Weight coefficient for the loss of the value
+            function
+        entropy_coeff (float): Weight coefficient for the loss of the entropy
+        rho_bar (float): Threshold of clipping importance weights used for
+            value targets and advantages.
+        c_bar (float): Threshold of clipping importance weights used for
+            traces.
+        act_deterministically (bool): If set true, choose most probable actions
+            in act method.
+        average_actor_loss_decay (float): Decay rate of average actor loss.
+            Used only to record statistics.
+        average_entropy_decay (float): Decay rate of average entropy. Used only
+            to record statistics.
+        average_value_decay (float): Decay rate of average value. Used only
+            to record statistics.
+        average_importance_weight_decay (float): Decay rate of average
+            importance weight. Used only to record statistics.
+        batch_states (callable): method which makes a batch of observations.
+            default is `chainerrl.misc.batch_states.batch_states`
+    """
+
+    saved_attributes = ['model', 'optimizer']
+
+    def __init__(self, model, optimizer, gamma,
+                 gpu=None,
+                 update_steps=20,
+                 phi=lambda x: x,
+                 v_loss_coef=0.5,
+                 entropy_coeff=0.01,
+                 rho_bar=1.0,
+                 c_bar=1.0,
+                 act_deterministically=False,
+                 average_actor_loss_decay=0.999,
+                 average_entropy_decay=0.999,
+                 average_value_decay=0.999,
+                 average_importance_weight_decay=0.999,
+                 batch_states=batch_states):
+
+        assert isinstance(model, A2CModel)
+
+        self.model = model
+        self.gpu = gpu
+        if gpu is not None and gpu >= 0:
+            chainer.cuda.get_device(gpu).use()
+            self.model.to_gpu(device=gpu)
+
+        self.optimizer = optimizer
+        self.gamma = gamma
+        self.update_steps = update_steps
+        self.phi = phi
+        self.v_loss_coef = v_loss_coef
+        self.entropy_coeff = entropy_coeff
+        self.rho_bar = rho_bar
+        self.c_bar = c_bar
+        self.act_deterministically = act_deterministically
+        self.average_actor_loss_decay = average_actor_loss_decay
+        self.average_entropy_decay = average_entropy_decay
+        self.average_value_decay = average_value_decay
+        self.average_importance_weight_decay = \
+            average_importance_weight_decay
+        self.batch_states = batch_states
+
+        self.xp = self.model.xp
+        self.rollout = None
+
+        # Stats
+        self.average_actor_loss = 0
+        self.average_value = 0
+        self.average_entropy = 0
+        self.average_importance_weight = 1
+
+    def update(self, rollout):
+        """Update the model from batched trajectories.
+
+        Args:
+            rollout (dict): Arrays of trajectories. 'state' is an array of
+                states of shape (T + 1, B, ...), where T is the length of
+                trajectories, B is the batch size and the last states are
+                used to bootstrap. 'action' and 'log_prob' are arrays of
+                actions of shape (T, B, ...) and their log probabilities
+                under the behavior policy of shape (T, B). 'reward' and
+                'nonterminal' are arrays of shape (T, B), where 'nonterminal'
+                is 0 at the end of episodes and otherwise 1.
+        """
+        xp = self.xp
+        states = xp.asarray(rollout['state'])
+        actions = xp.asarray(rollout['action'])
+        T, B = rollout['reward'].shape
+        obs_shape = states.shape[2:]
+        action_shape = actions.shape[2:]
+
+        with chainer.no_backprop_mode():
+            _, bootstrap_value = self.model.pi_and_v(states[-1])
+        pout, values = self.model.pi_and_v(
+            states[:-1].reshape((T * B,) + obs_shape))
+        log_probs = F.reshape(
+            pout.log_prob(actions.reshape((T * B,) + action_shape)), (T, B))
+        values = F.reshape(values, (T, B))
+
+        behavior_log_probs = cuda.to_cpu(
+            rollout['log_prob']).astype(np.float32)
+        target_log_probs = cuda.to_cpu(log_probs.array)
+        vs, advantages = compute_vtrace(
+            behavior_log_probs=behavior_log_probs,
+            target_log_probs=target_log_probs,
+            rewards=cuda.to_cpu(rollout['reward']).astype(np.float32),
+            discounts=self.gamma * cuda.to_cpu(
+                rollout['nonterminal']).astype(np.float32),
+            values=cuda.to_cpu(values.array),
+            bootstrap_value=cuda.to_cpu(bootstrap_value.array[:, 0]),
+            rho_bar=self.rho_bar,
+            c_bar=self.c_bar,
+        )
+
+        actor_loss = -F.mean(log_probs * xp.asarray(advantages))
+        value_loss = F.mean_squared_error(
+            values, xp.asarray(vs, dtype=np.float32)) / 2
+        entropy = F.mean(pout.entropy)
+
+        self.model.cleargrads()
+        (actor_loss
+         + self.v_loss_coef * value_loss
+         - self.entropy_coeff * entropy).backward()
+        self.optimizer.update()
+
+        # Update stats
+        self.average_actor_loss += (
+            (1 - self.average_actor_loss_decay) *
+            (float(actor_loss.array) - self.average_actor_loss))
+        self.average_value += (
+            (1 - self.average_value_decay) *
+            (float(value_loss.array) - self.average_value))
+        self.average_entropy += (
+            (1 - self.average_entropy_decay) *
+            (float(entropy.array) - self.average_entropy))
+        importance_weight = float(
+            np.mean(np.exp(target_log_probs - behavior_log_probs)))
+        self.average_importance_weight += (
+            (1 - self.average_importance_weight_decay) *
+            (importance_weight - self.average_importance_weight))
+
+    def _act(self, statevar, deterministic):
+        with chainer.using_config('train', False), \
+                chainer.no_backprop_mode():
+            pout, _ = self.model.pi_and_v(statevar)
+            if deterministic:
+                action = pout.most_probable.array
+            else:
+                action = pout.sample().array
+            return action, pout.log_prob(action).array
+
+    def batch_act_and_train(self, batch_obs):
+        statevar = self.batch_states(batch_obs, self.xp, self.phi)
+        action, log_prob = self._act(statevar, deterministic=False)
+        if self.rollout is None:
+            self.rollout = dict(state=[], action=[], reward=[],
+                                nonterminal=[], log_prob=[])
+        self.rollout['state'].append(statevar)
+        self.rollout['action'].append(action)
+        self.rollout['log_prob'].append(log_prob)
+        return cuda.to_cpu(action)
+
+    def batch_observe_and_train(self, batch_obs, batch_reward, batch_done,
+                                batch_reset):
+        rollout = self.rollout
+        rollout['reward'].append(
+            np.asarray(batch_reward, dtype=np.float32))
+        rollout['nonterminal'].append(1 - np.logical_or(
+            batch_done, batch_reset).astype(np.float32))
+        if len(rollout['reward']) == self.update_steps:
+            rollout['state'].append(
+                self.batch_states(batch_obs, self.xp, self.phi))
+            self.update(dict(
+                state=self.xp.stack(rollout['state']),
+                action=self.xp.stack(rollout['action']),
+                log_prob=self.xp.stack(rollout['log_prob']),
+                reward=np.stack(rollout['reward']),
+                nonterminal=np.stack(rollout['nonterminal']),
+            ))
+            self.rollout = None
+
+    def batch_act(self, batch_obs):
+        statevar = self.batch_states(batch_obs, self.xp, self.phi)
+        action, _ = self._act(statevar, self.act_deterministically)
+        return cuda.to_cpu(action)
+
+    def batch_observe(self, batch_obs, batch_reward, batch_done, batch_reset):
+        pass
+
+    def act_and_train(self, obs, reward):
+        raise RuntimeError('IMPALA does not support non-batch training')
+
+    def act(self, obs):
+        return self.batch_act([obs])[0]
+
+    def stop_episode_and_train(self, state, reward, done=False):
+        raise RuntimeError('IMPALA does not support non-batch training')
+
+    def stop_episode(self):
+        pass
+
+    def get_statistics(self):
+        return [
+            ('average_actor', self.average_actor_loss),
+            ('average_value', self.average_value),
+            ('average_entropy', self.average_entropy),
+            ('average_importance_weight', self.average_importance_weight),
+        ]
@@ -155,19 +155,59 @@ def compute_eltwise_huber_quantile_loss(y, t, taus, huber_loss_threshold=1.0):
         chainer.Variable: Loss (batch_size, N, N_prime)
     """
     assert y.shape == taus.shape
-    # (batch_size, N) -> (batch_size, N, 1)
-    y = F.expand_dims(y, axis=2)
-    # (batch_size, N_prime) -> (batch_size, 1, N_prime)
-    t = F.expand_dims(t, axis=1)
-    # (batch_size, N) -> (batch_size, N, 1)
-    taus = F.expand_dims(taus, axis=2)
-    # Broadcast to (batch_size, N, N_prime)
-    y, t, taus = F.broadcast(y, t, taus)
-    I_delta = ((t.array - y.array) > 0).astype('f')
-    eltwise_huber_loss = F.huber_loss(
-        y, t, delta=huber_loss_threshold, reduce='no')
-    eltwise_loss = abs(taus - I_delta) * eltwise_huber_loss
-    return eltwise_loss
+    return EltwiseHuberQuantileLoss(huber_loss_threshold).apply(
+        (y, t, taus))[0]
+
+
+class EltwiseHuberQuantileLoss(chainer.function_node.FunctionNode):
+    """Elementwise Huber losses for quantile regression.
+
+    Differences between targets and predictions are computed once and the
+    Huber losses and their weights are derived from them without
+    broadcasting inputs to (batch_size, N, N_prime). Only inputs are retained
+    for backward, where the differences are recomputed. Gradients are
+    computed only with respect to predictions.
+
+    See compute_eltwise_huber_quantile_loss for details.
+    """
+
+    def __init__(self, huber_loss_threshold):
+        self.huber_loss_threshold = huber_loss_threshold
+
+    def _diff_and_weight(self, y, t, taus):
+        xp = cuda.get_array_module(y)
+        # (batch_size, N, N_prime)
+        diff = t[:, None, :] - y[:, :, None]
+        # |tau - I(t - y > 0)|
+        weight = taus[:, :, None] - (diff > 0).astype(diff.dtype)
+        return diff, xp.abs(weight, out=weight)
+
+    def forward(self, inputs):
+        self.retain_inputs((0, 1, 2))
+        y, t, taus = inputs
+        xp = cuda.get_array_module(y)
+        diff, weight = self._diff_and_weight(y, t, taus)
+        abs_diff = abs(diff)
+        # Huber loss is c * (|diff| - c / 2) with c = min(|diff|, delta)
+        c = xp.minimum(abs_diff, self.huber_loss_threshold)
+        abs_diff -= 0.5 * c
+        abs_diff *= c
+        abs_diff *= weight
+        return abs_diff.astype(y.dtype, copy=False),
+
+    def backward(self, indexes, grad_outputs):
+        y, t, taus = [x.array for x in self.get_retained_inputs()]
+        gloss, = grad_outputs
+        xp = cuda.get_array_module(y)
+        delta = self.huber_loss_threshold
+        diff, weight = self._diff_and_weight(y, t, taus)
+        # d(huber)/dy = -clip(t - y, -delta, delta)
+        g = xp.clip(diff, -delta, delta)
+        g *= weight
+        g *= gloss.array
+        gy = -g.sum(axis=2)
+        return (chainer.Variable(gy.astype(y.dtype, copy=False)),
+                None, None)
 
 
 class IQN(dqn.DQN):
@@ -206,13 +246,19 @@ class IQN(dqn.DQN):
         taus_tilde = self.xp.random.uniform(
             0, 1, size=(batch_size, self.quantile_thresholds_K)).astype('f')
 
-        target_next_tau2av = self.target_model(batch_next_state)
-        greedy_actions = target_next_tau2av(taus_tilde).greedy_actions
         taus_prime = self.xp.random.uniform(
             0, 1,
             size=(batch_size, self.quantile_thresholds_N_prime)).astype('f')
-        target_next_maxz = target_next_tau2av(
-            taus_prime).evaluate_actions_as_quantiles(greedy_actions)
+
+        # Both kinds of thresholds are evaluated by a single forward
+        target_next_tau2av = self.target_model(batch_next_state)
+        quantiles = target_next_tau2av(
+            self.xp.concatenate((taus_tilde, taus_prime), axis=1)).quantiles
+        K = self.quantile_thresholds_K
+        greedy_actions = QuantileDiscreteActionValue(
+            quantiles[:, :K]).greedy_actions
+        target_next_maxz = QuantileDiscreteActionValue(
+            quantiles[:, K:]).evaluate_actions_as_quantiles(greedy_actions)
 
         batch_rewards = exp_batch['reward']
         batch_terminal = exp_batch['is_state_terminal']
@@ -288,9 +334,11 @@ class IQN(dqn.DQN):
             return tau2av(taus_tilde)
 
     def act_and_train(self, obs, reward):
-        action_value = self._compute_action_value([obs])
-        greedy_action = cuda.to_cpu(action_value.greedy_actions.array)[0]
-        q = float(action_value.max.array)
+        with self.phase_timer.measure('act_forward'):
+            action_value = self._compute_action_value([obs])
+            greedy_action = cuda.to_cpu(
+                action_value.greedy_actions.array)[0]
+            q = float(action_value.max.array)
 
         # Update stats
         self.average_q *= self.average_q_decay
@@ -304,20 +352,23 @@ class IQN(dqn.DQN):
 
         # Update the target network
         if self.t % self.target_update_interval == 0:
-            self.sync_target_network()
+            with self.phase_timer.measure('target_sync'):
+                self.sync_target_network()
 
+        replay_state = self._to_replay_state(obs)
         if self.last_state is not None:
             assert self.last_action is not None
             # Add a transition to the replay buffer
-            self.replay_buffer.append(
-                state=self.last_state,
-                action=self.last_action,
-                reward=reward,
-                next_state=obs,
-                next_action=action,
-                is_state_terminal=False)
-
-        self.last_state = obs
+            with self.phase_timer.measure('replay_append'):
+                self.replay_buffer.append(
+                    state=self.last_state,
+                    action=self.last_action,
+                    reward=reward,
+                    next_state=replay_state,
+                    next_action=action,
+                    is_state_terminal=False)
+
+        self.last_state = replay_state
         self.last_action = action
 
         self.replay_updater.update_if_necessary(self.t)
@@ -339,16 +390,13 @@ class IQN(dqn.DQN):
         return action
 
     def batch_act_and_train(self, batch_obs):
-        batch_av = self._compute_action_value(batch_obs)
-        batch_maxq = batch_av.max.array
-        batch_argmax = cuda.to_cpu(batch_av.greedy_actions.array)
-        batch_action = [
-            self.explorer.select_action(
-                self.t, lambda: batch_argmax[i],
-                action_value=batch_av[i:i + 1],
-            )
-            for i in range(len(batch_obs))]
-        self.batch_last_obs = list(batch_obs)
+        with self.phase_timer.measure('act_forward'):
+            batch_av = self._compute_action_value(batch_obs)
+            batch_maxq = batch_av.max.array
+            batch_argmax = cuda.to_cpu(batch_av.greedy_actions.array)
+        batch_action = self.explorer.batch_select_action(
+            self.t, lambda: batch_argmax, action_value=batch_av)
+        self.batch_last_obs = [self._to_replay_state(obs) for obs in batch_obs]
         self.batch_last_action = list(batch_action)
 
         # Update stats
@@ -16,18 +16,25 @@ import numpy as np
 
 from chainerrl.agent import AsyncAgent
 from chainerrl.agent import AttributeSavingMixin
+from chainerrl.agent import BatchAgent
 from chainerrl.misc import async_
 from chainerrl.misc.batch_states import batch_states
 from chainerrl.misc import copy_param
+from chainerrl.recurrent import is_recurrent
 from chainerrl.recurrent import Recurrent
 from chainerrl.recurrent import state_kept
 
 
-class NSQ(AttributeSavingMixin, AsyncAgent):
+class NSQ(AttributeSavingMixin, AsyncAgent, BatchAgent):
     """Asynchronous N-step Q-Learning.
 
     See http://arxiv.org/abs/1602.01783
 
+    Each process can interact with multiple envs at once via the BatchAgent
+    interface, in which case the Q-function is updated after every t_max
+    batch steps using the transitions of all the envs. Recurrent models are
+    not supported in that case.
+
     Args:
         q_function (A3CModel): Model to train
         optimizer (chainer.Optimizer): optimizer used to train the model
@@ -113,6 +120,15 @@ class NSQ(AttributeSavingMixin, AsyncAgent):
         # I'm not sure but if we need to normalize losses...
         # loss /= self.t - self.t_start
 
+        self._update_shared_q_function(loss)
+
+        self.past_action_values = {}
+        self.past_states = {}
+        self.past_rewards = {}
+
+        self.t_start = self.t
+
+    def _update_shared_q_function(self, loss):
         # Compute gradients using thread-specific model
         self.q_function.zerograds()
         loss.backward()
@@ -126,12 +142,45 @@ class NSQ(AttributeSavingMixin, AsyncAgent):
         if isinstance(self.q_function, Recurrent):
             self.q_function.unchain_backward()
 
-        self.past_action_values = {}
-        self.past_states = {}
-        self.past_rewards = {}
-
+    def _init_batch_history(self):
+        self.batch_past_action_values = []
+        self.batch_past_rewards = []
+        self.batch_past_ends = []
+        self.batch_past_bootstrap_values = []
         self.t_start = self.t
 
+    def _increment_t_global(self, n):
+        with self.t_global.get_lock():
+            self.t_global.value += n
+            t_global = self.t_global.value
+
+        if t_global // self.i_target != (t_global - n) // self.i_target:
+            self.logger.debug('target synchronized t_global:%s t_local:%s',
+                              t_global, self.t)
+            copy_param.copy_param(self.target_q_function, self.q_function)
+
+    def batch_update(self):
+        """Update the Q-function using the transitions of a batch of envs.
+
+        Every env contributes t_max transitions. Returns are truncated at the
+        ends of episodes, where they are bootstrapped from the values stored
+        by batch_observe_and_train.
+        """
+        assert self.t_start < self.t
+
+        R = np.zeros_like(self.batch_past_rewards[-1])
+        loss = 0
+        for i in reversed(range(self.t - self.t_start)):
+            R = np.where(self.batch_past_ends[i],
+                         self.batch_past_bootstrap_values[i], R)
+            R = self.batch_past_rewards[i] + self.gamma * R
+            q = F.reshape(self.batch_past_action_values[i], (-1, 1))
+            # Accumulate gradients of Q-function
+            loss += F.sum(F.huber_loss(q, R[:, None], delta=1.0))
+
+        self._update_shared_q_function(loss)
+        self._init_batch_history()
+
     def act_and_train(self, obs, reward):
 
         statevar = self.batch_states([obs], np, self.phi)
@@ -154,14 +203,7 @@ class NSQ(AttributeSavingMixin, AsyncAgent):
         self.t += 1
         self.average_q += ((1 - self.average_q_decay) *
                            (float(q.array[0]) - self.average_q))
-        with self.t_global.get_lock():
-            self.t_global.value += 1
-            t_global = self.t_global.value
-
-        if t_global % self.i_target == 0:
-            self.logger.debug('target synchronized t_global:%s t_local:%s',
-                              t_global, self.t)
-            copy_param.copy_param(self.target_q_function, self.q_function)
+        self._increment_t_global(1)
 
         return action
 
@@ -190,6 +232,59 @@ class NSQ(AttributeSavingMixin, AsyncAgent):
             self.shared_q_function.reset_state()
             self.target_q_function.reset_state()
 
+    def batch_act(self, batch_obs):
+        statevar = self.batch_states(batch_obs, np, self.phi)
+        with chainer.no_backprop_mode():
+            qout = self.q_function(statevar)
+        return qout.greedy_actions.array
+
+    def batch_act_and_train(self, batch_obs):
+        assert not is_recurrent(self.q_function),\
+            'Recurrent models are not supported in batch training.'
+        if self.t == self.t_start:
+            self._init_batch_history()
+
+        statevar = self.batch_states(batch_obs, np, self.phi)
+        qout = self.q_function(statevar)
+        batch_argmax = qout.greedy_actions.array
+        t_global = self.t_global.value
+        batch_action = self.explorer.batch_select_action(
+            t_global, lambda: batch_argmax, action_value=qout)
+        q = qout.evaluate_actions(batch_action)
+        self.batch_past_action_values.append(q)
+        self.t += 1
+        self.average_q += ((1 - self.average_q_decay) *
+                           (float(q.array.mean()) - self.average_q))
+        self._increment_t_global(len(batch_obs))
+
+        return batch_action
+
+    def batch_observe(self, batch_obs, batch_reward, batch_done, batch_reset):
+        pass
+
+    def batch_observe_and_train(self, batch_obs, batch_reward,
+                                batch_done, batch_reset):
+        batch_done = np.asarray(batch_done, dtype=bool)
+        ends = np.logical_or(batch_done, batch_reset)
+        need_update = self.t - self.t_start == self.t_max
+        if need_update:
+            # Returns are bootstrapped for all the envs at the last step
+            ends.fill(True)
+        if np.any(np.logical_and(ends, np.logical_not(batch_done))):
+            statevar = self.batch_states(batch_obs, np, self.phi)
+            with chainer.no_backprop_mode():
+                max_q = self.target_q_function(statevar).max.array
+            bootstrap_values = max_q * np.logical_not(batch_done)
+        else:
+            bootstrap_values = np.zeros(len(batch_done), dtype=np.float32)
+        self.batch_past_rewards.append(
+            np.asarray(batch_reward, dtype=np.float32))
+        self.batch_past_ends.append(ends)
+        self.batch_past_bootstrap_values.append(bootstrap_values)
+
+        if need_update:
+            self.batch_update()
+
     def load(self, dirname):
         super().load(dirname)
         copy_param.copy_param(target_link=self.shared_q_function,
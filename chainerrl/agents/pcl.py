@@ -11,6 +11,7 @@ from logging import getLogger
 
 import chainer
 from chainer import functions as F
+import numpy as np
 
 import chainerrl
 from chainerrl import agent
@@ -18,6 +19,7 @@ from chainerrl.agents import a3c
 from chainerrl.misc import async_
 from chainerrl.misc.batch_states import batch_states
 from chainerrl.misc import copy_param
+from chainerrl.recurrent import is_recurrent
 from chainerrl.recurrent import Recurrent
 from chainerrl.recurrent import state_kept
 from chainerrl.recurrent import state_reset
@@ -35,12 +37,16 @@ PCLSeparateModel = a3c.A3CSeparateModel
 PCLSharedModel = a3c.A3CSharedModel
 
 
-class PCL(agent.AttributeSavingMixin, agent.AsyncAgent):
+class PCL(agent.AttributeSavingMixin, agent.AsyncAgent, agent.BatchAgent):
     """PCL (Path Consistency Learning).
 
     Not only the batch PCL algorithm proposed in the paper but also its
     asynchronous variant is implemented.
 
+    The agent can interact with multiple envs at once via the BatchAgent
+    interface, in which case each env contributes its own sub-trajectories
+    to online updates. Recurrent models are not supported in that case.
+
     See https://arxiv.org/abs/1702.08892
 
     Args:
@@ -50,6 +56,10 @@ class PCL(agent.AttributeSavingMixin, agent.AsyncAgent):
             - action distributions (Distribution)
             - state values (chainer.Variable)
         optimizer (chainer.Optimizer): optimizer used to train the model
+        replay_buffer (EpisodicReplayBuffer): Replay buffer to use. If set
+            None, this agent won't use experience replay. Use
+            SharedEpisodicReplayBuffer for the processes of train_agent_async
+            to replay transitions of each other.
         t_max (int or None): The model is updated after every t_max local
             steps. If set None, the model is updated after every episode.
         gamma (float): Discount factor [0,1]
@@ -171,6 +181,12 @@ class PCL(agent.AttributeSavingMixin, agent.AsyncAgent):
 
         self.init_history_data_for_online_update()
 
+        # Variables used by the BatchAgent interface
+        self.batch_segments = None
+        self.batch_last_state = None
+        self.batch_last_action = None
+        self.batch_last_action_distrib = None
+
     def init_history_data_for_online_update(self):
         self.past_actions = {}
         self.past_rewards = {}
@@ -365,20 +381,24 @@ class PCL(agent.AttributeSavingMixin, agent.AsyncAgent):
             log_probs = {t: self.past_action_distrib[t].log_prob(
                 self.xp.asarray(self.xp.expand_dims(a, 0)))
                 for t, a in self.past_actions.items()}
-            self.online_batch_losses.append(self.compute_loss(
+            self.add_online_loss(self.compute_loss(
                 t_start=self.t_start, t_stop=self.t,
                 rewards=self.past_rewards,
                 values=self.past_values,
                 next_values=next_values,
                 log_probs=log_probs))
-            if len(self.online_batch_losses) == self.batchsize:
-                loss = chainerrl.functions.sum_arrays(
-                    self.online_batch_losses) / self.batchsize
-                self.update(loss)
-                self.online_batch_losses = []
 
         self.init_history_data_for_online_update()
 
+    def add_online_loss(self, loss):
+        """Add a loss of online update and update if a batch is ready."""
+        self.online_batch_losses.append(loss)
+        if len(self.online_batch_losses) == self.batchsize:
+            loss = chainerrl.functions.sum_arrays(
+                self.online_batch_losses) / self.batchsize
+            self.update(loss)
+            self.online_batch_losses = []
+
     def act_and_train(self, obs, reward):
 
         statevar = self.batch_states([obs], self.xp, self.phi)
@@ -483,6 +503,142 @@ class PCL(agent.AttributeSavingMixin, agent.AsyncAgent):
         if isinstance(self.model, Recurrent):
             self.model.reset_state()
 
+    def _make_empty_segment(self):
+        return {
+            'actions': {},
+            'rewards': {},
+            'values': {},
+            'action_distribs': {},
+        }
+
+    def _initialize_batch_variables(self, num_envs):
+        self.batch_segments = [
+            self._make_empty_segment() for _ in range(num_envs)]
+        self.batch_last_state = [None] * num_envs
+        self.batch_last_action = [None] * num_envs
+        self.batch_last_action_distrib = [None] * num_envs
+        self.t_start = self.t
+
+    def _compute_segment_loss(self, segment, last_next_value):
+        seq_len = len(segment['actions'])
+        values = segment['values']
+        next_values = {t - 1: values[t] for t in range(1, seq_len)}
+        next_values[seq_len - 1] = last_next_value
+        log_probs = {t: segment['action_distribs'][t].log_prob(
+            self.xp.asarray(self.xp.expand_dims(a, 0)))
+            for t, a in segment['actions'].items()}
+        return self.compute_loss(
+            t_start=0, t_stop=seq_len,
+            rewards=segment['rewards'],
+            values=values,
+            next_values=next_values,
+            log_probs=log_probs)
+
+    def batch_act(self, batch_obs):
+        with chainer.no_backprop_mode():
+            statevar = self.batch_states(batch_obs, self.xp, self.phi)
+            action_distrib, _ = self.model(statevar)
+            if self.act_deterministically:
+                return chainer.cuda.to_cpu(action_distrib.most_probable.array)
+            else:
+                return chainer.cuda.to_cpu(action_distrib.sample().array)
+
+    def batch_act_and_train(self, batch_obs):
+        assert not is_recurrent(self.model),\
+            'Recurrent models are not supported in batch training.'
+        num_envs = len(batch_obs)
+        if self.batch_segments is None:
+            self._initialize_batch_variables(num_envs)
+        assert len(self.batch_segments) == num_envs
+
+        statevar = self.batch_states(batch_obs, self.xp, self.phi)
+        action_distrib, v = self.model(statevar)
+        batch_action = chainer.cuda.to_cpu(action_distrib.sample().array)
+        if self.explorer is not None:
+            batch_action = self.explorer.batch_select_action(
+                self.t, lambda: batch_action)
+
+        # Save values for a later update
+        for i, segment in enumerate(self.batch_segments):
+            k = len(segment['actions'])
+            segment['values'][k] = v[i:i + 1]
+            segment['actions'][k] = batch_action[i]
+            segment['action_distribs'][k] = action_distrib[i:i + 1]
+
+        self.t += 1
+
+        # Update stats
+        self.average_value += (
+            (1 - self.average_value_decay) *
+            (float(v.array.mean()) - self.average_value))
+        self.average_entropy += (
+            (1 - self.average_entropy_decay) *
+            (float(action_distrib.entropy.array.mean())
+             - self.average_entropy))
+
+        mu = action_distrib.copy()
+        self.batch_last_state = list(batch_obs)
+        self.batch_last_action = list(batch_action)
+        self.batch_last_action_distrib = [
+            mu[i:i + 1] for i in range(num_envs)]
+
+        return batch_action
+
+    def batch_observe(self, batch_obs, batch_reward, batch_done, batch_reset):
+        pass
+
+    def batch_observe_and_train(self, batch_obs, batch_reward,
+                                batch_done, batch_reset):
+        batch_done = np.asarray(batch_done, dtype=bool)
+        ends = np.logical_or(batch_done, batch_reset)
+        need_update = (self.t_max is not None
+                       and self.t - self.t_start == self.t_max)
+        if need_update:
+            self.t_start = self.t
+            finished = np.ones_like(ends)
+        else:
+            finished = ends
+        if np.any(finished):
+            statevar = self.batch_states(batch_obs, self.xp, self.phi)
+            _, next_v = self.model(statevar)
+
+        for i, segment in enumerate(self.batch_segments):
+            if self.batch_last_state[i] is None:
+                continue
+            segment['rewards'][len(segment['actions']) - 1] = batch_reward[i]
+            if self.replay_buffer is not None:
+                # Add a transition to the replay buffer
+                self.replay_buffer.append(
+                    state=self.batch_last_state[i],
+                    action=self.batch_last_action[i],
+                    reward=batch_reward[i],
+                    next_state=batch_obs[i],
+                    next_action=None,
+                    is_state_terminal=batch_done[i],
+                    mu=self.batch_last_action_distrib[i],
+                    env_id=i,
+                )
+                if ends[i]:
+                    self.replay_buffer.stop_current_episode(env_id=i)
+            if finished[i]:
+                if not self.disable_online_update:
+                    if batch_done[i]:
+                        last_next_value = chainer.Variable(
+                            self.xp.zeros_like(next_v.array[i:i + 1]))
+                    else:
+                        last_next_value = next_v[i:i + 1]
+                    self.add_online_loss(self._compute_segment_loss(
+                        segment, last_next_value))
+                self.batch_segments[i] = self._make_empty_segment()
+            if ends[i]:
+                self.batch_last_state[i] = None
+                self.batch_last_action[i] = None
+                self.batch_last_action_distrib[i] = None
+
+        if np.any(finished) and len(self.online_batch_losses) == 0:
+            for _ in range(self.n_times_replay):
+                self.update_from_replay()
+
     def load(self, dirname):
         super().load(dirname)
         if self.train_async:
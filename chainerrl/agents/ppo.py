@@ -7,7 +7,6 @@ from future import standard_library
 standard_library.install_aliases()  # NOQA
 
 import collections
-import itertools
 
 import chainer
 from chainer import cuda
@@ -16,6 +15,10 @@ import numpy as np
 
 from chainerrl import agent
 from chainerrl.misc.batch_states import batch_states
+from chainerrl.misc.rollouts import compute_gae
+from chainerrl.misc.rollouts import iterate_minibatch_indices
+from chainerrl.misc.rollouts import make_rollout_arrays
+from chainerrl.misc.rollouts import take
 
 
 def _mean_or_nan(xs):
@@ -31,64 +34,6 @@ def _elementwise_clip(x, x_min, x_max):
     return F.minimum(F.maximum(x, x_min), x_max)
 
 
-def _add_advantage_and_value_target_to_episode(episode, gamma, lambd):
-    """Add advantage and value target values to an episode."""
-    adv = 0.0
-    for transition in reversed(episode):
-        td_err = (
-            transition['reward']
-            + (gamma * transition['nonterminal'] * transition['next_v_pred'])
-            - transition['v_pred']
-        )
-        adv = td_err + gamma * lambd * adv
-        transition['adv'] = adv
-        transition['v_teacher'] = adv + transition['v_pred']
-
-
-def _add_advantage_and_value_target_to_episodes(episodes, gamma, lambd):
-    """Add advantage and value target values to a list of episodes."""
-    for episode in episodes:
-        _add_advantage_and_value_target_to_episode(
-            episode, gamma=gamma, lambd=lambd)
-
-
-def _add_log_prob_and_value_to_episodes(
-        episodes,
-        model,
-        phi,
-        batch_states,
-        obs_normalizer,
-):
-
-    dataset = list(itertools.chain.from_iterable(episodes))
-    xp = model.xp
-
-    # Compute v_pred and next_v_pred
-    states = batch_states([b['state'] for b in dataset], xp, phi)
-    next_states = batch_states([b['next_state'] for b in dataset], xp, phi)
-
-    if obs_normalizer:
-        states = obs_normalizer(states, update=False)
-        next_states = obs_normalizer(next_states, update=False)
-
-    with chainer.using_config('train', False), chainer.no_backprop_mode():
-        distribs, vs_pred = model(states)
-        _, next_vs_pred = model(next_states)
-
-        actions = xp.array([b['action'] for b in dataset])
-        log_probs = chainer.cuda.to_cpu(distribs.log_prob(actions).array)
-        vs_pred = chainer.cuda.to_cpu(vs_pred.array.ravel())
-        next_vs_pred = chainer.cuda.to_cpu(next_vs_pred.array.ravel())
-
-    for transition, log_prob, v_pred, next_v_pred in zip(dataset,
-                                                         log_probs,
-                                                         vs_pred,
-                                                         next_vs_pred):
-        transition['log_prob'] = log_prob
-        transition['v_pred'] = v_pred
-        transition['next_v_pred'] = next_v_pred
-
-
 class PPO(agent.AttributeSavingMixin, agent.BatchAgent):
     """Proximal Policy Optimization
 
@@ -217,24 +162,46 @@ class PPO(agent.AttributeSavingMixin, agent.BatchAgent):
         if dataset_size >= self.update_interval:
             self._flush_last_episode()
             dataset = self._make_dataset()
-            assert len(dataset) == dataset_size
+            assert len(dataset['adv']) == dataset_size
             self._update(dataset)
             self.memory = []
 
     def _make_dataset(self):
+        xp = self.model.xp
+        rollout = make_rollout_arrays(
+            self.memory, xp, self.phi, batch_states=self.batch_states)
 
-        _add_log_prob_and_value_to_episodes(
-            episodes=self.memory,
-            model=self.model,
-            phi=self.phi,
-            batch_states=self.batch_states,
-            obs_normalizer=self.obs_normalizer,
+        # Compute log_prob, v_pred and next_v_pred
+        states = rollout['state']
+        next_states = rollout['next_state']
+        if self.obs_normalizer:
+            states = self.obs_normalizer(states, update=False)
+            next_states = self.obs_normalizer(next_states, update=False)
+        with chainer.using_config('train', False), chainer.no_backprop_mode():
+            distribs, vs_pred = self.model(states)
+            _, next_vs_pred = self.model(next_states)
+            log_probs = distribs.log_prob(rollout['action']).array
+            vs_pred = chainer.cuda.to_cpu(vs_pred.array.ravel())
+            next_vs_pred = chainer.cuda.to_cpu(next_vs_pred.array.ravel())
+
+        advs, vs_teacher = compute_gae(
+            rewards=rollout['reward'],
+            nonterminals=rollout['nonterminal'],
+            vs_pred=vs_pred,
+            next_vs_pred=next_vs_pred,
+            episode_lengths=rollout['episode_lengths'],
+            gamma=self.gamma,
+            lambd=self.lambd,
         )
 
-        _add_advantage_and_value_target_to_episodes(
-            self.memory, gamma=self.gamma, lambd=self.lambd)
-
-        return list(itertools.chain.from_iterable(self.memory))
+        return {
+            'state': rollout['state'],
+            'action': rollout['action'],
+            'log_prob': log_probs.astype(np.float32, copy=False),
+            'v_pred': xp.asarray(vs_pred, dtype=np.float32),
+            'adv': xp.asarray(advs),
+            'v_teacher': xp.asarray(vs_teacher),
+        }
 
     def _flush_last_episode(self):
         if self.last_episode:
@@ -246,61 +213,39 @@ class PPO(agent.AttributeSavingMixin, agent.BatchAgent):
                     self.memory.append(episode)
                     self.batch_last_episode[i] = []
 
-    def _update_obs_normalizer(self, dataset):
-        assert self.obs_normalizer
-        states = self.batch_states(
-            [b['state'] for b in dataset], self.obs_normalizer.xp, self.phi)
-        self.obs_normalizer.experience(states)
-
     def _update(self, dataset):
         """Update both the policy and the value function."""
 
+        states = dataset['state']
         if self.obs_normalizer:
-            self._update_obs_normalizer(dataset)
+            self.obs_normalizer.experience(states)
+            # Normalize states only once since the normalizer is fixed during
+            # the updates below
+            states = self.obs_normalizer(states, update=False)
 
         xp = self.model.xp
-
-        assert 'state' in dataset[0]
-        assert 'v_teacher' in dataset[0]
-
-        dataset_iter = chainer.iterators.SerialIterator(
-            dataset, self.minibatch_size)
-
+        actions = dataset['action']
+        log_probs_old = dataset['log_prob']
+        advs = dataset['adv']
         if self.standardize_advantages:
-            all_advs = xp.array([b['adv'] for b in dataset])
-            mean_advs = xp.mean(all_advs)
-            std_advs = xp.std(all_advs)
-
-        while dataset_iter.epoch < self.epochs:
-            batch = dataset_iter.__next__()
-            states = self.batch_states(
-                [b['state'] for b in batch], xp, self.phi)
-            if self.obs_normalizer:
-                states = self.obs_normalizer(states, update=False)
-            actions = xp.array([b['action'] for b in batch])
-            distribs, vs_pred = self.model(states)
-
-            advs = xp.array([b['adv'] for b in batch], dtype=xp.float32)
-            if self.standardize_advantages:
-                advs = (advs - mean_advs) / (std_advs + 1e-8)
-
-            log_probs_old = xp.array([b['log_prob']
-                                      for b in batch], dtype=xp.float32)
-            vs_pred_old = xp.array([b['v_pred']
-                                    for b in batch], dtype=xp.float32)
-            vs_teacher = xp.array([b['v_teacher']
-                                   for b in batch], dtype=xp.float32)
-            # Same shape as vs_pred: (batch_size, 1)
-            vs_pred_old = vs_pred_old[..., None]
-            vs_teacher = vs_teacher[..., None]
-
+            mean_advs = xp.mean(advs)
+            std_advs = xp.std(advs)
+            advs = (advs - mean_advs) / (std_advs + 1e-8)
+        # Same shape as vs_pred: (size, 1)
+        vs_pred_old = dataset['v_pred'][..., None]
+        vs_teacher = dataset['v_teacher'][..., None]
+
+        for indices in iterate_minibatch_indices(
+                len(advs), self.minibatch_size, self.epochs):
+            distribs, vs_pred = self.model(take(states, indices))
             self.optimizer.update(
                 self._lossfun,
-                distribs.entropy, vs_pred, distribs.log_prob(actions),
-                vs_pred_old=vs_pred_old,
-                log_probs_old=log_probs_old,
-                advs=advs,
-                vs_teacher=vs_teacher,
+                distribs.entropy, vs_pred,
+                distribs.log_prob(take(actions, indices)),
+                vs_pred_old=take(vs_pred_old, indices),
+                log_probs_old=take(log_probs_old, indices),
+                advs=take(advs, indices),
+                vs_teacher=take(vs_teacher, indices),
             )
 
     def _lossfun(self,
@@ -20,6 +20,8 @@ from chainerrl.agent import BatchAgent
 from chainerrl.misc.batch_states import batch_states
 from chainerrl.misc.copy_param import synchronize_parameters
 from chainerrl.replay_buffer import batch_experiences
+from chainerrl.replay_buffer import check_phi_for_replay_buffer
+from chainerrl.replay_buffer import identity_phi
 from chainerrl.replay_buffer import ReplayUpdater
 
 
@@ -61,7 +63,9 @@ class TD3(AttributeSavingMixin, BatchAgent):
             replay_start_size, skip update
         minibatch_size (int): Minibatch size
         update_interval (int): Model update interval in step
-        phi (callable): Feature extractor applied to observations
+        phi (callable): Feature extractor applied to observations. It must
+            be identity_phi for DeviceReplayBuffer, to which observations
+            must be given after they are preprocessed, e.g. by env wrappers.
         soft_update_tau (float): Tau of soft target update.
         logger (Logger): Logger used
         batch_states (callable): method which makes a batch of observations.
@@ -103,7 +107,7 @@ class TD3(AttributeSavingMixin, BatchAgent):
             replay_start_size=10000,
             minibatch_size=100,
             update_interval=1,
-            phi=lambda x: x,
+            phi=identity_phi,
             soft_update_tau=5e-3,
             n_times_update=1,
             logger=getLogger(__name__),
@@ -129,6 +133,7 @@ class TD3(AttributeSavingMixin, BatchAgent):
         self.explorer = explorer
         self.gpu = gpu
         self.phi = phi
+        check_phi_for_replay_buffer(replay_buffer, phi)
         self.soft_update_tau = soft_update_tau
         self.logger = logger
         self.policy_optimizer = policy_optimizer
@@ -307,10 +312,8 @@ class TD3(AttributeSavingMixin, BatchAgent):
         else:
             batch_onpolicy_action = self.batch_select_onpolicy_action(
                 batch_obs)
-            batch_action = [
-                self.explorer.select_action(
-                    self.t, lambda: batch_onpolicy_action[i])
-                for i in range(len(batch_onpolicy_action))]
+            batch_action = self.explorer.batch_select_action(
+                self.t, lambda: batch_onpolicy_action)
 
         self.batch_last_obs = list(batch_obs)
         self.batch_last_action = list(batch_action)
@@ -7,7 +7,6 @@ from future import standard_library
 standard_library.install_aliases()  # NOQA
 
 import collections
-import itertools
 from logging import getLogger
 
 import chainer
@@ -17,6 +16,10 @@ import numpy as np
 import chainerrl
 from chainerrl import agent
 from chainerrl.misc.batch_states import batch_states
+from chainerrl.misc.rollouts import compute_gae
+from chainerrl.misc.rollouts import iterate_minibatch_indices
+from chainerrl.misc.rollouts import make_rollout_arrays
+from chainerrl.misc.rollouts import take
 
 
 def _get_ordered_params(link):
@@ -89,7 +92,7 @@ def _find_old_style_function(outputs):
     return found
 
 
-class TRPO(agent.AttributeSavingMixin, agent.Agent):
+class TRPO(agent.AttributeSavingMixin, agent.BatchAgent):
     """Trust Region Policy Optimization.
 
     A given stochastic policy is optimized by the TRPO algorithm. A given
@@ -224,24 +227,36 @@ class TRPO(agent.AttributeSavingMixin, agent.Agent):
         # Contains transitions of the last episode not moved to self.memory yet
         self.last_episode = []
 
+        # Batch versions of last_episode, last_state, and last_action
+        self.batch_last_episode = None
+        self.batch_last_state = None
+        self.batch_last_action = None
+
+    def _initialize_batch_variables(self, num_envs):
+        self.batch_last_episode = [[] for _ in range(num_envs)]
+        self.batch_last_state = [None] * num_envs
+        self.batch_last_action = [None] * num_envs
+
     def _update_if_dataset_is_ready(self):
         dataset_size = (
             sum(len(episode) for episode in self.memory)
-            + len(self.last_episode))
+            + len(self.last_episode)
+            + (0 if self.batch_last_episode is None else sum(
+                len(episode) for episode in self.batch_last_episode)))
         if dataset_size >= self.update_interval:
             self._flush_last_episode()
             dataset = self._make_dataset()
+            assert len(dataset['adv']) == dataset_size
             self._update(dataset)
             self.memory = []
 
     def _make_dataset(self):
-        dataset = list(itertools.chain.from_iterable(self.memory))
         xp = self.vf.xp
+        rollout = make_rollout_arrays(self.memory, xp, self.phi)
 
         # Compute v_pred and next_v_pred
-        states = batch_states([b['state'] for b in dataset], xp, self.phi)
-        next_states = batch_states([b['next_state']
-                                    for b in dataset], xp, self.phi)
+        states = rollout['state']
+        next_states = rollout['next_state']
         if self.obs_normalizer:
             states = self.obs_normalizer(states, update=False)
             next_states = self.obs_normalizer(next_states, update=False)
@@ -249,73 +264,67 @@ class TRPO(agent.AttributeSavingMixin, agent.Agent):
             vs_pred = chainer.cuda.to_cpu(self.vf(states).array.ravel())
             next_vs_pred = chainer.cuda.to_cpu(
                 self.vf(next_states).array.ravel())
-        for transition, v_pred, next_v_pred in zip(dataset,
-                                                   vs_pred,
-                                                   next_vs_pred):
-            transition['v_pred'] = v_pred
-            transition['next_v_pred'] = next_v_pred
 
         # Update stats
         self.value_record.extend(vs_pred)
 
         # Compute adv and v_teacher
-        for episode in self.memory:
-            adv = 0.0
-            for transition in reversed(episode):
-                td_err = (
-                    transition['reward']
-                    + (self.gamma * transition['nonterminal']
-                       * transition['next_v_pred'])
-                    - transition['v_pred']
-                )
-                adv = td_err + self.gamma * self.lambd * adv
-                transition['adv'] = adv
-                transition['v_teacher'] = adv + transition['v_pred']
-
-        return dataset
+        advs, vs_teacher = compute_gae(
+            rewards=rollout['reward'],
+            nonterminals=rollout['nonterminal'],
+            vs_pred=vs_pred,
+            next_vs_pred=next_vs_pred,
+            episode_lengths=rollout['episode_lengths'],
+            gamma=self.gamma,
+            lambd=self.lambd,
+        )
+
+        return {
+            'state': rollout['state'],
+            'action': rollout['action'],
+            'adv': xp.asarray(advs),
+            'v_teacher': xp.asarray(vs_teacher),
+        }
 
     def _flush_last_episode(self):
         if self.last_episode:
             self.memory.append(self.last_episode)
             self.last_episode = []
+        if self.batch_last_episode:
+            for i, episode in enumerate(self.batch_last_episode):
+                if episode:
+                    self.memory.append(episode)
+                    self.batch_last_episode[i] = []
 
     def _update(self, dataset):
         """Update both the policy and the value function."""
 
+        states = dataset['state']
         if self.obs_normalizer:
-            self._update_obs_normalizer(dataset)
-        self._update_policy(dataset)
-        self._update_vf(dataset)
-
-    def _update_obs_normalizer(self, dataset):
-        assert self.obs_normalizer
-        states = batch_states(
-            [b['state'] for b in dataset], self.obs_normalizer.xp, self.phi)
-        self.obs_normalizer.experience(states)
+            self.obs_normalizer.experience(states)
+            # Normalize states only once since the normalizer is fixed during
+            # the updates below
+            states = self.obs_normalizer(states, update=False)
+        self._update_policy(states, dataset['action'], dataset['adv'])
+        self._update_vf(states, dataset['v_teacher'])
 
-    def _update_vf(self, dataset):
+    def _update_vf(self, states, vs_teacher):
         """Update the value function using a given dataset.
 
         The value function is updated via SGD to minimize TD(lambda) errors.
-        """
 
-        xp = self.vf.xp
+        Args:
+            states: Batch of (normalized) states.
+            vs_teacher: Array of target values of the value function.
+        """
 
-        assert 'state' in dataset[0]
-        assert 'v_teacher' in dataset[0]
-
-        dataset_iter = chainer.iterators.SerialIterator(
-            dataset, self.vf_batch_size)
-
-        while dataset_iter.epoch < self.vf_epochs:
-            batch = dataset_iter.__next__()
-            states = batch_states([b['state'] for b in batch], xp, self.phi)
-            if self.obs_normalizer:
-                states = self.obs_normalizer(states, update=False)
-            vs_teacher = xp.array(
-                [b['v_teacher'] for b in batch], dtype=xp.float32)
-            vs_pred = self.vf(states)
-            vf_loss = F.mean_squared_error(vs_pred, vs_teacher[..., None])
+        # Same shape as the output of the value function: (size, 1)
+        vs_teacher = vs_teacher[..., None]
+        for indices in iterate_minibatch_indices(
+                len(vs_teacher), self.vf_batch_size, self.vf_epochs):
+            vs_pred = self.vf(take(states, indices))
+            vf_loss = F.mean_squared_error(
+                vs_pred, take(vs_teacher, indices))
             self.vf_optimizer.update(lambda: vf_loss)
 
     def _compute_gain(self, action_distrib, action_distrib_old, actions, advs):
@@ -326,23 +335,19 @@ class TRPO(agent.AttributeSavingMixin, agent.Agent):
         surrogate_gain = F.mean(prob_ratio * advs)
         return surrogate_gain + self.entropy_coef * mean_entropy
 
-    def _update_policy(self, dataset):
+    def _update_policy(self, states, actions, advs):
         """Update the policy using a given dataset.
 
         The policy is updated via CG and line search.
-        """
 
-        assert 'state' in dataset[0]
-        assert 'action' in dataset[0]
-        assert 'adv' in dataset[0]
+        Args:
+            states: Batch of (normalized) states.
+            actions: Array of actions.
+            advs: Array of advantages.
+        """
 
         # Use full-batch
         xp = self.policy.xp
-        states = batch_states([b['state'] for b in dataset], xp, self.phi)
-        if self.obs_normalizer:
-            states = self.obs_normalizer(states, update=False)
-        actions = xp.array([b['action'] for b in dataset])
-        advs = xp.array([b['adv'] for b in dataset], dtype=np.float32)
         if self.standardize_advantages:
             mean_advs = xp.mean(advs)
             std_advs = xp.std(advs)
@@ -549,6 +554,78 @@ Line search coundn't find a good step size. The policy was not updated.")
     def stop_episode(self):
         pass
 
+    def batch_act(self, batch_obs):
+        xp = self.xp
+        b_state = batch_states(batch_obs, xp, self.phi)
+        if self.obs_normalizer:
+            b_state = self.obs_normalizer(b_state, update=False)
+        with chainer.using_config('train', False), chainer.no_backprop_mode():
+            action_distrib = self.policy(b_state)
+            if self.act_deterministically:
+                batch_action = chainer.cuda.to_cpu(
+                    action_distrib.most_probable.array)
+            else:
+                batch_action = chainer.cuda.to_cpu(
+                    action_distrib.sample().array)
+        return batch_action
+
+    def batch_act_and_train(self, batch_obs):
+        xp = self.xp
+        b_state = batch_states(batch_obs, xp, self.phi)
+        if self.obs_normalizer:
+            b_state = self.obs_normalizer(b_state, update=False)
+
+        num_envs = len(batch_obs)
+        if self.batch_last_episode is None:
+            self._initialize_batch_variables(num_envs)
+        assert len(self.batch_last_episode) == num_envs
+        assert len(self.batch_last_state) == num_envs
+        assert len(self.batch_last_action) == num_envs
+
+        # action_distrib will be recomputed when computing gradients
+        with chainer.using_config('train', False), chainer.no_backprop_mode():
+            action_distrib = self.policy(b_state)
+            batch_action = chainer.cuda.to_cpu(action_distrib.sample().array)
+            self.entropy_record.extend(
+                chainer.cuda.to_cpu(action_distrib.entropy.array))
+
+        self.batch_last_state = list(batch_obs)
+        self.batch_last_action = list(batch_action)
+
+        return batch_action
+
+    def batch_observe(self, batch_obs, batch_reward, batch_done, batch_reset):
+        pass
+
+    def batch_observe_and_train(self, batch_obs, batch_reward,
+                                batch_done, batch_reset):
+
+        for i, (state, action, reward, next_state, done, reset) in enumerate(zip(  # NOQA
+            self.batch_last_state,
+            self.batch_last_action,
+            batch_reward,
+            batch_obs,
+            batch_done,
+            batch_reset,
+        )):
+            if state is not None:
+                assert action is not None
+                self.batch_last_episode[i].append({
+                    'state': state,
+                    'action': action,
+                    'reward': reward,
+                    'next_state': next_state,
+                    'nonterminal': 0.0 if done else 1.0,
+                })
+            if done or reset:
+                assert self.batch_last_episode[i]
+                self.memory.append(self.batch_last_episode[i])
+                self.batch_last_episode[i] = []
+                self.batch_last_state[i] = None
+                self.batch_last_action[i] = None
+
+        self._update_if_dataset_is_ready()
+
     def get_statistics(self):
         return [
             ('average_value', _mean_or_nan(self.value_record)),
@@ -1,2 +1,6 @@
-from chainerrl.envs.multiprocess_vector_env import MultiprocessVectorEnv  # NOQA
-from chainerrl.envs.serial_vector_env import SerialVectorEnv  # NOQA
+from chainerrl.lazy_import import install_lazy_attributes
+
+install_lazy_attributes(__name__, attributes={
+    'MultiprocessVectorEnv': 'chainerrl.envs.multiprocess_vector_env',
+    'SerialVectorEnv': 'chainerrl.envs.serial_vector_env',
+})
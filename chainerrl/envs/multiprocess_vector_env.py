@@ -8,6 +8,7 @@ standard_library.install_aliases()  # NOQA
 
 from multiprocessing import Pipe
 from multiprocessing import Process
+from multiprocessing import RawArray
 import signal
 
 from cached_property import cached_property
@@ -16,19 +17,31 @@ import numpy as np
 import chainerrl
 
 
-def worker(remote, env_fn):
+def worker(remote, env_fn, shared_ob=None):
     # Ignore CTRL+C in the worker process
     signal.signal(signal.SIGINT, signal.SIG_IGN)
     env = env_fn()
+    if shared_ob is not None:
+        # Observations are written to the row of this worker in shared memory
+        # and None is sent instead
+        buf, idx, shape, dtype = shared_ob
+        shared_ob = np.frombuffer(buf, dtype=dtype).reshape((-1,) + shape)[idx]
+
+    def put_ob(ob):
+        if shared_ob is None:
+            return ob
+        shared_ob[...] = ob
+        return None
+
     try:
         while True:
             cmd, data = remote.recv()
             if cmd == 'step':
                 ob, reward, done, info = env.step(data)
-                remote.send((ob, reward, done, info))
+                remote.send((put_ob(ob), reward, done, info))
             elif cmd == 'reset':
                 ob = env.reset()
-                remote.send(ob)
+                remote.send(put_ob(ob))
             elif cmd == 'close':
                 remote.close()
                 break
@@ -47,22 +60,45 @@ def worker(remote, env_fn):
 class MultiprocessVectorEnv(chainerrl.env.VectorEnv):
     """VectorEnv where each env is run in its own subprocess.
 
+    If observation_space is given, subprocesses write observations into a
+    batch array in shared memory instead of sending them through pipes, which
+    saves pickling large observations, e.g., frames of Atari warped by
+    `chainerrl.wrappers.atari_wrappers.WarpFrame` in each subprocess.
+    Observations must then be arrays of the shape of observation_space.
+
     Args:
         env_fns (list of callable): List of callables, each of which
             returns gym.Env that is run in its own subprocess.
+        observation_space (gym.spaces.Box or None): Observation space of the
+            envs, whose shape and dtype are used to allocate shared memory for
+            observations. If set to None, observations are sent through pipes.
     """
 
-    def __init__(self, env_fns):
+    def __init__(self, env_fns, observation_space=None):
         nenvs = len(env_fns)
         self.remotes, self.work_remotes = zip(*[Pipe() for _ in range(nenvs)])
+        if observation_space is None:
+            self.shared_obs = None
+            shared_obs = [None] * nenvs
+        else:
+            shape = tuple(observation_space.shape)
+            dtype = np.dtype(observation_space.dtype)
+            buf = RawArray(
+                'b', nenvs * int(np.prod(shape)) * dtype.itemsize)
+            self.shared_obs = np.frombuffer(buf, dtype=dtype).reshape(
+                (nenvs,) + shape)
+            shared_obs = [(buf, idx, shape, dtype) for idx in range(nenvs)]
         self.ps = \
-            [Process(target=worker, args=(work_remote, env_fn))
-             for (work_remote, env_fn) in zip(self.work_remotes, env_fns)]
+            [Process(target=worker, args=(work_remote, env_fn, shared_ob))
+             for (work_remote, env_fn, shared_ob)
+             in zip(self.work_remotes, env_fns, shared_obs)]
         for p in self.ps:
             p.start()
         self.last_obs = [None] * self.num_envs
         self.remotes[0].send(('get_spaces', None))
         self.action_space, self.observation_space = self.remotes[0].recv()
+        if observation_space is not None:
+            assert self.observation_space.shape == observation_space.shape
         self.closed = False
 
     def __del__(self):
@@ -82,6 +118,9 @@ class MultiprocessVectorEnv(chainerrl.env.VectorEnv):
             remote.send(('step', action))
         results = [remote.recv() for remote in self.remotes]
         self.last_obs, rews, dones, infos = zip(*results)
+        if self.shared_obs is not None:
+            # Copy since subprocesses overwrite them at the next step
+            self.last_obs = tuple(self.shared_obs.copy())
         return self.last_obs, rews, dones, infos
 
     def reset(self, mask=None):
@@ -94,6 +133,9 @@ class MultiprocessVectorEnv(chainerrl.env.VectorEnv):
 
         obs = [remote.recv() if not m else o for m, remote,
                o in zip(mask, self.remotes, self.last_obs)]
+        if self.shared_obs is not None:
+            obs = [self.shared_obs[i].copy() if not m else o
+                   for i, (m, o) in enumerate(zip(mask, obs))]
         self.last_obs = obs
         return obs
 
@@ -1,13 +1,25 @@
+from chainerrl.experiments.checkpointer import AsyncCheckpointer  # NOQA
+
 from chainerrl.experiments.evaluator import eval_performance  # NOQA
 
 from chainerrl.experiments.hooks import LinearInterpolationHook  # NOQA
+from chainerrl.experiments.hooks import NoiseResamplingHook  # NOQA
 from chainerrl.experiments.hooks import StepHook  # NOQA
+from chainerrl.experiments.hooks import ThroughputHook  # NOQA
+
+from chainerrl.experiments.metrics import CSVSink  # NOQA
+from chainerrl.experiments.metrics import JSONLSink  # NOQA
+from chainerrl.experiments.metrics import MetricsSink  # NOQA
+from chainerrl.experiments.metrics import TensorBoardSink  # NOQA
 
 from chainerrl.experiments.prepare_output_dir import is_under_git_control  # NOQA
 from chainerrl.experiments.prepare_output_dir import prepare_output_dir  # NOQA
 
 from chainerrl.experiments.train_agent import train_agent  # NOQA
 from chainerrl.experiments.train_agent import train_agent_with_evaluation  # NOQA
+from chainerrl.experiments.train_agent_apex import apex_epsilons  # NOQA
+from chainerrl.experiments.train_agent_apex import train_agent_apex  # NOQA
 from chainerrl.experiments.train_agent_async import train_agent_async  # NOQA
+from chainerrl.experiments.train_agent_impala import train_agent_impala  # NOQA
 from chainerrl.experiments.train_agent_batch import train_agent_batch  # NOQA
 from chainerrl.experiments.train_agent_batch import train_agent_batch_with_evaluation  # NOQA
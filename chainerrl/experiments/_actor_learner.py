@@ -0,0 +1,218 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import collections
+import copy
+import multiprocessing as mp
+import os
+import time
+
+from chainerrl.experiments.evaluator import Evaluator
+from chainerrl.misc import async_
+from chainerrl.misc.makedirs import makedirs
+from chainerrl.misc import random_seed
+
+
+class SharedState(object):
+    """Objects shared by actor processes and a learner.
+
+    Actors act by a CPU copy of the model of the agent, pull parameters
+    published by the learner and send items such as transitions or rollouts
+    to the learner through a queue.
+
+    Args:
+        agent (Agent): Agent to train by the learner.
+        queue_size (int): Maximum number of items waiting to be received by
+            the learner. Actors wait for the learner when the queue is full.
+    """
+
+    def __init__(self, agent, queue_size):
+        # Actors must not use GPUs since they are forked
+        self.actor_model = copy.deepcopy(agent.model)
+        self.actor_model.to_cpu()
+        self.shared_params = async_.SharedParams(agent.model)
+        self.queue = mp.Queue(maxsize=queue_size)
+        self.counter = mp.Value('l', 0)
+        self.episodes_counter = mp.Value('l', 0)
+        self.stop = mp.Value('b', False)
+        self.processes = []
+
+    def send(self, item, n_steps):
+        """Send an item to the learner and count the steps it took.
+
+        Returns:
+            int: Global steps after the item.
+        """
+        async_.put_until_stopped(self.queue, item, self.stop)
+        with self.counter.get_lock():
+            self.counter.value += n_steps
+            return self.counter.value
+
+    def pull_if_published(self, model, version):
+        """Pull parameters into a model if a new version is published.
+
+        Returns:
+            int: Version of the parameters of the model.
+        """
+        if self.shared_params.version.value != version:
+            return self.shared_params.pull(model)
+        return version
+
+    def end_episodes(self, actor_idx, returns, outdir, global_t, local_t,
+                     logger):
+        """Count episodes and log their returns if it is the first actor."""
+        if actor_idx == 0:
+            for r in returns:
+                logger.info('outdir:%s global_step:%s local_step:%s R:%s',
+                            outdir, global_t, local_t, r)
+        with self.episodes_counter.get_lock():
+            self.episodes_counter.value += len(returns)
+
+
+def train_actors_and_learner(agent, shared, make_env, act, update, steps,
+                             outdir, actors, eval_n_steps, eval_n_episodes,
+                             eval_interval, max_episode_len,
+                             eval_max_episode_len, publish_interval,
+                             log_interval, successful_score, step_hooks,
+                             save_best_so_far_agent, logger, eval_sinks,
+                             statistics_sinks, extra_statistics=None):
+    """Run actor processes and train an agent by the current process.
+
+    Args:
+        agent (Agent): Agent to train.
+        shared (SharedState): Objects shared by actors and the learner.
+        make_env (callable): (process_idx, test) -> Environment.
+        act (callable): (actor_idx, env) -> None. It is called in each actor
+            process to act in the env until shared.stop is set or training
+            steps are reached.
+        update (callable): (n_updates) -> bool. It is called repeatedly by
+            the learner to receive items from shared.queue and update the
+            agent, where n_updates is the number of updates so far. It must
+            return whether the agent is updated.
+        extra_statistics (callable or None): () -> list of (name, value)
+            pairs recorded to statistics_sinks in addition to global steps,
+            episodes, updates and elapsed time.
+
+    See train_agent_apex for the other arguments.
+
+    Returns:
+        Trained agent.
+    """
+
+    makedirs(outdir, exist_ok=True)
+
+    # Prevent numpy from using multiple threads
+    os.environ['OMP_NUM_THREADS'] = '1'
+
+    def run_actor(actor_idx):
+        random_seed.set_random_seed(actor_idx)
+        env = make_env(actor_idx, test=False)
+        try:
+            act(actor_idx, env)
+        finally:
+            # Do not wait for queued items to be received at exit
+            shared.queue.cancel_join_thread()
+        env.close()
+
+    if eval_interval is None:
+        evaluator = None
+        eval_env = None
+    else:
+        eval_env = make_env(0, test=True)
+        if eval_max_episode_len is None:
+            eval_max_episode_len = max_episode_len
+        evaluator = Evaluator(
+            agent=agent,
+            n_steps=eval_n_steps,
+            n_episodes=eval_n_episodes,
+            eval_interval=eval_interval,
+            outdir=outdir,
+            max_episode_len=eval_max_episode_len,
+            env=eval_env,
+            save_best_so_far_agent=save_best_so_far_agent,
+            logger=logger,
+            sinks=eval_sinks,
+        )
+
+    shared.processes[:] = [mp.Process(target=run_actor, args=(actor_idx,))
+                           for actor_idx in range(actors)]
+    for p in shared.processes:
+        p.start()
+
+    start_time = time.time()
+    global_t = 0
+    n_updates = 0
+    successful = False
+
+    try:
+        while True:
+            global_t = shared.counter.value
+            if global_t >= steps:
+                break
+            if not update(n_updates):
+                async_.check_processes(shared.processes)
+                continue
+
+            n_updates += 1
+            if n_updates % publish_interval == 0:
+                shared.shared_params.publish(agent.model)
+                async_.check_processes(shared.processes)
+
+            for hook in step_hooks:
+                hook(None, agent, global_t)
+
+            if n_updates % log_interval == 0:
+                logger.info('global_step:%s updates:%s statistics:%s',
+                            global_t, n_updates, agent.get_statistics())
+                if statistics_sinks:
+                    record = collections.OrderedDict([
+                        ('steps', global_t),
+                        ('episodes', shared.episodes_counter.value),
+                        ('updates', n_updates),
+                        ('elapsed', time.time() - start_time),
+                    ])
+                    if extra_statistics is not None:
+                        record.update(extra_statistics())
+                    record.update(agent.get_statistics())
+                    for sink in statistics_sinks:
+                        sink.write(record)
+
+            if evaluator is not None:
+                eval_score = evaluator.evaluate_if_necessary(
+                    t=global_t, episodes=shared.episodes_counter.value)
+                if (eval_score is not None and
+                        successful_score is not None and
+                        eval_score >= successful_score):
+                    successful = True
+                    break
+
+    except (Exception, KeyboardInterrupt):
+        # Save the current model before being killed
+        dirname = os.path.join(outdir, '{}_except'.format(global_t))
+        agent.save(dirname)
+        logger.warning('Saved the current model to %s', dirname)
+        raise
+    finally:
+        async_.stop_processes(shared.processes, shared.queue, shared.stop)
+        for sink in statistics_sinks:
+            sink.flush()
+        if eval_env is not None:
+            eval_env.close()
+
+    if successful:
+        # Save the successful model
+        dirname = os.path.join(outdir, 'successful')
+        agent.save(dirname)
+        logger.info('Saved the successful agent to %s', dirname)
+    else:
+        # Save the final model
+        dirname = os.path.join(outdir, '{}_finish'.format(steps))
+        agent.save(dirname)
+        logger.info('Saved the final agent to %s', dirname)
+
+    return agent
@@ -0,0 +1,238 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import io
+import logging
+import os
+import queue
+import shutil
+import sys
+import threading
+import uuid
+import zipfile
+
+from chainer import cuda
+from chainer import serializers
+from future.utils import raise_from
+import numpy as np
+
+from chainerrl.agent import AttributeSavingMixin
+from chainerrl.misc.makedirs import makedirs
+
+
+def snapshot_agent(agent):
+    """Copy what AttributeSavingMixin.save saves to host memory.
+
+    Args:
+        agent (AttributeSavingMixin): Agent to snapshot.
+    Returns:
+        dict: Mapping from paths of npz files relative to the directory of
+        the agent to dicts of arrays to write to them.
+    """
+    snapshot = {}
+
+    def visit(obj, prefix, ancestors):
+        ancestors.append(obj)
+        for attr in obj.saved_attributes:
+            assert hasattr(obj, attr)
+            attr_value = getattr(obj, attr)
+            if attr_value is None:
+                continue
+            if isinstance(attr_value, AttributeSavingMixin):
+                assert not any(
+                    attr_value is ancestor
+                    for ancestor in ancestors
+                ), "Avoid an infinite loop"
+                visit(attr_value, os.path.join(prefix, attr), ancestors)
+            else:
+                serializer = serializers.DictionarySerializer()
+                serializer.save(attr_value)
+                arrays = {}
+                for key, value in serializer.target.items():
+                    # Arrays on CPU must be copied since they are updated
+                    # in place by training
+                    host_value = cuda.to_cpu(value)
+                    if host_value is value:
+                        host_value = np.array(value, copy=True)
+                    arrays[key] = host_value
+                snapshot[os.path.join(prefix, '{}.npz'.format(attr))] = \
+                    arrays
+        ancestors.pop()
+
+    visit(agent, '', [])
+    return snapshot
+
+
+def write_npz(filename, arrays, compression=6):
+    """Write arrays to an npz file that serializers.load_npz can load.
+
+    Args:
+        filename (str): Path to the file.
+        arrays (dict): Dict of arrays.
+        compression (int or None): zlib compression level from 0 to 9. If
+            None, arrays are stored without compression.
+    """
+    if compression is None:
+        kwargs = dict(compression=zipfile.ZIP_STORED)
+    else:
+        kwargs = dict(compression=zipfile.ZIP_DEFLATED)
+        # compresslevel is supported from Python 3.7. Before that, zlib's
+        # default level is used
+        if sys.version_info >= (3, 7):
+            kwargs['compresslevel'] = compression
+    with zipfile.ZipFile(filename, mode='w', allowZip64=True,
+                         **kwargs) as zf:
+        for key, value in arrays.items():
+            value = np.asanyarray(value)
+            if sys.version_info >= (3, 6):
+                # Write arrays without copying them to memory
+                with zf.open(key + '.npy', 'w', force_zip64=True) as f:
+                    np.lib.format.write_array(f, value, allow_pickle=True)
+            else:
+                f = io.BytesIO()
+                np.lib.format.write_array(f, value, allow_pickle=True)
+                zf.writestr(key + '.npy', f.getvalue())
+
+
+def replace_dir(src, dst):
+    """Replace a directory by another one by renames.
+
+    dst is never seen partially written: it is either the old one or src.
+    """
+    if os.path.exists(dst):
+        old = '{}.old-{}'.format(dst, uuid.uuid4().hex)
+        os.rename(dst, old)
+        os.rename(src, dst)
+        shutil.rmtree(old)
+    else:
+        os.rename(src, dst)
+
+
+class AsyncCheckpointer(object):
+    """Object that saves agents in a background thread.
+
+    save copies parameters and optimizer states to host memory, which is
+    fast, and a background thread writes them to npz files in a temporary
+    directory and then renames it to the target directory, so that training
+    does not wait for serialization and a checkpoint is never seen partially
+    written. Saved directories can be loaded by agent.load as usual.
+
+    Checkpoints that are not permanent are subject to a retention policy:
+    only the latest n_keep ones are kept, plus the one with the highest
+    score if keep_best is True.
+
+    Agents that are not AttributeSavingMixin are saved by agent.save in the
+    calling thread, though the directory is still replaced by a rename.
+
+    Args:
+        n_keep (int or None): Number of the latest checkpoints to keep. If
+            None, all the checkpoints are kept.
+        keep_best (bool): If set to True, the checkpoint with the highest
+            score is kept in addition to the latest ones.
+        compression (int or None): zlib compression level from 0 to 9 of npz
+            files. If None, arrays are stored without compression, which is
+            the fastest.
+        max_pending (int): Maximum number of snapshots waiting to be written.
+            save blocks when it is reached, which bounds memory usage.
+        logger (logging.Logger): Logger.
+    """
+
+    def __init__(self, n_keep=None, keep_best=True, compression=6,
+                 max_pending=1, logger=None):
+        assert n_keep is None or n_keep > 0
+        assert compression is None or 0 <= compression <= 9
+        self.n_keep = n_keep
+        self.keep_best = keep_best
+        self.compression = compression
+        self.logger = logger or logging.getLogger(__name__)
+        # Pairs of (dirname, score) of checkpoints that can be removed
+        self.checkpoints = []
+        self.error = None
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def save(self, agent, dirname, score=None, permanent=False):
+        """Save an agent asynchronously.
+
+        Args:
+            agent (Agent): Agent to save.
+            dirname (str): Directory to save the agent to.
+            score (float or None): Score of the agent used by keep_best.
+            permanent (bool): If set to True, the checkpoint is not removed
+                by the retention policy.
+        """
+        self._raise_error()
+        tmp_dirname = '{}.tmp-{}'.format(dirname, uuid.uuid4().hex)
+        if isinstance(agent, AttributeSavingMixin):
+            snapshot = snapshot_agent(agent)
+        else:
+            makedirs(tmp_dirname, exist_ok=True)
+            agent.save(tmp_dirname)
+            snapshot = None
+        self.queue.put((snapshot, tmp_dirname, dirname, score, permanent))
+
+    def wait(self):
+        """Wait for all the checkpoints to be written."""
+        self.queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Wait for all the checkpoints and stop the background thread."""
+        self.queue.join()
+        self.queue.put(None)
+        self.thread.join()
+        self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise_from(RuntimeError('Failed to save a checkpoint'), error)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                self._write(*job)
+            except Exception as e:
+                self.logger.exception('Failed to save a checkpoint')
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def _write(self, snapshot, tmp_dirname, dirname, score, permanent):
+        if snapshot is not None:
+            for path, arrays in snapshot.items():
+                filename = os.path.join(tmp_dirname, path)
+                makedirs(os.path.dirname(filename), exist_ok=True)
+                write_npz(filename, arrays, compression=self.compression)
+        replace_dir(tmp_dirname, dirname)
+        self.logger.info('Saved the agent to %s', dirname)
+        if not permanent:
+            self.checkpoints = [
+                c for c in self.checkpoints if c[0] != dirname]
+            self.checkpoints.append((dirname, score))
+            self._remove_old_checkpoints()
+
+    def _remove_old_checkpoints(self):
+        if self.n_keep is None:
+            return
+        kept = self.checkpoints[-self.n_keep:]
+        scored = [c for c in self.checkpoints if c[1] is not None]
+        if self.keep_best and scored:
+            best = max(scored, key=lambda c: c[1])
+            if best not in kept:
+                kept.insert(0, best)
+        for c in self.checkpoints:
+            if c not in kept:
+                shutil.rmtree(c[0], ignore_errors=True)
+                self.logger.info('Removed the old checkpoint %s', c[0])
+        self.checkpoints = kept
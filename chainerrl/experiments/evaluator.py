@@ -6,6 +6,7 @@ from builtins import *  # NOQA
 from future import standard_library
 standard_library.install_aliases()  # NOQA
 
+import collections
 import logging
 import multiprocessing as mp
 import os
@@ -15,6 +16,7 @@ import time
 import numpy as np
 
 import chainerrl
+from chainerrl.experiments.metrics import CSVSink
 
 
 """Columns that describe information about an experiment.
@@ -263,15 +265,35 @@ def eval_performance(env, agent, n_steps, n_episodes, max_episode_len=None,
     return stats
 
 
-def record_stats(outdir, values):
-    with open(os.path.join(outdir, 'scores.txt'), 'a+') as f:
-        print('\t'.join(str(x) for x in values), file=f)
+def _make_eval_record(t, episodes, elapsed, eval_stats, agent):
+    record = collections.OrderedDict(zip(
+        _basic_columns,
+        (t,
+         episodes,
+         elapsed,
+         eval_stats['mean'],
+         eval_stats['median'],
+         eval_stats['stdev'],
+         eval_stats['max'],
+         eval_stats['min'])))
+    record.update(agent.get_statistics())
+    return record
 
 
-def save_agent(agent, t, outdir, logger, suffix=''):
+def _write_record(sinks, record):
+    for sink in sinks:
+        sink.write(record)
+        sink.flush()
+
+
+def save_agent(agent, t, outdir, logger, suffix='', checkpointer=None,
+               score=None, permanent=True):
     dirname = os.path.join(outdir, '{}{}'.format(t, suffix))
-    agent.save(dirname)
-    logger.info('Saved the agent to %s', dirname)
+    if checkpointer is None:
+        agent.save(dirname)
+        logger.info('Saved the agent to %s', dirname)
+    else:
+        checkpointer.save(agent, dirname, score=score, permanent=permanent)
 
 
 class Evaluator(object):
@@ -289,6 +311,11 @@ class Evaluator(object):
         save_best_so_far_agent (bool): If set to True, after each evaluation,
             if the score (= mean of returns in evaluation episodes) exceeds
             the best-so-far score, the current agent is saved.
+        sinks (sequence of MetricsSink): Sinks that receive the same records
+            as scores.txt in addition to it. They are flushed after each
+            evaluation.
+        checkpointer (AsyncCheckpointer or None): If not None, the
+            best-so-far agent is saved by it in a background thread.
     """
 
     def __init__(self,
@@ -302,6 +329,8 @@ class Evaluator(object):
                  step_offset=0,
                  save_best_so_far_agent=True,
                  logger=None,
+                 sinks=(),
+                 checkpointer=None,
                  ):
         assert (n_steps is None) != (n_episodes is None), \
             ("One of n_steps or n_episodes must be None. " +
@@ -321,12 +350,14 @@ class Evaluator(object):
                             self.step_offset % self.eval_interval)
         self.save_best_so_far_agent = save_best_so_far_agent
         self.logger = logger or logging.getLogger(__name__)
+        self.checkpointer = checkpointer
 
-        # Write a header line first
-        with open(os.path.join(self.outdir, 'scores.txt'), 'w') as f:
-            custom_columns = tuple(t[0] for t in self.agent.get_statistics())
-            column_names = _basic_columns + custom_columns
-            print('\t'.join(column_names), file=f)
+        # The header line is written first
+        custom_columns = tuple(t[0] for t in self.agent.get_statistics())
+        self.sinks = [CSVSink(os.path.join(self.outdir, 'scores.txt'),
+                              columns=_basic_columns + custom_columns,
+                              delimiter='\t')]
+        self.sinks.extend(sinks)
 
     def evaluate_and_update_max_score(self, t, episodes):
         eval_stats = eval_performance(
@@ -334,23 +365,16 @@ class Evaluator(object):
             max_episode_len=self.max_episode_len,
             logger=self.logger)
         elapsed = time.time() - self.start_time
-        custom_values = tuple(tup[1] for tup in self.agent.get_statistics())
         mean = eval_stats['mean']
-        values = (t,
-                  episodes,
-                  elapsed,
-                  mean,
-                  eval_stats['median'],
-                  eval_stats['stdev'],
-                  eval_stats['max'],
-                  eval_stats['min']) + custom_values
-        record_stats(self.outdir, values)
+        _write_record(self.sinks, _make_eval_record(
+            t, episodes, elapsed, eval_stats, self.agent))
         if mean > self.max_score:
             self.logger.info('The best score is updated %s -> %s',
                              self.max_score, mean)
             self.max_score = mean
             if self.save_best_so_far_agent:
-                save_agent(self.agent, "best", self.outdir, self.logger)
+                save_agent(self.agent, "best", self.outdir, self.logger,
+                           checkpointer=self.checkpointer)
         return mean
 
     def evaluate_if_necessary(self, t, episodes):
@@ -374,6 +398,9 @@ class AsyncEvaluator(object):
         save_best_so_far_agent (bool): If set to True, after each evaluation,
             if the score (= mean return of evaluation episodes) exceeds
             the best-so-far score, the current agent is saved.
+        sinks (sequence of MetricsSink): Sinks that receive the same records
+            as scores.txt in addition to it. They are flushed after each
+            evaluation. They must be process-safe.
     """
 
     def __init__(self,
@@ -385,6 +412,7 @@ class AsyncEvaluator(object):
                  step_offset=0,
                  save_best_so_far_agent=True,
                  logger=None,
+                 sinks=(),
                  ):
         assert (n_steps is None) != (n_episodes is None), \
             ("One of n_steps or n_episodes must be None. " +
@@ -404,11 +432,12 @@ class AsyncEvaluator(object):
         self.prev_eval_t = mp.Value(
             'l', self.step_offset - self.step_offset % self.eval_interval)
         self._max_score = mp.Value('f', np.finfo(np.float32).min)
-        self.wrote_header = mp.Value('b', False)
 
-        # Create scores.txt
-        with open(os.path.join(self.outdir, 'scores.txt'), 'a'):
-            pass
+        # Create scores.txt, whose header line is written by the process
+        # that evaluates first because custom columns depend on the agent
+        self.sinks = [CSVSink(os.path.join(self.outdir, 'scores.txt'),
+                              delimiter='\t', process_safe=True)]
+        self.sinks.extend(sinks)
 
     @property
     def max_score(self):
@@ -422,17 +451,9 @@ class AsyncEvaluator(object):
             max_episode_len=self.max_episode_len,
             logger=self.logger)
         elapsed = time.time() - self.start_time
-        custom_values = tuple(tup[1] for tup in agent.get_statistics())
         mean = eval_stats['mean']
-        values = (t,
-                  episodes,
-                  elapsed,
-                  mean,
-                  eval_stats['median'],
-                  eval_stats['stdev'],
-                  eval_stats['max'],
-                  eval_stats['min']) + custom_values
-        record_stats(self.outdir, values)
+        _write_record(self.sinks, _make_eval_record(
+            t, episodes, elapsed, eval_stats, agent))
         with self._max_score.get_lock():
             if mean > self._max_score.value:
                 self.logger.info('The best score is updated %s -> %s',
@@ -442,12 +463,6 @@ class AsyncEvaluator(object):
                     save_agent(agent, "best", self.outdir, self.logger)
         return mean
 
-    def write_header(self, agent):
-        with open(os.path.join(self.outdir, 'scores.txt'), 'w') as f:
-            custom_columns = tuple(t[0] for t in agent.get_statistics())
-            column_names = _basic_columns + custom_columns
-            print('\t'.join(column_names), file=f)
-
     def evaluate_if_necessary(self, t, episodes, env, agent):
         necessary = False
         with self.prev_eval_t.get_lock():
@@ -455,9 +470,5 @@ class AsyncEvaluator(object):
                 necessary = True
                 self.prev_eval_t.value += self.eval_interval
         if necessary:
-            with self.wrote_header.get_lock():
-                if not self.wrote_header.value:
-                    self.write_header(agent)
-                    self.wrote_header.value = True
             return self.evaluate_and_update_max_score(t, episodes, env, agent)
         return None
@@ -8,10 +8,17 @@ standard_library.install_aliases()  # NOQA
 
 from abc import ABCMeta
 from abc import abstractmethod
+import os
+import time
 
+import chainer
 from future.utils import with_metaclass
 import numpy as np
 
+from chainerrl.links.noisy_chain import resample_noise
+from chainerrl.misc.makedirs import makedirs
+from chainerrl.misc.phase_timer import get_phase_timer
+
 
 class StepHook(with_metaclass(ABCMeta, object)):
     """Hook function that will be called in training.
@@ -65,3 +72,90 @@ class LinearInterpolationHook(StepHook):
                           [1, self.total_steps],
                           [self.start_value, self.stop_value])
         self.setter(env, agent, value)
+
+
+class NoiseResamplingHook(StepHook):
+    """Hook that periodically resamples noise of noisy networks.
+
+    This hook is meant for FactorizedNoisyLinear links with
+    noise_mode='cached'. Every `interval` steps, it resamples noise of such
+    links in the links saved by the agent, e.g. its model and target model.
+    With interval set to update_interval of DQN-like agents, noise is
+    resampled once per update.
+
+    Args:
+        interval (int): Interval in steps of resampling noise.
+    """
+
+    def __init__(self, interval=1):
+        assert interval > 0
+        self.interval = interval
+
+    def __call__(self, env, agent, step):
+        if step % self.interval != 0:
+            return
+        for attr in agent.saved_attributes:
+            link = getattr(agent, attr, None)
+            if isinstance(link, chainer.Link):
+                resample_noise(link)
+
+
+class ThroughputHook(StepHook):
+    """Hook that periodically writes throughput to a CSV file.
+
+    On its first call, this hook enables and resets the `PhaseTimer` of the
+    agent if the agent has one (see `chainerrl.misc.PhaseTimer`). Then, every
+    `interval` steps, it appends to `<outdir>/throughput.csv` a row of the
+    number of steps per second and the milliseconds per step spent in each
+    phase since the previous row, after which the timer is reset.
+
+    This hook is meant for `train_agent` and `train_agent_batch`, which call
+    it once for every step of a single env.
+
+    Args:
+        outdir (str): Path to the directory to write the CSV file.
+        interval (int): Interval in steps of writing rows.
+        phases (sequence of str): Names of phases written as columns.
+            Phases that have not been measured are written as zero.
+    """
+
+    def __init__(self, outdir, interval=1000, phases=(
+            'env_step', 'act_forward', 'target_sync', 'replay_append',
+            'replay_sample', 'batch', 'loss_forward', 'loss_backward',
+            'optimizer_update')):
+        assert interval > 0
+        self.outdir = outdir
+        self.interval = interval
+        self.phases = tuple(phases)
+        self.filename = os.path.join(outdir, 'throughput.csv')
+        self.start_time = None
+        self.last_time = None
+        self.last_step = None
+
+    def __call__(self, env, agent, step):
+        phase_timer = get_phase_timer(agent)
+        if self.last_step is None:
+            phase_timer.enabled = True
+            phase_timer.reset()
+            makedirs(self.outdir, exist_ok=True)
+            with open(self.filename, 'w') as f:
+                columns = ['steps', 'elapsed', 'steps_per_sec']
+                columns.extend('{}_ms'.format(name) for name in self.phases)
+                print(','.join(columns), file=f)
+            self.start_time = self.last_time = time.time()
+            self.last_step = step
+            return
+        n_steps = step - self.last_step
+        if n_steps < self.interval:
+            return
+        now = time.time()
+        values = [step, now - self.start_time,
+                  n_steps / max(now - self.last_time, 1e-8)]
+        values.extend(
+            1e3 * phase_timer.total_time.get(name, 0.0) / n_steps
+            for name in self.phases)
+        with open(self.filename, 'a') as f:
+            print(','.join(str(v) for v in values), file=f)
+        phase_timer.reset()
+        self.last_time = now
+        self.last_step = step
@@ -0,0 +1,215 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+from abc import ABCMeta
+from abc import abstractmethod
+import json
+import multiprocessing as mp
+import numbers
+import time
+
+from future.utils import with_metaclass
+import numpy as np
+
+
+class MetricsSink(with_metaclass(ABCMeta, object)):
+    """Destination of records of metrics such as scores and statistics.
+
+    A record is a dict (usually an OrderedDict) that maps names of metrics to
+    scalar values.
+    """
+
+    @abstractmethod
+    def write(self, record):
+        """Write a record.
+
+        Sinks may buffer records until flush is called.
+
+        Args:
+            record (dict): Mapping from names to scalar values.
+        """
+        raise NotImplementedError()
+
+    def flush(self):
+        """Write buffered records."""
+        pass
+
+    def close(self):
+        """Write buffered records and release resources."""
+        self.flush()
+
+
+def _to_builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+class _BufferedFileSink(MetricsSink):
+    """Sink that appends lines to a file in batches.
+
+    Lines are written when `flush_every` records are buffered or
+    `flush_interval` seconds have passed since the last flush, in addition to
+    explicit calls of flush. The file is opened only while writing, so a
+    sink created before processes are forked can be used by all of them if
+    process_safe=True, in which case writes are serialized by a lock.
+    """
+
+    def __init__(self, filename, flush_every=1, flush_interval=None,
+                 process_safe=False):
+        assert flush_every >= 1
+        self.filename = filename
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = mp.Lock() if process_safe else None
+        self._lines = []
+        self._last_flush_time = time.time()
+
+    def _format(self, record):
+        raise NotImplementedError()
+
+    def _before_write(self, f):
+        pass
+
+    def write(self, record):
+        self._lines.append(self._format(record))
+        if (len(self._lines) >= self.flush_every
+                or (self.flush_interval is not None
+                    and time.time() - self._last_flush_time
+                    >= self.flush_interval)):
+            self.flush()
+
+    def flush(self):
+        self._last_flush_time = time.time()
+        if not self._lines:
+            return
+        data = ''.join(self._lines)
+        self._lines = []
+        if self._lock is None:
+            self._append(data)
+        else:
+            with self._lock:
+                self._append(data)
+
+    def _append(self, data):
+        with open(self.filename, 'a') as f:
+            self._before_write(f)
+            f.write(data)
+
+
+class CSVSink(_BufferedFileSink):
+    """Sink that writes records as rows of a CSV file.
+
+    Columns are fixed by `columns` or, if it is None, by the keys of the first
+    record. Missing values are written as empty strings and keys that are not
+    columns are ignored. The file is truncated when the sink is created.
+
+    Args:
+        filename (str): Path to the file.
+        columns (sequence of str or None): Names of columns.
+        delimiter (str): Delimiter of columns.
+        flush_every (int): Number of records buffered before writing them.
+        flush_interval (float or None): If set, buffered records are written
+            when this number of seconds has passed since the last flush.
+        process_safe (bool): If set True, the sink can be shared among
+            processes forked after its creation.
+    """
+
+    def __init__(self, filename, columns=None, delimiter=',',
+                 flush_every=1, flush_interval=None, process_safe=False):
+        super().__init__(filename, flush_every=flush_every,
+                         flush_interval=flush_interval,
+                         process_safe=process_safe)
+        self.delimiter = delimiter
+        self.columns = None if columns is None else tuple(columns)
+        # Whether the header is written is shared among processes
+        self._wrote_header = mp.Value('b', False, lock=False)
+        with open(filename, 'w') as f:
+            if self.columns is not None:
+                self._write_header(f)
+
+    def _write_header(self, f):
+        print(self.delimiter.join(self.columns), file=f)
+        self._wrote_header.value = True
+
+    def _format(self, record):
+        if self.columns is None:
+            self.columns = tuple(record.keys())
+        return self.delimiter.join(
+            str(record[key]) if key in record else ''
+            for key in self.columns) + '\n'
+
+    def _before_write(self, f):
+        if not self._wrote_header.value:
+            self._write_header(f)
+
+
+class JSONLSink(_BufferedFileSink):
+    """Sink that writes records as lines of JSON objects.
+
+    Unlike `CSVSink`, every key of every record is written. The file is
+    truncated when the sink is created.
+
+    Args:
+        filename (str): Path to the file.
+        flush_every (int): Number of records buffered before writing them.
+        flush_interval (float or None): If set, buffered records are written
+            when this number of seconds has passed since the last flush.
+        process_safe (bool): If set True, the sink can be shared among
+            processes forked after its creation.
+    """
+
+    def __init__(self, filename, flush_every=1, flush_interval=None,
+                 process_safe=False):
+        super().__init__(filename, flush_every=flush_every,
+                         flush_interval=flush_interval,
+                         process_safe=process_safe)
+        with open(filename, 'w'):
+            pass
+
+    def _format(self, record):
+        return json.dumps(record, default=_to_builtin) + '\n'
+
+
+class TensorBoardSink(MetricsSink):
+    """Sink that writes records as scalar summaries of TensorBoard.
+
+    Each numeric value of a record is written as a scalar summary whose global
+    step is the value of `step_key`. tensorboardX is required to use this
+    sink. It is not process-safe.
+
+    Args:
+        logdir (str): Directory to write event files.
+        step_key (str): Key of records used as global steps.
+        tag_prefix (str): Prefix of tags of scalars, e.g. 'eval/'.
+    """
+
+    def __init__(self, logdir, step_key='steps', tag_prefix=''):
+        try:
+            import tensorboardX
+        except ImportError:
+            raise ImportError('tensorboardX is required to use TensorBoardSink.')  # NOQA
+        self.writer = tensorboardX.SummaryWriter(logdir)
+        self.step_key = step_key
+        self.tag_prefix = tag_prefix
+
+    def write(self, record):
+        step = _to_builtin(record[self.step_key])
+        for key, value in record.items():
+            value = _to_builtin(value)
+            if key == self.step_key or not isinstance(value, numbers.Number):
+                continue
+            self.writer.add_scalar(self.tag_prefix + key, value, step)
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
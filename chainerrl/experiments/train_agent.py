@@ -5,13 +5,16 @@ from __future__ import absolute_import
 from future import standard_library
 standard_library.install_aliases()  # NOQA
 
+import collections
 import logging
 import os
+import time
 
 from chainerrl.experiments.evaluator import Evaluator
 from chainerrl.experiments.evaluator import save_agent
 from chainerrl.misc.ask_yes_no import ask_yes_no
 from chainerrl.misc.makedirs import makedirs
+from chainerrl.misc.phase_timer import get_phase_timer
 
 
 def save_agent_replay_buffer(agent, t, outdir, suffix='', logger=None):
@@ -29,9 +32,12 @@ def ask_and_save_agent_replay_buffer(agent, t, outdir, suffix=''):
 
 def train_agent(agent, env, steps, outdir, max_episode_len=None,
                 step_offset=0, evaluator=None, successful_score=None,
-                step_hooks=[], logger=None):
+                step_hooks=[], logger=None, statistics_sinks=(),
+                checkpointer=None, checkpoint_freq=None):
 
     logger = logger or logging.getLogger(__name__)
+    start_time = time.time()
+    eval_score = None
 
     episode_r = 0
     episode_idx = 0
@@ -44,6 +50,9 @@ def train_agent(agent, env, steps, outdir, max_episode_len=None,
     if hasattr(agent, 't'):
         agent.t = step_offset
 
+    # Time spent in env.step is measured by the agent's timer if any
+    phase_timer = get_phase_timer(agent)
+
     episode_len = 0
     try:
         while t < steps:
@@ -51,7 +60,8 @@ def train_agent(agent, env, steps, outdir, max_episode_len=None,
             # a_t
             action = agent.act_and_train(obs, r)
             # o_{t+1}, r_{t+1}
-            obs, r, done, info = env.step(action)
+            with phase_timer.measure('env_step'):
+                obs, r, done, info = env.step(action)
             t += 1
             episode_r += r
             episode_len += 1
@@ -59,16 +69,34 @@ def train_agent(agent, env, steps, outdir, max_episode_len=None,
             for hook in step_hooks:
                 hook(env, agent, t)
 
+            if checkpoint_freq and t % checkpoint_freq == 0:
+                save_agent(agent, t, outdir, logger, suffix='_checkpoint',
+                           checkpointer=checkpointer, score=eval_score,
+                           permanent=False)
+
             reset = (episode_len == max_episode_len
                      or info.get('needs_reset', False))
             if done or reset or t == steps:
                 agent.stop_episode_and_train(obs, r, done=done)
                 logger.info('outdir:%s step:%s episode:%s R:%s',
                             outdir, t, episode_idx, episode_r)
-                logger.info('statistics:%s', agent.get_statistics())
+                statistics = agent.get_statistics()
+                logger.info('statistics:%s', statistics)
+                if statistics_sinks:
+                    record = collections.OrderedDict([
+                        ('steps', t),
+                        ('episodes', episode_idx + 1),
+                        ('elapsed', time.time() - start_time),
+                        ('return', episode_r),
+                    ])
+                    record.update(statistics)
+                    for sink in statistics_sinks:
+                        sink.write(record)
                 if evaluator is not None:
-                    evaluator.evaluate_if_necessary(
+                    score = evaluator.evaluate_if_necessary(
                         t=t, episodes=episode_idx + 1)
+                    if score is not None:
+                        eval_score = score
                     if (successful_score is not None and
                             evaluator.max_score >= successful_score):
                         break
@@ -83,11 +111,18 @@ def train_agent(agent, env, steps, outdir, max_episode_len=None,
 
     except (Exception, KeyboardInterrupt):
         # Save the current model before being killed
-        save_agent(agent, t, outdir, logger, suffix='_except')
+        save_agent(agent, t, outdir, logger, suffix='_except',
+                   checkpointer=checkpointer)
         raise
-
-    # Save the final model
-    save_agent(agent, t, outdir, logger, suffix='_finish')
+    else:
+        # Save the final model
+        save_agent(agent, t, outdir, logger, suffix='_finish',
+                   checkpointer=checkpointer)
+    finally:
+        for sink in statistics_sinks:
+            sink.flush()
+        if checkpointer is not None:
+            checkpointer.wait()
 
 
 def train_agent_with_evaluation(agent,
@@ -105,6 +140,10 @@ def train_agent_with_evaluation(agent,
                                 step_hooks=[],
                                 save_best_so_far_agent=True,
                                 logger=None,
+                                eval_sinks=(),
+                                statistics_sinks=(),
+                                checkpointer=None,
+                                checkpoint_freq=None,
                                 ):
     """Train an agent while periodically evaluating it.
 
@@ -130,6 +169,18 @@ def train_agent_with_evaluation(agent,
             phase, if the score (= mean return of evaluation episodes) exceeds
             the best-so-far score, the current agent is saved.
         logger (logging.Logger): Logger used in this function.
+        eval_sinks (sequence of MetricsSink): Sinks that receive records of
+            evaluations in addition to scores.txt.
+        statistics_sinks (sequence of MetricsSink): Sinks that receive
+            records of steps, episodes, elapsed time, the return and
+            statistics of the agent at the end of every training episode.
+        checkpointer (AsyncCheckpointer or None): If not None, the agent is
+            saved by it in a background thread, including the best-so-far
+            agent, and it is waited for before returning.
+        checkpoint_freq (int or None): If not None, the agent is saved to
+            {t}_checkpoint every checkpoint_freq steps. Such checkpoints are
+            subject to the retention policy of the checkpointer, with the
+            score of the latest evaluation.
     """
 
     logger = logger or logging.getLogger(__name__)
@@ -151,6 +202,8 @@ def train_agent_with_evaluation(agent,
                           step_offset=step_offset,
                           save_best_so_far_agent=save_best_so_far_agent,
                           logger=logger,
+                          sinks=eval_sinks,
+                          checkpointer=checkpointer,
                           )
 
     train_agent(
@@ -160,4 +213,7 @@ def train_agent_with_evaluation(agent,
         evaluator=evaluator,
         successful_score=successful_score,
         step_hooks=step_hooks,
-        logger=logger)
+        logger=logger,
+        statistics_sinks=statistics_sinks,
+        checkpointer=checkpointer,
+        checkpoint_freq=checkpoint_freq)
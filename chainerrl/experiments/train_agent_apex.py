@@ -0,0 +1,308 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import logging
+import queue
+
+import chainer
+import numpy as np
+
+from chainerrl.experiments._actor_learner import SharedState
+from chainerrl.experiments._actor_learner import train_actors_and_learner
+from chainerrl.explorers.epsilon_greedy import ConstantEpsilonGreedy
+from chainerrl.recurrent import is_recurrent
+from chainerrl.replay_buffer import PrioritizedReplayBuffer
+
+
+def apex_epsilons(n_actors, base_epsilon=0.4, alpha=7):
+    """Return epsilons of actors of Ape-X.
+
+    The i-th actor uses base_epsilon ** (1 + alpha * i / (n_actors - 1)).
+    See https://arxiv.org/abs/1803.00933.
+
+    Args:
+        n_actors (int): Number of actors.
+        base_epsilon (float): Epsilon of the first actor.
+        alpha (float): Exponent that controls how fast epsilons decrease.
+
+    Returns:
+        numpy.ndarray: Epsilons of actors.
+    """
+    assert n_actors > 0
+    if n_actors == 1:
+        return np.asarray([base_epsilon])
+    return base_epsilon ** (1 + alpha * np.arange(n_actors) / (n_actors - 1))
+
+
+def actor_loop(actor_idx, env, agent, explorer, shared, steps, outdir,
+               send_interval=50, pull_interval=400, max_episode_len=None,
+               logger=None):
+    """Act in an env and send transitions to a learner.
+
+    The actor selects actions by its own copy of the Q-function, which is
+    updated from the learner every pull_interval steps of the actor. For each
+    transition, its initial TD-error is computed from the Q-values that are
+    computed to select actions anyway, so it costs at most one additional
+    forward computation per episode.
+    """
+
+    logger = logger or logging.getLogger(__name__)
+    model = shared.actor_model
+
+    def compute_action_value(obs):
+        with chainer.using_config('train', False), \
+                chainer.no_backprop_mode():
+            return model(agent.batch_states([obs], np, agent.phi))
+
+    version = shared.shared_params.pull(model)
+    local_t = 0
+    global_t = 0
+    episode_r = 0
+    episode_len = 0
+    transitions = []
+    obs = env.reset()
+    action_value = compute_action_value(obs)
+
+    while not shared.stop.value:
+        greedy_action = action_value.greedy_actions.array[0]
+        action = explorer.select_action(
+            local_t, lambda: greedy_action, action_value=action_value)
+        next_obs, r, done, info = env.step(action)
+        local_t += 1
+        episode_r += r
+        episode_len += 1
+        reset = (episode_len == max_episode_len
+                 or info.get('needs_reset', False))
+
+        q = float(action_value.evaluate_actions(
+            np.asarray([action])).array[0])
+        if done:
+            target = r
+        else:
+            action_value = compute_action_value(next_obs)
+            target = r + agent.gamma * float(action_value.max.array[0])
+        transitions.append(dict(
+            state=agent._to_replay_state(obs),
+            action=action,
+            reward=r,
+            next_state=agent._to_replay_state(next_obs),
+            is_state_terminal=done,
+            reset=reset and not done,
+            initial_error=abs(target - q),
+        ))
+
+        if len(transitions) >= send_interval or done or reset:
+            global_t = shared.send((actor_idx, transitions), len(transitions))
+            transitions = []
+            if global_t >= steps:
+                break
+
+        if done or reset:
+            shared.end_episodes(
+                actor_idx, [episode_r], outdir, global_t, local_t, logger)
+            episode_r = 0
+            episode_len = 0
+            obs = env.reset()
+            action_value = compute_action_value(obs)
+        else:
+            obs = next_obs
+
+        if local_t % pull_interval == 0:
+            new_version = shared.pull_if_published(model, version)
+            if new_version != version:
+                version = new_version
+                # Select the next action by the new parameters
+                action_value = compute_action_value(obs)
+
+
+def _receive_transitions(agent, transition_queue, block):
+    """Append transitions received from actors to the replay buffer.
+
+    Returns:
+        int: Number of received transitions.
+    """
+    replay_buffer = agent.replay_buffer
+    prioritized = isinstance(replay_buffer, PrioritizedReplayBuffer)
+    n = 0
+    while True:
+        try:
+            actor_idx, transitions = transition_queue.get(
+                block=block, timeout=0.1)
+        except queue.Empty:
+            return n
+        block = False
+        for transition in transitions:
+            kwargs = {}
+            if prioritized:
+                kwargs['initial_error'] = transition['initial_error']
+            replay_buffer.append(
+                state=transition['state'],
+                action=transition['action'],
+                reward=transition['reward'],
+                next_state=transition['next_state'],
+                next_action=None,
+                is_state_terminal=transition['is_state_terminal'],
+                env_id=actor_idx,
+                **kwargs)
+            if transition['reset']:
+                replay_buffer.stop_current_episode(env_id=actor_idx)
+        n += len(transitions)
+
+
+def train_agent_apex(agent, make_env, steps, outdir, actors,
+                     eval_n_steps=None,
+                     eval_n_episodes=10,
+                     eval_interval=10 ** 5,
+                     max_episode_len=None,
+                     eval_max_episode_len=None,
+                     epsilons=None,
+                     send_interval=50,
+                     pull_interval=400,
+                     publish_interval=50,
+                     queue_size=256,
+                     log_interval=1000,
+                     successful_score=None,
+                     step_hooks=[],
+                     save_best_so_far_agent=True,
+                     logger=None,
+                     eval_sinks=(),
+                     statistics_sinks=(),
+                     ):
+    """Train a DQN-family agent by distributed actors and a learner.
+
+    This is an Ape-X style (https://arxiv.org/abs/1803.00933) counterpart of
+    train_agent_async on a single machine. Each actor process acts in its own
+    env with its own epsilon by a CPU copy of the Q-function and sends
+    transitions with their initial TD-errors to the learner, i.e. the current
+    process. The learner appends them to agent.replay_buffer, with priorities
+    computed from the errors if it is a PrioritizedReplayBuffer, updates the
+    agent and periodically publishes its parameters, which actors pull every
+    pull_interval steps. Thus env throughput is decoupled from learner
+    throughput.
+
+    The agent must be a DQN-family agent whose model maps a batch of
+    observations to an ActionValue and must not be recurrent. Its
+    replay_start_size, minibatch_size and target_update_interval are used,
+    where the last one is interpreted as the number of updates. Initial
+    TD-errors are always one-step errors computed by the Q-function of the
+    actor even if the replay buffer samples n-step experiences. Evaluations
+    run in the learner process while actors keep acting.
+
+    Args:
+        agent (DQN): Agent to train.
+        make_env (callable): (process_idx, test) -> Environment. Actors call
+            it with their indices and the learner calls it with process_idx=0
+            and test=True to make an env for evaluation.
+        steps (int): Number of global time steps of actors for training.
+        outdir (str): Path to the directory to output data.
+        actors (int): Number of actor processes.
+        eval_n_steps (int): Number of timesteps at each evaluation phase.
+        eval_n_episodes (int): Number of episodes at each evaluation phase.
+        eval_interval (int): Interval of evaluation in global steps. If set to
+            None, the agent will not be evaluated at all.
+        max_episode_len (int): Maximum episode length during training.
+        eval_max_episode_len (int or None): Maximum episode length of
+            evaluation runs. If None, max_episode_len is used instead.
+        epsilons (sequence of float or None): Epsilon of each actor. If None,
+            apex_epsilons(actors) is used.
+        send_interval (int): Number of transitions that an actor sends at
+            once unless an episode ends.
+        pull_interval (int): Interval of pulling parameters in steps of each
+            actor.
+        publish_interval (int): Interval of publishing parameters in updates.
+        queue_size (int): Maximum number of batches of transitions waiting to
+            be received by the learner. Actors wait for the learner when the
+            queue is full.
+        log_interval (int): Interval of logging statistics in updates.
+        successful_score (float): Finish training if the mean score is greater
+            than or equal to this value if not None
+        step_hooks (list): List of callable objects that accepts
+            (env, agent, step) as arguments. They are called after every
+            update with env=None and the global step.
+        save_best_so_far_agent (bool): If set to True, after each evaluation
+            phase, if the score (= mean return of evaluation episodes) exceeds
+            the best-so-far score, the current agent is saved.
+        logger (logging.Logger): Logger used in this function.
+        eval_sinks (sequence of MetricsSink): Sinks that receive records of
+            evaluations in addition to scores.txt.
+        statistics_sinks (sequence of MetricsSink): Sinks that receive
+            records of global steps, episodes, updates, elapsed time, the size
+            of the replay buffer and statistics of the agent every
+            log_interval updates.
+
+    Returns:
+        Trained agent.
+    """
+
+    logger = logger or logging.getLogger(__name__)
+    assert actors > 0
+    assert not is_recurrent(agent.model), \
+        'Recurrent models are not supported'
+    replay_updater = agent.replay_updater
+    assert not replay_updater.episodic_update, \
+        'Episodic updates are not supported'
+    if epsilons is None:
+        epsilons = apex_epsilons(actors)
+    assert len(epsilons) == actors
+
+    shared = SharedState(agent, queue_size)
+
+    def act(actor_idx, env):
+        explorer = ConstantEpsilonGreedy(
+            epsilons[actor_idx], random_action_func=env.action_space.sample)
+        actor_loop(
+            actor_idx=actor_idx,
+            env=env,
+            agent=agent,
+            explorer=explorer,
+            shared=shared,
+            steps=steps,
+            outdir=outdir,
+            send_interval=send_interval,
+            pull_interval=pull_interval,
+            max_episode_len=max_episode_len,
+            logger=logger,
+        )
+
+    def update(n_updates):
+        can_update = len(agent.replay_buffer) >= \
+            replay_updater.replay_start_size
+        _receive_transitions(agent, shared.queue, block=not can_update)
+        if not can_update:
+            return False
+        replay_updater.update_func(
+            agent.replay_buffer.sample(replay_updater.batchsize))
+        if (n_updates + 1) % agent.target_update_interval == 0:
+            agent.sync_target_network()
+        return True
+
+    return train_actors_and_learner(
+        agent=agent,
+        shared=shared,
+        make_env=make_env,
+        act=act,
+        update=update,
+        steps=steps,
+        outdir=outdir,
+        actors=actors,
+        eval_n_steps=eval_n_steps,
+        eval_n_episodes=eval_n_episodes,
+        eval_interval=eval_interval,
+        max_episode_len=max_episode_len,
+        eval_max_episode_len=eval_max_episode_len,
+        publish_interval=publish_interval,
+        log_interval=log_interval,
+        successful_score=successful_score,
+        step_hooks=step_hooks,
+        save_best_so_far_agent=save_best_so_far_agent,
+        logger=logger,
+        eval_sinks=eval_sinks,
+        statistics_sinks=statistics_sinks,
+        extra_statistics=lambda: [
+            ('replay_buffer_size', len(agent.replay_buffer))],
+    )
@@ -6,12 +6,18 @@ from builtins import *  # NOQA
 from future import standard_library
 standard_library.install_aliases()  # NOQA
 
+import collections
 import logging
 import multiprocessing as mp
 import os
+import time
 
+import numpy as np
+
+from chainerrl.env import VectorEnv
 from chainerrl.experiments.evaluator import AsyncEvaluator
 from chainerrl.misc import async_
+from chainerrl.misc.phase_timer import get_phase_timer
 from chainerrl.misc import random_seed
 
 
@@ -19,13 +25,17 @@ def train_loop(process_idx, env, agent, steps, outdir, counter,
                episodes_counter, training_done,
                max_episode_len=None, evaluator=None, eval_env=None,
                successful_score=None, logger=None,
-               global_step_hooks=[]):
+               global_step_hooks=[], statistics_sinks=()):
 
     logger = logger or logging.getLogger(__name__)
+    start_time = time.time()
 
     if eval_env is None:
         eval_env = env
 
+    # Time spent in env.step is measured by the agent's timer if any
+    phase_timer = get_phase_timer(agent)
+
     try:
 
         episode_r = 0
@@ -43,7 +53,8 @@ def train_loop(process_idx, env, agent, steps, outdir, counter,
             # a_t
             a = agent.act_and_train(obs, r)
             # o_{t+1}, r_{t+1}
-            obs, r, done, info = env.step(a)
+            with phase_timer.measure('env_step'):
+                obs, r, done, info = env.step(a)
             local_t += 1
             episode_r += r
             episode_len += 1
@@ -66,6 +77,17 @@ def train_loop(process_idx, env, agent, steps, outdir, counter,
                         'outdir:%s global_step:%s local_step:%s R:%s',
                         outdir, global_t, local_t, episode_r)
                     logger.info('statistics:%s', agent.get_statistics())
+                if statistics_sinks:
+                    record = collections.OrderedDict([
+                        ('steps', global_t),
+                        ('local_steps', local_t),
+                        ('process_idx', process_idx),
+                        ('elapsed', time.time() - start_time),
+                        ('return', episode_r),
+                    ])
+                    record.update(agent.get_statistics())
+                    for sink in statistics_sinks:
+                        sink.write(record)
 
                 # Evaluate the current agent
                 if evaluator is not None:
@@ -103,6 +125,9 @@ def train_loop(process_idx, env, agent, steps, outdir, counter,
             agent.save(dirname)
             logger.warning('Saved the current model to %s', dirname)
         raise
+    finally:
+        for sink in statistics_sinks:
+            sink.flush()
 
     if global_t == steps:
         # Save the final model
@@ -117,6 +142,143 @@ def train_loop(process_idx, env, agent, steps, outdir, counter,
         logger.info('Saved the successful agent to %s', dirname)
 
 
+def train_loop_batch(process_idx, env, agent, steps, outdir, counter,
+                     episodes_counter, training_done,
+                     max_episode_len=None, evaluator=None, eval_env=None,
+                     successful_score=None, logger=None,
+                     global_step_hooks=[], statistics_sinks=()):
+    """Train loop of a process that interacts with a VectorEnv.
+
+    The agent must be a BatchAgent. The global step counter is incremented by
+    the number of envs at every batch step.
+    """
+
+    logger = logger or logging.getLogger(__name__)
+    start_time = time.time()
+
+    if eval_env is None:
+        eval_env = env
+
+    # Time spent in env.step is measured by the agent's timer if any
+    phase_timer = get_phase_timer(agent)
+
+    num_envs = env.num_envs
+    episode_r = np.zeros(num_envs, dtype=np.float64)
+    episode_len = np.zeros(num_envs, dtype='i')
+    global_t = 0
+    local_t = 0
+    global_episodes = 0
+    successful = False
+
+    try:
+
+        obss = env.reset()
+
+        while True:
+
+            # a_t
+            actions = agent.batch_act_and_train(obss)
+            # o_{t+1}, r_{t+1}
+            with phase_timer.measure('env_step'):
+                obss, rs, dones, infos = env.step(actions)
+            local_t += num_envs
+            episode_r += rs
+            episode_len += 1
+
+            # Get and increment the global counter
+            with counter.get_lock():
+                counter.value += num_envs
+                global_t = counter.value
+
+            for hook in global_step_hooks:
+                hook(env, agent, global_t)
+
+            # Compute mask for done and reset
+            if max_episode_len is None:
+                resets = np.zeros(num_envs, dtype=bool)
+            else:
+                resets = (episode_len == max_episode_len)
+            resets = np.logical_or(
+                resets, [info.get('needs_reset', False) for info in infos])
+            training_finished = global_t >= steps or training_done.value
+            if training_finished:
+                # Let the agent finish all the ongoing episodes
+                resets.fill(True)
+            # Agent observes the consequences
+            agent.batch_observe_and_train(obss, rs, dones, resets)
+
+            end = np.logical_or(resets, dones)
+            if np.any(end):
+                if process_idx == 0:
+                    for r in episode_r[end]:
+                        logger.info(
+                            'outdir:%s global_step:%s local_step:%s R:%s',
+                            outdir, global_t, local_t, r)
+                    logger.info('statistics:%s', agent.get_statistics())
+                if statistics_sinks:
+                    statistics = agent.get_statistics()
+                    for r in episode_r[end]:
+                        record = collections.OrderedDict([
+                            ('steps', global_t),
+                            ('local_steps', local_t),
+                            ('process_idx', process_idx),
+                            ('elapsed', time.time() - start_time),
+                            ('return', r),
+                        ])
+                        record.update(statistics)
+                        for sink in statistics_sinks:
+                            sink.write(record)
+
+                with episodes_counter.get_lock():
+                    episodes_counter.value += int(np.sum(end))
+                    global_episodes = episodes_counter.value
+
+                # Evaluate the current agent
+                if evaluator is not None:
+                    eval_score = evaluator.evaluate_if_necessary(
+                        t=global_t, episodes=global_episodes,
+                        env=eval_env, agent=agent)
+                    if (eval_score is not None and
+                            successful_score is not None and
+                            eval_score >= successful_score):
+                        with training_done.get_lock():
+                            if not training_done.value:
+                                training_done.value = True
+                                successful = True
+                        break
+
+            if training_finished:
+                break
+
+            # Start new episodes if needed
+            episode_r[end] = 0
+            episode_len[end] = 0
+            obss = env.reset(np.logical_not(end))
+
+    except (Exception, KeyboardInterrupt):
+        if process_idx == 0:
+            # Save the current model before being killed
+            dirname = os.path.join(outdir, '{}_except'.format(global_t))
+            agent.save(dirname)
+            logger.warning('Saved the current model to %s', dirname)
+        raise
+    finally:
+        for sink in statistics_sinks:
+            sink.flush()
+
+    if global_t >= steps and global_t - num_envs < steps:
+        # Save the final model
+        dirname = os.path.join(outdir, '{}_finish'.format(steps))
+        agent.save(dirname)
+        logger.info('Saved the final agent to %s', dirname)
+
+    if successful:
+        # Save the successful model
+        dirname = os.path.join(outdir, 'successful')
+        agent.save(dirname)
+        logger.info('Saved the successful agent to %s', dirname)
+
+
 def extract_shared_objects_from_agent(agent):
     return dict((attr, async_.as_shared_objects(getattr(agent, attr)))
                 for attr in agent.shared_attributes)
@@ -143,6 +305,8 @@ def train_agent_async(outdir, processes, make_env,
                       global_step_hooks=[],
                       save_best_so_far_agent=True,
                       logger=None,
+                      eval_sinks=(),
+                      statistics_sinks=(),
                       ):
     """Train agent asynchronously using multiprocessing.
 
@@ -151,7 +315,9 @@ def train_agent_async(outdir, processes, make_env,
     Args:
         outdir (str): Path to the directory to output things.
         processes (int): Number of processes.
-        make_env (callable): (process_idx, test) -> Environment.
+        make_env (callable): (process_idx, test) -> Environment. If it
+            returns a VectorEnv, each process interacts with the multiple envs
+            of it via the BatchAgent interface of the agent.
         profile (bool): Profile if set True.
         steps (int): Number of global time steps for training.
         eval_interval (int): Interval of evaluation. If set to None, the agent
@@ -171,6 +337,12 @@ def train_agent_async(outdir, processes, make_env,
             if the score (= mean return of evaluation episodes) exceeds
             the best-so-far score, the current agent is saved.
         logger (logging.Logger): Logger used in this function.
+        eval_sinks (sequence of MetricsSink): Process-safe sinks that receive
+            records of evaluations in addition to scores.txt.
+        statistics_sinks (sequence of MetricsSink): Process-safe sinks that
+            receive records of global and local steps, the process index,
+            elapsed time, the return and statistics of the agent at the end
+            of every training episode of every process.
 
     Returns:
         Trained agent.
@@ -203,6 +375,7 @@ def train_agent_async(outdir, processes, make_env,
             step_offset=step_offset,
             save_best_so_far_agent=save_best_so_far_agent,
             logger=logger,
+            sinks=eval_sinks,
         )
 
     def run_func(process_idx):
@@ -220,8 +393,13 @@ def train_agent_async(outdir, processes, make_env,
             local_agent = agent
         local_agent.process_idx = process_idx
 
+        if isinstance(env, VectorEnv):
+            loop = train_loop_batch
+        else:
+            loop = train_loop
+
         def f():
-            train_loop(
+            loop(
                 process_idx=process_idx,
                 counter=counter,
                 episodes_counter=episodes_counter,
@@ -235,7 +413,8 @@ def train_agent_async(outdir, processes, make_env,
                 training_done=training_done,
                 eval_env=eval_env,
                 global_step_hooks=global_step_hooks,
-                logger=logger)
+                logger=logger,
+                statistics_sinks=statistics_sinks)
 
         if profile:
             import cProfile
@@ -5,8 +5,10 @@ from __future__ import absolute_import
 from future import standard_library
 standard_library.install_aliases()  # NOQA
 
+import collections
 from collections import deque
 import logging
+import time
 
 import numpy as np
 
@@ -14,12 +16,15 @@ import numpy as np
 from chainerrl.experiments.evaluator import Evaluator
 from chainerrl.experiments.evaluator import save_agent
 from chainerrl.misc.makedirs import makedirs
+from chainerrl.misc.phase_timer import get_phase_timer
 
 
 def train_agent_batch(agent, env, steps, outdir, log_interval=None,
                       max_episode_len=None, eval_interval=None,
                       step_offset=0, evaluator=None, successful_score=None,
-                      step_hooks=[], return_window_size=100, logger=None):
+                      step_hooks=[], return_window_size=100, logger=None,
+                      statistics_sinks=(), checkpointer=None,
+                      checkpoint_freq=None):
     """Train an agent in a batch environment.
 
     Args:
@@ -39,9 +44,21 @@ def train_agent_batch(agent, env, steps, outdir, log_interval=None,
             (env, agent, step) as arguments. They are called every step.
             See chainerrl.experiments.hooks.
         logger (logging.Logger): Logger used in this function.
+        statistics_sinks (sequence of MetricsSink): Sinks that receive
+            records of steps, episodes, elapsed time, returns and statistics
+            of the agent every log_interval steps.
+        checkpointer (AsyncCheckpointer or None): If not None, the agent is
+            saved by it in a background thread, and it is waited for before
+            returning.
+        checkpoint_freq (int or None): If not None, the agent is saved to
+            {t}_checkpoint every checkpoint_freq steps. Such checkpoints are
+            subject to the retention policy of the checkpointer, with the
+            score of the latest evaluation.
     """
 
     logger = logger or logging.getLogger(__name__)
+    start_time = time.time()
+    eval_score = None
     recent_returns = deque(maxlen=return_window_size)
 
     num_envs = env.num_envs
@@ -57,12 +74,16 @@ def train_agent_batch(agent, env, steps, outdir, log_interval=None,
     if hasattr(agent, 't'):
         agent.t = step_offset
 
+    # Time spent in env.step is measured by the agent's timer if any
+    phase_timer = get_phase_timer(agent)
+
     try:
         while True:
             # a_t
             actions = agent.batch_act_and_train(obss)
             # o_{t+1}, r_{t+1}
-            obss, rs, dones, infos = env.step(actions)
+            with phase_timer.measure('env_step'):
+                obss, rs, dones, infos = env.step(actions)
             episode_r += rs
             episode_len += 1
 
@@ -94,6 +115,11 @@ def train_agent_batch(agent, env, steps, outdir, log_interval=None,
                 t += 1
                 for hook in step_hooks:
                     hook(env, agent, t)
+                if checkpoint_freq and t % checkpoint_freq == 0:
+                    save_agent(agent, t, outdir, logger,
+                               suffix='_checkpoint',
+                               checkpointer=checkpointer, score=eval_score,
+                               permanent=False)
 
             if (log_interval is not None
                     and t >= log_interval
@@ -106,10 +132,27 @@ def train_agent_batch(agent, env, steps, outdir, log_interval=None,
                         recent_returns[-1] if recent_returns else np.nan,
                         np.mean(recent_returns) if recent_returns else np.nan,
                     ))
-                logger.info('statistics: {}'.format(agent.get_statistics()))
+                statistics = agent.get_statistics()
+                logger.info('statistics: {}'.format(statistics))
+                if statistics_sinks:
+                    record = collections.OrderedDict([
+                        ('steps', t),
+                        ('episodes', int(np.sum(episode_idx))),
+                        ('elapsed', time.time() - start_time),
+                        ('last_return',
+                         recent_returns[-1] if recent_returns else np.nan),
+                        ('average_return',
+                         np.mean(recent_returns) if recent_returns
+                         else np.nan),
+                    ])
+                    record.update(statistics)
+                    for sink in statistics_sinks:
+                        sink.write(record)
             if evaluator:
-                if evaluator.evaluate_if_necessary(
-                        t=t, episodes=np.sum(episode_idx)):
+                score = evaluator.evaluate_if_necessary(
+                    t=t, episodes=np.sum(episode_idx))
+                if score is not None:
+                    eval_score = score
                     if (successful_score is not None and
                             evaluator.max_score >= successful_score):
                         break
@@ -124,14 +167,21 @@ def train_agent_batch(agent, env, steps, outdir, log_interval=None,
 
     except (Exception, KeyboardInterrupt):
         # Save the current model before being killed
-        save_agent(agent, t, outdir, logger, suffix='_except')
+        save_agent(agent, t, outdir, logger, suffix='_except',
+                   checkpointer=checkpointer)
         env.close()
         if evaluator:
             evaluator.env.close()
         raise
     else:
         # Save the final model
-        save_agent(agent, t, outdir, logger, suffix='_finish')
+        save_agent(agent, t, outdir, logger, suffix='_finish',
+                   checkpointer=checkpointer)
+    finally:
+        for sink in statistics_sinks:
+            sink.flush()
+        if checkpointer is not None:
+            checkpointer.wait()
 
 
 def train_agent_batch_with_evaluation(agent,
@@ -151,6 +201,10 @@ def train_agent_batch_with_evaluation(agent,
                                       step_hooks=[],
                                       save_best_so_far_agent=True,
                                       logger=None,
+                                      eval_sinks=(),
+                                      statistics_sinks=(),
+                                      checkpointer=None,
+                                      checkpoint_freq=None,
                                       ):
     """Train an agent while regularly evaluating it.
 
@@ -179,6 +233,16 @@ def train_agent_batch_with_evaluation(agent,
             if the score (= mean return of evaluation episodes) exceeds
             the best-so-far score, the current agent is saved.
         logger (logging.Logger): Logger used in this function.
+        eval_sinks (sequence of MetricsSink): Sinks that receive records of
+            evaluations in addition to scores.txt.
+        statistics_sinks (sequence of MetricsSink): Sinks that receive
+            records of steps, episodes, elapsed time, returns and statistics
+            of the agent every log_interval steps.
+        checkpointer (AsyncCheckpointer or None): If not None, the agent is
+            saved by it in a background thread, including the best-so-far
+            agent, and it is waited for before returning.
+        checkpoint_freq (int or None): If not None, the agent is saved to
+            {t}_checkpoint every checkpoint_freq steps.
     """
 
     logger = logger or logging.getLogger(__name__)
@@ -200,6 +264,8 @@ def train_agent_batch_with_evaluation(agent,
                           step_offset=step_offset,
                           save_best_so_far_agent=save_best_so_far_agent,
                           logger=logger,
+                          sinks=eval_sinks,
+                          checkpointer=checkpointer,
                           )
 
     train_agent_batch(
@@ -212,4 +278,7 @@ def train_agent_batch_with_evaluation(agent,
         return_window_size=return_window_size,
         log_interval=log_interval,
         step_hooks=step_hooks,
-        logger=logger)
+        logger=logger,
+        statistics_sinks=statistics_sinks,
+        checkpointer=checkpointer,
+        checkpoint_freq=checkpoint_freq)
@@ -0,0 +1,227 @@
+from __future__ import print_function
+from __future__ import division
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import logging
+import queue
+
+import chainer
+import numpy as np
+
+from chainerrl.env import VectorEnv
+from chainerrl.experiments._actor_learner import SharedState
+from chainerrl.experiments._actor_learner import train_actors_and_learner
+from chainerrl.misc import async_
+from chainerrl.recurrent import is_recurrent
+
+
+def actor_loop(actor_idx, env, agent, shared, steps, outdir,
+               max_episode_len=None, logger=None):
+    """Generate trajectories in a VectorEnv and send them to a learner.
+
+    The actor samples actions by its own copy of the model, which is updated
+    from the learner after every trajectory if a new version of parameters
+    is published. Each trajectory has agent.update_steps steps for each env
+    and is sent as a rollout that IMPALA.update accepts.
+    """
+
+    logger = logger or logging.getLogger(__name__)
+    model = shared.actor_model
+    num_envs = env.num_envs
+    version = shared.shared_params.pull(model)
+    local_t = 0
+    global_t = 0
+    episode_r = np.zeros(num_envs, dtype=np.float64)
+    episode_len = np.zeros(num_envs, dtype='i')
+    obss = env.reset()
+    states = agent.batch_states(obss, np, agent.phi)
+
+    while not shared.stop.value:
+        rollout = dict(state=[states], action=[], reward=[],
+                       nonterminal=[], log_prob=[])
+        for _ in range(agent.update_steps):
+            with chainer.using_config('train', False), \
+                    chainer.no_backprop_mode():
+                pout, _ = model.pi_and_v(states)
+                actions = pout.sample().array
+                log_probs = pout.log_prob(actions).array
+            obss, rs, dones, infos = env.step(actions)
+            local_t += num_envs
+            episode_r += rs
+            episode_len += 1
+
+            if max_episode_len is None:
+                resets = np.zeros(num_envs, dtype=bool)
+            else:
+                resets = (episode_len == max_episode_len)
+            resets = np.logical_or(
+                resets, [info.get('needs_reset', False) for info in infos])
+            end = np.logical_or(resets, dones)
+
+            rollout['action'].append(actions)
+            rollout['log_prob'].append(log_probs)
+            rollout['reward'].append(np.asarray(rs, dtype=np.float32))
+            rollout['nonterminal'].append(
+                np.logical_not(end).astype(np.float32))
+
+            if np.any(end):
+                shared.end_episodes(actor_idx, episode_r[end], outdir,
+                                    global_t, local_t, logger)
+                episode_r[end] = 0
+                episode_len[end] = 0
+            obss = env.reset(np.logical_not(end))
+            states = agent.batch_states(obss, np, agent.phi)
+            rollout['state'].append(states)
+
+        rollout = dict((key, np.stack(value))
+                       for key, value in rollout.items())
+        global_t = shared.send(rollout, agent.update_steps * num_envs)
+        if global_t >= steps:
+            break
+
+        version = shared.pull_if_published(model, version)
+
+
+def _receive_rollouts(shared, n_rollouts, steps):
+    """Receive rollouts and concatenate them along the batch axis.
+
+    Returns:
+        dict or None: Concatenated rollout, or None if training steps are
+            reached before n_rollouts rollouts are received.
+    """
+    rollouts = []
+    while len(rollouts) < n_rollouts:
+        if shared.counter.value >= steps:
+            return None
+        try:
+            rollouts.append(shared.queue.get(timeout=0.1))
+        except queue.Empty:
+            async_.check_processes(shared.processes)
+    return dict((key, np.concatenate([r[key] for r in rollouts], axis=1))
+                for key in rollouts[0])
+
+
+def train_agent_impala(agent, make_env, steps, outdir, actors,
+                       rollouts_per_update=1,
+                       eval_n_steps=None,
+                       eval_n_episodes=10,
+                       eval_interval=10 ** 5,
+                       max_episode_len=None,
+                       eval_max_episode_len=None,
+                       publish_interval=1,
+                       queue_size=16,
+                       log_interval=100,
+                       successful_score=None,
+                       step_hooks=[],
+                       save_best_so_far_agent=True,
+                       logger=None,
+                       eval_sinks=(),
+                       statistics_sinks=(),
+                       ):
+    """Train an IMPALA agent by actor processes and a learner.
+
+    Each actor process generates trajectories in its own VectorEnv, e.g. a
+    MultiprocessVectorEnv, by a CPU copy of the model, which may be slightly
+    stale, and sends them to the learner, i.e. the current process. The
+    learner concatenates rollouts_per_update rollouts into a batch, updates
+    the agent by V-trace and publishes its parameters every publish_interval
+    updates. Unlike A2C, envs never wait for updates and the learner never
+    waits for the slowest env. Evaluations run in the learner process while
+    actors keep acting.
+
+    Args:
+        agent (IMPALA): Agent to train. Its model must not be recurrent.
+        make_env (callable): (process_idx, test) -> VectorEnv for training
+            and Environment or VectorEnv for evaluation. Actors call it with
+            their indices and the learner calls it with process_idx=0 and
+            test=True to make an env for evaluation.
+        steps (int): Number of global time steps of actors for training.
+        outdir (str): Path to the directory to output data.
+        actors (int): Number of actor processes.
+        rollouts_per_update (int): Number of rollouts used for each update.
+        eval_n_steps (int): Number of timesteps at each evaluation phase.
+        eval_n_episodes (int): Number of episodes at each evaluation phase.
+        eval_interval (int): Interval of evaluation in global steps. If set to
+            None, the agent will not be evaluated at all.
+        max_episode_len (int): Maximum episode length during training.
+        eval_max_episode_len (int or None): Maximum episode length of
+            evaluation runs. If None, max_episode_len is used instead.
+        publish_interval (int): Interval of publishing parameters in updates.
+        queue_size (int): Maximum number of rollouts waiting to be received
+            by the learner. Actors wait for the learner when the queue is
+            full, which bounds the staleness of trajectories.
+        log_interval (int): Interval of logging statistics in updates.
+        successful_score (float): Finish training if the mean score is greater
+            than or equal to this value if not None
+        step_hooks (list): List of callable objects that accepts
+            (env, agent, step) as arguments. They are called after every
+            update with env=None and the global step.
+        save_best_so_far_agent (bool): If set to True, after each evaluation
+            phase, if the score (= mean return of evaluation episodes) exceeds
+            the best-so-far score, the current agent is saved.
+        logger (logging.Logger): Logger used in this function.
+        eval_sinks (sequence of MetricsSink): Sinks that receive records of
+            evaluations in addition to scores.txt.
+        statistics_sinks (sequence of MetricsSink): Sinks that receive
+            records of global steps, episodes, updates, elapsed time and
+            statistics of the agent every log_interval updates.
+
+    Returns:
+        Trained agent.
+    """
+
+    logger = logger or logging.getLogger(__name__)
+    assert actors > 0
+    assert rollouts_per_update > 0
+    assert not is_recurrent(agent.model), \
+        'Recurrent models are not supported'
+
+    shared = SharedState(agent, queue_size)
+
+    def act(actor_idx, env):
+        assert isinstance(env, VectorEnv)
+        actor_loop(
+            actor_idx=actor_idx,
+            env=env,
+            agent=agent,
+            shared=shared,
+            steps=steps,
+            outdir=outdir,
+            max_episode_len=max_episode_len,
+            logger=logger,
+        )
+
+    def update(n_updates):
+        rollout = _receive_rollouts(shared, rollouts_per_update, steps)
+        if rollout is None:
+            return False
+        agent.update(rollout)
+        return True
+
+    return train_actors_and_learner(
+        agent=agent,
+        shared=shared,
+        make_env=make_env,
+        act=act,
+        update=update,
+        steps=steps,
+        outdir=outdir,
+        actors=actors,
+        eval_n_steps=eval_n_steps,
+        eval_n_episodes=eval_n_episodes,
+        eval_interval=eval_interval,
+        max_episode_len=max_episode_len,
+        eval_max_episode_len=eval_max_episode_len,
+        publish_interval=publish_interval,
+        log_interval=log_interval,
+        successful_score=successful_score,
+        step_hooks=step_hooks,
+        save_best_so_far_agent=save_best_so_far_agent,
+        logger=logger,
+        eval_sinks=eval_sinks,
+        statistics_sinks=statistics_sinks,
+    )
@@ -9,6 +9,7 @@ standard_library.install_aliases()  # NOQA
 from abc import ABCMeta
 from abc import abstractmethod
 from future.utils import with_metaclass
+import numpy as np
 
 
 class Explorer(with_metaclass(ABCMeta, object)):
@@ -24,3 +25,25 @@ class Explorer(with_metaclass(ABCMeta, object)):
           action_value (ActionValue): ActionValue object
         """
         raise NotImplementedError()
+
+    def batch_select_action(self, t, greedy_action_func, action_value=None):
+        """Select a batch of actions.
+
+        The default implementation calls select_action for each element of
+        the batch. Subclasses can override it to process the batch at once.
+
+        Args:
+          t: current time step
+          greedy_action_func: function with no argument that returns a batch
+            of actions
+          action_value (ActionValue): ActionValue object of the batch
+        Returns:
+          numpy.ndarray: a batch of actions
+        """
+        batch_greedy_action = greedy_action_func()
+        return np.asarray([
+            self.select_action(
+                t, lambda: batch_greedy_action[i],
+                action_value=None if action_value is None
+                else action_value[i:i + 1])
+            for i in range(len(batch_greedy_action))])
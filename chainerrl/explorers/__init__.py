@@ -1,6 +1,10 @@
-from chainerrl.explorers.additive_gaussian import AdditiveGaussian  # NOQA
-from chainerrl.explorers.additive_ou import AdditiveOU  # NOQA
-from chainerrl.explorers.boltzmann import Boltzmann  # NOQA
-from chainerrl.explorers.epsilon_greedy import ConstantEpsilonGreedy  # NOQA
-from chainerrl.explorers.epsilon_greedy import LinearDecayEpsilonGreedy  # NOQA
-from chainerrl.explorers.greedy import Greedy  # NOQA
+from chainerrl.lazy_import import install_lazy_attributes
+
+install_lazy_attributes(__name__, attributes={
+    'AdditiveGaussian': 'chainerrl.explorers.additive_gaussian',
+    'AdditiveOU': 'chainerrl.explorers.additive_ou',
+    'Boltzmann': 'chainerrl.explorers.boltzmann',
+    'ConstantEpsilonGreedy': 'chainerrl.explorers.epsilon_greedy',
+    'LinearDecayEpsilonGreedy': 'chainerrl.explorers.epsilon_greedy',
+    'Greedy': 'chainerrl.explorers.greedy',
+})
@@ -40,6 +40,12 @@ class AdditiveGaussian(explorer.Explorer):
         else:
             return a + noise
 
+    def batch_select_action(self, t, greedy_action_func, action_value=None):
+        # Noises for the whole batch are sampled at once. scale, low and high
+        # are broadcast to each action as in select_action.
+        return self.select_action(
+            t, lambda: np.asarray(greedy_action_func()))
+
     def __repr__(self):
         return 'AdditiveGaussian(scale={}, low={}, high={})'.format(
             self.scale, self.low, self.high)
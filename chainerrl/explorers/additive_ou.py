@@ -18,6 +18,9 @@ class AdditiveOU(explorer.Explorer):
 
     Used in https://arxiv.org/abs/1509.02971 for exploration.
 
+    With batch_select_action, an independent process is run for each env of
+    the batch.
+
     Args:
         mu (float): Mean of the OU process
         theta (float): Friction to pull towards the mean
@@ -33,31 +36,47 @@ class AdditiveOU(explorer.Explorer):
         self.start_with_mu = start_with_mu
         self.logger = logger
         self.ou_state = None
+        self.batch_ou_state = None
 
-    def evolve(self):
+    def _initial_state(self, shape):
+        if self.start_with_mu:
+            return np.full(shape, self.mu, dtype=np.float32)
+        else:
+            sigma_stable = (self.sigma /
+                            np.sqrt(2 * self.theta - self.theta ** 2))
+            return np.random.normal(
+                size=shape, loc=self.mu, scale=sigma_stable).astype(np.float32)
+
+    def _evolve(self, state):
         # dx = theta (mu - x) + sigma dW
         # for a Wiener process W
-        noise = np.random.normal(size=self.ou_state.shape, loc=0,
-                                 scale=self.sigma)
-        self.ou_state += self.theta * (self.mu - self.ou_state) + noise
+        noise = np.random.normal(size=state.shape, loc=0, scale=self.sigma)
+        state += self.theta * (self.mu - state) + noise
+
+    def evolve(self):
+        self._evolve(self.ou_state)
 
     def select_action(self, t, greedy_action_func, action_value=None):
         a = greedy_action_func()
         if self.ou_state is None:
-            if self.start_with_mu:
-                self.ou_state = np.full(a.shape, self.mu, dtype=np.float32)
-            else:
-                sigma_stable = (self.sigma /
-                                np.sqrt(2 * self.theta - self.theta ** 2))
-                self.ou_state = np.random.normal(
-                    size=a.shape,
-                    loc=self.mu, scale=sigma_stable).astype(np.float32)
+            self.ou_state = self._initial_state(a.shape)
         else:
             self.evolve()
         noise = self.ou_state
         self.logger.debug('t:%s noise:%s', t, noise)
         return a + noise
 
+    def batch_select_action(self, t, greedy_action_func, action_value=None):
+        batch_action = np.asarray(greedy_action_func())
+        if (self.batch_ou_state is None
+                or self.batch_ou_state.shape != batch_action.shape):
+            self.batch_ou_state = self._initial_state(batch_action.shape)
+        else:
+            self._evolve(self.batch_ou_state)
+        noise = self.batch_ou_state
+        self.logger.debug('t:%s noise:%s', t, noise)
+        return batch_action + noise
+
     def __repr__(self):
         return 'AdditiveOU(mu={}, theta={}, sigma={})'.format(
             self.mu, self.theta, self.sigma)
@@ -33,5 +33,17 @@ class Boltzmann(chainerrl.explorer.Explorer):
                 F.softmax(action_value.q_values / self.T).array).ravel()
         return np.random.choice(np.arange(n_actions), p=probs)
 
+    def batch_select_action(self, t, greedy_action_func, action_value=None):
+        assert action_value is not None
+        assert isinstance(action_value,
+                          chainerrl.action_value.DiscreteActionValue)
+        with chainer.no_backprop_mode():
+            probs = chainer.cuda.to_cpu(
+                F.softmax(action_value.q_values / self.T).array)
+        # Sample from each row by inverting its CDF
+        cdf = np.cumsum(probs, axis=1)
+        u = np.random.rand(len(cdf), 1) * cdf[:, -1:]
+        return np.minimum((cdf <= u).sum(axis=1), probs.shape[1] - 1)
+
     def __repr__(self):
         return 'Boltzmann(T={})'.format(self.T)
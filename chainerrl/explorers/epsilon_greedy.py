@@ -21,19 +21,58 @@ def select_action_epsilon_greedily(epsilon, random_action_func,
         return greedy_action_func(), True
 
 
+def batch_select_action_epsilon_greedily(epsilon, random_action_func,
+                                         greedy_action_func):
+    """Select a batch of actions epsilon-greedily.
+
+    Which actions are random is decided at once for the batch, and
+    random_action_func is called only for them.
+
+    Args:
+        epsilon (float or numpy.ndarray): Epsilon, or epsilons for each
+            element of the batch.
+        random_action_func (callable): Function with no argument that returns
+            an action.
+        greedy_action_func (callable): Function with no argument that returns
+            a batch of actions.
+    Returns:
+        tuple of numpy.ndarray: A batch of actions and a boolean mask that is
+            True for greedy actions.
+    """
+    batch_action = np.array(greedy_action_func())
+    greedy = np.random.rand(len(batch_action)) >= epsilon
+    for i in np.flatnonzero(~greedy):
+        batch_action[i] = random_action_func()
+    return batch_action, greedy
+
+
+def _check_epsilon(epsilon):
+    if np.isscalar(epsilon):
+        assert epsilon >= 0 and epsilon <= 1
+        return epsilon
+    else:
+        epsilon = np.asarray(epsilon)
+        assert np.all(epsilon >= 0) and np.all(epsilon <= 1)
+        return epsilon
+
+
 class ConstantEpsilonGreedy(explorer.Explorer):
     """Epsilon-greedy with constant epsilon.
 
+    epsilon can be an array of epsilons for each env of a batch, which is
+    only supported by batch_select_action. For example, epsilons of Ape-X
+    (https://arxiv.org/abs/1803.00933) for N envs are given by
+    `0.4 ** (1 + 7 * np.arange(N) / (N - 1))`.
+
     Args:
-      epsilon: epsilon used
+      epsilon: epsilon used, a float or an array of floats for each env
       random_action_func: function with no argument that returns action
       logger: logger used
     """
 
     def __init__(self, epsilon, random_action_func,
                  logger=getLogger(__name__)):
-        assert epsilon >= 0 and epsilon <= 1
-        self.epsilon = epsilon
+        self.epsilon = _check_epsilon(epsilon)
         self.random_action_func = random_action_func
         self.logger = logger
 
@@ -44,6 +83,12 @@ class ConstantEpsilonGreedy(explorer.Explorer):
         self.logger.debug('t:%s a:%s %s', t, a, greedy_str)
         return a
 
+    def batch_select_action(self, t, greedy_action_func, action_value=None):
+        batch_action, greedy = batch_select_action_epsilon_greedily(
+            self.epsilon, self.random_action_func, greedy_action_func)
+        self.logger.debug('t:%s a:%s greedy:%s', t, batch_action, greedy)
+        return batch_action
+
     def __repr__(self):
         return 'ConstantEpsilonGreedy(epsilon={})'.format(self.epsilon)
 
@@ -51,9 +96,12 @@ class ConstantEpsilonGreedy(explorer.Explorer):
 class LinearDecayEpsilonGreedy(explorer.Explorer):
     """Epsilon-greedy with linearyly decayed epsilon
 
+    start_epsilon and end_epsilon can be arrays of epsilons for each env of a
+    batch, which are only supported by batch_select_action.
+
     Args:
-      start_epsilon: max value of epsilon
-      end_epsilon: min value of epsilon
+      start_epsilon: max value of epsilon, or an array of them for each env
+      end_epsilon: min value of epsilon, or an array of them for each env
       decay_steps: how many steps it takes for epsilon to decay
       random_action_func: function with no argument that returns action
       logger: logger used
@@ -61,11 +109,9 @@ class LinearDecayEpsilonGreedy(explorer.Explorer):
 
     def __init__(self, start_epsilon, end_epsilon,
                  decay_steps, random_action_func, logger=getLogger(__name__)):
-        assert start_epsilon >= 0 and start_epsilon <= 1
-        assert end_epsilon >= 0 and end_epsilon <= 1
         assert decay_steps >= 0
-        self.start_epsilon = start_epsilon
-        self.end_epsilon = end_epsilon
+        self.start_epsilon = _check_epsilon(start_epsilon)
+        self.end_epsilon = _check_epsilon(end_epsilon)
         self.decay_steps = decay_steps
         self.random_action_func = random_action_func
         self.logger = logger
@@ -86,5 +132,12 @@ class LinearDecayEpsilonGreedy(explorer.Explorer):
         self.logger.debug('t:%s a:%s %s', t, a, greedy_str)
         return a
 
+    def batch_select_action(self, t, greedy_action_func, action_value=None):
+        self.epsilon = self.compute_epsilon(t)
+        batch_action, greedy = batch_select_action_epsilon_greedily(
+            self.epsilon, self.random_action_func, greedy_action_func)
+        self.logger.debug('t:%s a:%s greedy:%s', t, batch_action, greedy)
+        return batch_action
+
     def __repr__(self):
         return 'LinearDecayEpsilonGreedy(epsilon={})'.format(self.epsilon)
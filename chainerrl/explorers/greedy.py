@@ -15,5 +15,8 @@ class Greedy(explorer.Explorer):
     def select_action(self, t, greedy_action_func, action_value=None):
         return greedy_action_func()
 
+    def batch_select_action(self, t, greedy_action_func, action_value=None):
+        return greedy_action_func()
+
     def __repr__(self):
         return 'Greedy()'
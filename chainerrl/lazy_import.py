@@ -0,0 +1,68 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import importlib
+import sys
+
+
+def install_lazy_attributes(module_name, submodules=(), attributes=None):
+    """Make attributes of a package imported on their first access.
+
+    This relies on module-level __getattr__ (PEP 562), which is available in
+    Python 3.7 or later. On older versions, everything is imported
+    immediately instead.
+
+    Any submodule of the package that is not imported yet, including those
+    not listed in submodules, is imported when it is accessed as an attribute.
+    It can also be applied to a plain module to lazily import attributes
+    defined in other modules.
+
+    Attributes must not have the same name as a submodule of the package
+    because importing the submodule would overwrite the attribute.
+
+    Args:
+        module_name (str): Name of the package, usually __name__.
+        submodules (sequence of str): Names of submodules to list.
+        attributes (dict or None): Mapping from the name of an attribute to
+            the name of the module that defines it.
+    """
+    module = sys.modules[module_name]
+    attributes = attributes or {}
+
+    def load_attribute(name):
+        value = getattr(importlib.import_module(attributes[name]), name)
+        setattr(module, name, value)
+        return value
+
+    if sys.version_info < (3, 7):
+        for name in submodules:
+            importlib.import_module('{}.{}'.format(module_name, name))
+        for name in attributes:
+            load_attribute(name)
+        return
+
+    is_package = hasattr(module, '__path__')
+
+    def __getattr__(name):
+        if name in attributes:
+            return load_attribute(name)
+        if is_package and not name.startswith('__'):
+            submodule_name = '{}.{}'.format(module_name, name)
+            try:
+                return importlib.import_module(submodule_name)
+            except ImportError as e:
+                # Re-raise errors raised inside the submodule
+                if e.name != submodule_name:
+                    raise
+        raise AttributeError(
+            'module {!r} has no attribute {!r}'.format(module_name, name))
+
+    def __dir__():
+        return sorted(set(module.__dict__) | set(submodules) | set(attributes))
+
+    module.__getattr__ = __getattr__
+    module.__dir__ = __dir__
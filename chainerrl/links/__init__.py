@@ -4,6 +4,7 @@ from chainerrl.links.dqn_head import NIPSDQNHead  # NOQA
 from chainerrl.links.empirical_normalization import EmpiricalNormalization  # NOQA
 from chainerrl.links.mlp import MLP  # NOQA
 from chainerrl.links.mlp_bn import MLPBN  # NOQA
+from chainerrl.links.noisy_chain import resample_noise  # NOQA
 from chainerrl.links.noisy_chain import to_factorized_noisy  # NOQA
 from chainerrl.links.noisy_linear import FactorizedNoisyLinear  # NOQA
 from chainerrl.links.sequence import Sequence  # NOQA
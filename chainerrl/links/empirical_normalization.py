@@ -13,6 +13,10 @@ import numpy as np
 class EmpiricalNormalization(chainer.Link):
     """Normalize mean and variance of values based on emprical values.
 
+    Statistics are accumulated in float64 so that they do not drift after
+    many values. Normalization is done by an affine transform cached in the
+    dtype of input values, which is recomputed only after statistics change.
+
     Args:
         shape (int or tuple of int): Shape of input values except batch axis.
         batch_axis (int): Batch axis.
@@ -30,36 +34,67 @@ class EmpiricalNormalization(chainer.Link):
         self.eps = dtype.type(eps)
         self.until = until
         self.clip_threshold = clip_threshold
-        self._mean = np.expand_dims(np.zeros(shape, dtype=dtype), batch_axis)
-        self._var = np.expand_dims(np.ones(shape, dtype=dtype), batch_axis)
+        self._mean = np.expand_dims(
+            np.zeros(shape, dtype=np.float64), batch_axis)
+        self._var = np.expand_dims(
+            np.ones(shape, dtype=np.float64), batch_axis)
         self.count = 0
         self.register_persistent('_mean')
         self.register_persistent('_var')
         self.register_persistent('count')
 
         # cache
-        self._cached_std_inverse = None
+        self._cached_affine = None
 
     @property
     def mean(self):
         return self.xp.squeeze(self._mean, self.batch_axis).copy()
 
+    @property
+    def var(self):
+        return self.xp.squeeze(self._var, self.batch_axis).copy()
+
     @property
     def std(self):
         xp = self.xp
         return xp.sqrt(xp.squeeze(self._var, self.batch_axis))
 
     @property
-    def _std_inverse(self):
-        if self._cached_std_inverse is None:
-            self._cached_std_inverse = (self._var + self.eps) ** -0.5
+    def frozen(self):
+        """Whether the link no longer learns input values."""
+        return self.until is not None and self.count >= self.until
+
+    def _affine(self, dtype):
+        """Return (scale, shift) such that x * scale + shift is normalized."""
+        if self._cached_affine is None or self._cached_affine[0] != dtype:
+            scale = (self._var + self.eps) ** -0.5
+            shift = -self._mean * scale
+            self._cached_affine = (
+                dtype, scale.astype(dtype), shift.astype(dtype))
+        return self._cached_affine[1:]
+
+    def serialize(self, serializer):
+        super(EmpiricalNormalization, self).serialize(serializer)
+        # Statistics may have been loaded
+        self._cached_affine = None
+
+    def _merge(self, count_x, mean_x, var_x):
+        self.count += count_x
+        rate = count_x / self.count
+        delta_mean = mean_x - self._mean
+        self._mean += rate * delta_mean
+        self._var += rate * (
+            var_x - self._var
+            + delta_mean * (mean_x - self._mean)
+        )
 
-        return self._cached_std_inverse
+        # clear cache
+        self._cached_affine = None
 
     def experience(self, x):
         """Learn input values without computing the output values of them"""
 
-        if self.until is not None and self.count >= self.until:
+        if self.frozen:
             return
 
         if isinstance(x, chainer.Variable):
@@ -70,48 +105,75 @@ class EmpiricalNormalization(chainer.Link):
             return
 
         xp = self.xp
+        mean_x = xp.mean(
+            x, axis=self.batch_axis, keepdims=True, dtype=np.float64)
+        var_x = xp.var(
+            x, axis=self.batch_axis, keepdims=True, dtype=np.float64)
+        self._merge(count_x, mean_x, var_x)
 
-        self.count += count_x
-        rate = x.dtype.type(count_x / self.count)
+    def merge(self, count, mean, var):
+        """Merge statistics of values learned elsewhere.
 
-        mean_x = xp.mean(x, axis=self.batch_axis, keepdims=True)
-        var_x = xp.var(x, axis=self.batch_axis, keepdims=True)
-        delta_mean = mean_x - self._mean
-        self._mean += rate * delta_mean
-        self._var += rate * (
-            var_x - self._var
-            + delta_mean * (mean_x - self._mean)
-        )
-
-        # clear cache
-        self._cached_std_inverse = None
+        This can be used to combine statistics of links in multiple
+        processes, e.g. `merge(other.count, other.mean, other.var)`. The
+        result is the same as if the link had learned those values itself.
 
-    def __call__(self, x, update=True):
+        Args:
+            count (int): Number of values.
+            mean (ndarray): Mean of values with the shape of a value.
+            var (ndarray): Variance of values with the shape of a value.
+        """
+        if self.frozen or count == 0:
+            return
+        xp = self.xp
+        mean = xp.expand_dims(
+            xp.asarray(mean, dtype=np.float64), self.batch_axis)
+        var = xp.expand_dims(
+            xp.asarray(var, dtype=np.float64), self.batch_axis)
+        assert mean.shape == self._mean.shape
+        assert var.shape == self._var.shape
+        self._merge(count, mean, var)
+
+    def __call__(self, x, update=True, out=None):
         """Normalize mean and variance of values based on emprical values.
 
         Args:
             x (ndarray or Variable): Input values
             update (bool): Flag to learn the input values
+            out (ndarray or None): If specified, normalized values of x
+                (ndarray) are written to it, which can be x itself, so that
+                no new array is allocated.
 
         Returns:
             ndarray or Variable: Normalized output values
         """
 
         xp = self.xp
-        mean = xp.broadcast_to(self._mean, x.shape)
-        std_inv = xp.broadcast_to(self._std_inverse, x.shape)
+        # e.g. float32 for float32 and uint8, and float64 for int64
+        scale, shift = self._affine(np.result_type(x.dtype, self.eps.dtype))
 
         if update:
             self.experience(x)
 
-        normalized = (x - mean) * std_inv
+        if isinstance(x, chainer.Variable):
+            assert out is None
+            normalized = (x * xp.broadcast_to(scale, x.shape)
+                          + xp.broadcast_to(shift, x.shape))
+            if self.clip_threshold is not None:
+                normalized = xp.clip(
+                    normalized, -self.clip_threshold, self.clip_threshold)
+            return normalized
+
+        normalized = xp.multiply(x, scale, out=out)
+        normalized += shift
         if self.clip_threshold is not None:
-            normalized = xp.clip(
-                normalized, -self.clip_threshold, self.clip_threshold)
+            xp.clip(normalized, -self.clip_threshold, self.clip_threshold,
+                    out=normalized)
         return normalized
 
     def inverse(self, y):
         xp = self.xp
-        mean = xp.broadcast_to(self._mean, y.shape)
-        std = xp.broadcast_to(xp.sqrt(self._var + self.eps), y.shape)
+        mean = xp.broadcast_to(self._mean.astype(y.dtype), y.shape)
+        std = xp.broadcast_to(
+            xp.sqrt(self._var + self.eps).astype(y.dtype), y.shape)
         return y * std + mean
@@ -14,6 +14,11 @@ def to_factorized_noisy(link, *args, **kwargs):
     """Add noisiness to components of given link
 
     Currently this function supports L.Linear (with and without bias)
+
+    Arguments other than link are passed to FactorizedNoisyLinear, e.g.
+    sigma_scale and noise_mode. With noise_mode='cached', call
+    resample_noise(link) to resample noise, e.g. once per update or per
+    episode.
     """
 
     def func_to_factorized_noisy(link):
@@ -25,6 +30,17 @@ def to_factorized_noisy(link, *args, **kwargs):
     _map_links(func_to_factorized_noisy, link)
 
 
+def resample_noise(link):
+    """Resample noise of all the FactorizedNoisyLinear links in given link
+
+    Args:
+        link (chainer.Link): Link that may contain FactorizedNoisyLinear.
+    """
+    for child in link.links():
+        if isinstance(child, FactorizedNoisyLinear):
+            child.resample_noise()
+
+
 def _map_links(func, link):
     if isinstance(link, chainer.Chain):
         children_names = link._children.copy()
@@ -9,20 +9,45 @@ from chainerrl.functions import muladd
 from chainerrl.initializers import VarianceScalingConstant
 
 
+# Building the noisy weight matrix is cheaper than computing the output with
+# factorized noise for batches at least this large
+_MIN_BATCH_SIZE_TO_BUILD_WEIGHT = 8
+
+
 class FactorizedNoisyLinear(chainer.Chain):
     """Linear layer in Factorized Noisy Network
 
+    How noise is sampled is specified by noise_mode:
+
+    - 'call': new noise is sampled for every call and shared by the samples
+      in a batch.
+    - 'sample': new noise is sampled for every sample in a batch.
+    - 'cached': noise is sampled only by resample_noise and reused by calls
+      in between, e.g. to resample it once per update or per episode.
+
+    For small batches, e.g. when selecting actions, the output is computed
+    as x W_mu^T + ((x * eps_x) W_sigma^T) * eps_y (plus biases) without
+    building the noisy weight matrix W_mu + W_sigma * outer(eps_y, eps_x),
+    which is cheaper. For large batches, the matrix is built as it is cheaper
+    then, and outer(eps_y, eps_x) is cached in the 'cached' mode.
+
     Args:
         mu_link (L.Linear): Linear link that computes mean of output.
         sigma_scale (float): The hyperparameter sigma_0 in the original paper.
             Scaling factor of the initial weights of noise-scaling parameters.
+        noise_mode (str): 'call', 'sample' or 'cached'.
     """
 
-    def __init__(self, mu_link, sigma_scale=0.4):
+    def __init__(self, mu_link, sigma_scale=0.4, noise_mode='call'):
         super(FactorizedNoisyLinear, self).__init__()
+        assert noise_mode in ('call', 'sample', 'cached')
         self._kernel = None
         self.out_size = mu_link.out_size
         self.nobias = not ('/b' in [name for name, _ in mu_link.namedparams()])
+        self.noise_mode = noise_mode
+        self._eps_x = None
+        self._eps_y = None
+        self._eps_outer = None
 
         W_data = mu_link.W.array
         in_size = None if W_data is None else W_data.shape[1]
@@ -59,6 +84,26 @@ class FactorizedNoisyLinear(chainer.Chain):
             self._noise_function(r)
             return r
 
+    def _sample_noise(self, batch_size=None):
+        out_size, in_size = self.sigma.W.shape
+        shape = (in_size + out_size,)
+        if batch_size is not None:
+            shape = (batch_size,) + shape
+        eps = self._eps(shape, self.sigma.W.dtype)
+        return eps[..., :in_size], eps[..., in_size:]
+
+    def resample_noise(self):
+        """Sample new noise used by calls in the 'cached' mode.
+
+        If the input size is not determined yet, noise is sampled by the
+        next call.
+        """
+        if self.sigma.W.array is None:
+            self._eps_x = self._eps_y = None
+        else:
+            self._eps_x, self._eps_y = self._sample_noise()
+        self._eps_outer = None
+
     def __call__(self, x):
         if self.mu.W.array is None:
             self.mu.W.initialize((self.out_size, numpy.prod(x.shape[1:])))
@@ -66,15 +111,44 @@ class FactorizedNoisyLinear(chainer.Chain):
             self.sigma.W.initialize((self.out_size, numpy.prod(x.shape[1:])))
 
         # use info of sigma.W to avoid strange error messages
-        dtype = self.sigma.W.dtype
         out_size, in_size = self.sigma.W.shape
 
-        eps = self._eps(in_size + out_size, dtype)
-        eps_x = eps[:in_size]
-        eps_y = eps[in_size:]
-        W = muladd(self.sigma.W, self.xp.outer(eps_y, eps_x), self.mu.W)
+        batch_size = len(x)
+        if x.ndim > 2:
+            x = F.reshape(x, (batch_size, in_size))
+        if self.noise_mode == 'sample':
+            eps_x, eps_y = self._sample_noise(batch_size)
+            return self._factorized_linear(x, eps_x, eps_y)
+
+        if self.noise_mode == 'call':
+            eps_x, eps_y = self._sample_noise()
+        else:
+            if self._eps_x is None or \
+                    cuda.get_array_module(self._eps_x) is not self.xp:
+                # Noise has not been sampled on the current device
+                self.resample_noise()
+            eps_x, eps_y = self._eps_x, self._eps_y
+        if batch_size < _MIN_BATCH_SIZE_TO_BUILD_WEIGHT:
+            return self._factorized_linear(
+                x,
+                self.xp.broadcast_to(eps_x, (batch_size, in_size)),
+                self.xp.broadcast_to(eps_y, (batch_size, out_size)))
+
+        if self.noise_mode == 'cached':
+            if self._eps_outer is None:
+                self._eps_outer = self.xp.outer(eps_y, eps_x)
+            eps_outer = self._eps_outer
+        else:
+            eps_outer = self.xp.outer(eps_y, eps_x)
+        W = muladd(self.sigma.W, eps_outer, self.mu.W)
         if self.nobias:
             return F.linear(x, W)
         else:
             b = muladd(self.sigma.b, eps_y, self.mu.b)
             return F.linear(x, W, b)
+
+    def _factorized_linear(self, x, eps_x, eps_y):
+        # (x * eps_x) W_sigma^T * eps_y + b_sigma * eps_y is the same as the
+        # noise term of x W^T + b with W = W_mu + W_sigma * outer(eps_y, eps_x)
+        # and b = b_mu + b_sigma * eps_y
+        return self.mu(x) + self.sigma(x * eps_x) * eps_y
@@ -4,5 +4,8 @@ from chainerrl.misc.draw_computational_graph import collect_variables  # NOQA
 from chainerrl.misc.draw_computational_graph import draw_computational_graph  # NOQA
 from chainerrl.misc.draw_computational_graph import is_graphviz_available  # NOQA
 from chainerrl.misc import env_modifiers  # NOQA
+from chainerrl.misc.inference_export import export_for_inference  # NOQA
+from chainerrl.misc.inference_export import load_for_inference  # NOQA
 from chainerrl.misc.is_return_code_zero import is_return_code_zero  # NOQA
+from chainerrl.misc.phase_timer import PhaseTimer  # NOQA
 from chainerrl.misc.random_seed import set_random_seed  # NOQA
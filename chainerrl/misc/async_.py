@@ -7,6 +7,7 @@ from future import standard_library
 standard_library.install_aliases()  # NOQA
 
 import multiprocessing as mp
+import queue
 import warnings
 
 import chainer
@@ -152,6 +153,116 @@ def run_async(n_process, run_func):
             )
 
 
+class SharedParams(object):
+    """Parameters of a link published by a learner and pulled by actors.
+
+    Unlike share_params_as_shared_arrays, the link itself keeps its own
+    arrays, which can be on a GPU. Parameters are copied to and from float32
+    arrays on shared memory, and publishing and pulling are serialized by a
+    lock so that actors never see parameters that are partially updated.
+
+    Args:
+        link (chainer.Link): Link whose parameters are all initialized.
+    """
+
+    def __init__(self, link):
+        assert isinstance(link, chainer.Link)
+        self.lock = mp.Lock()
+        self.version = mp.Value('l', 0, lock=False)
+        self.arrays = {}
+        for name, param in link.namedparams():
+            assert param.array is not None, \
+                'Parameter {} must be initialized'.format(name)
+            self.arrays[name] = mp.RawArray('f', param.size)
+        self.publish(link)
+
+    def _view(self, name, param):
+        return np.frombuffer(
+            self.arrays[name], dtype=np.float32).reshape(param.shape)
+
+    def publish(self, link):
+        """Copy parameters of a link to shared memory.
+
+        Args:
+            link (chainer.Link): Link to copy parameters from.
+        """
+        with self.lock:
+            for name, param in link.namedparams():
+                np.copyto(self._view(name, param),
+                          chainer.cuda.to_cpu(param.array))
+            self.version.value += 1
+
+    def pull(self, link):
+        """Copy parameters on shared memory to a link on CPU.
+
+        Args:
+            link (chainer.Link): Link to copy parameters to.
+        Returns:
+            int: Version of the parameters, which is incremented every time
+                they are published.
+        """
+        with self.lock:
+            for name, param in link.namedparams():
+                np.copyto(param.array, self._view(name, param))
+            return self.version.value
+
+
+def put_until_stopped(item_queue, item, stop):
+    """Put an item to a queue unless stop.value becomes True while waiting.
+
+    Args:
+        item_queue (multiprocessing.Queue): Queue.
+        item (object): Item to put.
+        stop (multiprocessing.Value): Flag to stop waiting.
+    """
+    while not stop.value:
+        try:
+            item_queue.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def check_processes(processes):
+    """Raise RuntimeError if any of processes exited abnormally.
+
+    Args:
+        processes (list of multiprocessing.Process): Processes to check.
+    """
+    for process_idx, p in enumerate(processes):
+        if p.exitcode is not None and p.exitcode != 0:
+            raise RuntimeError(
+                'Process #{} (pid={}) exited with status {}'.format(
+                    process_idx, p.pid, p.exitcode))
+
+
+def stop_processes(processes, item_queue, stop):
+    """Stop processes that put items to a queue and wait for them.
+
+    stop.value is set to True and items are discarded until all the
+    processes exit so that no process blocks on the queue.
+
+    Args:
+        processes (list of multiprocessing.Process): Processes to stop.
+        item_queue (multiprocessing.Queue): Queue the processes put items to.
+        stop (multiprocessing.Value): Flag the processes check.
+    """
+    stop.value = True
+    while any(p.is_alive() for p in processes):
+        try:
+            item_queue.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    for process_idx, p in enumerate(processes):
+        p.join()
+        if p.exitcode != 0:
+            warnings.warn(
+                'Process #{} (pid={}) exited with status {}'.format(
+                    process_idx, p.pid, p.exitcode),
+                category=AbnormalExitWarning,
+            )
+
+
 def as_shared_objects(obj):
     if isinstance(obj, tuple):
         return tuple(as_shared_objects(x) for x in obj)
@@ -1,9 +1,57 @@
 import chainer
+import numpy as np
+
+
+def _stack_features(states, phi):
+    """Apply phi and write features into a single numpy.ndarray.
+
+    Each feature is written into its row of the output array as soon as it is
+    computed, so LazyFrames are concatenated directly into the batch and the
+    features do not need to be alive at the same time.
+
+    LazyFrames are detected by their materialize method so that this module
+    does not depend on chainerrl.wrappers, which imports gym and cv2.
+
+    Returns:
+        tuple: (batch, []) if all the features are numpy.ndarray or
+            LazyFrames of the same shape and dtype, otherwise (None, list of
+            features).
+    """
+    batch = None
+    features = []
+    for i, state in enumerate(states):
+        feature = phi(state)
+        if i == 0:
+            feature_type = type(feature)
+            is_lazy = feature_type is not np.ndarray and \
+                hasattr(feature, 'materialize')
+            if feature_type is np.ndarray or is_lazy:
+                shape = feature.shape
+                dtype = feature.dtype
+                batch = np.empty((len(states),) + shape, dtype=dtype)
+        if batch is not None:
+            if (type(feature) is feature_type and feature.shape == shape
+                    and feature.dtype == dtype):
+                if is_lazy:
+                    feature.materialize(out=batch[i])
+                else:
+                    batch[i] = feature
+                continue
+            # Heterogeneous features: fall back to a list of features
+            features = list(batch[:i])
+            batch = None
+        features.append(feature)
+    return batch, features
 
 
 def batch_states(states, xp, phi):
     """The default method for making batch of observations.
 
+    If all the features computed by phi are numpy.ndarray or LazyFrames of the
+    same shape and dtype, which is the most common case, they are written into
+    a single output array directly. Otherwise they are batched by
+    chainer.dataset.concat_examples.
+
     Args:
         states (list): list of observations from an environment.
         xp (module): numpy or cupy
@@ -19,5 +67,9 @@ def batch_states(states, xp, phi):
         # CPU
         device = -1
 
-    features = [phi(s) for s in states]
+    batch, features = _stack_features(states, phi)
+    if batch is not None:
+        if device >= 0:
+            batch = chainer.cuda.to_gpu(batch, device=device)
+        return batch
     return chainer.dataset.concat_examples(features, device=device)
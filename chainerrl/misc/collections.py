@@ -8,6 +8,8 @@ standard_library.install_aliases()  # NOQA
 
 import itertools
 
+import numpy as np
+
 from chainerrl.misc.random import sample_n_k
 
 
@@ -106,5 +108,31 @@ class RandomAccessQueue(object):
 
         return self._queue_front.pop()
 
-    def sample(self, k):
-        return [self[i] for i in sample_n_k(len(self), k)]
+    def sample(self, k, replace=False, rng=None):
+        """Sample k items uniformly.
+
+        Args:
+            k (int): Number of items to sample.
+            replace (bool): If set to True, items are sampled with
+                replacement.
+            rng (numpy.random.Generator, numpy.random.RandomState or None):
+                Random number generator passed to sample_n_k.
+        Returns:
+            list: Sampled items.
+        """
+        indices = sample_n_k(len(self), k, replace=replace, rng=rng)
+        return self.gather(indices)
+
+    def gather(self, indices):
+        """Return items at nonnegative indices.
+
+        Unlike calling __getitem__ for each index, indices are converted to
+        a list at once and mapped to positions in the backing lists inline.
+        """
+        front = self._queue_front
+        back = self._queue_back
+        nf = len(front)
+        # Items of the front list are stored in reverse order, and negative
+        # or too large indices raise IndexError from either list
+        return [front[nf - 1 - i] if i < nf else back[i - nf]
+                for i in np.asarray(indices).tolist()]
@@ -0,0 +1,136 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import json
+import os
+
+import chainer
+from chainer import cuda
+from chainer import serializers
+import numpy as np
+
+from chainerrl.misc.makedirs import makedirs
+
+
+_PARAMS_FILENAME = 'params.bin'
+_MANIFEST_FILENAME = 'manifest.json'
+# Offsets of arrays are aligned to cache lines
+_ALIGNMENT = 64
+
+
+def export_for_inference(link, dirname):
+    """Export parameters and persistent values of a link for inference.
+
+    All the arrays are written to a single flat file params.bin, with a
+    small manifest.json that records their keys, dtypes, shapes and offsets
+    in it. Use load_for_inference to load them.
+
+    Args:
+        link (chainer.Link): Link to export, e.g. agent.model.
+        dirname (str): Directory to export to.
+    """
+    serializer = serializers.DictionarySerializer()
+    serializer.save(link)
+    makedirs(dirname, exist_ok=True)
+    entries = []
+    offset = 0
+    with open(os.path.join(dirname, _PARAMS_FILENAME), 'wb') as f:
+        for key, value in sorted(serializer.target.items()):
+            value = np.asarray(cuda.to_cpu(value))
+            if value.dtype == object:
+                # Persistent values that are None are left as they are
+                continue
+            padding = -offset % _ALIGNMENT
+            f.write(b'\0' * padding)
+            offset += padding
+            f.write(value.tobytes())
+            entries.append(dict(key=key, dtype=value.dtype.str,
+                                shape=list(value.shape), offset=offset))
+            offset += value.nbytes
+    with open(os.path.join(dirname, _MANIFEST_FILENAME), 'w') as f:
+        json.dump(dict(version=1, arrays=entries), f, indent=1)
+
+
+class _ArrayDeserializer(chainer.serializer.Deserializer):
+
+    def __init__(self, arrays, path=''):
+        self.arrays = arrays
+        self.path = path
+
+    def __getitem__(self, key):
+        return _ArrayDeserializer(
+            self.arrays, self.path + key.strip('/') + '/')
+
+    def __call__(self, key, value):
+        key = self.path + key.lstrip('/')
+        if key not in self.arrays:
+            return value
+        array = self.arrays[key]
+        if value is None or isinstance(value, np.ndarray):
+            # Bind the array without a copy
+            return array
+        if isinstance(value, cuda.ndarray):
+            value.set(array)
+            return value
+        return type(value)(array)
+
+
+def load_for_inference(link, dirname, mmap_mode='r'):
+    """Load parameters of a link for inference.
+
+    If dirname has been made by export_for_inference, params.bin is
+    memory-mapped and parameters of the link are bound to views of it
+    without copies, so that processes that load the same file share
+    physical memory. Otherwise, dirname is regarded as a directory saved by
+    Agent.save and only its model.npz is loaded, without constructing
+    optimizers or target models.
+
+    Args:
+        link (chainer.Link): Link to load parameters into, which must have
+            the same structure as the exported one and be on CPU.
+        dirname (str): Directory to load from.
+        mmap_mode (str or None): Mode of np.memmap. With the default 'r',
+            parameters are read-only. Use 'c' to allow in-place updates that
+            are not written back to the file, or None to read the file into
+            memory.
+    Returns:
+        chainer.Link: The link.
+    """
+    manifest_filename = os.path.join(dirname, _MANIFEST_FILENAME)
+    if not os.path.exists(manifest_filename):
+        serializers.load_npz(os.path.join(dirname, 'model.npz'), link)
+        return link
+
+    with open(manifest_filename) as f:
+        manifest = json.load(f)
+    params_filename = os.path.join(dirname, _PARAMS_FILENAME)
+    if mmap_mode is None:
+        buf = np.fromfile(params_filename, dtype=np.uint8)
+    elif os.path.getsize(params_filename) == 0:
+        buf = np.zeros(0, dtype=np.uint8)
+    else:
+        buf = np.memmap(params_filename, dtype=np.uint8, mode=mmap_mode)
+    arrays = {}
+    for entry in manifest['arrays']:
+        dtype = np.dtype(entry['dtype'])
+        shape = tuple(entry['shape'])
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        offset = entry['offset']
+        # Views of np.memmap are np.ndarray so that they work as usual
+        arrays[entry['key']] = np.ndarray(
+            shape, dtype=dtype, buffer=buf[offset:offset + nbytes])
+
+    for name, param in link.namedparams():
+        key = name.lstrip('/')
+        assert key in arrays, '{} is not exported'.format(key)
+        assert param.array is None or param.array.shape == \
+            arrays[key].shape, 'Shape mismatch of {}'.format(key)
+        param.array = arrays[key]
+    # Persistent values, which are bound by Link.serialize
+    link.serialize(_ArrayDeserializer(arrays))
+    return link
@@ -0,0 +1,238 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+
+import numpy as np
+
+from chainerrl import agent
+
+
+def _shared_array(shape, dtype):
+    dtype = np.dtype(dtype)
+    raw = mp.RawArray('B', int(np.prod(shape)) * dtype.itemsize)
+    return raw, np.frombuffer(raw, dtype=dtype).reshape(shape)
+
+
+class InferenceServer(object):
+    """Server that computes actions of an agent for many actor processes.
+
+    Actor processes send observations via InferenceClient, a proxy of the
+    agent that supports the acting methods of BatchAgent. The server, which
+    runs in a thread of the process that has the agent, batches requests
+    that arrive within max_wait seconds up to max_batch_size observations
+    and computes their actions by a single call of agent.batch_act, so that
+    dozens of actors share one copy of the model without each computing a
+    forward pass of batch size 1.
+
+    Observations and actions are exchanged via arrays in shared memory and
+    only indices of clients are sent via a queue. Clients must be made by
+    make_client before actor processes are forked. Recurrent models are not
+    supported since states are not kept for each client.
+
+    Args:
+        agent (Agent): Agent whose batch_act computes actions, e.g. greedy
+            actions of DQN.
+        observation_space (gym.spaces.Box): Observation space of envs.
+        action_space (gym.Space): Action space of envs.
+        n_clients (int): Number of clients.
+        max_client_batch_size (int): Maximum number of observations of a
+            request, e.g. the number of envs of a VectorEnv of each actor.
+        max_batch_size (int or None): Maximum number of observations of a
+            batch, which can be exceeded by the last request. If None, the
+            total of max_client_batch_size of all the clients is used.
+        max_wait (float): Maximum seconds to wait for requests after the
+            first one of a batch.
+    """
+
+    def __init__(self, agent, observation_space, action_space, n_clients,
+                 max_client_batch_size=1, max_batch_size=None,
+                 max_wait=1e-3):
+        assert n_clients > 0
+        assert max_client_batch_size > 0
+        self.agent = agent
+        self.n_clients = n_clients
+        self.max_client_batch_size = max_client_batch_size
+        if max_batch_size is None:
+            max_batch_size = n_clients * max_client_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        obs_shape = (max_client_batch_size,) + observation_space.shape
+        action_shape = (max_client_batch_size,) + action_space.shape
+        action_dtype = action_space.dtype
+        if action_dtype is None:
+            # Discrete spaces of old gym have no dtype
+            action_dtype = np.int64
+        self._raw = []
+        self.observations = []
+        self.actions = []
+        for _ in range(n_clients):
+            raw_obs, obs = _shared_array(obs_shape, observation_space.dtype)
+            raw_action, action = _shared_array(action_shape, action_dtype)
+            self._raw.extend([raw_obs, raw_action])
+            self.observations.append(obs)
+            self.actions.append(action)
+        self.request_queue = mp.Queue()
+        self.ready = [mp.Semaphore(0) for _ in range(n_clients)]
+        self.stopped = mp.Value('b', False)
+        self.thread = None
+
+        # Stats
+        self.n_batches = 0
+        self.n_requests = 0
+        self.n_observations = 0
+
+    def make_client(self, client_idx, explorer=None):
+        """Make a client that sends requests to this server.
+
+        Args:
+            client_idx (int): Index of the client, which must be unique
+                among clients used at the same time.
+            explorer (Explorer or None): If not None, the client selects
+                actions by it given actions computed by the server as greedy
+                actions.
+        Returns:
+            InferenceClient: Client.
+        """
+        assert 0 <= client_idx < self.n_clients
+        return InferenceClient(self, client_idx, explorer=explorer)
+
+    def start(self):
+        """Start serving in a daemon thread."""
+        assert self.thread is None
+        self.stopped.value = False
+        self.thread = threading.Thread(target=self._serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop serving and wait for the thread to finish."""
+        self.stopped.value = True
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _receive_requests(self):
+        try:
+            requests = [self.request_queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        n = requests[0][1]
+        deadline = time.time() + self.max_wait
+        while n < self.max_batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                requests.append(self.request_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+            n += requests[-1][1]
+        return requests
+
+    def _serve(self):
+        try:
+            while not self.stopped.value:
+                requests = self._receive_requests()
+                if requests:
+                    self._respond(requests)
+        finally:
+            self.stopped.value = True
+
+    def _respond(self, requests):
+        batch_obs = np.concatenate(
+            [self.observations[idx][:n] for idx, n in requests])
+        batch_action = self.agent.batch_act(batch_obs)
+        i = 0
+        for idx, n in requests:
+            self.actions[idx][:n] = batch_action[i:i + n]
+            i += n
+            self.ready[idx].release()
+        self.n_batches += 1
+        self.n_requests += len(requests)
+        self.n_observations += len(batch_obs)
+
+    def get_statistics(self):
+        return [
+            ('n_batches', self.n_batches),
+            ('average_batch_size',
+             self.n_observations / max(self.n_batches, 1)),
+            ('average_requests_per_batch',
+             self.n_requests / max(self.n_batches, 1)),
+        ]
+
+
+class InferenceClient(agent.BatchAgent):
+    """Proxy of an agent that gets actions from an InferenceServer.
+
+    Only the acting methods are supported; the methods for training raise
+    NotImplementedError. Use InferenceServer.make_client to make one.
+
+    Args:
+        server (InferenceServer): Server to send requests to.
+        client_idx (int): Index of the client.
+        explorer (Explorer or None): If not None, actions are selected by it
+            given actions computed by the server as greedy actions.
+    """
+
+    def __init__(self, server, client_idx, explorer=None):
+        self.server = server
+        self.client_idx = client_idx
+        self.explorer = explorer
+        self.t = 0
+
+    def batch_act(self, batch_obs):
+        server = self.server
+        n = len(batch_obs)
+        assert n <= server.max_client_batch_size
+        server.observations[self.client_idx][:n] = batch_obs
+        server.request_queue.put((self.client_idx, n))
+        while not server.ready[self.client_idx].acquire(timeout=1):
+            if server.stopped.value:
+                raise RuntimeError('The inference server is stopped')
+        batch_action = server.actions[self.client_idx][:n].copy()
+        if self.explorer is not None:
+            batch_action = self.explorer.batch_select_action(
+                self.t, lambda: batch_action)
+        self.t += 1
+        return batch_action
+
+    def act(self, obs):
+        return self.batch_act([obs])[0]
+
+    def batch_observe(self, batch_obs, batch_reward, batch_done, batch_reset):
+        pass
+
+    def stop_episode(self):
+        pass
+
+    def act_and_train(self, obs, reward):
+        raise NotImplementedError('InferenceClient does not support training')
+
+    def stop_episode_and_train(self, state, reward, done=False):
+        raise NotImplementedError('InferenceClient does not support training')
+
+    def batch_act_and_train(self, batch_obs):
+        raise NotImplementedError('InferenceClient does not support training')
+
+    def batch_observe_and_train(self, batch_obs, batch_reward, batch_done,
+                                batch_reset):
+        raise NotImplementedError('InferenceClient does not support training')
+
+    def save(self, dirname):
+        raise NotImplementedError('Save the agent of the server instead')
+
+    def load(self, dirname):
+        raise NotImplementedError('Load the agent of the server instead')
+
+    def get_statistics(self):
+        return []
@@ -0,0 +1,122 @@
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import collections
+import time
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+class _Measurement(object):
+
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = _clock()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.add(self.name, _clock() - self.start)
+
+
+class _NullMeasurement(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+_null_measurement = _NullMeasurement()
+
+
+class PhaseTimer(object):
+    """Accumulate wall-clock time spent in named phases of training.
+
+    Phases are measured by a with statement:
+
+    .. code-block:: python
+
+        with phase_timer.measure('env_step'):
+            obs, r, done, info = env.step(action)
+
+    While the timer is disabled, measure returns a shared no-op context
+    manager so that instrumented code costs almost nothing.
+
+    Args:
+        enabled (bool): Measure phases if set True.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.total_time = collections.OrderedDict()
+        self.count = collections.OrderedDict()
+
+    def measure(self, name):
+        """Return a context manager that measures a phase.
+
+        Args:
+            name (str): Name of the phase.
+        Returns:
+            Context manager.
+        """
+        if self.enabled:
+            return _Measurement(self, name)
+        else:
+            return _null_measurement
+
+    def add(self, name, elapsed):
+        """Add elapsed time of a phase.
+
+        Args:
+            name (str): Name of the phase.
+            elapsed (float): Elapsed time in seconds.
+        """
+        if name in self.total_time:
+            self.total_time[name] += elapsed
+            self.count[name] += 1
+        else:
+            self.total_time[name] = elapsed
+            self.count[name] = 1
+
+    def reset(self):
+        """Discard all the measured time."""
+        self.total_time.clear()
+        self.count.clear()
+
+    def get_statistics(self):
+        """Return the mean time of each phase per call in milliseconds.
+
+        Returns:
+            list of (str, float): Pairs of '<phase>_ms' and mean time, in the
+                order phases were measured first since the last reset.
+        """
+        return [('{}_ms'.format(name), 1e3 * total / self.count[name])
+                for name, total in self.total_time.items()]
+
+
+def get_phase_timer(agent):
+    """Return the PhaseTimer of an agent.
+
+    Args:
+        agent: Agent.
+    Returns:
+        PhaseTimer: agent.phase_timer if it is a PhaseTimer, otherwise a
+            disabled PhaseTimer.
+    """
+    phase_timer = getattr(agent, 'phase_timer', None)
+    if isinstance(phase_timer, PhaseTimer):
+        return phase_timer
+    else:
+        return PhaseTimer(enabled=False)
@@ -298,6 +298,103 @@ class MinTreeQueue(TreeQueue):
             return self.root[2]
 
 
+class PriorityTree(object):
+    """Sum and min trees of priorities stored in arrays.
+
+    Unlike SumTreeQueue and MinTreeQueue, whose nodes are Python lists,
+    leaves are indexed by slots of a fixed size and every operation takes
+    arrays of slots, so that updates and sampling are vectorized by NumPy.
+    Empty slots have a sum of zero and a min of infinity.
+
+    Args:
+        size (int): Number of slots, which is rounded up to a power of two.
+    """
+
+    def __init__(self, size):
+        assert size > 0
+        self.size = 1
+        while self.size < size:
+            self.size *= 2
+        # Node i has children 2i and 2i+1, and leaves start at size
+        self.sums = np.zeros(2 * self.size, dtype=np.float64)
+        self.mins = np.full(2 * self.size, np.inf, dtype=np.float64)
+
+    def sum(self):
+        return self.sums[1]
+
+    def min(self):
+        return self.mins[1]
+
+    def get(self, slots):
+        """Return sums of slots."""
+        return self.sums[self.size + np.asarray(slots, dtype=np.intp)]
+
+    def set(self, slots, priorities):
+        """Set priorities of slots."""
+        leaves = self.size + np.asarray(slots, dtype=np.intp)
+        self._update(self.sums, leaves, priorities, np.add)
+        self._update(self.mins, leaves, priorities, np.minimum)
+
+    def remove_from_sums(self, slots):
+        """Exclude slots from sampling, keeping their mins."""
+        leaves = self.size + np.asarray(slots, dtype=np.intp)
+        self._update(self.sums, leaves, 0.0, np.add)
+
+    def clear(self, slots):
+        """Make slots empty."""
+        leaves = self.size + np.asarray(slots, dtype=np.intp)
+        self._update(self.sums, leaves, 0.0, np.add)
+        self._update(self.mins, leaves, np.inf, np.minimum)
+
+    def _update(self, tree, nodes, values, op):
+        if len(nodes) == 0:
+            return
+        tree[nodes] = values
+        nodes = np.unique(nodes // 2)
+        while nodes[0] > 0:
+            tree[nodes] = op(tree[2 * nodes], tree[2 * nodes + 1])
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values):
+        """Find slots whose prefix sums of priorities contain values."""
+        nodes = np.ones(len(values), dtype=np.intp)
+        values = np.array(values, dtype=np.float64)
+        # Descend from the root to the leaves
+        for _ in range(self.size.bit_length() - 1):
+            left = self.sums[2 * nodes]
+            # Empty subtrees are never chosen even with rounding errors
+            right = (values >= left) & (self.sums[2 * nodes + 1] > 0)
+            values -= left * right
+            nodes = 2 * nodes + right
+        return nodes - self.size
+
+    def prioritized_sample(self, n):
+        """Sample n distinct slots in proportion to priorities.
+
+        Sampled slots are removed from sums. Slots are drawn in a batch and
+        only the ones that collide with already sampled slots are drawn
+        again.
+
+        Returns:
+            ndarray: Sampled slots.
+            ndarray: Their priorities.
+        """
+        slots = []
+        priorities = []
+        while n > 0:
+            assert self.sum() > 0
+            drawn = np.unique(self.find(
+                np.random.uniform(0, self.sum(), size=n)))
+            slots.append(drawn)
+            priorities.append(self.get(drawn))
+            self.remove_from_sums(drawn)
+            n -= len(drawn)
+        if not slots:
+            return (np.zeros(0, dtype=np.intp),
+                    np.zeros(0, dtype=np.float64))
+        return np.concatenate(slots), np.concatenate(priorities)
+
+
 # Deprecated
 class SumTree (object):
     """Fast weighted sampling.
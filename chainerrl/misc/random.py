@@ -9,28 +9,51 @@ standard_library.install_aliases()  # NOQA
 import numpy as np
 
 
-def sample_n_k(n, k):
-    """Sample k distinct elements uniformly from range(n)"""
+def _randint(rng, n, size):
+    # np.random.Generator, which does not exist in numpy < 1.17
+    if hasattr(rng, 'integers'):
+        return rng.integers(n, size=size)
+    return rng.randint(n, size=size)
 
-    if not 0 <= k <= n:
+
+def sample_n_k(n, k, replace=False, rng=None):
+    """Sample k elements uniformly from range(n)
+
+    Args:
+        n (int): Size of the population.
+        k (int): Number of elements to sample.
+        replace (bool): If set to True, elements are sampled with
+            replacement. Otherwise they are distinct.
+        rng (numpy.random.Generator, numpy.random.RandomState or None):
+            Random number generator. If None, the global one of np.random is
+            used.
+    Returns:
+        ndarray: Sampled elements in random order.
+    """
+
+    if rng is None:
+        rng = np.random
+    if k < 0 or (not replace and k > n) or (k > 0 and n <= 0):
         raise ValueError("Sample larger than population or is negative")
     if k == 0:
         return np.empty((0,), dtype=np.int64)
-    elif 3 * k >= n:
-        return np.random.choice(n, k, replace=False)
+    elif replace:
+        return _randint(rng, n, k).astype(np.int64, copy=False)
+    elif 10 * k >= n:
+        # A permutation of range(n) is cheap enough
+        return rng.choice(n, k, replace=False).astype(np.int64, copy=False)
     else:
-        result = np.random.choice(n, 2 * k)
-        selected = set()
-        selected_add = selected.add
-        j = k
-        for i in range(k):
-            x = result[i]
-            while x in selected:
-                x = result[i] = result[j]
-                j += 1
-                if j == 2 * k:
-                    # This is slow, but it rarely happens.
-                    result[k:] = np.random.choice(n, k)
-                    j = k
-            selected_add(x)
-        return result[:k]
+        # Sample with replacement, drop duplicates keeping the first
+        # occurrences in order, which is the same as rejecting them one by
+        # one, and sample again only if too many collided. Extra elements
+        # for the expected number of collisions, about k^2/2n, are sampled
+        # so that it rarely happens.
+        n_extra = 2 * k * k // n + 4
+        result = _randint(rng, n, k + n_extra)
+        while True:
+            _, first = np.unique(result, return_index=True)
+            if len(first) >= k:
+                return result[np.sort(first)[:k]].astype(
+                    np.int64, copy=False)
+            result = np.concatenate([
+                result[np.sort(first)], _randint(rng, n, k + n_extra)])
@@ -0,0 +1,135 @@
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import itertools
+
+import chainer
+import numpy as np
+
+from chainerrl.misc.batch_states import batch_states as default_batch_states
+
+
+def make_rollout_arrays(episodes, xp, phi,
+                        batch_states=default_batch_states):
+    """Make a vectorized rollout store from a list of episodes.
+
+    Each episode is a list of transitions, each of which is a dict that has
+    'state', 'action', 'reward', 'next_state' and 'nonterminal' as keys.
+    Transitions are flattened in the order of episodes so that each episode
+    occupies a contiguous range of indices.
+
+    Args:
+        episodes (list): List of episodes.
+        xp (module): numpy or cupy. States and actions are stored as arrays
+            of this module.
+        phi (callable): Feature extractor applied to observations.
+        batch_states (callable): Method to make a batch of observations.
+
+    Returns:
+        dict: Arrays of the rollout, whose keys are 'state', 'next_state',
+            'action', 'reward', 'nonterminal' and 'episode_lengths'. Rewards,
+            nonterminals and episode lengths are always numpy.ndarray.
+    """
+    transitions = list(itertools.chain.from_iterable(episodes))
+    return {
+        'state': batch_states(
+            [b['state'] for b in transitions], xp, phi),
+        'next_state': batch_states(
+            [b['next_state'] for b in transitions], xp, phi),
+        'action': xp.asarray([b['action'] for b in transitions]),
+        'reward': np.asarray(
+            [b['reward'] for b in transitions], dtype=np.float32),
+        'nonterminal': np.asarray(
+            [b['nonterminal'] for b in transitions], dtype=np.float32),
+        'episode_lengths': np.asarray(
+            [len(episode) for episode in episodes], dtype=np.int64),
+    }
+
+
+def discounted_cumsum(x, discount):
+    """Compute discounted cumulative sums of a 1-D array from its end.
+
+    The i-th output is sum_{j>=i} discount^(j-i) x[j].
+
+    Args:
+        x (numpy.ndarray): 1-D array.
+        discount (float): Discount factor.
+
+    Returns:
+        numpy.ndarray: Discounted cumulative sums with the same shape as x.
+    """
+    # scipy.signal is imported here because it takes long to import
+    import scipy.signal
+    return scipy.signal.lfilter([1], [1, -discount], x[::-1])[::-1]
+
+
+def compute_gae(rewards, nonterminals, vs_pred, next_vs_pred,
+                episode_lengths, gamma, lambd):
+    """Compute advantages and value targets by GAE.
+
+    All the arrays except episode_lengths must be 1-D arrays of the same
+    length, where each episode occupies a contiguous range of indices.
+
+    See https://arxiv.org/abs/1506.02438 for GAE.
+
+    Args:
+        rewards (numpy.ndarray): Rewards.
+        nonterminals (numpy.ndarray): 0 for terminal transitions, otherwise 1.
+        vs_pred (numpy.ndarray): Value predictions of states.
+        next_vs_pred (numpy.ndarray): Value predictions of next states.
+        episode_lengths (Sequence of int): Lengths of episodes.
+        gamma (float): Discount factor [0, 1]
+        lambd (float): Lambda-return factor [0, 1]
+
+    Returns:
+        tuple of two numpy.ndarray: Advantages and value targets.
+    """
+    vs_pred = np.asarray(vs_pred, dtype=np.float64)
+    td_errs = (
+        rewards
+        + gamma * nonterminals * np.asarray(next_vs_pred, dtype=np.float64)
+        - vs_pred
+    )
+    advs = np.empty_like(td_errs)
+    start = 0
+    for length in episode_lengths:
+        end = start + length
+        advs[start:end] = discounted_cumsum(td_errs[start:end], gamma * lambd)
+        start = end
+    assert start == len(td_errs)
+    vs_teacher = advs + vs_pred
+    return advs.astype(np.float32), vs_teacher.astype(np.float32)
+
+
+def take(x, indices):
+    """Take elements of a batch, which may be a tuple of arrays, by indices."""
+    if isinstance(x, tuple):
+        return tuple(take(e, indices) for e in x)
+    else:
+        xp = chainer.cuda.get_array_module(x)
+        return x[xp.asarray(indices)]
+
+
+def iterate_minibatch_indices(size, minibatch_size, epochs):
+    """Yield shuffled index arrays of minibatches for given epochs.
+
+    Every epoch visits each index exactly once. The last minibatch of an
+    epoch can be smaller than minibatch_size.
+
+    Args:
+        size (int): Number of data points.
+        minibatch_size (int): Minibatch size.
+        epochs (int): Number of epochs.
+
+    Yields:
+        numpy.ndarray: Indices of a minibatch.
+    """
+    for _ in range(epochs):
+        perm = np.random.permutation(size)
+        for start in range(0, size, minibatch_size):
+            yield perm[start:start + minibatch_size]
@@ -1,2 +1,6 @@
-from chainerrl.optimizers.nonbias_weight_decay import NonbiasWeightDecay  # noqa
-from chainerrl.optimizers.rmsprop_async import RMSpropAsync  # noqa
+from chainerrl.lazy_import import install_lazy_attributes
+
+install_lazy_attributes(__name__, attributes={
+    'NonbiasWeightDecay': 'chainerrl.optimizers.nonbias_weight_decay',
+    'RMSpropAsync': 'chainerrl.optimizers.rmsprop_async',
+})
@@ -8,9 +8,12 @@ standard_library.install_aliases()  # NOQA
 
 from abc import ABCMeta
 from abc import abstractmethod
+import sys
 
 from future.utils import with_metaclass
 
+from chainerrl.lazy_import import install_lazy_attributes
+
 from logging import getLogger
 logger = getLogger(__name__)
 
@@ -26,3 +29,21 @@ class Policy(with_metaclass(ABCMeta, object)):
             Distribution of actions
         """
         raise NotImplementedError()
+
+
+# For backward compatibility, classes moved to chainerrl.policies can
+# still be accessed from this module. They are imported lazily to avoid
+# circular import. On Python < 3.7, they are set by chainerrl/__init__.py
+# instead.
+_moved_attributes = {
+    'SoftmaxPolicy': 'chainerrl.policies',
+    'FCSoftmaxPolicy': 'chainerrl.policies',
+    'ContinuousDeterministicPolicy': 'chainerrl.policies',
+    'FCDeterministicPolicy': 'chainerrl.policies',
+    'FCBNDeterministicPolicy': 'chainerrl.policies',
+    'FCLSTMDeterministicPolicy': 'chainerrl.policies',
+    'FCGaussianPolicy': 'chainerrl.policies',
+    'MellowmaxPolicy': 'chainerrl.policies',
+}
+if sys.version_info >= (3, 7):
+    install_lazy_attributes(__name__, attributes=_moved_attributes)
@@ -8,9 +8,12 @@ standard_library.install_aliases()  # NOQA
 
 from abc import ABCMeta
 from abc import abstractmethod
+import sys
 
 from future.utils import with_metaclass
 
+from chainerrl.lazy_import import install_lazy_attributes
+
 
 class StateQFunction(with_metaclass(ABCMeta, object)):
 
@@ -24,3 +27,24 @@ class StateActionQFunction(with_metaclass(ABCMeta, object)):
     @abstractmethod
     def __call__(self, x, a):
         raise NotImplementedError()
+
+
+# For backward compatibility, classes moved to chainerrl.q_functions can
+# still be accessed from this module. They are imported lazily to avoid
+# circular import. On Python < 3.7, they are set by chainerrl/__init__.py
+# instead.
+_moved_attributes = {
+    'DuelingDQN': 'chainerrl.q_functions',
+    'SingleModelStateActionQFunction': 'chainerrl.q_functions',
+    'FCSAQFunction': 'chainerrl.q_functions',
+    'FCLSTMSAQFunction': 'chainerrl.q_functions',
+    'FCBNSAQFunction': 'chainerrl.q_functions',
+    'FCBNLateActionSAQFunction': 'chainerrl.q_functions',
+    'FCLateActionSAQFunction': 'chainerrl.q_functions',
+    'FCStateQFunctionWithDiscreteAction': 'chainerrl.q_functions',
+    'FCLSTMStateQFunction': 'chainerrl.q_functions',
+    'FCQuadraticStateQFunction': 'chainerrl.q_functions',
+    'FCBNQuadraticStateQFunction': 'chainerrl.q_functions',
+}
+if sys.version_info >= (3, 7):
+    install_lazy_attributes(__name__, attributes=_moved_attributes)
@@ -121,6 +121,23 @@ def stateful_links(chain):
                 yield m
 
 
+def is_recurrent(link):
+    """Return True iff a given link actually has a state.
+
+    Unlike isinstance(link, Recurrent), a chain that implements Recurrent via
+    RecurrentChainMixin is regarded as non-recurrent when none of its
+    descendants has a state.
+    """
+    if isinstance(link, chainer.links.LSTM):
+        return True
+    if isinstance(link, Recurrent) and \
+            not isinstance(link, RecurrentChainMixin):
+        return True
+    if isinstance(link, (chainer.Chain, chainer.ChainList)):
+        return any(is_recurrent(l) for l in link.children())
+    return False
+
+
 def set_state(chain, state):
     assert isinstance(chain, (chainer.Chain, chainer.ChainList))
     for l, s in zip(chain.children(), state):
@@ -128,6 +145,11 @@ def set_state(chain, state):
             c, h = s
             # LSTM.set_state doesn't accept None state
             if c is not None:
+                # nor arrays, e.g. those of concatenate_states
+                if not isinstance(c, chainer.Variable):
+                    c = chainer.Variable(c)
+                if not isinstance(h, chainer.Variable):
+                    h = chainer.Variable(h)
                 l.set_state(c, h)
         elif isinstance(l, Recurrent):
             l.set_state(s)
@@ -148,6 +170,80 @@ def reset_state(chain):
             reset_state(l)
 
 
+def _map_state(f, *states):
+    """Apply a function to leaves of states of the same structure."""
+    if isinstance(states[0], (list, tuple)):
+        return type(states[0])(
+            _map_state(f, *children) for children in zip(*states))
+    return f(*states)
+
+
+def detach_state(state):
+    """Replace Variables in a state with their arrays.
+
+    Args:
+        state (object): State returned by get_state, which is a nested list or
+            tuple of Variables, arrays or None.
+    Returns:
+        State of the same structure whose leaves are arrays or None.
+    """
+    def detach(x):
+        if isinstance(x, chainer.Variable):
+            return x.array
+        return x
+
+    return _map_state(detach, state)
+
+
+def concatenate_states(states, xp):
+    """Concatenate batched states along the batch axis.
+
+    None, which represents an initial state, is regarded as zeros.
+
+    Args:
+        states (list): States of the same structure, e.g. returned by
+            detach_state.
+        xp (module): numpy or cupy.
+    Returns:
+        State of the same structure whose leaves are concatenated arrays, or
+        None if all the corresponding leaves are None.
+    """
+    def concatenate(*xs):
+        ref = next((x for x in xs if x is not None), None)
+        if ref is None:
+            return None
+        ref = xp.asarray(ref)
+        return xp.concatenate(
+            [ref * 0 if x is None else xp.asarray(x) for x in xs])
+
+    return _map_state(concatenate, *states)
+
+
+def select_states(condition, x, y):
+    """Select rows of batched states by a condition.
+
+    None, which represents an initial state, is regarded as zeros.
+
+    Args:
+        condition (ndarray): Boolean array of shape (batch_size,).
+        x (object): State whose rows are selected where condition is True.
+        y (object): State whose rows are selected where condition is False.
+    Returns:
+        State of the same structure as x and y.
+    """
+    def select(a, b):
+        if a is None and b is None:
+            return None
+        if a is None:
+            a = b * 0
+        if b is None:
+            b = a * 0
+        cond = condition.reshape((-1,) + (1,) * (a.ndim - 1))
+        return chainer.cuda.get_array_module(a).where(cond, a, b)
+
+    return _map_state(select, detach_state(x), detach_state(y))
+
+
 class RecurrentChainMixin(Recurrent):
     """Mixin that aggregate states of children.
 
@@ -11,13 +11,19 @@ from abc import ABCMeta
 from abc import abstractmethod
 from abc import abstractproperty
 import collections
+import copy
+import multiprocessing as mp
 
+from chainer import cuda
 import numpy as np
 import six.moves.cPickle as pickle
 
 from chainerrl.misc.batch_states import batch_states
 from chainerrl.misc.collections import RandomAccessQueue
+from chainerrl.misc.phase_timer import PhaseTimer
 from chainerrl.misc.prioritized import PrioritizedBuffer
+from chainerrl.misc.prioritized import PriorityTree
+from chainerrl.misc.random import sample_n_k
 
 
 class AbstractReplayBuffer(with_metaclass(ABCMeta, object)):
@@ -161,27 +167,31 @@ class ReplayBuffer(AbstractReplayBuffer):
         last_n_transitions.append(experience)
         if is_state_terminal:
             while last_n_transitions:
-                self.memory.append(list(last_n_transitions))
+                self._append_experience(list(last_n_transitions))
                 del last_n_transitions[0]
             assert len(last_n_transitions) == 0
         else:
             if len(last_n_transitions) == self.num_steps:
-                self.memory.append(list(last_n_transitions))
+                self._append_experience(list(last_n_transitions))
 
     def stop_current_episode(self, env_id=0):
         last_n_transitions = self.last_n_transitions[env_id]
         # if n-step transition hist is not full, add transition;
         # if n-step hist is indeed full, transition has already been added;
         if 0 < len(last_n_transitions) < self.num_steps:
-            self.memory.append(list(last_n_transitions))
+            self._append_experience(list(last_n_transitions))
         # avoid duplicate entry
         if 0 < len(last_n_transitions) <= self.num_steps:
             del last_n_transitions[0]
         while last_n_transitions:
-            self.memory.append(list(last_n_transitions))
+            self._append_experience(list(last_n_transitions))
             del last_n_transitions[0]
         assert len(last_n_transitions) == 0
 
+    def _append_experience(self, experience):
+        """Append an n-step experience, a list of transitions, to memory."""
+        self.memory.append(experience)
+
     def sample(self, num_experiences):
         assert len(self.memory) >= num_experiences
         return self.memory.sample(num_experiences)
@@ -202,6 +212,162 @@ class ReplayBuffer(AbstractReplayBuffer):
                 self.memory, maxlen=self.memory.maxlen)
 
 
+class DeviceReplayBuffer(ReplayBuffer):
+    """Replay buffer whose transitions are stored in arrays on a device.
+
+    Transitions are stored in preallocated columns of numpy or cupy arrays
+    and sampled by drawing indices and gathering rows on the same device, so
+    that sampled minibatches need no host-device transfer. Appended
+    transitions are staged in host memory and copied to the device by a
+    single transfer before the next sampling.
+
+    A sampled minibatch is a dict of batched arrays instead of a list of
+    transitions, which batch_experiences accepts as it is. Since
+    observations are batched when they are stored, phi of agents is not
+    applied to them, so store preprocessed observations, e.g. by
+    store_phi_in_replay=True of DQN. Floating-point values are stored as
+    float32. next_action and additional information given to append are not
+    stored. Unlike ReplayBuffer, transitions are sampled with replacement,
+    which avoids permuting the whole buffer.
+
+    Args:
+        capacity (int): Capacity in transitions.
+        num_steps (int): Number of steps for n-step transitions.
+        gpu (int): GPU device id to store transitions if not None nor
+            negative. Otherwise they are stored as numpy arrays.
+    """
+
+    def __init__(self, capacity, num_steps=1, gpu=None):
+        assert capacity is not None and capacity > 0
+        super().__init__(capacity=capacity, num_steps=num_steps)
+        self.memory = None
+        self.gpu = gpu
+        if gpu is not None and gpu >= 0:
+            self.xp = cuda.cupy
+            self.device = cuda.get_device_from_id(gpu)
+        else:
+            self.xp = np
+            self.device = cuda.DummyDevice
+        self.columns = None
+        self.head = 0
+        self.size = 0
+        self.staged = []
+
+    def _append_experience(self, experience):
+        first, last = experience[0], experience[-1]
+        next_state = last['next_state']
+        if next_state is None:
+            next_state = np.zeros_like(first['state'])
+        rewards = np.zeros(self.num_steps, dtype=np.float32)
+        rewards[:len(experience)] = [t['reward'] for t in experience]
+        self.staged.append(dict(
+            state=first['state'],
+            action=first['action'],
+            reward=rewards,
+            n_steps=len(experience),
+            next_state=next_state,
+            is_state_terminal=any(
+                t['is_state_terminal'] for t in experience),
+        ))
+        if len(self.staged) >= self.capacity:
+            self._flush()
+
+    def _allocate(self, rows):
+        self.columns = {}
+        for key, value in rows.items():
+            if value.dtype.kind in 'fb':
+                dtype = np.float32
+            else:
+                dtype = value.dtype
+            self.columns[key] = self.xp.zeros(
+                (self.capacity,) + value.shape[1:], dtype=dtype)
+
+    def _flush(self):
+        """Copy staged transitions to the device."""
+        if not self.staged:
+            return
+        rows = dict((key, np.asarray([t[key] for t in self.staged]))
+                    for key in self.staged[0])
+        n = len(self.staged)
+        self.staged = []
+        with self.device:
+            if self.columns is None:
+                self._allocate(rows)
+            indices = self.xp.asarray(
+                (self.head + np.arange(n)) % self.capacity)
+            for key, column in self.columns.items():
+                column[indices] = self.xp.asarray(
+                    rows[key], dtype=column.dtype)
+        self.head = (self.head + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, num_experiences):
+        """Sample a minibatch of transitions with replacement.
+
+        Args:
+            num_experiences (int): Number of transitions to sample.
+        Returns:
+            dict: Batched arrays of transitions. 'reward' has the shape
+            (num_experiences, num_steps), whose columns after 'n_steps' are
+            zero.
+        """
+        assert len(self) >= num_experiences
+        self._flush()
+        with self.device:
+            indices = self.xp.random.randint(
+                0, self.size, size=num_experiences)
+            return dict((key, column[indices])
+                        for key, column in self.columns.items())
+
+    def __len__(self):
+        return min(self.size + len(self.staged), self.capacity)
+
+    def save(self, filename):
+        self._flush()
+        columns = self.columns
+        if columns is not None:
+            columns = dict((key, cuda.to_cpu(column))
+                           for key, column in columns.items())
+        with open(filename, 'wb') as f:
+            pickle.dump((columns, self.head, self.size), f)
+
+    def load(self, filename):
+        with open(filename, 'rb') as f:
+            columns, self.head, self.size = pickle.load(f)
+        self.staged = []
+        self.columns = columns
+        if columns is not None:
+            with self.device:
+                self.columns = dict((key, self.xp.asarray(column))
+                                    for key, column in columns.items())
+
+
+def identity_phi(x):
+    """Return an observation as it is, which is the default phi of agents."""
+    return x
+
+
+def check_phi_for_replay_buffer(replay_buffer, phi):
+    """Check that phi can be applied to states sampled from a buffer.
+
+    DeviceReplayBuffer batches observations when they are stored, so phi
+    given to batch_experiences is not applied to them.
+
+    Args:
+        replay_buffer (AbstractReplayBuffer): Replay buffer of an agent.
+        phi (callable): Feature extractor that the agent applies to states
+            sampled from replay_buffer.
+    Raises:
+        ValueError: If replay_buffer is a DeviceReplayBuffer and phi is not
+            identity_phi.
+    """
+    if isinstance(replay_buffer, DeviceReplayBuffer) and \
+            phi is not identity_phi:
+        raise ValueError(
+            'phi is not applied to states sampled from DeviceReplayBuffer.'
+            ' Store preprocessed observations in it instead.')
+
+
 class PriorityWeightError(object):
     """For proportional prioritization
 
@@ -240,15 +406,12 @@ class PriorityWeightError(object):
         self.error_max = error_max
 
     def priority_from_errors(self, errors):
-
-        def _clip_error(error):
-            if self.error_min is not None:
-                error = max(self.error_min, error)
-            if self.error_max is not None:
-                error = min(self.error_max, error)
-            return error
-
-        return [(_clip_error(d) + self.eps) ** self.alpha for d in errors]
+        errors = np.asarray(errors, dtype=np.float64)
+        if self.error_min is not None:
+            errors = np.maximum(self.error_min, errors)
+        if self.error_max is not None:
+            errors = np.minimum(self.error_max, errors)
+        return (errors + self.eps) ** self.alpha
 
     def weights_from_probabilities(self, probabilities, min_probability):
         if self.normalize_by_max == 'batch':
@@ -270,6 +433,12 @@ class PrioritizedReplayBuffer(ReplayBuffer, PriorityWeightError):
     https://arxiv.org/pdf/1511.05952.pdf Section 3.3
     proportional prioritization
 
+    A transition can be appended with its initial TD-error by passing
+    `initial_error` to append, e.g. when it is computed by an actor of Ape-X
+    (https://arxiv.org/abs/1803.00933). The priority of an n-step experience
+    is then computed from the initial error of its first transition instead of
+    the maximum priority so far.
+
     Args:
         capacity (int)
         alpha, beta0, betasteps, eps (float)
@@ -301,6 +470,15 @@ class PrioritizedReplayBuffer(ReplayBuffer, PriorityWeightError):
     def update_errors(self, errors):
         self.memory.set_last_priority(self.priority_from_errors(errors))
 
+    def _append_experience(self, experience):
+        # Each transition is the first one of exactly one experience
+        initial_error = experience[0].pop('initial_error', None)
+        if initial_error is None:
+            priority = None
+        else:
+            priority, = self.priority_from_errors([initial_error])
+        self.memory.append(experience, priority=priority)
+
 
 def random_subseq(seq, subseq_len):
     if len(seq) <= subseq_len:
@@ -311,12 +489,37 @@ def random_subseq(seq, subseq_len):
 
 
 class EpisodicReplayBuffer(AbstractEpisodicReplayBuffer):
+    """Replay buffer of episodes.
+
+    Transitions of stored episodes are kept in a single flat store, which
+    is a ring buffer of capacity transitions, and episodes are indexed by a
+    table of their (start, length) in it, so that sample and sample_episodes
+    share the same storage. When capacity is exceeded, the oldest episodes
+    are discarded by advancing the position of the first transition.
+
+    Args:
+        capacity (int or None): Capacity in transitions. If None, the buffer
+            grows without limit.
+    """
 
     def __init__(self, capacity=None):
         self.current_episode = collections.defaultdict(list)
-        self.episodic_memory = RandomAccessQueue()
-        self.memory = RandomAccessQueue()
+        self.episodic_memory = self._make_episodic_memory()
         self.capacity = capacity
+        self._init_transitions()
+
+    def _make_episodic_memory(self):
+        return RandomAccessQueue()
+
+    def _init_transitions(self):
+        if self.capacity is None:
+            self.transitions = []
+        else:
+            self.transitions = [None] * self.capacity
+        # Position of the first transition and the next position. Positions
+        # are counted from the beginning and wrapped around capacity.
+        self.first = 0
+        self.end = 0
 
     def append(self, state, action, reward, next_state=None, next_action=None,
                is_state_terminal=False, env_id=0, **kwargs):
@@ -330,64 +533,139 @@ class EpisodicReplayBuffer(AbstractEpisodicReplayBuffer):
             self.stop_current_episode(env_id=env_id)
 
     def sample(self, n):
-        assert len(self.memory) >= n
-        return self.memory.sample(n)
+        assert len(self) >= n
+        positions = self.first + sample_n_k(len(self), n)
+        if self.capacity is not None:
+            positions %= self.capacity
+        return [self.transitions[i] for i in positions]
 
     def sample_episodes(self, n_episodes, max_len=None):
         assert len(self.episodic_memory) >= n_episodes
-        episodes = self.episodic_memory.sample(n_episodes)
-        if max_len is not None:
-            return [random_subseq(ep, max_len) for ep in episodes]
-        else:
-            return episodes
+        entries = self.episodic_memory.sample(n_episodes)
+        return [self._get_episode(entry, max_len) for entry in entries]
+
+    def _get_episode(self, entry, max_len=None):
+        start, length = entry
+        if max_len is not None and length > max_len:
+            # Random subsequence, only which is gathered
+            start += np.random.randint(0, length - max_len + 1)
+            length = max_len
+        if self.capacity is None:
+            return self.transitions[start:start + length]
+        i = start % self.capacity
+        j = i + length
+        if j <= self.capacity:
+            return self.transitions[i:j]
+        return self.transitions[i:] + self.transitions[:j - self.capacity]
 
     def __len__(self):
-        return len(self.memory)
+        return self.end - self.first
 
     @property
     def n_episodes(self):
         return len(self.episodic_memory)
 
+    def _episode_entries(self):
+        return list(self.episodic_memory)
+
     def save(self, filename):
+        episodes = RandomAccessQueue(
+            self._get_episode(entry) for entry in self._episode_entries())
+        memory = RandomAccessQueue(
+            transition for episode in episodes for transition in episode)
         with open(filename, 'wb') as f:
-            pickle.dump((self.memory, self.episodic_memory), f)
+            pickle.dump((memory, episodes), f)
 
     def load(self, filename):
         with open(filename, 'rb') as f:
             memory = pickle.load(f)
+        self._load_memory(memory)
+
+    def _load_memory(self, memory):
+        """Rebuild the buffer from what was saved to a file."""
         if isinstance(memory, tuple):
-            self.memory, self.episodic_memory = memory
+            episodes = memory[1]
+            if isinstance(episodes, PrioritizedBuffer):
+                episodes = episodes.data
         else:
             # Load v0.2
-            # FIXME: The code works with EpisodicReplayBuffer
-            # but not with PrioritizedEpisodicReplayBuffer
-            self.memory = RandomAccessQueue(memory)
-            self.episodic_memory = RandomAccessQueue()
-
-            # Recover episodic_memory with best effort.
+            # Recover episodes with best effort.
+            episodes = []
             episode = []
-            for item in self.memory:
+            for item in memory:
                 episode.append(item)
                 if item['is_state_terminal']:
-                    self.episodic_memory.append(episode)
+                    episodes.append(episode)
                     episode = []
+            if episode:
+                episodes.append(episode)
+        self.episodic_memory = self._make_episodic_memory()
+        self._init_transitions()
+        for episode in episodes:
+            self._append_episode(list(episode))
 
     def stop_current_episode(self, env_id=0):
         current_episode = self.current_episode[env_id]
         if current_episode:
-            self.episodic_memory.append(current_episode)
-            self.memory.extend(current_episode)
+            self._append_episode(current_episode)
             self.current_episode[env_id] = []
-            while self.capacity is not None and \
-                    len(self.memory) > self.capacity:
-                discarded_episode = self.episodic_memory.popleft()
-                for _ in range(len(discarded_episode)):
-                    self.memory.popleft()
         assert not self.current_episode[env_id]
 
+    def _append_episode(self, episode):
+        entry = self._store(episode)
+        if entry is not None:
+            self.episodic_memory.append(entry)
+
+    def _store(self, episode):
+        """Store transitions of an episode and return its entry."""
+        n = len(episode)
+        if self.capacity is None:
+            self.transitions.extend(episode)
+        else:
+            # Discard the oldest episodes to make room
+            while self.episodic_memory and len(self) + n > self.capacity:
+                self._discard_oldest_episode()
+            if n > self.capacity:
+                # No episode can be kept, as when capacity is exceeded by
+                # the episode itself
+                self.first = self.end
+                return None
+            i = self.end % self.capacity
+            n_head = min(n, self.capacity - i)
+            self.transitions[i:i + n_head] = episode[:n_head]
+            self.transitions[:n - n_head] = episode[n_head:]
+        entry = (self.end, n)
+        self.end += n
+        return entry
+
+    def _discard_oldest_episode(self):
+        start, length = self.episodic_memory.popleft()
+        self.first = start + length
+
 
 class PrioritizedEpisodicReplayBuffer (
         EpisodicReplayBuffer, PriorityWeightError):
+    """Episodic replay buffer with prioritized sampling.
+
+    By default, whole episodes are prioritized and sample_episodes picks a
+    uniformly random subsequence of each sampled episode when max_len is
+    given. If window_len is set, each episode is instead split into aligned
+    windows of window_len transitions, except that the last one can be
+    shorter, and each window has its own priority. sample_episodes then
+    samples windows, and update_errors updates their priorities at once in
+    a PriorityTree.
+
+    update_errors accepts, for each sampled sequence, either an error or a
+    sequence of per-step errors. The latter are summed if eta is None and
+    otherwise mixed as eta * max + (1 - eta) * mean as in R2D2
+    (https://openreview.net/forum?id=r1lyTjAqYX).
+
+    Args:
+        capacity (int or None): Capacity in transitions.
+        window_len (int or None): Length of windows with priorities. If
+            None, episodes are prioritized.
+        eta (float or None): Weight of the max of per-step errors.
+    """
 
     def __init__(self, capacity=None,
                  alpha=0.6, beta0=0.4, betasteps=2e5, eps=1e-8,
@@ -398,53 +676,694 @@ class PrioritizedEpisodicReplayBuffer (
                  return_sample_weights=True,
                  error_min=None,
                  error_max=None,
+                 window_len=None,
+                 eta=None,
                  ):
+        assert window_len is None or window_len > 0
+        assert eta is None or 0 <= eta <= 1
         self.current_episode = collections.defaultdict(list)
-        self.episodic_memory = PrioritizedBuffer(
-            capacity=None,
-            wait_priority_after_sampling=wait_priority_after_sampling)
-        self.memory = RandomAccessQueue(maxlen=capacity)
-        self.capacity_left = capacity
+        self.wait_priority_after_sampling = wait_priority_after_sampling
+        self.window_len = window_len
+        self.eta = eta
+        self.episodic_memory = self._make_episodic_memory()
+        self.capacity = capacity
+        self._init_transitions()
         self.default_priority_func = default_priority_func
         self.uniform_ratio = uniform_ratio
         self.return_sample_weights = return_sample_weights
+        self.max_priority = 1.0
         PriorityWeightError.__init__(
             self, alpha, beta0, betasteps, eps, normalize_by_max,
             error_min=error_min, error_max=error_max)
 
+    def _make_episodic_memory(self):
+        if self.window_len is not None:
+            return RandomAccessQueue()
+        return PrioritizedBuffer(
+            capacity=None,
+            wait_priority_after_sampling=self.wait_priority_after_sampling)
+
+    def _init_transitions(self):
+        EpisodicReplayBuffer._init_transitions(self)
+        # (start, length) of windows, the number of windows of each episode
+        # and the index of the first window counted from the beginning
+        self.windows = RandomAccessQueue()
+        self.episode_n_windows = collections.deque()
+        self.first_window = 0
+        # Window i has priority at slot i % tree.size
+        self.tree = PriorityTree(1)
+        self.sampled_windows = None
+        self.flag_wait_priority = False
+
+    @property
+    def memory(self):
+        # Prioritized items, whose number is used to compute weights
+        if self.window_len is not None:
+            return self.windows
+        return self.episodic_memory
+
     def sample_episodes(self, n_episodes, max_len=None):
         """Sample n unique samples from this replay buffer"""
+        if self.window_len is not None:
+            return self._sample_windows(n_episodes, max_len)
         assert len(self.episodic_memory) >= n_episodes
-        episodes, probabilities, min_prob = self.episodic_memory.sample(
+        entries, probabilities, min_prob = self.episodic_memory.sample(
             n_episodes, uniform_ratio=self.uniform_ratio)
-        if max_len is not None:
-            episodes = [random_subseq(ep, max_len) for ep in episodes]
+        episodes = [self._get_episode(entry, max_len) for entry in entries]
         if self.return_sample_weights:
             weights = self.weights_from_probabilities(probabilities, min_prob)
             return episodes, weights
         else:
             return episodes
 
+    def _sample_windows(self, n, max_len):
+        assert (not self.wait_priority_after_sampling or
+                not self.flag_wait_priority)
+        n_windows = len(self.windows)
+        assert n_windows >= n
+        tree = self.tree
+        total_priority = tree.sum()
+        min_prob = tree.min() / total_priority
+        if self.uniform_ratio > 0:
+            # Mix uniform samples and prioritized samples
+            n_uniform = np.random.binomial(n, self.uniform_ratio)
+            uniform_slots = (self.first_window + sample_n_k(
+                n_windows, n_uniform)) % tree.size
+            uniform_priorities = tree.get(uniform_slots)
+            tree.remove_from_sums(uniform_slots)
+            min_prob = self.uniform_ratio / n_windows \
+                + (1 - self.uniform_ratio) * min_prob
+        else:
+            n_uniform = 0
+            uniform_slots = np.zeros(0, dtype=np.intp)
+            uniform_priorities = np.zeros(0)
+        slots, priorities = tree.prioritized_sample(n - n_uniform)
+        slots = np.concatenate([uniform_slots, slots])
+        priorities = np.concatenate([uniform_priorities, priorities])
+        if not self.wait_priority_after_sampling:
+            tree.set(slots, priorities)
+        probabilities = self.uniform_ratio / n_windows \
+            + (1 - self.uniform_ratio) * priorities / total_priority
+        self.sampled_windows = self.first_window + \
+            (slots - self.first_window) % tree.size
+        self.flag_wait_priority = True
+
+        windows = []
+        for i in self.sampled_windows:
+            start, length = self.windows[i - self.first_window]
+            if max_len is not None:
+                length = min(length, max_len)
+            windows.append(self._get_episode((start, length)))
+        if self.return_sample_weights:
+            weights = self.weights_from_probabilities(
+                probabilities, min_prob)
+            return windows, weights
+        else:
+            return windows
+
     def update_errors(self, errors):
-        self.episodic_memory.set_last_priority(
-            self.priority_from_errors(errors))
+        priorities = self.priority_from_errors(self._reduce_errors(errors))
+        if self.window_len is None:
+            self.episodic_memory.set_last_priority(priorities)
+            return
+        assert (not self.wait_priority_after_sampling or
+                self.flag_wait_priority)
+        assert np.all(priorities > 0)
+        assert len(self.sampled_windows) == len(priorities)
+        # Windows discarded after sampling are skipped
+        alive = self.sampled_windows >= self.first_window
+        self.tree.set(self.sampled_windows[alive] % self.tree.size,
+                      priorities[alive])
+        self.max_priority = max(self.max_priority, np.max(priorities))
+        self.flag_wait_priority = False
+        self.sampled_windows = None
+
+    def _reduce_errors(self, errors):
+        # Errors of sequences are reduced at once by ufunc.reduceat
+        errors = [np.ravel(error) for error in errors]
+        lengths = np.asarray([len(error) for error in errors])
+        assert np.all(lengths > 0)
+        errors = np.concatenate(errors).astype(np.float64)
+        offsets = np.cumsum(lengths) - lengths
+        sums = np.add.reduceat(errors, offsets)
+        if self.eta is None:
+            return sums
+        return (self.eta * np.maximum.reduceat(errors, offsets)
+                + (1 - self.eta) * sums / lengths)
+
+    def _episode_entries(self):
+        if self.window_len is not None:
+            return list(self.episodic_memory)
+        return list(self.episodic_memory.data)
+
+    def save(self, filename):
+        # The same format as before, where episodes are kept with their
+        # priorities in a PrioritizedBuffer
+        episodes = [self._get_episode(entry)
+                    for entry in self._episode_entries()]
+        memory = RandomAccessQueue(
+            transition for episode in episodes for transition in episode)
+        if self.window_len is None:
+            prioritized_episodes = copy.copy(self.episodic_memory)
+            prioritized_episodes.data = collections.deque(episodes)
+        else:
+            window_priorities = self._window_priorities()
+            prioritized_episodes = PrioritizedBuffer(
+                wait_priority_after_sampling=self.wait_priority_after_sampling,
+                initial_max_priority=self.max_priority)
+            offsets = np.cumsum(self.episode_n_windows) - \
+                self.episode_n_windows
+            for episode, offset, n in zip(
+                    episodes, offsets, self.episode_n_windows):
+                prioritized_episodes.append(
+                    episode,
+                    priority=window_priorities[offset:offset + n].max())
+            # Extra attributes, which are ignored by older versions
+            prioritized_episodes.window_len = self.window_len
+            prioritized_episodes.window_priorities = window_priorities
+        with open(filename, 'wb') as f:
+            pickle.dump((memory, prioritized_episodes), f)
+
+    def _load_memory(self, memory):
+        EpisodicReplayBuffer._load_memory(self, memory)
+        if not isinstance(memory, tuple) or \
+                not isinstance(memory[1], PrioritizedBuffer):
+            return
+        saved = memory[1]
+        # Episodes that do not fit in capacity are discarded from the oldest
+        n_discarded = len(saved) - self.n_episodes
+        if self.window_len is None:
+            for _ in range(n_discarded):
+                saved.popleft()
+            saved.data = collections.deque(self.episodic_memory.data)
+            self.episodic_memory = saved
+            return
+        if getattr(saved, 'window_len', None) != self.window_len:
+            # Windows of the saved priorities are not the same
+            return
+        n_windows = len(self.windows)
+        priorities = saved.window_priorities[
+            len(saved.window_priorities) - n_windows:]
+        self.tree.set(
+            (self.first_window + np.arange(n_windows)) % self.tree.size,
+            priorities)
+        self.max_priority = max(self.max_priority, saved.max_priority)
+
+    def _window_priorities(self):
+        slots = (self.first_window + np.arange(len(self.windows))) \
+            % self.tree.size
+        # Mins are kept for windows waiting for priorities after sampling
+        return self.tree.mins[self.tree.size + slots]
+
+    def _append_episode(self, episode):
+        if self.window_len is not None:
+            self._append_episode_windows(episode)
+            return
+        if self.default_priority_func is not None:
+            priority = self.default_priority_func(episode)
+        else:
+            priority = None
+        entry = self._store(episode)
+        if entry is not None:
+            self.episodic_memory.append(entry, priority=priority)
+
+    def _append_episode_windows(self, episode):
+        entry = self._store(episode)
+        if entry is None:
+            return
+        self.episodic_memory.append(entry)
+        start, length = entry
+        offsets = range(0, length, self.window_len)
+        windows = [(start + offset, min(self.window_len, length - offset))
+                   for offset in offsets]
+        if self.default_priority_func is not None:
+            priorities = [
+                self.default_priority_func(
+                    episode[offset:offset + self.window_len])
+                for offset in offsets]
+        else:
+            priorities = self.max_priority
+        self._reserve_windows(len(self.windows) + len(windows))
+        ids = self.first_window + len(self.windows) + np.arange(len(windows))
+        self.windows.extend(windows)
+        self.episode_n_windows.append(len(windows))
+        self.tree.set(ids % self.tree.size, priorities)
+
+    def _reserve_windows(self, n):
+        old_tree = self.tree
+        if n <= old_tree.size:
+            return
+        # Move priorities of live windows to a larger tree
+        old_slots = (self.first_window + np.arange(len(self.windows))) \
+            % old_tree.size
+        sums = old_tree.sums[old_tree.size + old_slots]
+        mins = old_tree.mins[old_tree.size + old_slots]
+        self.tree = PriorityTree(max(n, 2 * old_tree.size))
+        slots = (self.first_window + np.arange(len(self.windows))) \
+            % self.tree.size
+        self.tree.set(slots, mins)
+        # Windows waiting for priorities stay excluded from sampling
+        self.tree.remove_from_sums(slots[sums == 0])
+
+    def _discard_oldest_episode(self):
+        EpisodicReplayBuffer._discard_oldest_episode(self)
+        if self.window_len is not None:
+            n = self.episode_n_windows.popleft()
+            self.tree.clear(
+                (self.first_window + np.arange(n)) % self.tree.size)
+            for _ in range(n):
+                self.windows.popleft()
+            self.first_window += n
+
+
+class _StoredFrames(object):
+    """Frames of an observation stored in the frame ring of a buffer.
+
+    Args:
+        indices (list): Indices of the frames in the episode.
+        shape (tuple): Shape of each frame.
+        dtype (numpy.dtype): dtype of each frame.
+    """
+
+    def __init__(self, indices, shape, dtype):
+        self.indices = indices
+        self.shape = shape
+        self.dtype = dtype
+
+
+class SharedEpisodicReplayBuffer(AbstractEpisodicReplayBuffer):
+    """Episodic replay buffer shared by processes.
+
+    Transitions are pickled into fixed-size slots of a ring buffer in shared
+    memory, and episodes are indexed by a table of their positions in the
+    ring. Processes forked after the buffer is created, e.g. those of
+    chainerrl.experiments.train_agent_async, append to and sample from the
+    same buffer, so that async agents such as ACER and PCL replay
+    transitions of all the processes while keeping only one copy of them.
+
+    Each process keeps its current episodes in its own memory and stores
+    them when they end. The lock shared by processes is held only while
+    slots are copied and the index is updated; pickling and unpickling are
+    done outside of it. When next_state of a transition is the state of the
+    next one, as is the case for ACER and PCL, it is not pickled but
+    recovered from the next slot.
+
+    If frame_size is given, frames of stacked observations such as
+    LazyFrames of chainerrl.wrappers.atari_wrappers are not pickled but
+    stored in another ring of frame_capacity frames, where frames shared
+    by observations of an episode are stored only once. The oldest
+    episodes are also discarded when the ring is full.
+
+    capacity * slot_size + frame_capacity * frame_size bytes of shared
+    memory are allocated at once, so slot_size should be just large enough
+    for a pickled transition. The default is enough for small observations
+    such as those of classic control tasks and for Atari transitions whose
+    frames are stored separately with frame_size=84 * 84. An episode of n
+    steps from FrameStack has about n unique frames, so frame_capacity
+    should be a little larger than capacity in that case.
+
+    Args:
+        capacity (int): Capacity in transitions. Like EpisodicReplayBuffer,
+            the oldest episodes are discarded when it is exceeded.
+        slot_size (int): Maximum size of a pickled transition in bytes.
+            ValueError is raised when a larger transition is appended.
+        frame_size (int or None): Maximum size of a frame in bytes. If set
+            None, frames are pickled with transitions.
+        frame_capacity (int or None): Capacity in frames. If set None,
+            capacity is used.
+    """
+
+    def __init__(self, capacity, slot_size=2 ** 12, frame_size=None,
+                 frame_capacity=None):
+        assert capacity > 0
+        assert slot_size > 0
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.frame_size = frame_size
+        if frame_size is None:
+            self.frame_capacity = 0
+        else:
+            assert frame_size > 0
+            self.frame_capacity = frame_capacity or capacity
+        self.current_episode = collections.defaultdict(list)
+        self.lock = mp.Lock()
+        self._slots = mp.RawArray('B', capacity * slot_size)
+        self._slot_lens = mp.RawArray('l', capacity)
+        self._next_state_omitted = mp.RawArray('b', capacity)
+        # First frame of the episode of each slot and the range of frames
+        # used by the slot from it
+        self._slot_frames = mp.RawArray('l', 3 * capacity)
+        self._episode_starts = mp.RawArray('l', capacity)
+        self._episode_lens = mp.RawArray('l', capacity)
+        self._episode_frame_starts = mp.RawArray('l', capacity)
+        self._frames = mp.RawArray(
+            'B', self.frame_capacity * (frame_size or 0))
+        # Next position of transitions, the oldest episode, the next
+        # episode, the number of transitions and the next position of
+        # frames. Positions and episodes are counted from the beginning and
+        # wrapped around capacity or frame_capacity.
+        self._index = mp.RawArray('l', 5)
+        self._views()
+
+    def _views(self):
+        self.slots = np.frombuffer(self._slots, dtype=np.uint8).reshape(
+            self.capacity, self.slot_size)
+        self.slot_lens = np.frombuffer(self._slot_lens, dtype='l')
+        self.next_state_omitted = np.frombuffer(
+            self._next_state_omitted, dtype=np.int8)
+        self.slot_frames = np.frombuffer(
+            self._slot_frames, dtype='l').reshape(self.capacity, 3)
+        self.episode_starts = np.frombuffer(self._episode_starts, dtype='l')
+        self.episode_lens = np.frombuffer(self._episode_lens, dtype='l')
+        self.episode_frame_starts = np.frombuffer(
+            self._episode_frame_starts, dtype='l')
+        self.frames = np.frombuffer(self._frames, dtype=np.uint8).reshape(
+            self.frame_capacity, self.frame_size or 0)
+        self.index = np.frombuffer(self._index, dtype='l')
+
+    def append(self, state, action, reward, next_state=None, next_action=None,
+               is_state_terminal=False, env_id=0, **kwargs):
+        current_episode = self.current_episode[env_id]
+        experience = dict(state=state, action=action, reward=reward,
+                          next_state=next_state, next_action=next_action,
+                          is_state_terminal=is_state_terminal,
+                          **kwargs)
+        current_episode.append(experience)
+        if is_state_terminal:
+            self.stop_current_episode(env_id=env_id)
 
     def stop_current_episode(self, env_id=0):
         current_episode = self.current_episode[env_id]
         if current_episode:
-            if self.default_priority_func is not None:
-                priority = self.default_priority_func(current_episode)
-            else:
-                priority = None
-            self.memory.extend(current_episode)
-            self.episodic_memory.append(current_episode, priority=priority)
-            if self.capacity_left is not None:
-                self.capacity_left -= len(current_episode)
+            self._append_episode(current_episode)
             self.current_episode[env_id] = []
-            while self.capacity_left is not None and self.capacity_left < 0:
-                discarded_episode = self.episodic_memory.popleft()
-                self.capacity_left += len(discarded_episode)
-        assert not self.current_episode[env_id]
+
+    def _extract_frames(self, episode):
+        """Replace frames of observations with their indices.
+
+        Returns:
+            tuple: Transitions whose observations refer to frames, unique
+                frames of the episode and ranges of frames used by the
+                transitions.
+        """
+        frame_indices = {}
+        frames = []
+
+        def extract(obs):
+            # Duck typing for LazyFrames, which imports gym and cv2
+            obs_frames = getattr(obs, '_frames', None)
+            if not hasattr(obs, 'materialize') or \
+                    not isinstance(obs_frames, list):
+                return obs
+            indices = []
+            for frame in obs_frames:
+                assert frame.shape == obs_frames[0].shape
+                assert frame.dtype == obs_frames[0].dtype
+                if id(frame) not in frame_indices:
+                    if frame.nbytes > self.frame_size:
+                        raise ValueError(
+                            'A frame of {} bytes exceeds frame_size {}'.format(
+                                frame.nbytes, self.frame_size))
+                    frame_indices[id(frame)] = len(frames)
+                    frames.append(frame)
+                indices.append(frame_indices[id(frame)])
+            obs = copy.copy(obs)
+            obs._frames = _StoredFrames(
+                indices, obs_frames[0].shape, obs_frames[0].dtype)
+            return obs
+
+        transitions = []
+        frame_ranges = []
+        for transition in episode:
+            n_frames = len(frames)
+            transition = dict(transition)
+            for key in ('state', 'next_state'):
+                if key in transition:
+                    transition[key] = extract(transition[key])
+            used = [i for key in ('state', 'next_state')
+                    if isinstance(getattr(transition.get(key), '_frames',
+                                          None), _StoredFrames)
+                    for i in transition[key]._frames.indices]
+            frame_ranges.append(
+                (min(used), max(used) + 1) if used else (n_frames, n_frames))
+            transitions.append(transition)
+        return transitions, frames, frame_ranges
+
+    def _append_episode(self, episode):
+        if len(episode) > self.capacity:
+            raise ValueError(
+                'An episode of length {} exceeds capacity {}'.format(
+                    len(episode), self.capacity))
+        omitted = [i + 1 < len(episode)
+                   and transition['next_state'] is episode[i + 1]['state']
+                   for i, transition in enumerate(episode)]
+        if self.frame_size is None:
+            frames = []
+            frame_ranges = [(0, 0)] * len(episode)
+        else:
+            episode, frames, frame_ranges = self._extract_frames(episode)
+            if len(frames) > self.frame_capacity:
+                raise ValueError(
+                    'An episode of {} frames exceeds frame_capacity'
+                    ' {}'.format(len(frames), self.frame_capacity))
+        data = [pickle.dumps(
+            {k: v for k, v in transition.items() if k != 'next_state'}
+            if omit else transition, protocol=pickle.HIGHEST_PROTOCOL)
+            for transition, omit in zip(episode, omitted)]
+        for d in data:
+            if len(d) > self.slot_size:
+                raise ValueError(
+                    'A pickled transition of {} bytes exceeds slot_size'
+                    ' {}; increase slot_size'.format(
+                        len(d), self.slot_size))
+        with self.lock:
+            start, first, end, n_transitions, frame_start = self.index
+            # Discard the oldest episodes to make room
+            while first < end and (
+                    n_transitions + len(data) > self.capacity or
+                    frame_start + len(frames) -
+                    self.episode_frame_starts[first % self.capacity] >
+                    self.frame_capacity):
+                n_transitions -= self.episode_lens[first % self.capacity]
+                first += 1
+            for i, d in enumerate(data):
+                slot = (start + i) % self.capacity
+                self.slots[slot, :len(d)] = np.frombuffer(d, dtype=np.uint8)
+                self.slot_lens[slot] = len(d)
+                self.next_state_omitted[slot] = omitted[i]
+                self.slot_frames[slot] = (frame_start,) + frame_ranges[i]
+            for i, frame in enumerate(frames):
+                self.frames[(frame_start + i) % self.frame_capacity,
+                            :frame.nbytes] = \
+                    np.ascontiguousarray(frame).view(np.uint8).ravel()
+            self.episode_starts[end % self.capacity] = start
+            self.episode_lens[end % self.capacity] = len(data)
+            self.episode_frame_starts[end % self.capacity] = frame_start
+            self.index[:] = (start + len(data), first, end + 1,
+                             n_transitions + len(data),
+                             frame_start + len(frames))
+
+    def _read(self, positions):
+        # The lock must be held
+        slots = np.asarray(positions) % self.capacity
+        data = collections.OrderedDict(
+            (slot, self.slots[slot, :self.slot_lens[slot]].tobytes())
+            for slot in slots)
+        # Slots of next states omitted from the transitions
+        for slot in slots[self.next_state_omitted[slots] != 0]:
+            next_slot = (slot + 1) % self.capacity
+            if next_slot not in data:
+                data[next_slot] = \
+                    self.slots[next_slot, :self.slot_lens[next_slot]].tobytes()
+        # Frames used by the slots
+        frame_starts = {}
+        frames = {}
+        if self.frame_capacity:
+            for slot in data:
+                frame_start, lo, hi = self.slot_frames[slot]
+                frame_starts[slot] = frame_start
+                for i in range(frame_start + lo, frame_start + hi):
+                    if i not in frames:
+                        frames[i] = \
+                            self.frames[i % self.frame_capacity].tobytes()
+        return slots, data, frame_starts, frames
+
+    def _loads(self, read):
+        slots, data, frame_starts, frames = read
+        loaded = {slot: pickle.loads(d) for slot, d in data.items()}
+        arrays = {}
+
+        def restore(obs, frame_start):
+            stored = getattr(obs, '_frames', None)
+            if not isinstance(stored, _StoredFrames):
+                return
+            n = int(np.prod(stored.shape)) * np.dtype(stored.dtype).itemsize
+            obs_frames = []
+            for i in stored.indices:
+                i += frame_start
+                if i not in arrays:
+                    arrays[i] = np.frombuffer(
+                        frames[i][:n], dtype=stored.dtype).reshape(
+                            stored.shape)
+                obs_frames.append(arrays[i])
+            obs._frames = obs_frames
+
+        for slot, transition in loaded.items():
+            for key in ('state', 'next_state'):
+                if slot in frame_starts:
+                    restore(transition.get(key), frame_starts[slot])
+        transitions = []
+        for slot in slots:
+            transition = loaded[slot]
+            if 'next_state' not in transition:
+                next_slot = (slot + 1) % self.capacity
+                transition['next_state'] = loaded[next_slot]['state']
+            transitions.append(transition)
+        return transitions
+
+    def sample(self, n):
+        with self.lock:
+            start, _, _, n_transitions, _ = self.index
+            assert n_transitions >= n
+            read = self._read(
+                start - n_transitions + sample_n_k(n_transitions, n))
+        return self._loads(read)
+
+    def sample_episodes(self, n_episodes, max_len=None):
+        with self.lock:
+            _, first, end, _, _ = self.index
+            assert end - first >= n_episodes
+            episodes = []
+            for k in first + sample_n_k(end - first, n_episodes):
+                start = self.episode_starts[k % self.capacity]
+                length = self.episode_lens[k % self.capacity]
+                if max_len is not None and length > max_len:
+                    start += np.random.randint(0, length - max_len + 1)
+                    length = max_len
+                episodes.append(self._read(np.arange(start, start + length)))
+        return [self._loads(read) for read in episodes]
+
+    def __len__(self):
+        return int(self.index[3])
+
+    @property
+    def n_episodes(self):
+        return int(self.index[2] - self.index[1])
+
+    def _episodes(self):
+        with self.lock:
+            _, first, end, _, _ = self.index
+            episodes = []
+            for k in range(first, end):
+                start = self.episode_starts[k % self.capacity]
+                length = self.episode_lens[k % self.capacity]
+                episodes.append(self._read(np.arange(start, start + length)))
+        return [self._loads(read) for read in episodes]
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            pickle.dump(self._episodes(), f)
+
+    def load(self, filename):
+        with open(filename, 'rb') as f:
+            episodes = pickle.load(f)
+        with self.lock:
+            self.index[:] = 0
+        for episode in episodes:
+            self._append_episode(episode)
+
+
+class SequenceReplayBuffer(AbstractReplayBuffer):
+    """Replay buffer of fixed-length sequences with recurrent states.
+
+    Each episode is split into consecutive sequences of sequence_len
+    transitions, except that the last one can be shorter. Each sequence is
+    stored with at most burn_in preceding transitions of the same episode
+    and the recurrent state of the model before the first stored transition
+    so that the state can be recovered without replaying the whole episode.
+    See https://openreview.net/forum?id=r1lyTjAqYX (R2D2).
+
+    The recurrent state is given by `recurrent_state` of append. A sampled
+    sequence is a list of transitions whose first one has 'recurrent_state'
+    and 'burn_in', the number of burn-in transitions, as additional keys.
+
+    Args:
+        capacity (int or None): Capacity in sequences.
+        sequence_len (int): Length of sequences excluding burn-in.
+        burn_in (int): Maximum number of burn-in transitions.
+    """
+
+    def __init__(self, capacity=None, sequence_len=40, burn_in=0):
+        assert sequence_len > 0
+        assert burn_in >= 0
+        self.capacity = capacity
+        self.sequence_len = sequence_len
+        self.burn_in = burn_in
+        self.memory = RandomAccessQueue(maxlen=capacity)
+        self.last_transitions = collections.defaultdict(
+            lambda: collections.deque([], maxlen=burn_in + sequence_len))
+        self.episode_len = collections.defaultdict(int)
+
+    def append(self, state, action, reward, next_state=None, next_action=None,
+               is_state_terminal=False, env_id=0, recurrent_state=None,
+               **kwargs):
+        transition = dict(
+            state=state,
+            action=action,
+            reward=reward,
+            next_state=next_state,
+            next_action=next_action,
+            is_state_terminal=is_state_terminal,
+            **kwargs
+        )
+        self.last_transitions[env_id].append((transition, recurrent_state))
+        self.episode_len[env_id] += 1
+        if self.episode_len[env_id] % self.sequence_len == 0:
+            self._append_sequence(env_id)
+        if is_state_terminal:
+            self.stop_current_episode(env_id=env_id)
+
+    def _append_sequence(self, env_id):
+        episode_len = self.episode_len[env_id]
+        sequence_len = (episode_len - 1) % self.sequence_len + 1
+        burn_in = min(self.burn_in, episode_len - sequence_len)
+        items = list(self.last_transitions[env_id])[
+            -(burn_in + sequence_len):]
+        # Transitions are copied since they are shared by sequences
+        sequence = [dict(transition) for transition, _ in items]
+        sequence[0]['recurrent_state'] = items[0][1]
+        sequence[0]['burn_in'] = burn_in
+        self.memory.append(sequence)
+
+    def stop_current_episode(self, env_id=0):
+        if self.episode_len[env_id] % self.sequence_len != 0:
+            self._append_sequence(env_id)
+        self.last_transitions[env_id].clear()
+        self.episode_len[env_id] = 0
+
+    def sample(self, n):
+        """Sample n unique sequences from this replay buffer.
+
+        Args:
+            n (int): Number of sequences to sample.
+        Returns:
+            Sequence of n sampled sequences, each of which is a list of
+            transitions.
+        """
+        assert len(self.memory) >= n
+        return self.memory.sample(n)
+
+    def __len__(self):
+        """Return the number of sequences in the buffer."""
+        return len(self.memory)
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            pickle.dump(self.memory, f)
+
+    def load(self, filename):
+        with open(filename, 'rb') as f:
+            self.memory = pickle.load(f)
 
 
 def batch_experiences(experiences, xp, phi, gamma, batch_states=batch_states):
@@ -460,6 +1379,8 @@ def batch_experiences(experiences, xp, phi, gamma, batch_states=batch_states):
               - reward (float): Reward
               - is_state_terminal (bool): True iff next state is terminal
               - next_state (object): Next state
+            It can also be a dict of batched arrays sampled from
+            DeviceReplayBuffer.
         xp : Numpy compatible matrix library: e.g. Numpy or CuPy.
         phi : Preprocessing function
         gamma: discount factor
@@ -468,6 +1389,19 @@ def batch_experiences(experiences, xp, phi, gamma, batch_states=batch_states):
         dict of batched transitions
     """
 
+    if isinstance(experiences, dict):
+        # Already batched by DeviceReplayBuffer, where phi is not applied
+        discounts = gamma ** xp.arange(
+            experiences['reward'].shape[1], dtype=np.float32)
+        return {
+            'state': experiences['state'],
+            'action': experiences['action'],
+            'reward': experiences['reward'].dot(discounts),
+            'next_state': experiences['next_state'],
+            'is_state_terminal': experiences['is_state_terminal'],
+            'discount': (gamma ** experiences['n_steps']).astype(np.float32),
+        }
+
     batch_exp = {
         'state': batch_states(
             [elem[0]['state'] for elem in experiences], xp, phi),
@@ -507,11 +1441,13 @@ class ReplayUpdater(object):
         episodic_update (bool): Use full episodes for update if set True
         episodic_update_len (int or None): Subsequences of this length are used
             for update if set int and episodic_update=True
+        phase_timer (PhaseTimer or None): If set, time spent in sampling is
+            measured as 'replay_sample'.
     """
 
     def __init__(self, replay_buffer, update_func, batchsize, episodic_update,
                  n_times_update, replay_start_size, update_interval,
-                 episodic_update_len=None):
+                 episodic_update_len=None, phase_timer=None):
 
         assert batchsize <= replay_start_size
         self.replay_buffer = replay_buffer
@@ -522,6 +1458,9 @@ class ReplayUpdater(object):
         self.n_times_update = n_times_update
         self.replay_start_size = replay_start_size
         self.update_interval = update_interval
+        if phase_timer is None:
+            phase_timer = PhaseTimer(enabled=False)
+        self.phase_timer = phase_timer
 
     def update_if_necessary(self, iteration):
         if len(self.replay_buffer) < self.replay_start_size:
@@ -536,9 +1475,11 @@ class ReplayUpdater(object):
 
         for _ in range(self.n_times_update):
             if self.episodic_update:
-                episodes = self.replay_buffer.sample_episodes(
-                    self.batchsize, self.episodic_update_len)
+                with self.phase_timer.measure('replay_sample'):
+                    episodes = self.replay_buffer.sample_episodes(
+                        self.batchsize, self.episodic_update_len)
                 self.update_func(episodes)
             else:
-                transitions = self.replay_buffer.sample(self.batchsize)
+                with self.phase_timer.measure('replay_sample'):
+                    transitions = self.replay_buffer.sample(self.batchsize)
                 self.update_func(transitions)
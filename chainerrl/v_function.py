@@ -8,12 +8,27 @@ standard_library.install_aliases()  # NOQA
 
 from abc import ABCMeta
 from abc import abstractmethod
+import sys
 
 from future.utils import with_metaclass
 
+from chainerrl.lazy_import import install_lazy_attributes
+
 
 class VFunction(with_metaclass(ABCMeta, object)):
 
     @abstractmethod
     def __call__(self, x):
         raise NotImplementedError()
+
+
+# For backward compatibility, classes moved to chainerrl.v_functions can
+# still be accessed from this module. They are imported lazily to avoid
+# circular import. On Python < 3.7, they are set by chainerrl/__init__.py
+# instead.
+_moved_attributes = {
+    'SingleModelVFunction': 'chainerrl.v_functions',
+    'FCVFunction': 'chainerrl.v_functions',
+}
+if sys.version_info >= (3, 7):
+    install_lazy_attributes(__name__, attributes=_moved_attributes)
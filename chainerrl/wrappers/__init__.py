@@ -1,12 +1,13 @@
-from chainerrl.wrappers.cast_observation import CastObservation  # NOQA
-from chainerrl.wrappers.cast_observation import CastObservationToFloat32  # NOQA
-
-from chainerrl.wrappers.continuing_time_limit import ContinuingTimeLimit  # NOQA
-
-from chainerrl.wrappers.randomize_action import RandomizeAction  # NOQA
-
-from chainerrl.wrappers.render import Render  # NOQA
-
-from chainerrl.wrappers.scale_reward import ScaleReward  # NOQA
-
-from chainerrl.wrappers.vector_frame_stack import VectorFrameStack  # NOQA
+from chainerrl.lazy_import import install_lazy_attributes
+
+install_lazy_attributes(__name__, attributes={
+    'CastObservation': 'chainerrl.wrappers.cast_observation',
+    'CastObservationToFloat32': 'chainerrl.wrappers.cast_observation',
+    'ContinuingTimeLimit': 'chainerrl.wrappers.continuing_time_limit',
+    'RandomizeAction': 'chainerrl.wrappers.randomize_action',
+    'Render': 'chainerrl.wrappers.render',
+    'ScaleReward': 'chainerrl.wrappers.scale_reward',
+    'VectorFrameStack': 'chainerrl.wrappers.vector_frame_stack',
+    'VectorClipReward': 'chainerrl.wrappers.vector_atari_wrappers',
+    'VectorWarpFrame': 'chainerrl.wrappers.vector_atari_wrappers',
+})
@@ -259,11 +259,35 @@ class LazyFrames(object):
         self._frames = frames
 
     def __array__(self, dtype=None):
-        out = np.concatenate(self._frames, axis=self.stack_axis)
+        out = self.materialize()
         if dtype is not None:
             out = out.astype(dtype)
         return out
 
+    @property
+    def shape(self):
+        shape = list(self._frames[0].shape)
+        shape[self.stack_axis] = sum(
+            frame.shape[self.stack_axis] for frame in self._frames)
+        return tuple(shape)
+
+    @property
+    def dtype(self):
+        return self._frames[0].dtype
+
+    def materialize(self, out=None):
+        """Concatenate frames into a numpy.ndarray.
+
+        Args:
+            out (numpy.ndarray or None): If specified, frames are written
+                into it directly instead of a newly allocated array. It can be
+                a slice of a larger array, e.g. a row of a batch.
+
+        Returns:
+            numpy.ndarray: Concatenated frames.
+        """
+        return np.concatenate(self._frames, axis=self.stack_axis, out=out)
+
 
 def make_atari(env_id, max_frames=30 * 60 * 60):
     env = gym.make(env_id)
@@ -0,0 +1,108 @@
+"""VectorEnv analogs to some of `chainerrl.wrappers.atari_wrappers`.
+
+These wrappers process the observations or rewards of all the envs of a
+VectorEnv at once instead of wrapping each env by a gym.Wrapper.
+
+Frame skipping with max-pooling (`MaxAndSkipEnv`) needs every intermediate
+frame of the emulator, so it should still be applied to each env before
+vectorization.
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+from gym import spaces
+import numpy as np
+
+from chainerrl.wrappers import atari_wrappers
+from chainerrl.wrappers.vector_frame_stack import VectorEnvWrapper
+
+
+class VectorWarpFrame(VectorEnvWrapper):
+    """VectorEnv analog to chainerrl.wrappers.atari_wrappers.WarpFrame.
+
+    Frames of all the envs are warped into a single preallocated batch array,
+    whose rows are returned as observations, so that a step allocates only
+    one array for observations. Observations are the same as those of
+    `WarpFrame`. On reset with a mask, only the frames of envs that are
+    actually reset are warped, and the last observations are reused for the
+    others.
+
+    Since this wrapper processes raw frames in the process that owns the
+    VectorEnv, it is meant for `chainerrl.envs.SerialVectorEnv` only. With
+    `chainerrl.envs.MultiprocessVectorEnv`, wrap each env by `WarpFrame`
+    instead and pass the observation space of `WarpFrame` to
+    `MultiprocessVectorEnv` so that subprocesses warp frames and write them
+    into a batch array in shared memory.
+
+    To use this wrapper, OpenCV-Python is required.
+
+    Args:
+        env (VectorEnv): Env to wrap.
+        channel_order (str): 'hwc' or 'chw'.
+    """
+
+    def __init__(self, env, channel_order='hwc'):
+        if not atari_wrappers._is_cv2_available:
+            raise RuntimeError('Cannot import cv2 module. Please install OpenCV-Python to use VectorWarpFrame.')  # NOQA
+        VectorEnvWrapper.__init__(self, env)
+        self.width = 84
+        self.height = 84
+        shape = {
+            'hwc': (self.height, self.width, 1),
+            'chw': (1, self.height, self.width),
+        }
+        self.observation_space = spaces.Box(
+            low=0, high=255,
+            shape=shape[channel_order], dtype=np.uint8)
+        # Warped observations of the last reset or step
+        self._last_batch_ob = None
+
+    def reset(self, mask=None):
+        batch_frame = self.env.reset(mask=mask)
+        if mask is None or self._last_batch_ob is None:
+            batch_ob = self._observation(batch_frame)
+        else:
+            # Only the frames of envs that are actually reset are warped
+            batch_ob = list(self._last_batch_ob)
+            indices = [i for i, m in enumerate(mask) if not m]
+            if indices:
+                warped = self._observation(
+                    [batch_frame[i] for i in indices])
+                for i, ob in zip(indices, warped):
+                    batch_ob[i] = ob
+        self._last_batch_ob = batch_ob
+        return batch_ob
+
+    def step(self, action):
+        batch_frame, reward, done, info = self.env.step(action)
+        self._last_batch_ob = self._observation(batch_frame)
+        return self._last_batch_ob, reward, done, info
+
+    def _observation(self, batch_frame):
+        cv2 = atari_wrappers.cv2
+        out = np.empty(
+            (len(batch_frame), self.height, self.width), dtype=np.uint8)
+        for frame, dst in zip(batch_frame, out):
+            cv2.resize(cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY),
+                       (self.width, self.height), dst=dst,
+                       interpolation=cv2.INTER_AREA)
+        return list(out.reshape(
+            (len(batch_frame),) + self.observation_space.low.shape))
+
+
+class VectorClipReward(VectorEnvWrapper):
+    """VectorEnv analog to chainerrl.wrappers.atari_wrappers.ClipRewardEnv.
+
+    Rewards of all the envs are binned to {+1, 0, -1} by their signs at once.
+
+    Args:
+        env (VectorEnv): Env to wrap.
+    """
+
+    def step(self, action):
+        batch_ob, reward, done, info = self.env.step(action)
+        return batch_ob, np.sign(reward), done, info
@@ -27,6 +27,7 @@ from chainerrl import misc
 from chainerrl.optimizers.nonbias_weight_decay import NonbiasWeightDecay
 from chainerrl.optimizers import rmsprop_async
 from chainerrl.replay_buffer import EpisodicReplayBuffer
+from chainerrl.replay_buffer import SharedEpisodicReplayBuffer
 
 from chainerrl.wrappers import atari_wrappers
 
@@ -44,6 +45,13 @@ def main():
     parser.add_argument('--t-max', type=int, default=5)
     parser.add_argument('--replay-start-size', type=int, default=10000)
     parser.add_argument('--n-times-replay', type=int, default=4)
+    parser.add_argument('--shared-replay-buffer', action='store_true',
+                        default=False,
+                        help='Use a replay buffer of 10 ** 6 transitions'
+                             ' shared by processes instead of one of'
+                             ' 10 ** 6 / processes transitions for each'
+                             ' process. It allocates about 9GB of shared'
+                             ' memory at once.')
     parser.add_argument('--beta', type=float, default=1e-2)
     parser.add_argument('--profile', action='store_true')
     parser.add_argument('--steps', type=int, default=10 ** 7)
@@ -113,7 +121,14 @@ def main():
     opt.add_hook(chainer.optimizer.GradientClipping(40))
     if args.weight_decay > 0:
         opt.add_hook(NonbiasWeightDecay(args.weight_decay))
-    replay_buffer = EpisodicReplayBuffer(10 ** 6 // args.processes)
+    if args.shared_replay_buffer:
+        # Frames of observations are stored once apart from transitions,
+        # and an episode of n steps has n + 1 frames
+        replay_buffer = SharedEpisodicReplayBuffer(
+            10 ** 6, slot_size=2 ** 10, frame_size=84 * 84,
+            frame_capacity=11 * 10 ** 5)
+    else:
+        replay_buffer = EpisodicReplayBuffer(10 ** 6 // args.processes)
 
     def phi(x):
         # Feature extractor
@@ -162,9 +162,11 @@ def main():
         return env
 
     def make_batch_env(test):
+        # Frames warped by subprocesses are passed through shared memory
         vec_env = chainerrl.envs.MultiprocessVectorEnv(
             [functools.partial(make_env, idx, test)
-             for idx, env in enumerate(range(args.num_envs))])
+             for idx, env in enumerate(range(args.num_envs))],
+            observation_space=sample_env.observation_space)
         vec_env = chainerrl.wrappers.VectorFrameStack(vec_env, 4)
         return vec_env
 
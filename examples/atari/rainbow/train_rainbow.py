@@ -39,6 +39,10 @@ def main():
     parser.add_argument('--use-sdl', action='store_true', default=False)
     parser.add_argument('--eval-epsilon', type=float, default=0.0)
     parser.add_argument('--noisy-net-sigma', type=float, default=0.5)
+    parser.add_argument('--noisy-net-mode', type=str, default='call',
+                        choices=['call', 'cached'],
+                        help='Resample noise of noisy nets for every call'
+                             ' or only once per update.')
     parser.add_argument('--steps', type=int, default=5 * 10 ** 7)
     parser.add_argument('--max-frames', type=int,
                         default=30 * 60 * 60,  # 30 minutes with 60 fps
@@ -99,7 +103,8 @@ def main():
     q_func = DistributionalDuelingDQN(n_actions, n_atoms, v_min, v_max,)
 
     # Noisy nets
-    links.to_factorized_noisy(q_func, sigma_scale=args.noisy_net_sigma)
+    links.to_factorized_noisy(q_func, sigma_scale=args.noisy_net_sigma,
+                              noise_mode=args.noisy_net_mode)
     # Turn off explorer
     explorer = explorers.Greedy()
 
@@ -151,6 +156,10 @@ def main():
             eval_stats['stdev']))
 
     else:
+        step_hooks = []
+        if args.noisy_net_mode == 'cached':
+            step_hooks.append(
+                experiments.NoiseResamplingHook(update_interval))
         experiments.train_agent_with_evaluation(
             agent=agent, env=env, steps=args.steps,
             eval_n_steps=args.eval_n_steps,
@@ -159,6 +168,7 @@ def main():
             outdir=args.outdir,
             save_best_so_far_agent=True,
             eval_env=eval_env,
+            step_hooks=step_hooks,
         )
 
         dir_of_best_network = os.path.join(args.outdir, "best")
@@ -17,9 +17,12 @@ from chainer import functions as F
 from chainer import links as L
 from chainer import testing
 
+import chainerrl
 from chainerrl.agents import a3c
 from chainerrl.envs.abc import ABC
+from chainerrl.experiments.evaluator import batch_run_evaluation_episodes
 from chainerrl.experiments.train_agent_async import train_agent_async
+from chainerrl.misc import async_
 from chainerrl import policies
 from chainerrl import v_function
 
@@ -199,3 +202,98 @@ class TestA3C(unittest.TestCase):
             if require_success:
                 self.assertAlmostEqual(total_r, 1)
             agent.stop_episode()
+
+
+@testing.parameterize(*testing.product({
+    't_max': [1, 5],
+    'discrete': [True, False],
+    'episodic': [True, False],
+}))
+class TestBatchA3C(unittest.TestCase):
+
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+        logging.basicConfig(level=logging.DEBUG)
+
+    @testing.attr.slow
+    def test_abc(self):
+        self._test_abc(steps=100000, require_success=True)
+
+    def test_abc_fast(self):
+        self._test_abc(steps=100, require_success=False)
+
+    def _test_abc(self, steps, require_success):
+
+        nproc = 2
+        num_envs = 2
+
+        def make_env(process_idx, test):
+            return chainerrl.envs.SerialVectorEnv([
+                ABC(size=2, discrete=self.discrete,
+                    episodic=self.episodic or test, deterministic=test)
+                for _ in range(num_envs)])
+
+        sample_env = ABC(size=2, discrete=self.discrete)
+        action_space = sample_env.action_space
+        obs_space = sample_env.observation_space
+
+        n_hidden_channels = 20
+        if self.discrete:
+            pi = policies.FCSoftmaxPolicy(
+                obs_space.low.size, action_space.n,
+                n_hidden_channels=n_hidden_channels,
+                n_hidden_layers=2,
+                nonlinearity=F.tanh,
+                last_wscale=1e-1,
+            )
+        else:
+            pi = policies.FCGaussianPolicy(
+                obs_space.low.size, action_space.low.size,
+                n_hidden_channels=n_hidden_channels,
+                n_hidden_layers=2,
+                nonlinearity=F.tanh,
+                mean_wscale=1e-1,
+            )
+        model = a3c.A3CSeparateModel(
+            pi=pi,
+            v=v_function.FCVFunction(
+                obs_space.low.size,
+                n_hidden_channels=n_hidden_channels,
+                n_hidden_layers=2,
+                nonlinearity=F.tanh,
+                last_wscale=1e-1,
+            ),
+        )
+        opt = chainer.optimizers.Adam()
+        opt.setup(model)
+        opt.add_hook(chainer.optimizer_hooks.GradientClipping(1))
+        agent = a3c.A3C(model, opt, t_max=self.t_max, gamma=0.8, beta=1e-2,
+                        act_deterministically=True)
+
+        with warnings.catch_warnings(record=True) as warns:
+            train_agent_async(
+                outdir=self.outdir, processes=nproc, make_env=make_env,
+                agent=agent, steps=steps,
+                max_episode_len=None if self.episodic else 2,
+                eval_interval=500,
+                eval_n_steps=None,
+                eval_n_episodes=5,
+                successful_score=1)
+            # There should be no AbnormalExitWarning
+            self.assertEqual(
+                sum(1 if issubclass(
+                    w.category, async_.AbnormalExitWarning) else 0
+                    for w in warns), 0)
+
+        if require_success:
+            agent.load(os.path.join(self.outdir, 'successful'))
+
+        # Test
+        env = make_env(0, True)
+        scores = batch_run_evaluation_episodes(
+            env, agent, n_steps=None, n_episodes=5)
+        env.close()
+        self.assertEqual(len(scores), 5)
+        if require_success:
+            for score in scores:
+                self.assertAlmostEqual(score, 1)
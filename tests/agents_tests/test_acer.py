@@ -23,7 +23,9 @@ import numpy as np
 import chainerrl
 from chainerrl.agents import acer
 from chainerrl.envs.abc import ABC
+from chainerrl.experiments.evaluator import batch_run_evaluation_episodes
 from chainerrl.experiments.train_agent_async import train_agent_async
+from chainerrl.misc import async_
 from chainerrl.optimizers import rmsprop_async
 from chainerrl import policies
 from chainerrl import q_function
@@ -510,3 +512,113 @@ class TestACER(unittest.TestCase):
             if require_success:
                 self.assertAlmostEqual(total_r, 1)
             agent.stop_episode()
+
+
+@testing.parameterize(*testing.product({
+    'discrete': [True, False],
+    'episodic': [True, False],
+    'n_times_replay': [0, 2],
+}))
+class TestBatchACER(unittest.TestCase):
+
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+        logging.basicConfig(level=logging.DEBUG)
+
+    @testing.attr.slow
+    def test_abc(self):
+        self._test_abc(steps=100000, require_success=True)
+
+    def test_abc_fast(self):
+        self._test_abc(steps=100, require_success=False)
+
+    def _test_abc(self, steps, require_success):
+
+        nproc = 2
+        num_envs = 2
+
+        def make_env(process_idx, test):
+            return chainerrl.envs.SerialVectorEnv([
+                ABC(size=2, discrete=self.discrete,
+                    episodic=self.episodic or test, deterministic=test)
+                for _ in range(num_envs)])
+
+        sample_env = ABC(size=2, discrete=self.discrete)
+        action_space = sample_env.action_space
+        obs_space = sample_env.observation_space
+
+        n_hidden_channels = 20
+        n_hidden_layers = 1
+        nonlinearity = F.leaky_relu
+        if self.discrete:
+            model = acer.ACERSeparateModel(
+                pi=policies.FCSoftmaxPolicy(
+                    obs_space.low.size, action_space.n,
+                    n_hidden_channels=n_hidden_channels,
+                    n_hidden_layers=n_hidden_layers,
+                    nonlinearity=nonlinearity,
+                    min_prob=1e-1),
+                q=q_function.FCStateQFunctionWithDiscreteAction(
+                    obs_space.low.size, action_space.n,
+                    n_hidden_channels=n_hidden_channels,
+                    n_hidden_layers=n_hidden_layers,
+                    nonlinearity=nonlinearity),
+            )
+        else:
+            model = acer.ACERSDNSeparateModel(
+                pi=policies.FCGaussianPolicy(
+                    obs_space.low.size, action_space.low.size,
+                    n_hidden_channels=n_hidden_channels,
+                    n_hidden_layers=n_hidden_layers,
+                    bound_mean=True,
+                    min_action=action_space.low,
+                    max_action=action_space.high,
+                    nonlinearity=nonlinearity,
+                    min_var=1e-1),
+                v=v_function.FCVFunction(
+                    obs_space.low.size,
+                    n_hidden_channels=n_hidden_channels,
+                    n_hidden_layers=n_hidden_layers,
+                    nonlinearity=nonlinearity),
+                adv=q_function.FCSAQFunction(
+                    obs_space.low.size, action_space.low.size,
+                    n_hidden_channels=n_hidden_channels,
+                    n_hidden_layers=n_hidden_layers,
+                    nonlinearity=nonlinearity),
+            )
+        opt = rmsprop_async.RMSpropAsync(lr=1e-3, eps=1e-8, alpha=0.99)
+        opt.setup(model)
+        agent = acer.ACER(
+            model, opt, replay_buffer=EpisodicReplayBuffer(10 ** 4),
+            t_max=5, gamma=0.5, beta=1e-5,
+            n_times_replay=self.n_times_replay,
+            act_deterministically=True,
+            replay_start_size=100)
+
+        with warnings.catch_warnings(record=True) as warns:
+            train_agent_async(
+                outdir=self.outdir, processes=nproc, make_env=make_env,
+                agent=agent, steps=steps,
+                max_episode_len=None if self.episodic else 2,
+                eval_interval=500,
+                eval_n_steps=None,
+                eval_n_episodes=5,
+                successful_score=1)
+            # There should be no AbnormalExitWarning
+            self.assertEqual(
+                sum(1 if issubclass(
+                    w.category, async_.AbnormalExitWarning) else 0
+                    for w in warns), 0)
+
+        if require_success:
+            agent.load(os.path.join(self.outdir, 'successful'))
+
+        # Test
+        env = make_env(0, True)
+        scores = batch_run_evaluation_episodes(
+            env, agent, n_steps=None, n_episodes=5)
+        env.close()
+        self.assertEqual(len(scores), 5)
+        if require_success:
+            for score in scores:
+                self.assertAlmostEqual(score, 1)
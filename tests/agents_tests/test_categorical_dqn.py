@@ -53,6 +53,49 @@ def _apply_categorical_projection_naive(y, y_probs, z):
     return proj_probs
 
 
+def _apply_categorical_projection_scatter(y, y_probs, z):
+    """Categorical projection by np.add.at for checking results."""
+    batch_size, n_atoms = y.shape
+    delta_z = z[1] - z[0]
+    bj = np.clip((np.clip(y, z[0], z[-1]) - z[0]) / delta_z, 0, n_atoms - 1)
+    l, u = np.floor(bj), np.ceil(bj)
+    offset = np.arange(0, batch_size * n_atoms, n_atoms)[:, None]
+    proj_probs = np.zeros((batch_size, n_atoms), dtype=np.float32)
+    np.add.at(proj_probs.ravel(), (l.astype(np.int32) + offset).ravel(),
+              (y_probs * (1 - (bj - l))).ravel())
+    np.add.at(proj_probs.ravel(), (u.astype(np.int32) + offset).ravel(),
+              (y_probs * (bj - l)).ravel())
+    return proj_probs
+
+
+@testing.parameterize(
+    *testing.product({
+        'batch_size': [32, 256],
+        'v_range': [(-10, 10), (0, 1)],
+    })
+)
+class TestApplyCategoricalProjectionToLargeCases(unittest.TestCase):
+
+    def test_cpu(self):
+        n_atoms = 51
+        v_min, v_max = self.v_range
+        z = np.linspace(v_min, v_max, num=n_atoms, dtype=np.float32)
+        y = np.random.normal(
+            scale=v_max - v_min,
+            size=(self.batch_size, n_atoms)).astype(np.float32)
+        # Values exactly on atoms and both ends
+        y[:, :3] = z[[0, n_atoms // 2, -1]]
+        y_probs = np.random.dirichlet(
+            alpha=np.ones(n_atoms),
+            size=self.batch_size).astype(np.float32)
+
+        proj = categorical_dqn._apply_categorical_projection(y, y_probs, z)
+        self.assertEqual(proj.dtype, np.float32)
+        np.testing.assert_allclose(
+            proj, _apply_categorical_projection_scatter(y, y_probs, z),
+            atol=1e-6)
+
+
 @testing.parameterize(
     *testing.product({
         'batch_size': [1, 7],
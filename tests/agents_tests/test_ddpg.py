@@ -6,7 +6,10 @@ from builtins import *  # NOQA
 from future import standard_library
 standard_library.install_aliases()  # NOQA
 
+from chainer import optimizers
+
 import basetest_ddpg as base
+import chainerrl
 from chainerrl.agents.ddpg import DDPG
 
 from basetest_training import _TestBatchTrainingMixin
@@ -32,3 +35,17 @@ class TestDDPGOnContinuousABC(_TestBatchTrainingMixin,
                     explorer=explorer, replay_start_size=100,
                     target_update_method='soft', target_update_interval=1,
                     episodic_update=False)
+
+    def test_phi_checked(self):
+        env, _ = self.make_env_and_successful_return(test=False)
+        model = self.make_model(env)
+        actor_opt = optimizers.Adam().setup(model['policy'])
+        critic_opt = optimizers.Adam().setup(model['q_function'])
+        rbuf = chainerrl.replay_buffer.DeviceReplayBuffer(10 ** 5)
+        # phi is not applied to states sampled from DeviceReplayBuffer
+        with self.assertRaises(ValueError):
+            DDPG(model, actor_opt, critic_opt, rbuf, gamma=0.9,
+                 explorer=None, replay_start_size=100,
+                 phi=lambda x: x * 2)
+        DDPG(model, actor_opt, critic_opt, rbuf, gamma=0.9, explorer=None,
+             replay_start_size=100)
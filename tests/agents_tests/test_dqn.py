@@ -5,6 +5,7 @@ from __future__ import absolute_import
 from future import standard_library
 from builtins import *  # NOQA
 standard_library.install_aliases()  # NOQA
+import tempfile
 import unittest
 
 from chainer import testing
@@ -36,6 +37,20 @@ class TestDQNOnDiscreteABC(
             self.make_dqn_agent(env=env, q_func=q_func, opt=opt,
                                 explorer=explorer, rbuf=rbuf, gpu=None)
 
+    def test_phase_timer(self):
+        env, _ = self.make_env_and_successful_return(test=False)
+        agent = self.make_agent(env, gpu=None)
+        self.assertFalse(agent.phase_timer.enabled)
+        agent.phase_timer.enabled = True
+        chainerrl.experiments.train_agent(
+            agent, env, steps=200, outdir=tempfile.mkdtemp())
+        stats = dict(agent.get_statistics())
+        for name in ('env_step', 'act_forward', 'target_sync',
+                     'replay_append', 'replay_sample', 'batch',
+                     'loss_forward', 'loss_backward', 'optimizer_update'):
+            self.assertIn('{}_ms'.format(name), stats)
+            self.assertGreaterEqual(stats['{}_ms'.format(name)], 0)
+
 
 class TestDQNOnDiscreteABCBoltzmann(
         _TestBatchTrainingMixin, base._TestDQNOnDiscreteABC):
@@ -54,6 +69,50 @@ class TestDQNOnContinuousABC(
                    replay_start_size=100, target_update_interval=100)
 
 
+class TestDQNOnDiscreteABCStorePhiInReplay(
+        _TestBatchTrainingMixin, base._TestDQNOnDiscreteABC):
+
+    def make_dqn_agent(self, env, q_func, opt, explorer, rbuf, gpu):
+        return DQN(q_func, opt, rbuf, gpu=gpu, gamma=0.9, explorer=explorer,
+                   replay_start_size=100, target_update_interval=100,
+                   phi=lambda x: x * 2, store_phi_in_replay=True)
+
+    def test_replay_stores_features(self):
+        env, _ = self.make_env_and_successful_return(test=False)
+        agent = self.make_agent(env, gpu=None)
+        obs1 = env.reset()
+        agent.act_and_train(obs1, 0)
+        obs2, r, done, _ = env.step(env.action_space.sample())
+        agent.act_and_train(obs2, r)
+        self.assertEqual(len(agent.replay_buffer), 1)
+        transition = agent.replay_buffer.sample(1)[0][0]
+        np.testing.assert_array_equal(transition['state'], obs1 * 2)
+        np.testing.assert_array_equal(transition['next_state'], obs2 * 2)
+
+
+class TestNStepDQNOnDiscreteABCDeviceReplay(
+        _TestBatchTrainingMixin, base._TestNStepDQNOnDiscreteABC):
+
+    def make_dqn_agent(self, env, q_func, opt, explorer, rbuf, gpu):
+        rbuf = chainerrl.replay_buffer.DeviceReplayBuffer(
+            10 ** 5, num_steps=3, gpu=gpu)
+        return DQN(q_func, opt, rbuf, gpu=gpu, gamma=0.9, explorer=explorer,
+                   replay_start_size=100, target_update_interval=100)
+
+    def test_phi_checked(self):
+        env, _ = self.make_env_and_successful_return(test=False)
+        q_func = self.make_q_func(env)
+        opt = self.make_optimizer(env, q_func)
+        rbuf = chainerrl.replay_buffer.DeviceReplayBuffer(10 ** 5)
+        # phi is not applied to states sampled from DeviceReplayBuffer
+        with self.assertRaises(ValueError):
+            DQN(q_func, opt, rbuf, gamma=0.9, explorer=None,
+                replay_start_size=100, phi=lambda x: x * 2)
+        DQN(q_func, opt, rbuf, gamma=0.9, explorer=None,
+            replay_start_size=100, phi=lambda x: x * 2,
+            store_phi_in_replay=True)
+
+
 # Batch training with recurrent models is currently not supported
 class TestDQNOnDiscretePOABC(base._TestDQNOnDiscretePOABC):
 
@@ -63,6 +122,57 @@ class TestDQNOnDiscretePOABC(base._TestDQNOnDiscretePOABC):
                    episodic_update=True)
 
 
+class TestDQNOnDiscretePOABCPrioritizedWindows(base._TestDQNOnDiscretePOABC):
+
+    def make_replay_buffer(self, env):
+        return chainerrl.replay_buffer.PrioritizedEpisodicReplayBuffer(
+            10 ** 5, window_len=4, eta=0.9)
+
+    def make_dqn_agent(self, env, q_func, opt, explorer, rbuf, gpu):
+        return DQN(q_func, opt, rbuf, gpu=gpu, gamma=0.9, explorer=explorer,
+                   replay_start_size=100, target_update_interval=100,
+                   episodic_update=True)
+
+
+class TestDQNOnDiscretePOABCSequenceReplay(base._TestDQNOnDiscretePOABC):
+
+    def make_replay_buffer(self, env):
+        return chainerrl.replay_buffer.SequenceReplayBuffer(
+            10 ** 5, sequence_len=4, burn_in=2)
+
+    def make_dqn_agent(self, env, q_func, opt, explorer, rbuf, gpu):
+        return DQN(q_func, opt, rbuf, gpu=gpu, gamma=0.9, explorer=explorer,
+                   replay_start_size=100, target_update_interval=100,
+                   minibatch_size=8)
+
+    def test_update_from_stored_states(self):
+        # Episodes longer than sequence_len store states of the LSTM
+        env, _ = self.make_env_and_successful_return(test=False)
+        q_func = self.make_q_func(env)
+        opt = self.make_optimizer(env, q_func)
+        explorer = self.make_explorer(env)
+        rbuf = chainerrl.replay_buffer.SequenceReplayBuffer(
+            10 ** 5, sequence_len=1, burn_in=1)
+        agent = self.make_dqn_agent(env=env, q_func=q_func, opt=opt,
+                                    explorer=explorer, rbuf=rbuf, gpu=None)
+        chainerrl.experiments.train_agent(
+            agent, env, steps=300, outdir=tempfile.mkdtemp())
+        self.assertGreater(agent.optimizer.t, 0)
+        sequences = rbuf.sample(len(rbuf))
+        self.assertTrue(any(seq[0]['recurrent_state'] is not None
+                            for seq in sequences))
+
+    def test_batch_training_not_supported(self):
+        env, _ = self.make_env_and_successful_return(test=False)
+        agent = self.make_agent(env, gpu=None)
+        obs = [env.reset() for _ in range(2)]
+        with self.assertRaises(AssertionError):
+            agent.batch_act_and_train(obs)
+        with self.assertRaises(AssertionError):
+            agent.batch_observe_and_train(
+                obs, [0, 0], [False, False], [False, False])
+
+
 class TestNStepDQNOnDiscreteABC(base._TestNStepDQNOnDiscreteABC):
 
     def make_dqn_agent(self, env, q_func, opt, explorer, rbuf, gpu):
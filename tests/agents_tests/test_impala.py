@@ -0,0 +1,197 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import os
+import tempfile
+import unittest
+
+from chainer import optimizers
+from chainer import testing
+import numpy as np
+
+import chainerrl
+from chainerrl.agents.a2c import A2CSeparateModel
+from chainerrl.agents.impala import compute_vtrace
+from chainerrl.agents.impala import IMPALA
+from chainerrl.envs.abc import ABC
+from chainerrl.experiments.evaluator import batch_run_evaluation_episodes
+from chainerrl import policies
+from chainerrl import v_functions
+
+
+def _compute_vtrace_naive(behavior_log_probs, target_log_probs, rewards,
+                          discounts, values, bootstrap_value, rho_bar, c_bar):
+    # Eq. (1) of https://arxiv.org/abs/1802.01561 written as sums
+    T = len(rewards)
+    rhos = np.exp(target_log_probs - behavior_log_probs)
+    values = np.concatenate([values, bootstrap_value[None]])
+    vs = []
+    for s in range(T):
+        v_s = values[s].copy()
+        for t in range(s, T):
+            coef = np.prod(discounts[s:t], axis=0) * np.prod(
+                np.minimum(c_bar, rhos[s:t]), axis=0)
+            delta = np.minimum(rho_bar, rhos[t]) * (
+                rewards[t] + discounts[t] * values[t + 1] - values[t])
+            v_s += coef * delta
+        vs.append(v_s)
+    return np.asarray(vs)
+
+
+@testing.parameterize(*testing.product({
+    'rho_bar': [1.0, 0.5],
+    'c_bar': [1.0, 0.5],
+}))
+class TestComputeVtrace(unittest.TestCase):
+
+    def test(self):
+        T, B = 5, 3
+        behavior_log_probs = np.log(np.random.uniform(0.1, 1, size=(T, B)))
+        target_log_probs = np.log(np.random.uniform(0.1, 1, size=(T, B)))
+        rewards = np.random.normal(size=(T, B))
+        discounts = 0.9 * (np.random.uniform(size=(T, B)) > 0.2)
+        values = np.random.normal(size=(T, B))
+        bootstrap_value = np.random.normal(size=B)
+
+        vs, advantages = compute_vtrace(
+            behavior_log_probs, target_log_probs, rewards, discounts,
+            values, bootstrap_value, rho_bar=self.rho_bar, c_bar=self.c_bar)
+
+        expected_vs = _compute_vtrace_naive(
+            behavior_log_probs, target_log_probs, rewards, discounts,
+            values, bootstrap_value, rho_bar=self.rho_bar, c_bar=self.c_bar)
+        np.testing.assert_allclose(vs, expected_vs)
+        next_vs = np.concatenate([expected_vs[1:], bootstrap_value[None]])
+        rhos = np.exp(target_log_probs - behavior_log_probs)
+        np.testing.assert_allclose(
+            advantages,
+            np.minimum(self.rho_bar, rhos)
+            * (rewards + discounts * next_vs - values))
+
+
+class TestComputeVtraceOnPolicy(unittest.TestCase):
+
+    def test(self):
+        # V-trace targets are n-step returns for on-policy trajectories
+        T, B = 4, 2
+        log_probs = np.log(np.random.uniform(0.1, 1, size=(T, B)))
+        rewards = np.random.normal(size=(T, B))
+        discounts = np.full((T, B), 0.9)
+        values = np.random.normal(size=(T, B))
+        bootstrap_value = np.random.normal(size=B)
+
+        vs, _ = compute_vtrace(
+            log_probs, log_probs, rewards, discounts, values,
+            bootstrap_value)
+
+        returns = bootstrap_value
+        for t in reversed(range(T)):
+            returns = rewards[t] + discounts[t] * returns
+            np.testing.assert_allclose(vs[t], returns)
+
+
+@testing.parameterize(*testing.product({
+    'num_processes': [1, 3],
+    'discrete': [False, True],
+}))
+class TestIMPALA(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.agent_dirname = os.path.join(self.tmpdir, 'agent_final')
+
+    @testing.attr.slow
+    def test_abc_cpu(self):
+        self._test_abc()
+        self._test_abc(steps=0, load_model=True)
+
+    def test_abc_fast_cpu(self):
+        self._test_abc(steps=100, require_success=False)
+        self._test_abc(steps=0, require_success=False, load_model=True)
+
+    def _test_abc(self, steps=1000000, require_success=True,
+                  load_model=False):
+
+        env, _ = self.make_env_and_successful_return(
+            test=False, n=self.num_processes)
+        test_env, successful_return = self.make_env_and_successful_return(
+            test=True, n=1)
+        agent = self.make_agent(env)
+
+        if load_model:
+            print('Load agent from', self.agent_dirname)
+            agent.load(self.agent_dirname)
+
+        # Train
+        chainerrl.experiments.train_agent_batch_with_evaluation(
+            agent=agent,
+            env=env,
+            steps=steps,
+            outdir=self.tmpdir,
+            log_interval=10,
+            eval_interval=200,
+            eval_n_steps=None,
+            eval_n_episodes=50,
+            successful_score=1,
+            eval_env=test_env,
+        )
+        env.close()
+
+        # Test
+        n_test_runs = 100
+        eval_returns = batch_run_evaluation_episodes(
+            test_env,
+            agent,
+            n_steps=None,
+            n_episodes=n_test_runs,
+        )
+        test_env.close()
+        n_succeeded = np.sum(np.asarray(eval_returns) >= successful_return)
+        if require_success:
+            self.assertGreater(n_succeeded, 0.8 * n_test_runs)
+
+        # Save
+        agent.save(self.agent_dirname)
+
+    def make_agent(self, env):
+        model = make_model(env, self.discrete)
+        opt = optimizers.Adam(alpha=3e-4)
+        opt.setup(model)
+        return IMPALA(model, opt, gamma=0.99, update_steps=5)
+
+    def make_env_and_successful_return(self, test, n):
+
+        def make_env():
+            return ABC(discrete=self.discrete, deterministic=test)
+
+        vec_env = chainerrl.envs.SerialVectorEnv(
+            [make_env() for _ in range(n)])
+        return vec_env, 1
+
+
+def make_model(env, discrete):
+    n_hidden_channels = 50
+
+    n_dim_obs = env.observation_space.low.size
+    v = v_functions.FCVFunction(
+        n_dim_obs,
+        n_hidden_layers=2,
+        n_hidden_channels=n_hidden_channels)
+
+    if discrete:
+        pi = policies.FCSoftmaxPolicy(
+            n_dim_obs, env.action_space.n,
+            n_hidden_layers=2,
+            n_hidden_channels=n_hidden_channels)
+    else:
+        pi = policies.FCGaussianPolicy(
+            n_dim_obs, env.action_space.low.size,
+            n_hidden_layers=2,
+            n_hidden_channels=n_hidden_channels)
+
+    return A2CSeparateModel(pi=pi, v=v)
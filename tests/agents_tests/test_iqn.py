@@ -13,6 +13,7 @@ import numpy as np
 import chainer
 import chainer.functions as F
 import chainer.links as L
+from chainer import gradient_check
 from chainer import testing
 
 import basetest_dqn_like as base
@@ -115,6 +116,29 @@ class TestComputeEltwiseHuberQuantileLoss(unittest.TestCase):
                     )
 
 
+@testing.parameterize(*testing.product({
+    'batch_size': [1, 3],
+    'N': [1, 5],
+    'N_prime': [1, 7],
+}))
+class TestEltwiseHuberQuantileLossBackward(unittest.TestCase):
+
+    def test(self):
+        y = np.random.normal(size=(self.batch_size, self.N))
+        t = np.random.normal(size=(self.batch_size, self.N_prime))
+        taus = np.random.uniform(size=(self.batch_size, self.N))
+        gloss = np.random.normal(
+            size=(self.batch_size, self.N, self.N_prime))
+
+        def f(y):
+            return iqn.compute_eltwise_huber_quantile_loss(
+                y, t, taus, huber_loss_threshold=0.5)
+
+        # float64 is used for numerical accuracy
+        gradient_check.check_backward(
+            f, y, gloss, dtype=np.float64)
+
+
 @testing.parameterize(*testing.product({
     'batch_size': [1, 3],
     'm': [1, 5],
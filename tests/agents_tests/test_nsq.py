@@ -18,6 +18,7 @@ import numpy as np
 import chainerrl
 from chainerrl.agents import nsq
 from chainerrl.envs.abc import ABC
+from chainerrl.experiments.evaluator import batch_run_evaluation_episodes
 from chainerrl.experiments.train_agent_async import train_agent_async
 from chainerrl.misc import async_
 from chainerrl.optimizers import rmsprop_async
@@ -141,3 +142,82 @@ class TestNSQ(unittest.TestCase):
             if require_success:
                 self.assertAlmostEqual(total_r, 1)
             agent.stop_episode()
+
+
+@testing.parameterize(*testing.product({
+    't_max': [1, 5],
+    'episodic': [True, False],
+}))
+class TestBatchNSQ(unittest.TestCase):
+
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+        logging.basicConfig(level=logging.DEBUG)
+
+    @testing.attr.slow
+    def test_abc(self):
+        self._test_abc(steps=100000, require_success=True)
+
+    def test_abc_fast(self):
+        self._test_abc(steps=100, require_success=False)
+
+    def _test_abc(self, steps, require_success):
+
+        nproc = 2
+        num_envs = 2
+
+        def make_env(process_idx, test):
+            return chainerrl.envs.SerialVectorEnv([
+                ABC(episodic=self.episodic or test, deterministic=test)
+                for _ in range(num_envs)])
+
+        sample_env = ABC()
+        action_space = sample_env.action_space
+        obs_space = sample_env.observation_space
+        ndim_obs = obs_space.low.size
+        n_actions = action_space.n
+
+        def random_action_func():
+            return np.random.randint(n_actions)
+
+        def make_agent(process_idx):
+            q_func = FCStateQFunctionWithDiscreteAction(
+                ndim_obs, n_actions,
+                n_hidden_channels=50,
+                n_hidden_layers=2)
+            opt = rmsprop_async.RMSpropAsync(lr=1e-3, eps=1e-2, alpha=0.99)
+            opt.setup(q_func)
+            explorer = chainerrl.explorers.ConstantEpsilonGreedy(
+                0.1, random_action_func)
+            return nsq.NSQ(q_func, opt, t_max=self.t_max,
+                           gamma=0.9, i_target=100,
+                           explorer=explorer)
+
+        with warnings.catch_warnings(record=True) as warns:
+            agent = train_agent_async(
+                outdir=self.outdir, processes=nproc, make_env=make_env,
+                make_agent=make_agent, steps=steps,
+                max_episode_len=5,
+                eval_interval=500,
+                eval_n_steps=None,
+                eval_n_episodes=5,
+                successful_score=1,
+            )
+            # There should be no AbnormalExitWarning
+            self.assertEqual(
+                sum(1 if issubclass(
+                    w.category, async_.AbnormalExitWarning) else 0
+                    for w in warns), 0)
+
+        if require_success:
+            agent.load(os.path.join(self.outdir, 'successful'))
+
+        # Test
+        env = make_env(0, True)
+        scores = batch_run_evaluation_episodes(
+            env, agent, n_steps=None, n_episodes=5)
+        env.close()
+        self.assertEqual(len(scores), 5)
+        if require_success:
+            for score in scores:
+                self.assertAlmostEqual(score, 1)
@@ -20,6 +20,8 @@ import chainerrl
 from chainerrl.agents import a3c
 from chainerrl.agents import pcl
 from chainerrl.envs.abc import ABC
+from chainerrl.experiments.evaluator import batch_run_evaluation_episodes
+from chainerrl.misc import async_
 from chainerrl.optimizers import rmsprop_async
 from chainerrl import policies
 from chainerrl import v_function
@@ -242,3 +244,124 @@ class TestPCL(unittest.TestCase):
             if require_success:
                 self.assertAlmostEqual(total_r, 1)
             agent.stop_episode()
+
+
+@testing.parameterize(*testing.product({
+    't_max': [1, None],
+    'discrete': [True, False],
+    'train_async': [True, False],
+}))
+class TestBatchPCL(unittest.TestCase):
+
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+        logging.basicConfig(level=logging.DEBUG)
+
+    @testing.attr.slow
+    def test_abc(self):
+        self._test_abc(steps=100000, require_success=True)
+
+    def test_abc_fast(self):
+        self._test_abc(steps=100, require_success=False)
+
+    def _test_abc(self, steps, require_success):
+
+        nproc = 2
+        num_envs = 2
+
+        def make_env(process_idx, test):
+            return chainerrl.envs.SerialVectorEnv([
+                ABC(size=2, discrete=self.discrete, episodic=True,
+                    deterministic=test)
+                for _ in range(num_envs)])
+
+        sample_env = ABC(size=2, discrete=self.discrete)
+        action_space = sample_env.action_space
+        obs_space = sample_env.observation_space
+
+        n_hidden_channels = 20
+        n_hidden_layers = 2
+        nonlinearity = F.relu
+        if self.discrete:
+            pi = policies.FCSoftmaxPolicy(
+                obs_space.low.size, action_space.n,
+                n_hidden_channels=n_hidden_channels,
+                n_hidden_layers=n_hidden_layers,
+                nonlinearity=nonlinearity,
+                last_wscale=1e-2,
+            )
+        else:
+            pi = policies.FCGaussianPolicy(
+                obs_space.low.size, action_space.low.size,
+                n_hidden_channels=n_hidden_channels,
+                n_hidden_layers=n_hidden_layers,
+                nonlinearity=nonlinearity,
+                var_wscale=1e-2,
+                var_bias=1,
+                bound_mean=True,
+                min_action=action_space.low,
+                max_action=action_space.high,
+                min_var=1e-1,
+            )
+        model = a3c.A3CSeparateModel(
+            pi=pi,
+            v=v_function.FCVFunction(
+                obs_space.low.size,
+                n_hidden_channels=n_hidden_channels,
+                n_hidden_layers=n_hidden_layers,
+                nonlinearity=nonlinearity,
+                last_wscale=1e-2,
+            ),
+        )
+        opt = rmsprop_async.RMSpropAsync(lr=5e-4, eps=1e-8, alpha=0.99)
+        opt.setup(model)
+        replay_buffer = chainerrl.replay_buffer.EpisodicReplayBuffer(10 ** 5)
+        agent = pcl.PCL(model, opt,
+                        replay_buffer=replay_buffer,
+                        t_max=self.t_max,
+                        gamma=0.5,
+                        tau=1e-2,
+                        n_times_replay=1,
+                        train_async=self.train_async,
+                        act_deterministically=True)
+
+        if self.train_async:
+            with warnings.catch_warnings(record=True) as warns:
+                chainerrl.experiments.train_agent_async(
+                    outdir=self.outdir, processes=nproc, make_env=make_env,
+                    agent=agent, steps=steps,
+                    max_episode_len=2,
+                    eval_interval=200,
+                    eval_n_steps=None,
+                    eval_n_episodes=5,
+                    successful_score=1)
+                # There should be no AbnormalExitWarning
+                self.assertEqual(
+                    sum(1 if issubclass(
+                        w.category, async_.AbnormalExitWarning) else 0
+                        for w in warns), 0)
+            if require_success:
+                agent.load(os.path.join(self.outdir, 'successful'))
+        else:
+            agent.process_idx = 0
+            chainerrl.experiments.train_agent_batch_with_evaluation(
+                agent=agent,
+                env=make_env(0, False),
+                eval_env=make_env(0, True),
+                outdir=self.outdir,
+                steps=steps,
+                max_episode_len=2,
+                eval_interval=200,
+                eval_n_steps=None,
+                eval_n_episodes=5,
+                successful_score=1)
+
+        # Test
+        env = make_env(0, True)
+        scores = batch_run_evaluation_episodes(
+            env, agent, n_steps=None, n_episodes=5)
+        env.close()
+        self.assertEqual(len(scores), 5)
+        if require_success:
+            for score in scores:
+                self.assertAlmostEqual(score, 1)
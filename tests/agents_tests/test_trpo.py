@@ -19,6 +19,8 @@ import numpy as np
 import chainerrl
 from chainerrl.agents import trpo
 from chainerrl.envs.abc import ABC
+from chainerrl.experiments.evaluator import batch_run_evaluation_episodes
+from chainerrl.experiments import train_agent_batch_with_evaluation
 from chainerrl.experiments import train_agent_with_evaluation
 from chainerrl import policies
 from chainerrl import v_functions
@@ -318,3 +320,151 @@ Chainer v{} does not support double backprop of these functions: {}.".format(
             deterministic=test,
         )
         return env, 1
+
+
+@testing.parameterize(*(
+    testing.product({
+        'discrete': [False, True],
+        'episodic': [False, True],
+        'lambd': [0.0, 0.5],
+        'standardize_obs': [False, True],
+    })
+))
+class TestBatchTRPO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.agent_dirname = os.path.join(self.tmpdir, 'agent_final')
+
+    @testing.attr.slow
+    def test_abc_cpu(self):
+        self._test_abc()
+        self._test_abc(steps=0, load_model=True)
+
+    @testing.attr.slow
+    @testing.attr.gpu
+    def test_abc_gpu(self):
+        self._test_abc(gpu=0)
+
+    def test_abc_fast_cpu(self):
+        self._test_abc(steps=100, require_success=False)
+        self._test_abc(steps=0, require_success=False, load_model=True)
+
+    @testing.attr.gpu
+    def test_abc_fast_gpu(self):
+        self._test_abc(steps=100, require_success=False, gpu=0)
+
+    def _test_abc(self, steps=1000000,
+                  require_success=True, gpu=-1, load_model=False,
+                  num_envs=3):
+
+        env, _ = self.make_vec_env_and_successful_return(
+            test=False, num_envs=num_envs)
+        test_env, successful_return = self.make_vec_env_and_successful_return(
+            test=True, num_envs=num_envs)
+        agent = self.make_agent(env, gpu)
+        max_episode_len = None if self.episodic else 2
+
+        if load_model:
+            print('Load agent from', self.agent_dirname)
+            agent.load(self.agent_dirname)
+
+        # Train
+        train_agent_batch_with_evaluation(
+            agent=agent,
+            env=env,
+            steps=steps,
+            outdir=self.tmpdir,
+            eval_interval=200,
+            eval_n_steps=None,
+            eval_n_episodes=50,
+            successful_score=successful_return,
+            eval_env=test_env,
+            log_interval=100,
+            max_episode_len=max_episode_len,
+        )
+        env.close()
+
+        # Test
+        n_test_runs = 100
+        eval_returns = batch_run_evaluation_episodes(
+            test_env,
+            agent,
+            n_steps=None,
+            n_episodes=n_test_runs,
+            max_episode_len=max_episode_len,
+        )
+        test_env.close()
+        n_succeeded = np.sum(np.asarray(eval_returns) >= successful_return)
+        if require_success:
+            self.assertGreater(n_succeeded, 0.8 * n_test_runs)
+
+        # Save
+        agent.save(self.agent_dirname)
+
+    def make_agent(self, env, gpu):
+        n_hidden_channels = 20
+        n_dim_obs = env.observation_space.low.size
+        vf = v_functions.FCVFunction(
+            n_dim_obs,
+            n_hidden_layers=1,
+            n_hidden_channels=n_hidden_channels,
+            nonlinearity=F.tanh,
+            last_wscale=0.01,
+        )
+        if self.discrete:
+            policy = policies.FCSoftmaxPolicy(
+                n_dim_obs, env.action_space.n,
+                n_hidden_layers=1,
+                n_hidden_channels=n_hidden_channels,
+                nonlinearity=F.tanh,
+                last_wscale=0.01,
+            )
+        else:
+            policy = policies.FCGaussianPolicyWithStateIndependentCovariance(
+                n_dim_obs, env.action_space.low.size,
+                n_hidden_layers=1,
+                n_hidden_channels=n_hidden_channels,
+                nonlinearity=F.tanh,
+                mean_wscale=0.01,
+                var_type='diagonal',
+            )
+
+        if gpu >= 0:
+            chainer.cuda.get_device_from_id(gpu).use()
+            policy.to_gpu(gpu)
+            vf.to_gpu(gpu)
+
+        vf_opt = optimizers.Adam()
+        vf_opt.setup(vf)
+
+        if self.standardize_obs:
+            obs_normalizer = chainerrl.links.EmpiricalNormalization(
+                n_dim_obs)
+            if gpu >= 0:
+                obs_normalizer.to_gpu(gpu)
+        else:
+            obs_normalizer = None
+
+        return chainerrl.agents.TRPO(
+            policy=policy,
+            vf=vf,
+            vf_optimizer=vf_opt,
+            obs_normalizer=obs_normalizer,
+            gamma=0.5,
+            lambd=self.lambd,
+            update_interval=64,
+            vf_batch_size=32,
+            act_deterministically=True,
+        )
+
+    def make_vec_env_and_successful_return(self, test, num_envs=3):
+        def make_env():
+            return ABC(
+                discrete=self.discrete,
+                episodic=self.episodic or test,
+                deterministic=test,
+            )
+        vec_env = chainerrl.envs.MultiprocessVectorEnv(
+            [make_env for _ in range(num_envs)])
+        return vec_env, 1
@@ -19,7 +19,8 @@ import chainerrl
     'num_envs': [1, 2, 3],
     'env_id': ['CartPole-v0', 'Pendulum-v0'],
     'random_seed_offset': [0, 100],
-    'vector_env_to_test': ['SerialVectorEnv', 'MultiprocessVectorEnv'],
+    'vector_env_to_test': ['SerialVectorEnv', 'MultiprocessVectorEnv',
+                           'MultiprocessVectorEnvWithSharedObs'],
 }))
 class TestSerialVectorEnv(unittest.TestCase):
 
@@ -32,6 +33,11 @@ class TestSerialVectorEnv(unittest.TestCase):
             self.vec_env = chainerrl.envs.MultiprocessVectorEnv(
                 [(lambda: gym.make(self.env_id))
                  for _ in range(self.num_envs)])
+        elif self.vector_env_to_test == 'MultiprocessVectorEnvWithSharedObs':
+            self.vec_env = chainerrl.envs.MultiprocessVectorEnv(
+                [(lambda: gym.make(self.env_id))
+                 for _ in range(self.num_envs)],
+                observation_space=gym.make(self.env_id).observation_space)
         else:
             assert False
         # Init envs to compare against
@@ -0,0 +1,162 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import os
+import tempfile
+import unittest
+
+import chainer.functions as F
+from chainer import optimizers
+from chainer import testing
+import mock
+import numpy as np
+
+import chainerrl
+from chainerrl.envs.abc import ABC
+from chainerrl.experiments.checkpointer import write_npz
+
+
+def _make_agent():
+    env = ABC(discrete=True)
+    q_func = chainerrl.q_functions.FCStateQFunctionWithDiscreteAction(
+        env.observation_space.low.size, env.action_space.n, 10, 1)
+    opt = optimizers.Adam()
+    opt.setup(q_func)
+    return chainerrl.agents.DQN(
+        q_func, opt, chainerrl.replay_buffer.ReplayBuffer(100),
+        gamma=0.9, explorer=chainerrl.explorers.Greedy(),
+        replay_start_size=100)
+
+
+def _params(link):
+    return {name: param.array.copy()
+            for name, param in link.namedparams()}
+
+
+@testing.parameterize(*testing.product({
+    # 'default' means that compression is not specified
+    'compression': [None, 0, 6, 'default'],
+}))
+class TestAsyncCheckpointer(unittest.TestCase):
+
+    def test_save_and_load(self):
+        outdir = tempfile.mkdtemp()
+        dirname = os.path.join(outdir, 'agent')
+        agent = _make_agent()
+        # Make the optimizer have non-trivial states
+        agent.optimizer.update(
+            lambda: sum(F.sum(p) for p in agent.model.params()))
+        expected = _params(agent.model)
+        if self.compression == 'default':
+            checkpointer = chainerrl.experiments.AsyncCheckpointer()
+        else:
+            checkpointer = chainerrl.experiments.AsyncCheckpointer(
+                compression=self.compression)
+        checkpointer.save(agent, dirname)
+        # Updates after save do not affect the checkpoint
+        for param in agent.model.params():
+            param.array[...] = 0
+        checkpointer.close()
+        self.assertEqual(os.listdir(outdir), ['agent'])
+
+        loaded = _make_agent()
+        loaded.load(dirname)
+        for name, value in _params(loaded.model).items():
+            np.testing.assert_array_equal(value, expected[name])
+        self.assertEqual(loaded.optimizer.t, 1)
+
+        # The result is the same as AttributeSavingMixin.save
+        sync_dirname = os.path.join(outdir, 'sync')
+        agent.load(dirname)
+        agent.save(sync_dirname)
+        self.assertEqual(
+            sorted(os.listdir(dirname)), sorted(os.listdir(sync_dirname)))
+
+
+class TestWriteNpz(unittest.TestCase):
+
+    def test_default_compression(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'a.npz')
+        arrays = {'a': np.arange(1000, dtype=np.float32),
+                  'b/c': np.zeros((3, 4), dtype=np.int64)}
+        write_npz(filename, arrays)
+        with np.load(filename) as loaded:
+            self.assertEqual(sorted(loaded.files), ['a', 'b/c'])
+            for key, value in arrays.items():
+                np.testing.assert_array_equal(loaded[key], value)
+
+
+class TestAsyncCheckpointerRetention(unittest.TestCase):
+
+    def test(self):
+        outdir = tempfile.mkdtemp()
+        agent = _make_agent()
+        checkpointer = chainerrl.experiments.AsyncCheckpointer(
+            n_keep=2, keep_best=True)
+        for i, score in enumerate([1, 3, 2, None, 0]):
+            checkpointer.save(agent, os.path.join(outdir, str(i)),
+                              score=score)
+        checkpointer.save(agent, os.path.join(outdir, 'final'),
+                          permanent=True)
+        checkpointer.close()
+        self.assertEqual(sorted(os.listdir(outdir)),
+                         ['1', '3', '4', 'final'])
+
+    def test_overwrite(self):
+        outdir = tempfile.mkdtemp()
+        dirname = os.path.join(outdir, 'best')
+        agent = _make_agent()
+        checkpointer = chainerrl.experiments.AsyncCheckpointer()
+        checkpointer.save(agent, dirname, permanent=True)
+        for param in agent.model.params():
+            param.array[...] = 1
+        checkpointer.save(agent, dirname, permanent=True)
+        checkpointer.close()
+        self.assertEqual(os.listdir(outdir), ['best'])
+        loaded = _make_agent()
+        loaded.load(dirname)
+        for param in loaded.model.params():
+            np.testing.assert_array_equal(param.array, 1)
+
+    def test_error(self):
+        outdir = tempfile.mkdtemp()
+        filename = os.path.join(outdir, 'file')
+        open(filename, 'w').close()
+        checkpointer = chainerrl.experiments.AsyncCheckpointer()
+        # Directories cannot be made under a file
+        checkpointer.save(_make_agent(), os.path.join(filename, 'agent'))
+        with self.assertRaises(RuntimeError):
+            checkpointer.wait()
+        checkpointer.close()
+
+
+class TestTrainAgentWithCheckpointer(unittest.TestCase):
+
+    def test(self):
+        outdir = tempfile.mkdtemp()
+        agent = mock.Mock()
+        env = mock.Mock()
+        env.reset.side_effect = [('state', 0)] * 2
+        env.step.side_effect = [
+            (('state', 1), 0, False, {}),
+            (('state', 2), 0, True, {}),
+            (('state', 3), 0, False, {}),
+            (('state', 4), 0, False, {}),
+        ]
+        checkpointer = chainerrl.experiments.AsyncCheckpointer(n_keep=1)
+        chainerrl.experiments.train_agent(
+            agent=agent,
+            env=env,
+            steps=4,
+            outdir=outdir,
+            checkpointer=checkpointer,
+            checkpoint_freq=2,
+        )
+        self.assertEqual(agent.save.call_count, 3)
+        self.assertEqual(sorted(os.listdir(outdir)),
+                         ['4_checkpoint', '4_finish'])
+        checkpointer.close()
@@ -5,8 +5,12 @@ from __future__ import absolute_import
 from builtins import *  # NOQA
 from future import standard_library
 standard_library.install_aliases()  # NOQA
+import os
+import tempfile
 import unittest
 
+import chainer
+import mock
 import numpy as np
 
 import chainerrl
@@ -32,3 +36,52 @@ class TestLinearInterpolationHook(unittest.TestCase):
 
         np.testing.assert_allclose(
             buf, np.arange(1, 10 + 1, dtype=np.float32) / 10)
+
+
+class TestNoiseResamplingHook(unittest.TestCase):
+
+    def test_call(self):
+        agent = mock.Mock()
+        agent.saved_attributes = ('model', 'target_model', 'optimizer')
+        agent.model = chainerrl.links.FactorizedNoisyLinear(
+            chainer.links.Linear(3, 2), noise_mode='cached')
+        agent.target_model = chainerrl.links.FactorizedNoisyLinear(
+            chainer.links.Linear(3, 2), noise_mode='cached')
+        agent.optimizer = None
+        x = np.random.standard_normal((1, 3)).astype(np.float32)
+        hook = chainerrl.experiments.NoiseResamplingHook(interval=4)
+        for step in range(1, 9):
+            ys = [agent.model(x).array, agent.target_model(x).array]
+            hook(env=None, agent=agent, step=step)
+            new_ys = [agent.model(x).array, agent.target_model(x).array]
+            for y, new_y in zip(ys, new_ys):
+                # Noises are resampled every 4 steps
+                self.assertEqual(
+                    np.allclose(y, new_y), step % 4 != 0)
+
+
+class TestThroughputHook(unittest.TestCase):
+
+    def test_call(self):
+        outdir = tempfile.mkdtemp()
+        agent = mock.Mock()
+        agent.phase_timer = chainerrl.misc.PhaseTimer(enabled=False)
+        hook = chainerrl.experiments.ThroughputHook(
+            outdir, interval=5, phases=('env_step', 'update'))
+
+        for step in range(1, 12):
+            hook(env=None, agent=agent, step=step)
+            self.assertTrue(agent.phase_timer.enabled)
+            agent.phase_timer.add('env_step', 0.002)
+
+        with open(os.path.join(outdir, 'throughput.csv')) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(
+            lines[0], 'steps,elapsed,steps_per_sec,env_step_ms,update_ms')
+        self.assertEqual(len(lines), 3)
+        for line, step in zip(lines[1:], [6, 11]):
+            values = [float(v) for v in line.split(',')]
+            self.assertEqual(values[0], step)
+            self.assertGreater(values[2], 0)
+            self.assertAlmostEqual(values[3], 2)
+            self.assertEqual(values[4], 0)
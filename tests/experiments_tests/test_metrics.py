@@ -0,0 +1,119 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import collections
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import unittest
+
+from chainer import testing
+import numpy as np
+
+from chainerrl.experiments import metrics
+
+
+def _record(steps, **kwargs):
+    record = collections.OrderedDict([('steps', steps)])
+    record.update(sorted(kwargs.items()))
+    return record
+
+
+def _read_lines(filename):
+    with open(filename) as f:
+        return f.read().splitlines()
+
+
+@testing.parameterize(*testing.product({
+    'columns': [None, ('steps', 'a', 'b')],
+    'flush_every': [1, 3],
+}))
+class TestCSVSink(unittest.TestCase):
+
+    def test_write(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'scores.txt')
+        sink = metrics.CSVSink(filename, columns=self.columns,
+                               delimiter='\t', flush_every=self.flush_every)
+        sink.write(_record(1, a=0.5, b='x'))
+        sink.write(_record(2, a=1.5))
+        if self.flush_every > 1:
+            # Records are still buffered
+            self.assertLessEqual(len(_read_lines(filename)), 1)
+        sink.close()
+        self.assertEqual(_read_lines(filename), [
+            'steps\ta\tb',
+            '1\t0.5\tx',
+            '2\t1.5\t',
+        ])
+
+
+class TestJSONLSink(unittest.TestCase):
+
+    def test_write(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'statistics.jsonl')
+        sink = metrics.JSONLSink(filename, flush_every=10)
+        sink.write(_record(1, a=np.float32(0.5)))
+        sink.write(_record(np.int64(2), b=np.arange(2)))
+        self.assertEqual(_read_lines(filename), [])
+        sink.flush()
+        records = [json.loads(line) for line in _read_lines(filename)]
+        self.assertEqual(records, [
+            {'steps': 1, 'a': 0.5},
+            {'steps': 2, 'b': [0, 1]},
+        ])
+
+
+def _write_from_process(sink, process_idx):
+    for i in range(10):
+        sink.write(_record(i, process_idx=process_idx))
+    sink.flush()
+
+
+@testing.parameterize(*testing.product({
+    'sink_class': [metrics.CSVSink, metrics.JSONLSink],
+}))
+class TestProcessSafeSink(unittest.TestCase):
+
+    def test_write_from_processes(self):
+        filename = os.path.join(tempfile.mkdtemp(), 'out')
+        sink = self.sink_class(filename, flush_every=4, process_safe=True)
+        processes = [mp.Process(target=_write_from_process, args=(sink, i))
+                     for i in range(4)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+        lines = _read_lines(filename)
+        if self.sink_class is metrics.CSVSink:
+            self.assertEqual(lines[0], 'steps,process_idx')
+            rows = [tuple(int(v) for v in line.split(','))
+                    for line in lines[1:]]
+        else:
+            rows = [(r['steps'], r['process_idx'])
+                    for r in (json.loads(line) for line in lines)]
+        self.assertEqual(
+            sorted(rows),
+            sorted((i, p) for i in range(10) for p in range(4)))
+
+
+class TestTensorBoardSink(unittest.TestCase):
+
+    def setUp(self):
+        try:
+            import tensorboardX  # NOQA
+        except ImportError:
+            self.skipTest('tensorboardX is not available')
+
+    def test_write(self):
+        logdir = tempfile.mkdtemp()
+        sink = metrics.TensorBoardSink(logdir, tag_prefix='eval/')
+        sink.write(_record(1, mean=0.5, name='x'))
+        sink.close()
+        self.assertTrue(any(f.startswith('events.out.tfevents')
+                            for f in os.listdir(logdir)))
@@ -54,6 +54,42 @@ class TestTrainAgent(unittest.TestCase):
             # step starts with 1
             self.assertEqual(args[2], i + 1)
 
+    def test_statistics_sinks(self):
+
+        outdir = tempfile.mkdtemp()
+
+        agent = mock.Mock()
+        agent.get_statistics.return_value = [('average_q', 0.5)]
+        env = mock.Mock()
+        env.reset.side_effect = [('state', 0), ('state', 3)]
+        env.step.side_effect = [
+            (('state', 1), 0, False, {}),
+            (('state', 2), 1, True, {}),
+            (('state', 4), 0.5, False, {}),
+            (('state', 5), 1, True, {}),
+        ]
+        sink = mock.Mock()
+
+        chainerrl.experiments.train_agent(
+            agent=agent,
+            env=env,
+            steps=4,
+            outdir=outdir,
+            statistics_sinks=[sink])
+
+        self.assertEqual(sink.write.call_count, 2)
+        for call, steps, episodes, ret in zip(
+                sink.write.call_args_list, [2, 4], [1, 2], [1, 1.5]):
+            record, = call[0]
+            self.assertEqual(
+                list(record.keys()),
+                ['steps', 'episodes', 'elapsed', 'return', 'average_q'])
+            self.assertEqual(record['steps'], steps)
+            self.assertEqual(record['episodes'], episodes)
+            self.assertEqual(record['return'], ret)
+            self.assertEqual(record['average_q'], 0.5)
+        self.assertEqual(sink.flush.call_count, 1)
+
     def test_needs_reset(self):
 
         outdir = tempfile.mkdtemp()
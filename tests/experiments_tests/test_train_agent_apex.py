@@ -0,0 +1,122 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import os
+import tempfile
+import unittest
+
+from chainer import optimizers
+from chainer import testing
+import numpy as np
+
+import chainerrl
+from chainerrl.envs.abc import ABC
+from chainerrl.experiments.train_agent_apex import apex_epsilons
+from chainerrl.experiments.train_agent_apex import train_agent_apex
+
+
+class TestApexEpsilons(unittest.TestCase):
+
+    def test(self):
+        epsilons = apex_epsilons(8)
+        self.assertEqual(len(epsilons), 8)
+        self.assertAlmostEqual(epsilons[0], 0.4)
+        self.assertAlmostEqual(epsilons[-1], 0.4 ** 8)
+        self.assertTrue(np.all(np.diff(epsilons) < 0))
+
+    def test_one_actor(self):
+        np.testing.assert_allclose(apex_epsilons(1), [0.4])
+
+
+def _make_agent(rbuf):
+    env = ABC(discrete=True)
+    q_func = chainerrl.q_functions.FCStateQFunctionWithDiscreteAction(
+        env.observation_space.low.size, env.action_space.n, 10, 10)
+    opt = optimizers.Adam(1e-2)
+    opt.setup(q_func)
+    explorer = chainerrl.explorers.ConstantEpsilonGreedy(
+        0.1, env.action_space.sample)
+    return chainerrl.agents.DQN(
+        q_func, opt, rbuf, gamma=0.9, explorer=explorer,
+        replay_start_size=100, target_update_interval=10)
+
+
+@testing.parameterize(*testing.product({
+    'prioritized': [True, False],
+    'num_steps': [1, 3],
+    'max_episode_len': [None, 2],
+}))
+class TestTrainAgentApex(unittest.TestCase):
+
+    def test(self):
+        outdir = tempfile.mkdtemp()
+        steps = 1000
+        if self.prioritized:
+            rbuf = chainerrl.replay_buffer.PrioritizedReplayBuffer(
+                10 ** 5, num_steps=self.num_steps)
+        else:
+            rbuf = chainerrl.replay_buffer.ReplayBuffer(
+                10 ** 5, num_steps=self.num_steps)
+        agent = _make_agent(rbuf)
+
+        def make_env(process_idx, test):
+            return ABC(discrete=True, deterministic=test)
+
+        hook = chainerrl.experiments.LinearInterpolationHook(
+            steps, 1e-2, 0, lambda env, agent, value: setattr(
+                agent.optimizer, 'alpha', value))
+
+        train_agent_apex(
+            agent=agent,
+            make_env=make_env,
+            steps=steps,
+            outdir=outdir,
+            actors=2,
+            eval_n_steps=None,
+            eval_n_episodes=1,
+            eval_interval=500,
+            max_episode_len=self.max_episode_len,
+            send_interval=10,
+            pull_interval=20,
+            publish_interval=5,
+            log_interval=10,
+            step_hooks=[hook],
+        )
+
+        # Transitions from actors are received until the end
+        self.assertGreater(len(rbuf), 100)
+        self.assertGreater(agent.optimizer.t, 0)
+        self.assertLess(agent.optimizer.alpha, 1e-2)
+        # Initial errors are converted to priorities
+        for experience in rbuf.sample(10):
+            self.assertNotIn('initial_error', experience[0])
+            self.assertNotIn('reset', experience[0])
+        self.assertTrue(os.path.exists(os.path.join(outdir, 'scores.txt')))
+        self.assertTrue(os.path.exists(
+            os.path.join(outdir, '{}_finish'.format(steps))))
+
+
+class TestTrainAgentApexActorFailure(unittest.TestCase):
+
+    def test(self):
+        outdir = tempfile.mkdtemp()
+        agent = _make_agent(chainerrl.replay_buffer.ReplayBuffer(10 ** 5))
+
+        def make_env(process_idx, test):
+            if not test:
+                raise RuntimeError('Failed to make an env')
+            return ABC(discrete=True, deterministic=test)
+
+        with self.assertRaises(RuntimeError):
+            train_agent_apex(
+                agent=agent,
+                make_env=make_env,
+                steps=1000,
+                outdir=outdir,
+                actors=2,
+                eval_interval=None,
+            )
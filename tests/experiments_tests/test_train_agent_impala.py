@@ -0,0 +1,98 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import os
+import tempfile
+import unittest
+
+from chainer import optimizers
+from chainer import testing
+
+import chainerrl
+from chainerrl.agents.a2c import A2CSeparateModel
+from chainerrl.agents.impala import IMPALA
+from chainerrl.envs.abc import ABC
+from chainerrl.experiments.train_agent_impala import train_agent_impala
+from chainerrl import policies
+from chainerrl import v_functions
+
+
+def _make_agent(env):
+    n_dim_obs = env.observation_space.low.size
+    model = A2CSeparateModel(
+        pi=policies.FCSoftmaxPolicy(
+            n_dim_obs, env.action_space.n,
+            n_hidden_layers=1, n_hidden_channels=10),
+        v=v_functions.FCVFunction(
+            n_dim_obs, n_hidden_layers=1, n_hidden_channels=10),
+    )
+    opt = optimizers.Adam(alpha=1e-3)
+    opt.setup(model)
+    return IMPALA(model, opt, gamma=0.9, update_steps=5)
+
+
+@testing.parameterize(*testing.product({
+    'rollouts_per_update': [1, 2],
+    'max_episode_len': [None, 2],
+}))
+class TestTrainAgentImpala(unittest.TestCase):
+
+    def test(self):
+        outdir = tempfile.mkdtemp()
+        steps = 400
+        agent = _make_agent(ABC(discrete=True))
+
+        def make_env(process_idx, test):
+            if test:
+                return ABC(discrete=True, deterministic=True)
+            return chainerrl.envs.SerialVectorEnv(
+                [ABC(discrete=True) for _ in range(2)])
+
+        hook = chainerrl.experiments.LinearInterpolationHook(
+            steps, 1e-3, 0, lambda env, agent, value: setattr(
+                agent.optimizer, 'alpha', value))
+
+        train_agent_impala(
+            agent=agent,
+            make_env=make_env,
+            steps=steps,
+            outdir=outdir,
+            actors=2,
+            rollouts_per_update=self.rollouts_per_update,
+            eval_n_steps=None,
+            eval_n_episodes=1,
+            eval_interval=200,
+            max_episode_len=self.max_episode_len,
+            log_interval=5,
+            step_hooks=[hook],
+        )
+
+        self.assertGreater(agent.optimizer.t, 0)
+        self.assertLess(agent.optimizer.alpha, 1e-3)
+        self.assertTrue(os.path.exists(os.path.join(outdir, 'scores.txt')))
+        self.assertTrue(os.path.exists(
+            os.path.join(outdir, '{}_finish'.format(steps))))
+
+
+class TestTrainAgentImpalaActorFailure(unittest.TestCase):
+
+    def test(self):
+        outdir = tempfile.mkdtemp()
+        agent = _make_agent(ABC(discrete=True))
+
+        def make_env(process_idx, test):
+            raise RuntimeError('Failed to make an env')
+
+        with self.assertRaises(RuntimeError):
+            train_agent_impala(
+                agent=agent,
+                make_env=make_env,
+                steps=400,
+                outdir=outdir,
+                actors=2,
+                eval_interval=None,
+            )
@@ -54,3 +54,22 @@ class TestAdditiveGaussian(unittest.TestCase):
         if self.low is None and self.high is None:
             np.testing.assert_allclose(
                 np.mean(np.asarray(actions), axis=0), .3, atol=.1)
+
+    def test_batch(self):
+
+        def greedy_action_func():
+            return np.full((100, self.action_size), .3)
+
+        explorer = AdditiveGaussian(self.scale, low=self.low, high=self.high)
+        batch_action = explorer.batch_select_action(0, greedy_action_func)
+        self.assertEqual(batch_action.shape, (100, self.action_size))
+
+        if self.low is not None:
+            self.assertTrue((batch_action >= self.low).all())
+        if self.high is not None:
+            self.assertTrue((batch_action <= self.high).all())
+        if self.scale == 0:
+            self.assertTrue((batch_action == .3).all())
+        else:
+            # Noises are independent among envs
+            self.assertGreater(len(np.unique(batch_action[:, 0])), 1)
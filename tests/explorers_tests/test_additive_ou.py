@@ -35,3 +35,26 @@ class TestAdditiveOU(unittest.TestCase):
         for t in range(100):
             a = explorer.select_action(t, greedy_action_func)
             print(t, a)
+
+    def test_batch(self):
+
+        def greedy_action_func():
+            return np.zeros((4, self.action_size), dtype=np.float32)
+
+        if self.sigma_type == 'scalar':
+            sigma = np.random.rand()
+        elif self.sigma_type == 'ndarray':
+            sigma = np.random.rand(self.action_size)
+        theta = np.random.rand()
+
+        explorer = AdditiveOU(theta=theta, sigma=sigma)
+
+        prev = None
+        for t in range(100):
+            batch_action = explorer.batch_select_action(t, greedy_action_func)
+            self.assertEqual(batch_action.shape, (4, self.action_size))
+            # Each env has its own process
+            self.assertGreater(len(np.unique(batch_action[:, 0])), 1)
+            if prev is not None:
+                self.assertFalse((batch_action == prev).all())
+            prev = batch_action
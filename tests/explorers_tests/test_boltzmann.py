@@ -30,6 +30,27 @@ def count_actions_selected_by_boltzmann(T, q_values):
     return action_count
 
 
+def count_actions_batch_selected_by_boltzmann(T, q_values):
+
+    def greedy_action_func():
+        raise RuntimeError('Must not be called')
+
+    explorer = chainerrl.explorers.Boltzmann(T=T)
+    # The same q-values for all the envs of a batch
+    action_value = chainerrl.action_value.DiscreteActionValue(
+        chainer.functions.repeat(q_values, 100, axis=0))
+
+    action_count = [0] * 3
+
+    for t in range(100):
+        batch_action = explorer.batch_select_action(
+            t, greedy_action_func, action_value)
+        for a in batch_action:
+            action_count[a] += 1
+
+    return action_count
+
+
 class TestBoltzmann(unittest.TestCase):
 
     def test_boltzmann(self):
@@ -51,3 +72,14 @@ class TestBoltzmann(unittest.TestCase):
 
         # T=0.5 must be more greedy than T=1
         self.assertGreater(action_count_t05[1], action_count[1])
+
+    def test_batch_boltzmann(self):
+
+        q_values = chainer.Variable(np.asarray([[-1, 1, 0]], dtype=np.float32))
+        for T in [1, 0.5]:
+            action_count = count_actions_batch_selected_by_boltzmann(
+                T, q_values)
+            probs = np.exp(np.asarray([-1, 1, 0]) / T)
+            probs /= probs.sum()
+            np.testing.assert_allclose(
+                np.asarray(action_count) / 10000, probs, atol=0.03)
@@ -8,6 +8,8 @@ standard_library.install_aliases()  # NOQA
 import logging
 import unittest
 
+import numpy as np
+
 from chainerrl.explorers import epsilon_greedy
 
 
@@ -64,3 +66,40 @@ class TestEpsilonGreedy(unittest.TestCase):
             explorer.select_action(t, greedy_action_func)
 
         self.assertAlmostEqual(explorer.epsilon, 0.1)
+
+    def test_batch_constant_epsilon_greedy(self):
+
+        random_action_func_count = [0]
+
+        def random_action_func():
+            random_action_func_count[0] += 1
+            return 0
+
+        # Per-env epsilons
+        explorer = epsilon_greedy.ConstantEpsilonGreedy(
+            [0.0, 1.0, 0.5], random_action_func)
+
+        n_random = np.zeros(3)
+        for t in range(1000):
+            batch_action = explorer.batch_select_action(
+                t, lambda: np.asarray([1, 1, 1]))
+            self.assertEqual(batch_action.shape, (3,))
+            n_random += batch_action == 0
+
+        self.assertEqual(n_random[0], 0)
+        self.assertEqual(n_random[1], 1000)
+        self.assertGreater(n_random[2], 400)
+        self.assertLess(n_random[2], 600)
+        # random_action_func is called only for random actions
+        self.assertEqual(random_action_func_count[0], n_random.sum())
+
+    def test_batch_linear_decay_epsilon_greedy(self):
+
+        explorer = epsilon_greedy.LinearDecayEpsilonGreedy(
+            1.0, [0.0, 1.0], 50, lambda: 0)
+
+        for t in range(100):
+            batch_action = explorer.batch_select_action(
+                t, lambda: np.asarray([1, 1]))
+        np.testing.assert_allclose(explorer.epsilon, [0.0, 1.0])
+        np.testing.assert_array_equal(batch_action, [1, 0])
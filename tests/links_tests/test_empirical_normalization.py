@@ -87,3 +87,44 @@ class TestEmpiricalNormalization(unittest.TestCase):
             self.assertIsInstance(y, np.ndarray)
             y = en(chainer.Variable(np.random.rand(t + 1, 7)))
             self.assertIsInstance(y, chainer.Variable)
+
+    def test_merge(self):
+        # Merging statistics is the same as learning values at once
+        xs = [np.random.normal(loc=t, scale=t + 1, size=(3, t + 1, 4))
+              for t in range(4)]
+        en = empirical_normalization.EmpiricalNormalization(
+            (3, 4), batch_axis=1)
+        en.experience(np.concatenate(xs, axis=1))
+        merged = empirical_normalization.EmpiricalNormalization(
+            (3, 4), batch_axis=1)
+        for x in xs:
+            other = empirical_normalization.EmpiricalNormalization(
+                (3, 4), batch_axis=1)
+            other.experience(x)
+            merged.merge(other.count, other.mean, other.var)
+        self.assertEqual(merged.count, en.count)
+        np.testing.assert_allclose(merged.mean, en.mean)
+        np.testing.assert_allclose(merged.var, en.var)
+
+    def test_precision(self):
+        # Small updates of statistics of values with a large mean are not
+        # lost after many values
+        en = empirical_normalization.EmpiricalNormalization(2)
+        for loc in [1e4, 1e4 + 1]:
+            for _ in range(2000):
+                en.experience(np.random.normal(
+                    loc=loc, scale=0.1, size=(10, 2)).astype(np.float32))
+        np.testing.assert_allclose(en.mean, 1e4 + 0.5, atol=1e-2)
+        np.testing.assert_allclose(en.std, np.sqrt(0.01 + 0.25), rtol=1e-2)
+
+    def test_out(self):
+        en = empirical_normalization.EmpiricalNormalization(
+            5, until=10, clip_threshold=1)
+        en(np.random.normal(loc=2, size=(10, 5)).astype(np.float32))
+        self.assertTrue(en.frozen)
+        x = np.random.normal(loc=2, size=(3, 5)).astype(np.float32)
+        expected = np.clip((x - en.mean) / np.sqrt(en.var + en.eps), -1, 1)
+        np.testing.assert_allclose(en(x), expected, rtol=1e-5, atol=1e-6)
+        y = en(x, out=x)
+        self.assertIs(y, x)
+        np.testing.assert_allclose(y, expected, rtol=1e-5, atol=1e-6)
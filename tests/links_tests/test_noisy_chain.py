@@ -1,7 +1,10 @@
 import unittest
 
 import chainer
+import numpy
 
+from chainerrl.links import resample_noise
+from chainerrl.links import Sequence
 from chainerrl.links import to_factorized_noisy
 
 
@@ -43,3 +46,17 @@ class TestToFactorizedNoisy(unittest.TestCase):
             {
                 '/l1', '/l1/mu', '/l1/sigma',
                 '/l2', '/l2/mu', '/l2/sigma', '/l3'})
+
+
+class TestResampleNoise(unittest.TestCase):
+    def test(self):
+        ch = Sequence(
+            chainer.links.Linear(3, 4),
+            chainer.links.Linear(4, 2),
+        )
+        to_factorized_noisy(ch, noise_mode='cached')
+        x = numpy.random.standard_normal((2, 3)).astype(numpy.float32)
+        y1 = ch(x).array
+        numpy.testing.assert_allclose(ch(x).array, y1)
+        resample_noise(ch)
+        self.assertFalse(numpy.allclose(ch(x).array, y1))
@@ -89,3 +89,59 @@ class TestFactorizedNoisyLinear(unittest.TestCase):
     def test_non_randomness_gpu(self):
         self.linear.to_gpu(0)
         self._test_non_randomness(cuda.cupy)
+
+
+@testing.parameterize(*testing.product({
+    'nobias': [False, True],
+    'noise_mode': ['call', 'sample', 'cached'],
+    # The noisy weight matrix is built only for large batches
+    'batch_size': [2, 10],
+}))
+class TestFactorizedNoisyLinearNoiseMode(unittest.TestCase):
+    def setUp(self):
+        mu = chainer.links.Linear(6, 5, nobias=self.nobias)
+        self.linear = noisy_linear.FactorizedNoisyLinear(
+            mu, noise_mode=self.noise_mode)
+
+    def test_same_as_noisy_weight(self):
+        # Outputs equal those computed by the noisy weight matrix
+        self.linear.noise_mode = 'cached'
+        x = numpy.random.standard_normal(
+            (self.batch_size, 6)).astype(numpy.float32)
+        self.linear.resample_noise()
+        eps_x, eps_y = self.linear._eps_x, self.linear._eps_y
+        W = (self.linear.mu.W.array
+             + self.linear.sigma.W.array * numpy.outer(eps_y, eps_x))
+        expected = x.dot(W.T)
+        if not self.nobias:
+            expected += (self.linear.mu.b.array
+                         + self.linear.sigma.b.array * eps_y)
+        numpy.testing.assert_allclose(
+            self.linear(x).array, expected, rtol=1e-5, atol=1e-5)
+
+    def test_noise(self):
+        x0 = numpy.random.standard_normal((1, 6)).astype(numpy.float32)
+        x = numpy.broadcast_to(x0, (self.batch_size, 6))
+        y1 = self.linear(x).array
+        y2 = self.linear(x).array
+        if self.noise_mode == 'sample':
+            # Noises differ in a batch
+            self.assertFalse(numpy.allclose(y1[0], y1[1]))
+        else:
+            numpy.testing.assert_allclose(y1[0], y1[1], rtol=1e-4)
+        if self.noise_mode == 'cached':
+            # Noises are kept until resampled
+            numpy.testing.assert_allclose(y1, y2)
+            self.linear.resample_noise()
+            y3 = self.linear(x).array
+            self.assertFalse(numpy.allclose(y1, y3))
+        else:
+            self.assertFalse(numpy.allclose(y1, y2))
+
+    def test_backward(self):
+        x = numpy.random.standard_normal(
+            (self.batch_size, 2, 3)).astype(numpy.float32)
+        loss = chainer.functions.sum(self.linear(x))
+        loss.backward()
+        self.assertIsNotNone(self.linear.mu.W.grad)
+        self.assertIsNotNone(self.linear.sigma.W.grad)
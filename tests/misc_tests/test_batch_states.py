@@ -4,6 +4,9 @@ from __future__ import division
 from __future__ import absolute_import
 from future import standard_library
 standard_library.install_aliases()  # NOQA
+import os
+import subprocess
+import sys
 import unittest
 
 import chainer
@@ -11,6 +14,7 @@ from chainer import testing
 import numpy as np
 
 import chainerrl
+from chainerrl.wrappers.atari_wrappers import LazyFrames
 
 
 class TestBatchStates(unittest.TestCase):
@@ -56,3 +60,81 @@ class TestBatchStates(unittest.TestCase):
     @testing.attr.gpu
     def test_gpu(self):
         self._test(chainer.cuda.cupy)
+
+
+class TestBatchStatesNDArrays(unittest.TestCase):
+
+    def _test(self, xp):
+        states = [np.full((2, 3), i, dtype=np.float32) for i in range(4)]
+
+        batch = chainerrl.misc.batch_states(
+            states, xp=xp, phi=lambda x: x * 2)
+        self.assertIsInstance(batch, xp.ndarray)
+        self.assertEqual(batch.shape, (4, 2, 3))
+        self.assertEqual(batch.dtype, np.float32)
+        xp.testing.assert_allclose(
+            batch, xp.asarray(np.stack(states) * 2))
+
+    def test_cpu(self):
+        self._test(np)
+
+    @testing.attr.gpu
+    def test_gpu(self):
+        self._test(chainer.cuda.cupy)
+
+    def test_mixed_dtypes(self):
+        states = [np.zeros(2, dtype=np.float32),
+                  np.ones(2, dtype=np.float64)]
+        batch = chainerrl.misc.batch_states(states, xp=np, phi=lambda x: x)
+        self.assertEqual(batch.dtype, np.float64)
+        np.testing.assert_allclose(batch, [[0, 0], [1, 1]])
+
+    def test_scalars(self):
+        batch = chainerrl.misc.batch_states(
+            [0, 1, 2], xp=np, phi=lambda x: np.float32(x))
+        self.assertEqual(batch.dtype, np.float32)
+        np.testing.assert_allclose(batch, [0, 1, 2])
+
+
+class TestBatchStatesLazyFrames(unittest.TestCase):
+
+    def setUp(self):
+        frames = [np.random.randint(0, 256, size=(1, 4, 4), dtype=np.uint8)
+                  for _ in range(5)]
+        self.states = [LazyFrames(frames[i:i + 3], stack_axis=0)
+                       for i in range(3)]
+        self.expected = np.stack([np.asarray(s) for s in self.states])
+
+    def _test(self, xp):
+        batch = chainerrl.misc.batch_states(
+            self.states, xp=xp, phi=lambda x: x)
+        self.assertIsInstance(batch, xp.ndarray)
+        self.assertEqual(batch.dtype, np.uint8)
+        xp.testing.assert_array_equal(batch, xp.asarray(self.expected))
+
+    def test_cpu(self):
+        self._test(np)
+
+    @testing.attr.gpu
+    def test_gpu(self):
+        self._test(chainer.cuda.cupy)
+
+    def test_phi(self):
+        batch = chainerrl.misc.batch_states(
+            self.states, xp=np,
+            phi=lambda x: np.asarray(x, dtype=np.float32) / 255)
+        self.assertEqual(batch.dtype, np.float32)
+        np.testing.assert_allclose(batch, self.expected / 255, rtol=1e-6)
+
+
+class TestBatchStatesImport(unittest.TestCase):
+
+    def test_no_gym_or_cv2(self):
+        # batch_states is used by every agent, so it must not import
+        # chainerrl.wrappers, which imports gym and cv2
+        code = ('import sys; import chainerrl.misc.batch_states; '
+                'assert "chainerrl.wrappers.atari_wrappers" not in '
+                'sys.modules; assert "cv2" not in sys.modules')
+        # Run where chainerrl of this process is found
+        root = os.path.dirname(os.path.dirname(chainerrl.__file__))
+        subprocess.check_call([sys.executable, '-c', code], cwd=root)
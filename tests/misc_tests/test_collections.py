@@ -10,6 +10,7 @@ import collections
 import unittest
 
 from chainer import testing
+import numpy as np
 
 from chainerrl.misc.collections import RandomAccessQueue
 
@@ -69,6 +70,29 @@ class TestRandomAccessQueue(unittest.TestCase):
         n = len(self.t_queue)
         for i in range(n):
             self.check_getitem(i)
+        self.check_gather()
+        self.check_sample()
+
+    def check_gather(self):
+        n = len(self.t_queue)
+        indices = list(range(n)) + list(reversed(range(n)))
+        self.assertEqual(self.y_queue.gather(np.asarray(indices)),
+                         [self.t_queue[i] for i in indices])
+        with self.assertRaises(IndexError):
+            self.y_queue.gather([n])
+
+    def check_sample(self):
+        n = len(self.t_queue)
+        for replace in [False, True]:
+            samples = self.y_queue.sample(n, replace=replace)
+            self.assertEqual(len(samples), n)
+            for x in samples:
+                self.assertIn(x, self.t_queue)
+        # Sampling by a given rng is reproducible
+        rng_type = getattr(np.random, 'default_rng', np.random.RandomState)
+        self.assertEqual(
+            self.y_queue.sample(n, rng=rng_type(0)),
+            self.y_queue.sample(n, rng=rng_type(0)))
 
     def check_len(self):
         self.assertEqual(len(self.y_queue), len(self.t_queue))
@@ -0,0 +1,84 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import os
+import tempfile
+import unittest
+
+import chainer
+from chainer import links as L
+from chainer import optimizers
+from chainer import testing
+import numpy as np
+
+import chainerrl
+from chainerrl.misc import export_for_inference
+from chainerrl.misc import load_for_inference
+
+
+def _make_model():
+    return chainer.Sequential(
+        L.Linear(3, 4),
+        L.BatchNormalization(4),
+        L.Linear(None, 2),
+    )
+
+
+@testing.parameterize(*testing.product({
+    'mmap_mode': ['r', 'c', None],
+}))
+class TestLoadForInference(unittest.TestCase):
+
+    def test(self):
+        dirname = tempfile.mkdtemp()
+        model = _make_model()
+        x = np.random.rand(5, 3).astype(np.float32)
+        with chainer.using_config('train', True):
+            model(x)
+        model[1].avg_mean[...] = np.random.rand(4)
+        export_for_inference(model, dirname)
+        self.assertEqual(sorted(os.listdir(dirname)),
+                         ['manifest.json', 'params.bin'])
+
+        loaded = load_for_inference(
+            _make_model(), dirname, mmap_mode=self.mmap_mode)
+        with chainer.using_config('train', False):
+            np.testing.assert_array_equal(model(x).array, loaded(x).array)
+        np.testing.assert_array_equal(loaded[1].avg_mean, model[1].avg_mean)
+
+        # Parameters are views of the file, which is not modified
+        weight = loaded[0].W.array
+        self.assertIsInstance(weight, np.ndarray)
+        self.assertEqual(weight.flags.writeable, self.mmap_mode != 'r')
+        if weight.flags.writeable:
+            weight[...] = 0
+        loaded_again = load_for_inference(_make_model(), dirname)
+        np.testing.assert_array_equal(loaded_again[0].W.array,
+                                      model[0].W.array)
+
+
+class TestLoadForInferenceFromAgent(unittest.TestCase):
+
+    def test(self):
+        dirname = tempfile.mkdtemp()
+        q_func = chainerrl.q_functions.FCStateQFunctionWithDiscreteAction(
+            3, 2, 10, 1)
+        opt = optimizers.Adam()
+        opt.setup(q_func)
+        agent = chainerrl.agents.DQN(
+            q_func, opt, chainerrl.replay_buffer.ReplayBuffer(100),
+            gamma=0.9, explorer=chainerrl.explorers.Greedy(),
+            replay_start_size=100)
+        agent.save(dirname)
+
+        # Only model.npz of the agent is loaded
+        loaded = load_for_inference(
+            chainerrl.q_functions.FCStateQFunctionWithDiscreteAction(
+                3, 2, 10, 1), dirname)
+        for (name, a), (_, b) in zip(sorted(q_func.namedparams()),
+                                     sorted(loaded.namedparams())):
+            np.testing.assert_array_equal(a.array, b.array, err_msg=name)
@@ -0,0 +1,127 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import multiprocessing as mp
+import unittest
+
+from chainer import optimizers
+from chainer import testing
+import numpy as np
+
+import chainerrl
+from chainerrl.envs.abc import ABC
+from chainerrl.misc.inference_server import InferenceServer
+
+
+def _make_agent(env):
+    q_func = chainerrl.q_functions.FCStateQFunctionWithDiscreteAction(
+        env.observation_space.low.size, env.action_space.n, 10, 10)
+    opt = optimizers.Adam()
+    opt.setup(q_func)
+    return chainerrl.agents.DQN(
+        q_func, opt, chainerrl.replay_buffer.ReplayBuffer(10 ** 3),
+        gamma=0.9, explorer=chainerrl.explorers.Greedy(),
+        replay_start_size=100)
+
+
+@testing.parameterize(*testing.product({
+    'n_clients': [1, 4],
+    'client_batch_size': [1, 3],
+}))
+class TestInferenceServer(unittest.TestCase):
+
+    def test(self):
+        env = ABC(discrete=True)
+        agent = _make_agent(env)
+        server = InferenceServer(
+            agent, env.observation_space, env.action_space,
+            n_clients=self.n_clients,
+            max_client_batch_size=self.client_batch_size, max_wait=0.01)
+        clients = [server.make_client(i) for i in range(self.n_clients)]
+        n_steps = 20
+        obss = np.random.uniform(
+            size=(self.n_clients, n_steps, self.client_batch_size) +
+            env.observation_space.shape).astype(np.float32)
+        result_queue = mp.Queue()
+
+        def run(client_idx):
+            client = clients[client_idx]
+            actions = [client.batch_act(obs) for obs in obss[client_idx]]
+            result_queue.put((client_idx, actions))
+
+        server.start()
+        processes = [mp.Process(target=run, args=(i,))
+                     for i in range(self.n_clients)]
+        for p in processes:
+            p.start()
+        results = dict(result_queue.get(timeout=60)
+                       for _ in range(self.n_clients))
+        for p in processes:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+        server.stop()
+
+        # Actions are the same as those computed by the agent itself
+        for client_idx, actions in results.items():
+            for obs, action in zip(obss[client_idx], actions):
+                np.testing.assert_array_equal(action, agent.batch_act(obs))
+
+        stats = dict(server.get_statistics())
+        self.assertEqual(stats['n_batches'] * stats['average_batch_size'],
+                         self.n_clients * n_steps * self.client_batch_size)
+        self.assertLessEqual(stats['average_batch_size'],
+                             self.n_clients * self.client_batch_size)
+
+
+class TestInferenceClient(unittest.TestCase):
+
+    def setUp(self):
+        self.env = ABC(discrete=True)
+        self.agent = _make_agent(self.env)
+        self.server = InferenceServer(
+            self.agent, self.env.observation_space, self.env.action_space,
+            n_clients=1, max_client_batch_size=3)
+
+    def test_act_in_same_process(self):
+        client = self.server.make_client(0)
+        obs = self.env.reset()
+        self.server.start()
+        self.assertEqual(client.act(obs), self.agent.act(obs))
+        self.server.stop()
+
+    def test_explorer(self):
+        # Actions other than greedy ones are selected by the explorer
+        client = self.server.make_client(
+            0, explorer=chainerrl.explorers.ConstantEpsilonGreedy(
+                1.0, lambda: -1))
+        self.server.start()
+        self.assertEqual(client.act(self.env.reset()), -1)
+        np.testing.assert_array_equal(
+            client.batch_act([self.env.reset() for _ in range(3)]),
+            [-1, -1, -1])
+        self.server.stop()
+
+    def test_evaluation(self):
+        client = self.server.make_client(0)
+        self.server.start()
+        scores = chainerrl.experiments.evaluator.run_evaluation_episodes(
+            ABC(discrete=True, deterministic=True), client, n_steps=None,
+            n_episodes=2)
+        self.server.stop()
+        self.assertEqual(len(scores), 2)
+
+    def test_stopped_server(self):
+        client = self.server.make_client(0)
+        with self.assertRaises(RuntimeError):
+            self.server.start()
+            self.server.stop()
+            client.act(self.env.reset())
+
+    def test_training_not_supported(self):
+        client = self.server.make_client(0)
+        with self.assertRaises(NotImplementedError):
+            client.act_and_train(self.env.reset(), 0)
@@ -0,0 +1,52 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import time
+import unittest
+
+import mock
+
+from chainerrl.misc.phase_timer import get_phase_timer
+from chainerrl.misc.phase_timer import PhaseTimer
+
+
+class TestPhaseTimer(unittest.TestCase):
+
+    def test_measure(self):
+        timer = PhaseTimer()
+        for _ in range(2):
+            with timer.measure('a'):
+                time.sleep(0.01)
+        with timer.measure('b'):
+            pass
+        self.assertEqual(timer.count, {'a': 2, 'b': 1})
+        self.assertGreaterEqual(timer.total_time['a'], 0.02)
+        stats = timer.get_statistics()
+        self.assertEqual([name for name, _ in stats], ['a_ms', 'b_ms'])
+        self.assertGreaterEqual(stats[0][1], 10)
+
+        timer.reset()
+        self.assertEqual(timer.get_statistics(), [])
+
+    def test_measure_exception(self):
+        timer = PhaseTimer()
+        with self.assertRaises(ValueError):
+            with timer.measure('a'):
+                raise ValueError()
+        self.assertEqual(timer.count, {'a': 1})
+
+    def test_disabled(self):
+        timer = PhaseTimer(enabled=False)
+        with timer.measure('a'):
+            pass
+        self.assertEqual(timer.get_statistics(), [])
+
+    def test_get_phase_timer(self):
+        agent = mock.Mock()
+        self.assertFalse(get_phase_timer(agent).enabled)
+        agent.phase_timer = PhaseTimer()
+        self.assertIs(get_phase_timer(agent), agent.phase_timer)
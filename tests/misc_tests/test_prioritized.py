@@ -107,3 +107,59 @@ class TestSumTree(unittest.TestCase):
 
             k = random.choice(list(d.keys()))
             self.assertEqual(t[k], d[k])
+
+
+@testing.parameterize(*testing.product({
+    'size': [1, 5, 64],
+}))
+class TestPriorityTree(unittest.TestCase):
+
+    def test_set_and_clear(self):
+        tree = prioritized.PriorityTree(self.size)
+        self.assertGreaterEqual(tree.size, self.size)
+        priorities = np.zeros(tree.size)
+        for _ in range(20):
+            slots = np.random.randint(tree.size, size=3)
+            values = np.random.uniform(0.1, 10, size=3)
+            tree.set(slots, values)
+            # The last one is set for duplicated slots
+            for slot, value in zip(slots, values):
+                priorities[slot] = value
+            np.testing.assert_allclose(tree.sum(), priorities.sum())
+            np.testing.assert_allclose(
+                tree.min(), priorities[priorities > 0].min())
+            np.testing.assert_allclose(tree.get(slots), priorities[slots])
+        tree.clear(np.arange(tree.size))
+        self.assertEqual(tree.sum(), 0)
+        self.assertEqual(tree.min(), np.inf)
+
+    def test_find(self):
+        tree = prioritized.PriorityTree(self.size)
+        priorities = np.random.uniform(0.1, 10, size=tree.size)
+        # Empty slots are never found
+        priorities[::3] = 0
+        if priorities.sum() == 0:
+            priorities[-1] = 1
+        tree.set(np.arange(tree.size), priorities)
+        cumsum = np.cumsum(priorities)
+        values = np.random.uniform(0, tree.sum(), size=1000)
+        np.testing.assert_array_equal(
+            tree.find(values),
+            np.minimum(np.searchsorted(cumsum, values, side='right'),
+                       np.flatnonzero(priorities).max()))
+        np.testing.assert_array_equal(tree.find([tree.sum()]),
+                                      [np.flatnonzero(priorities).max()])
+
+    def test_prioritized_sample(self):
+        tree = prioritized.PriorityTree(self.size)
+        priorities = np.random.uniform(0.1, 10, size=tree.size)
+        tree.set(np.arange(tree.size), priorities)
+        n = max(tree.size // 2, 1)
+        slots, sampled_priorities = tree.prioritized_sample(n)
+        self.assertEqual(len(np.unique(slots)), n)
+        np.testing.assert_allclose(sampled_priorities, priorities[slots])
+        # Sampled slots are removed from sums but not from mins
+        np.testing.assert_allclose(
+            tree.sum(), priorities.sum() - priorities[slots].sum(),
+            rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(tree.min(), priorities.min())
@@ -32,6 +32,26 @@ class TestSampleNK(unittest.TestCase):
         self.samples = [sample_n_k(self.n, self.k) for _ in range(200)]
         self.subtest_constraints()
 
+    def test_rng(self):
+        rng_types = [np.random.RandomState]
+        if hasattr(np.random, 'default_rng'):
+            # np.random.Generator is available from numpy 1.17
+            rng_types.append(np.random.default_rng)
+        for rng_type in rng_types:
+            rng = rng_type(0)
+            self.samples = [sample_n_k(self.n, self.k, rng=rng)
+                            for _ in range(200)]
+            self.subtest_constraints()
+            np.testing.assert_array_equal(
+                sample_n_k(self.n, self.k, rng=rng_type(1)),
+                sample_n_k(self.n, self.k, rng=rng_type(1)))
+
+    def test_replace(self):
+        k = 2 * self.k if self.n > 0 else 0
+        samples = sample_n_k(self.n, k, replace=True)
+        self.assertEqual(len(samples), k)
+        self.assertTrue(np.all((0 <= samples) & (samples < self.n)))
+
     def subtest_constraints(self):
         for s in self.samples:
             self.assertEqual(len(s), self.k)
@@ -90,6 +110,34 @@ class TestSampleNK(unittest.TestCase):
         self.assertGreater(pvalue, 3e-3)
 
 
+class TestSampleNKInvalid(unittest.TestCase):
+
+    def test(self):
+        with self.assertRaises(ValueError):
+            sample_n_k(3, 4)
+        with self.assertRaises(ValueError):
+            sample_n_k(3, -1)
+        with self.assertRaises(ValueError):
+            sample_n_k(0, 1, replace=True)
+
+
+@testing.parameterize(
+    {'n': 10 ** 6, 'k': 32},
+    {'n': 10 ** 4, 'k': 512},
+)
+class TestSampleNKLarge(unittest.TestCase):
+
+    def test(self):
+        # Samples are distinct and in random order
+        samples = np.asarray([sample_n_k(self.n, self.k)
+                              for _ in range(100)])
+        for s in samples:
+            self.assertEqual(len(np.unique(s)), self.k)
+        self.assertTrue(np.all((0 <= samples) & (samples < self.n)))
+        self.assertGreater(np.mean(samples[:, 0] < samples[:, 1]), 0.3)
+        self.assertLess(np.mean(samples[:, 0] < samples[:, 1]), 0.7)
+
+
 class TestSampleNKSpeed(unittest.TestCase):
     def get_timeit(self, setup):
         return min(timeit.Timer(
@@ -0,0 +1,103 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import unittest
+
+from chainer import testing
+import numpy as np
+
+from chainerrl.misc import rollouts
+
+
+def _compute_gae_naive(episodes, gamma, lambd):
+    advs = []
+    vs_teacher = []
+    for episode in episodes:
+        adv = 0.0
+        episode_advs = []
+        for transition in reversed(episode):
+            td_err = (
+                transition['reward']
+                + (gamma * transition['nonterminal']
+                   * transition['next_v_pred'])
+                - transition['v_pred']
+            )
+            adv = td_err + gamma * lambd * adv
+            episode_advs.append(adv)
+        episode_advs.reverse()
+        advs.extend(episode_advs)
+        vs_teacher.extend(
+            a + t['v_pred'] for a, t in zip(episode_advs, episode))
+    return np.asarray(advs), np.asarray(vs_teacher)
+
+
+@testing.parameterize(*testing.product({
+    'gamma': [0.0, 0.9, 1.0],
+    'lambd': [0.0, 0.5, 1.0],
+}))
+class TestComputeGAE(unittest.TestCase):
+
+    def test(self):
+        episode_lengths = [1, 5, 3]
+        episodes = []
+        for length in episode_lengths:
+            episode = []
+            for i in range(length):
+                episode.append({
+                    'state': np.random.rand(2).astype(np.float32),
+                    'action': np.random.randint(3),
+                    'reward': np.random.rand(),
+                    'next_state': np.random.rand(2).astype(np.float32),
+                    'nonterminal': float(i != length - 1 or
+                                         np.random.rand() > 0.5),
+                    'v_pred': np.random.rand(),
+                    'next_v_pred': np.random.rand(),
+                })
+            episodes.append(episode)
+        transitions = [t for episode in episodes for t in episode]
+
+        rollout = rollouts.make_rollout_arrays(episodes, np, lambda x: x)
+        self.assertEqual(rollout['state'].shape, (9, 2))
+        self.assertEqual(rollout['next_state'].shape, (9, 2))
+        self.assertEqual(rollout['action'].shape, (9,))
+        np.testing.assert_array_equal(
+            rollout['episode_lengths'], episode_lengths)
+
+        advs, vs_teacher = rollouts.compute_gae(
+            rewards=rollout['reward'],
+            nonterminals=rollout['nonterminal'],
+            vs_pred=[t['v_pred'] for t in transitions],
+            next_vs_pred=[t['next_v_pred'] for t in transitions],
+            episode_lengths=rollout['episode_lengths'],
+            gamma=self.gamma,
+            lambd=self.lambd,
+        )
+        self.assertEqual(advs.dtype, np.float32)
+        self.assertEqual(vs_teacher.dtype, np.float32)
+        expected_advs, expected_vs_teacher = _compute_gae_naive(
+            episodes, self.gamma, self.lambd)
+        np.testing.assert_allclose(
+            advs, expected_advs, rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(
+            vs_teacher, expected_vs_teacher, rtol=1e-5, atol=1e-6)
+
+
+class TestIterateMinibatchIndices(unittest.TestCase):
+
+    def test(self):
+        batches = list(rollouts.iterate_minibatch_indices(
+            size=10, minibatch_size=4, epochs=3))
+        self.assertEqual([len(b) for b in batches], [4, 4, 2] * 3)
+        for epoch in range(3):
+            indices = np.concatenate(batches[3 * epoch:3 * (epoch + 1)])
+            np.testing.assert_array_equal(np.sort(indices), np.arange(10))
+
+    def test_take_tuple(self):
+        x = (np.arange(5), np.arange(5) * 2)
+        a, b = rollouts.take(x, np.asarray([3, 1]))
+        np.testing.assert_array_equal(a, [3, 1])
+        np.testing.assert_array_equal(b, [6, 2])
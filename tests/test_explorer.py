@@ -0,0 +1,47 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+import unittest
+
+import chainer
+import numpy as np
+
+import chainerrl
+
+
+class PlusOneExplorer(chainerrl.explorer.Explorer):
+
+    def __init__(self):
+        self.action_values = []
+
+    def select_action(self, t, greedy_action_func, action_value=None):
+        self.action_values.append(action_value)
+        return greedy_action_func() + 1
+
+
+class TestExplorer(unittest.TestCase):
+
+    def test_default_batch_select_action(self):
+        explorer = PlusOneExplorer()
+        q_values = chainer.Variable(np.arange(6, dtype=np.float32).reshape(
+            (3, 2)))
+        action_value = chainerrl.action_value.DiscreteActionValue(q_values)
+        batch_action = explorer.batch_select_action(
+            0, lambda: np.asarray([0, 1, 2]), action_value=action_value)
+        np.testing.assert_array_equal(batch_action, [1, 2, 3])
+        # Each call of select_action receives the action value of an env
+        self.assertEqual(len(explorer.action_values), 3)
+        for i, av in enumerate(explorer.action_values):
+            np.testing.assert_array_equal(
+                av.q_values.array, q_values.array[i:i + 1])
+
+    def test_default_batch_select_action_without_action_value(self):
+        explorer = PlusOneExplorer()
+        batch_action = explorer.batch_select_action(
+            0, lambda: np.asarray([0, 1]))
+        np.testing.assert_array_equal(batch_action, [1, 2])
+        self.assertEqual(explorer.action_values, [None, None])
@@ -0,0 +1,54 @@
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import os
+import subprocess
+import sys
+import unittest
+
+import chainerrl
+
+
+@unittest.skipIf(sys.version_info < (3, 7),
+                 'module-level __getattr__ is not supported')
+class TestLazyImport(unittest.TestCase):
+
+    def test_import_chainerrl_does_not_import_subpackages(self):
+        code = '\n'.join([
+            'import sys',
+            'import chainerrl',
+            'assert "chainer" not in sys.modules',
+            'assert "gym" not in sys.modules',
+            'assert "chainerrl.agents" not in sys.modules',
+        ])
+        # Make sure that the same chainerrl is imported regardless of cwd
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(
+            os.path.dirname(os.path.abspath(chainerrl.__file__)))
+        subprocess.check_call([sys.executable, '-c', code], env=env)
+
+    def test_attributes(self):
+        self.assertIs(chainerrl.agents.DQN, chainerrl.agents.dqn.DQN)
+        self.assertIs(chainerrl.envs.SerialVectorEnv,
+                      chainerrl.envs.serial_vector_env.SerialVectorEnv)
+        self.assertIn('agents', dir(chainerrl))
+        self.assertIn('DQN', dir(chainerrl.agents))
+        with self.assertRaises(AttributeError):
+            chainerrl.nonexistent_attribute
+        with self.assertRaises(AttributeError):
+            chainerrl.agents.NonexistentAgent
+
+    def test_backward_compatible_aliases(self):
+        self.assertIs(chainerrl.policy.FCSoftmaxPolicy,
+                      chainerrl.policies.FCSoftmaxPolicy)
+        self.assertIs(chainerrl.q_function.DuelingDQN,
+                      chainerrl.q_functions.DuelingDQN)
+        self.assertIs(chainerrl.v_function.FCVFunction,
+                      chainerrl.v_functions.FCVFunction)
+        from chainerrl.policy import FCGaussianPolicy
+        self.assertIs(FCGaussianPolicy, chainerrl.policies.FCGaussianPolicy)
@@ -8,7 +8,9 @@ import copy
 from builtins import *  # NOQA
 from future import standard_library
 standard_library.install_aliases()  # NOQA
+import multiprocessing as mp
 import os
+import pickle
 import tempfile
 import unittest
 
@@ -16,6 +18,7 @@ from chainer import testing
 import numpy as np
 
 from chainerrl import replay_buffer
+from chainerrl.wrappers.atari_wrappers import LazyFrames
 
 
 @testing.parameterize(*testing.product(
@@ -268,6 +271,84 @@ class TestEpisodicReplayBuffer(unittest.TestCase):
         self.assertEqual(rbuf.n_episodes, 2)
 
 
+@testing.parameterize(*testing.product({
+    'replay_buffer_type': ['EpisodicReplayBuffer',
+                           'PrioritizedEpisodicReplayBuffer'],
+    'capacity': [30, 31],
+}))
+class TestEpisodicReplayBufferEviction(unittest.TestCase):
+
+    def make_rbuf(self):
+        if self.replay_buffer_type == 'EpisodicReplayBuffer':
+            return replay_buffer.EpisodicReplayBuffer(capacity=self.capacity)
+        else:
+            return replay_buffer.PrioritizedEpisodicReplayBuffer(
+                capacity=self.capacity, wait_priority_after_sampling=False,
+                return_sample_weights=False)
+
+    def append_episode(self, rbuf, episode_idx, n):
+        for i in range(n):
+            rbuf.append(state=(episode_idx, i), action=0, reward=0,
+                        is_state_terminal=(i == n - 1))
+
+    def test(self):
+        rbuf = self.make_rbuf()
+        lengths = [7, 11, 3, 13, 5, 9, 8, 2]
+        for episode_idx, n in enumerate(lengths):
+            self.append_episode(rbuf, episode_idx, n)
+            # The oldest episodes that do not fit are discarded
+            kept = []
+            for k in reversed(range(episode_idx + 1)):
+                if sum(lengths[j] for j in kept) + lengths[k] > \
+                        self.capacity:
+                    break
+                kept.append(k)
+            self.assertEqual(rbuf.n_episodes, len(kept))
+            self.assertEqual(len(rbuf), sum(lengths[k] for k in kept))
+
+            # Episodes wrapped around capacity are recovered in order
+            episodes = rbuf.sample_episodes(rbuf.n_episodes)
+            self.assertEqual(
+                sorted(ep[0]['state'][0] for ep in episodes), sorted(kept))
+            for ep in episodes:
+                k = ep[0]['state'][0]
+                self.assertEqual([t['state'] for t in ep],
+                                 [(k, i) for i in range(lengths[k])])
+
+            # Transitions are sampled from the same storage as episodes
+            transitions = rbuf.sample(len(rbuf))
+            self.assertEqual(
+                sorted(t['state'] for t in transitions),
+                sorted(t['state'] for ep in episodes for t in ep))
+            stored = set(id(t) for ep in episodes for t in ep)
+            for t in transitions:
+                self.assertIn(id(t), stored)
+
+    def test_too_long_episode(self):
+        rbuf = self.make_rbuf()
+        self.append_episode(rbuf, 0, 5)
+        self.append_episode(rbuf, 1, self.capacity + 1)
+        self.assertEqual(len(rbuf), 0)
+        self.assertEqual(rbuf.n_episodes, 0)
+        self.append_episode(rbuf, 2, 5)
+        self.assertEqual(len(rbuf), 5)
+        self.assertEqual(rbuf.n_episodes, 1)
+
+    def test_save_and_load(self):
+        rbuf = self.make_rbuf()
+        for episode_idx, n in enumerate([13, 11, 9]):
+            self.append_episode(rbuf, episode_idx, n)
+        filename = os.path.join(tempfile.mkdtemp(), 'rbuf.pkl')
+        rbuf.save(filename)
+        loaded = self.make_rbuf()
+        loaded.load(filename)
+        self.assertEqual(len(loaded), len(rbuf))
+        self.assertEqual(loaded.n_episodes, rbuf.n_episodes)
+        self.assertEqual(
+            sorted(ep[0]['state'] for ep in loaded.sample_episodes(2)),
+            [(1, 0), (2, 0)])
+
+
 @testing.parameterize(*testing.product(
     {
         'capacity': [100, None],
@@ -336,6 +417,27 @@ class TestPrioritizedReplayBuffer(unittest.TestCase):
         s4 = rbuf.sample(2)
         self.assertAlmostEqual(s4[0][0]['weight'], s4[1][0]['weight'])
 
+    def test_append_with_initial_error(self):
+        num_steps = self.num_steps
+        rbuf = replay_buffer.PrioritizedReplayBuffer(
+            self.capacity, alpha=1, eps=0, error_max=None,
+            num_steps=num_steps)
+
+        # The priority of each experience comes from its first transition
+        errors = [0.5, 2, 4]
+        for i, error in enumerate(errors):
+            rbuf.append(state=i, action=1, reward=2, next_state=i + 1,
+                        next_action=4, is_state_terminal=i == 2,
+                        initial_error=error)
+        self.assertEqual(len(rbuf), 3)
+        self.assertAlmostEqual(rbuf.memory.priority_sums.sum(), sum(errors))
+        self.assertAlmostEqual(rbuf.memory.priority_mins.min(), min(errors))
+
+        sampled = rbuf.sample(3)
+        for experience in sampled:
+            for transition in experience:
+                self.assertNotIn('initial_error', transition)
+
     def test_capacity(self):
         capacity = self.capacity
         if capacity is None:
@@ -417,7 +519,7 @@ def exp_return_of_episode(episode):
 @testing.parameterize(*(
     testing.product({
         'capacity': [100],
-        'normalize_by_max': ['batch', 'memory'],
+        'normalize_by_max': ['batch', 'memory', False],
         'wait_priority_after_sampling': [False],
         'default_priority_func': [exp_return_of_episode],
         'uniform_ratio': [0, 0.1, 1.0],
@@ -486,6 +588,533 @@ class TestPrioritizedEpisodicReplayBuffer(unittest.TestCase):
                     self.assertEqual(t0['next_state'], t1['state'])
                     self.assertEqual(t0['next_action'], t1['action'])
 
+    def test_save_and_load(self):
+        tempdir = tempfile.mkdtemp()
+
+        def make_rbuf():
+            return replay_buffer.PrioritizedEpisodicReplayBuffer(
+                capacity=self.capacity,
+                normalize_by_max=self.normalize_by_max,
+                default_priority_func=self.default_priority_func,
+                uniform_ratio=self.uniform_ratio,
+                wait_priority_after_sampling=self.wait_priority_after_sampling,
+                return_sample_weights=self.return_sample_weights)
+
+        rbuf = make_rbuf()
+        for n in [10, 15, 5]:
+            for i in range(n):
+                rbuf.append(state=i, action=100 + i, reward=200 + i,
+                            next_state=i + 1, next_action=101 + i,
+                            is_state_terminal=(i == n - 1))
+        rbuf.sample_episodes(2)
+        rbuf.update_errors([0.5, 2.0])
+        priority_sum = rbuf.episodic_memory.priority_sums.sum()
+
+        filename = os.path.join(tempdir, 'rbuf.pkl')
+        rbuf.save(filename)
+        rbuf = make_rbuf()
+        rbuf.load(filename)
+
+        self.assertEqual(len(rbuf), 30)
+        self.assertEqual(rbuf.n_episodes, 3)
+        np.testing.assert_allclose(
+            rbuf.episodic_memory.priority_sums.sum(), priority_sum)
+        episodes = rbuf.sample_episodes(3)
+        if self.return_sample_weights:
+            episodes, _ = episodes
+        for ep in episodes:
+            self.assertIn(len(ep), [10, 15, 5])
+        if self.wait_priority_after_sampling:
+            rbuf.update_errors([1.0] * 3)
+
+
+@testing.parameterize(*testing.product({
+    'capacity': [None, 40],
+    'uniform_ratio': [0, 0.5],
+    'eta': [None, 0.9],
+    'wait_priority_after_sampling': [True, False],
+}))
+class TestPrioritizedEpisodicReplayBufferWindows(unittest.TestCase):
+
+    def make_rbuf(self):
+        return replay_buffer.PrioritizedEpisodicReplayBuffer(
+            capacity=self.capacity,
+            uniform_ratio=self.uniform_ratio,
+            wait_priority_after_sampling=self.wait_priority_after_sampling,
+            window_len=4,
+            eta=self.eta,
+            alpha=1,
+            eps=0,
+        )
+
+    def append_episodes(self, rbuf, lengths):
+        for n in lengths:
+            for i in range(n):
+                rbuf.append(state=i, action=0, reward=0,
+                            is_state_terminal=(i == n - 1))
+
+    def window_priorities(self, rbuf):
+        slots = (rbuf.first_window + np.arange(len(rbuf.windows))) \
+            % rbuf.tree.size
+        return rbuf.tree.get(slots)
+
+    def test_sample_and_update(self):
+        rbuf = self.make_rbuf()
+        self.append_episodes(rbuf, [10, 3, 8])
+        # Windows of 4 transitions aligned to the start of each episode
+        self.assertEqual(len(rbuf.windows), 3 + 1 + 2)
+        self.assertEqual(rbuf.n_episodes, 3)
+
+        windows, weights = rbuf.sample_episodes(5)
+        self.assertEqual(len(windows), 5)
+        self.assertEqual(len(weights), 5)
+        for window in windows:
+            self.assertLessEqual(len(window), 4)
+            self.assertEqual(window[0]['state'] % 4, 0)
+            self.assertEqual([t['state'] for t in window],
+                             list(range(window[0]['state'],
+                                        window[0]['state'] + len(window))))
+
+        # Per-step errors are reduced to priorities of windows
+        errors = [np.random.uniform(0.1, 1, size=len(window))
+                  for window in windows]
+        sampled_slots = rbuf.sampled_windows % rbuf.tree.size
+        rbuf.update_errors(errors)
+        if self.eta is None:
+            expected = [e.sum() for e in errors]
+        else:
+            expected = [self.eta * e.max() + (1 - self.eta) * e.mean()
+                        for e in errors]
+        np.testing.assert_allclose(rbuf.tree.get(sampled_slots), expected)
+        # Other windows keep the initial priority
+        slots = (rbuf.first_window + np.arange(len(rbuf.windows))) \
+            % rbuf.tree.size
+        np.testing.assert_allclose(
+            rbuf.tree.get(np.setdiff1d(slots, sampled_slots)), 1)
+
+        # max_len truncates windows, keeping their starts
+        windows, _ = rbuf.sample_episodes(2, max_len=2)
+        for window in windows:
+            self.assertLessEqual(len(window), 2)
+            self.assertEqual(window[0]['state'] % 4, 0)
+
+    def test_eviction_and_growth(self):
+        rbuf = self.make_rbuf()
+        for k in range(20):
+            self.append_episodes(rbuf, [5 + k % 7])
+            windows, _ = rbuf.sample_episodes(min(3, len(rbuf.windows)))
+            rbuf.update_errors([float(k + 1)] * len(windows))
+            # Windows of discarded episodes are removed from the tree
+            self.assertEqual(sum(rbuf.episode_n_windows), len(rbuf.windows))
+            np.testing.assert_allclose(
+                rbuf.tree.sum(), self.window_priorities(rbuf).sum())
+            self.assertGreaterEqual(rbuf.tree.size, len(rbuf.windows))
+            if self.capacity is not None:
+                self.assertLessEqual(len(rbuf), self.capacity)
+        self.assertTrue(np.all(self.window_priorities(rbuf) > 0))
+
+    def test_save_and_load(self):
+        tempdir = tempfile.mkdtemp()
+        rbuf = self.make_rbuf()
+        self.append_episodes(rbuf, [10, 3, 8])
+        windows, _ = rbuf.sample_episodes(3)
+        rbuf.update_errors([float(k + 2) for k in range(3)])
+        priorities = self.window_priorities(rbuf)
+
+        filename = os.path.join(tempdir, 'rbuf.pkl')
+        rbuf.save(filename)
+        rbuf = self.make_rbuf()
+        rbuf.load(filename)
+
+        self.assertEqual(len(rbuf), 21)
+        self.assertEqual(rbuf.n_episodes, 3)
+        self.assertEqual(len(rbuf.windows), 6)
+        np.testing.assert_allclose(self.window_priorities(rbuf), priorities)
+
+        # Saved episodes are kept in the old format with their priorities
+        with open(filename, 'rb') as f:
+            _, episodes = pickle.load(f)
+        self.assertIsInstance(episodes, replay_buffer.PrioritizedBuffer)
+        self.assertEqual([len(ep) for ep in episodes.data], [10, 3, 8])
+
+
+def _append_shared_episodes(rbuf, lengths, offset=0):
+    for n in lengths:
+        for i in range(n):
+            rbuf.append(state=offset + i, action=100 + i, reward=200 + i,
+                        next_state=offset + i + 1, next_action=101 + i,
+                        is_state_terminal=(i == n - 1))
+
+
+@testing.parameterize(*testing.product({
+    'capacity': [100, 30],
+}))
+class TestSharedEpisodicReplayBuffer(unittest.TestCase):
+
+    def test_append_and_sample(self):
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(self.capacity)
+        _append_shared_episodes(rbuf, [10, 15, 5] * 3)
+
+        # The oldest episodes are discarded when capacity is exceeded
+        if self.capacity == 100:
+            self.assertEqual(len(rbuf), 90)
+            self.assertEqual(rbuf.n_episodes, 9)
+        else:
+            self.assertEqual(len(rbuf), 30)
+            self.assertEqual(rbuf.n_episodes, 3)
+
+        s = rbuf.sample(len(rbuf))
+        self.assertEqual(len(s), len(rbuf))
+        self.assertEqual(len(set(t['state'] - t['action'] for t in s)), 1)
+
+        for k in [1, 3]:
+            s = rbuf.sample_episodes(k)
+            self.assertEqual(len(s), k)
+            for ep in s:
+                self.assertIn(len(ep), [10, 15, 5])
+                self.assertTrue(ep[-1]['is_state_terminal'])
+
+            s = rbuf.sample_episodes(k, max_len=10)
+            for ep in s:
+                self.assertLessEqual(len(ep), 10)
+                for t0, t1 in zip(ep, ep[1:]):
+                    self.assertEqual(t0['next_state'], t1['state'])
+                    self.assertEqual(t0['next_action'], t1['action'])
+
+    def test_env_id(self):
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(self.capacity)
+        for i in range(4):
+            for env_id in range(2):
+                rbuf.append(state=(env_id, i), action=0, reward=0,
+                            env_id=env_id)
+        self.assertEqual(len(rbuf), 0)
+        rbuf.stop_current_episode(env_id=1)
+        self.assertEqual(rbuf.sample_episodes(1)[0],
+                         [dict(state=(1, i), action=0, reward=0,
+                               next_state=None, next_action=None,
+                               is_state_terminal=False)
+                          for i in range(4)])
+
+    def test_too_large(self):
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(
+            self.capacity, slot_size=100)
+        with self.assertRaises(ValueError):
+            rbuf.append(state=np.zeros(100), action=0, reward=0,
+                        is_state_terminal=True)
+        with self.assertRaises(ValueError):
+            _append_shared_episodes(rbuf, [self.capacity + 1])
+
+    def test_next_state_not_duplicated(self):
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(
+            self.capacity, slot_size=3000)
+        for k in range(10):
+            # Observations are shared by consecutive transitions
+            obs = [np.full(1000, 10 * k + i, dtype=np.uint8)
+                   for i in range(7)]
+            for i in range(6):
+                rbuf.append(state=obs[i], action=i, reward=0,
+                            next_state=obs[i + 1],
+                            is_state_terminal=(i == 5))
+        # Only the last transition of each episode has its next_state
+        self.assertEqual(rbuf.next_state_omitted.sum(), len(rbuf) * 5 // 6)
+        omitted = rbuf.next_state_omitted != 0
+        self.assertTrue(np.all(rbuf.slot_lens[omitted] < 1500))
+
+        for t in rbuf.sample(len(rbuf)):
+            np.testing.assert_array_equal(t['next_state'], t['state'] + 1)
+        for ep in rbuf.sample_episodes(3, max_len=4):
+            for t0, t1 in zip(ep, ep[1:]):
+                self.assertIs(t0['next_state'], t1['state'])
+            np.testing.assert_array_equal(
+                ep[-1]['next_state'], ep[-1]['state'] + 1)
+
+    def test_shared_by_processes(self):
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(self.capacity)
+
+        def run(process_idx):
+            _append_shared_episodes(rbuf, [5, 5], offset=1000 * process_idx)
+
+        processes = [mp.Process(target=run, args=(i,)) for i in range(3)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+            self.assertEqual(p.exitcode, 0)
+
+        self.assertEqual(len(rbuf), 30)
+        self.assertEqual(rbuf.n_episodes, 6)
+        episodes = rbuf.sample_episodes(6)
+        self.assertEqual(
+            sorted(ep[0]['state'] for ep in episodes),
+            [0, 0, 1000, 1000, 2000, 2000])
+
+    def test_save_and_load(self):
+        tempdir = tempfile.mkdtemp()
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(self.capacity)
+        _append_shared_episodes(rbuf, [2, 3])
+        episodes = sorted(rbuf.sample_episodes(2), key=len)
+
+        filename = os.path.join(tempdir, 'rbuf.pkl')
+        rbuf.save(filename)
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(self.capacity)
+        self.assertEqual(len(rbuf), 0)
+        rbuf.load(filename)
+        self.assertEqual(len(rbuf), 5)
+        self.assertEqual(rbuf.n_episodes, 2)
+        self.assertEqual(sorted(rbuf.sample_episodes(2), key=len), episodes)
+
+
+def _append_frame_episodes(rbuf, lengths, k=4):
+    """Append episodes of stacked frames like FrameStack."""
+    for n in lengths:
+        frames = collections.deque(
+            [np.random.randint(0, 256, size=(1, 5, 5)).astype(np.uint8)] * k,
+            maxlen=k)
+        obs = LazyFrames(list(frames), stack_axis=0)
+        for i in range(n):
+            frames.append(
+                np.random.randint(0, 256, size=(1, 5, 5)).astype(np.uint8))
+            next_obs = LazyFrames(list(frames), stack_axis=0)
+            rbuf.append(state=obs, action=i, reward=0, next_state=next_obs,
+                        is_state_terminal=(i == n - 1))
+            obs = next_obs
+
+
+class TestSharedEpisodicReplayBufferFrames(unittest.TestCase):
+
+    def check_transitions(self, transitions):
+        for t in transitions:
+            state = np.asarray(t['state'])
+            next_state = np.asarray(t['next_state'])
+            self.assertEqual(state.shape, (4, 5, 5))
+            self.assertEqual(state.dtype, np.uint8)
+            # Stacked frames are shifted by one step
+            np.testing.assert_array_equal(state[1:], next_state[:3])
+
+    def test_append_and_sample(self):
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(
+            100, slot_size=2 ** 10, frame_size=25)
+        _append_frame_episodes(rbuf, [10, 5, 8])
+        self.assertEqual(len(rbuf), 23)
+        # Each frame is stored once
+        self.assertEqual(rbuf.index[4], 10 + 1 + 5 + 1 + 8 + 1)
+        self.assertTrue(np.all(rbuf.slot_lens[:23] < 500))
+
+        self.check_transitions(rbuf.sample(23))
+        for ep in rbuf.sample_episodes(3, max_len=4):
+            self.check_transitions(ep)
+            for t0, t1 in zip(ep, ep[1:]):
+                self.assertIs(t0['next_state'], t1['state'])
+                # Frames are shared by observations
+                self.assertIs(t0['state']._frames[1], t1['state']._frames[0])
+
+    def test_frame_capacity(self):
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(
+            100, frame_size=25, frame_capacity=20)
+        _append_frame_episodes(rbuf, [10, 5, 8])
+        # The oldest episode is discarded to make room for frames
+        self.assertEqual(len(rbuf), 13)
+        self.assertEqual(rbuf.n_episodes, 2)
+        for ep in rbuf.sample_episodes(2):
+            self.check_transitions(ep)
+        with self.assertRaises(ValueError):
+            _append_frame_episodes(rbuf, [20])
+
+    def test_too_large_frame(self):
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(100, frame_size=24)
+        with self.assertRaises(ValueError):
+            _append_frame_episodes(rbuf, [3])
+
+    def test_save_and_load(self):
+        tempdir = tempfile.mkdtemp()
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(100, frame_size=25)
+        _append_frame_episodes(rbuf, [10, 5])
+        episodes = sorted(rbuf.sample_episodes(2), key=len)
+
+        filename = os.path.join(tempdir, 'rbuf.pkl')
+        rbuf.save(filename)
+        rbuf = replay_buffer.SharedEpisodicReplayBuffer(100, frame_size=25)
+        rbuf.load(filename)
+        self.assertEqual(len(rbuf), 15)
+        self.assertEqual(rbuf.index[4], 17)
+        for ep, loaded_ep in zip(
+                episodes, sorted(rbuf.sample_episodes(2), key=len)):
+            for t, loaded_t in zip(ep, loaded_ep):
+                np.testing.assert_array_equal(
+                    np.asarray(t['state']), np.asarray(loaded_t['state']))
+                np.testing.assert_array_equal(
+                    np.asarray(t['next_state']),
+                    np.asarray(loaded_t['next_state']))
+
+
+@testing.parameterize(*testing.product({
+    'sequence_len': [1, 3],
+    'burn_in': [0, 2],
+}))
+class TestSequenceReplayBuffer(unittest.TestCase):
+
+    def append_episode(self, rbuf, episode_len, env_id=0, terminal=True):
+        for i in range(episode_len):
+            rbuf.append(state=i, action=i, reward=1, next_state=i + 1,
+                        is_state_terminal=terminal and i == episode_len - 1,
+                        env_id=env_id, recurrent_state=('h', i))
+
+    def check_sequences(self, sequences, episode_len):
+        starts = sorted(seq[seq[0]['burn_in']]['state'] for seq in sequences)
+        self.assertEqual(
+            starts, list(range(0, episode_len, self.sequence_len)))
+        for seq in sequences:
+            burn_in = seq[0]['burn_in']
+            start = seq[burn_in]['state']
+            self.assertEqual(burn_in, min(self.burn_in, start))
+            self.assertEqual(len(seq) - burn_in,
+                             min(self.sequence_len, episode_len - start))
+            self.assertEqual([t['state'] for t in seq],
+                             list(range(start - burn_in, start - burn_in +
+                                        len(seq))))
+            # The recurrent state before the first transition is stored
+            self.assertEqual(seq[0]['recurrent_state'],
+                             ('h', start - burn_in))
+            for t in seq[1:]:
+                self.assertNotIn('recurrent_state', t)
+
+    def test_append_and_sample(self):
+        rbuf = replay_buffer.SequenceReplayBuffer(
+            capacity=None, sequence_len=self.sequence_len,
+            burn_in=self.burn_in)
+        episode_len = 7
+        self.append_episode(rbuf, episode_len)
+        n_sequences = -(-episode_len // self.sequence_len)
+        self.assertEqual(len(rbuf), n_sequences)
+        self.check_sequences(rbuf.sample(n_sequences), episode_len)
+
+    def test_terminal_at_end_of_sequence(self):
+        rbuf = replay_buffer.SequenceReplayBuffer(
+            capacity=None, sequence_len=self.sequence_len,
+            burn_in=self.burn_in)
+        episode_len = 2 * self.sequence_len
+        self.append_episode(rbuf, episode_len)
+        self.assertEqual(len(rbuf), 2)
+        self.check_sequences(rbuf.sample(2), episode_len)
+        # Nothing is left after the terminal state
+        rbuf.stop_current_episode()
+        self.assertEqual(len(rbuf), 2)
+
+    def test_stop_current_episode(self):
+        rbuf = replay_buffer.SequenceReplayBuffer(
+            capacity=None, sequence_len=self.sequence_len,
+            burn_in=self.burn_in)
+        self.append_episode(rbuf, 4, env_id=0, terminal=False)
+        self.append_episode(rbuf, 5, env_id=1, terminal=False)
+        n_sequences = 4 // self.sequence_len + 5 // self.sequence_len
+        self.assertEqual(len(rbuf), n_sequences)
+        rbuf.stop_current_episode(env_id=0)
+        rbuf.stop_current_episode(env_id=1)
+        n_sequences = -(-4 // self.sequence_len) + -(-5 // self.sequence_len)
+        self.assertEqual(len(rbuf), n_sequences)
+        # Episodes of different envs are not mixed
+        for seq in rbuf.sample(n_sequences):
+            states = [t['state'] for t in seq]
+            self.assertEqual(states, sorted(states))
+
+    def test_capacity(self):
+        rbuf = replay_buffer.SequenceReplayBuffer(
+            capacity=2, sequence_len=self.sequence_len,
+            burn_in=self.burn_in)
+        self.append_episode(rbuf, 10)
+        self.assertEqual(len(rbuf), 2)
+
+    def test_save_and_load(self):
+        tempdir = tempfile.mkdtemp()
+        rbuf = replay_buffer.SequenceReplayBuffer(
+            capacity=None, sequence_len=self.sequence_len,
+            burn_in=self.burn_in)
+        self.append_episode(rbuf, 7)
+        n_sequences = len(rbuf)
+
+        filename = os.path.join(tempdir, 'rbuf.pkl')
+        rbuf.save(filename)
+        rbuf = replay_buffer.SequenceReplayBuffer(
+            capacity=None, sequence_len=self.sequence_len,
+            burn_in=self.burn_in)
+        rbuf.load(filename)
+        self.assertEqual(len(rbuf), n_sequences)
+        self.check_sequences(rbuf.sample(n_sequences), 7)
+
+
+@testing.parameterize(*testing.product({
+    'capacity': [5, 100],
+    'num_steps': [1, 3],
+}))
+class TestDeviceReplayBuffer(unittest.TestCase):
+
+    def append_episode(self, rbuf, episode_len):
+        for i in range(episode_len):
+            rbuf.append(state=np.full(2, i, dtype=np.float64), action=i,
+                        reward=i, next_state=np.full(2, i + 1),
+                        is_state_terminal=i == episode_len - 1)
+
+    def test_append_and_sample(self):
+        rbuf = replay_buffer.DeviceReplayBuffer(
+            self.capacity, num_steps=self.num_steps)
+        ref_rbuf = replay_buffer.ReplayBuffer(
+            self.capacity, num_steps=self.num_steps)
+        for _ in range(3):
+            self.append_episode(rbuf, 4)
+            self.append_episode(ref_rbuf, 4)
+        self.assertEqual(len(rbuf), len(ref_rbuf))
+
+        n = len(rbuf)
+        batch = rbuf.sample(n)
+        self.assertIsInstance(batch, dict)
+        self.assertEqual(batch['state'].shape, (n, 2))
+        self.assertEqual(batch['state'].dtype, np.float32)
+        self.assertEqual(batch['reward'].shape, (n, self.num_steps))
+
+        # Batched transitions are the same as those of ReplayBuffer
+        gamma = 0.9
+        exp_batch = replay_buffer.batch_experiences(
+            batch, np, lambda x: x, gamma)
+        ref_batch = replay_buffer.batch_experiences(
+            ref_rbuf.sample(len(ref_rbuf)), np, lambda x: x, gamma)
+        # Actions identify transitions since episodes are the same
+        ref_by_action = dict(
+            (int(a), i) for i, a in enumerate(ref_batch['action']))
+        for i in range(n):
+            j = ref_by_action[int(exp_batch['action'][i])]
+            for name in ('state', 'reward', 'next_state',
+                         'is_state_terminal', 'discount'):
+                np.testing.assert_allclose(
+                    exp_batch[name][i], ref_batch[name][j], rtol=1e-6)
+
+    def test_capacity(self):
+        rbuf = replay_buffer.DeviceReplayBuffer(
+            self.capacity, num_steps=self.num_steps)
+        self.append_episode(rbuf, 150)
+        self.assertEqual(len(rbuf), min(150, self.capacity))
+        # Only the latest transitions are kept
+        batch = rbuf.sample(len(rbuf))
+        self.assertTrue(
+            np.all(batch['action'] >= 150 - min(150, self.capacity)))
+
+    def test_save_and_load(self):
+        tempdir = tempfile.mkdtemp()
+        rbuf = replay_buffer.DeviceReplayBuffer(
+            self.capacity, num_steps=self.num_steps)
+        self.append_episode(rbuf, 4)
+        n = len(rbuf)
+
+        filename = os.path.join(tempdir, 'rbuf.pkl')
+        rbuf.save(filename)
+        rbuf = replay_buffer.DeviceReplayBuffer(
+            self.capacity, num_steps=self.num_steps)
+        rbuf.load(filename)
+        self.assertEqual(len(rbuf), n)
+        self.append_episode(rbuf, 4)
+        self.assertEqual(len(rbuf), min(2 * n, self.capacity))
+        batch = rbuf.sample(len(rbuf))
+        np.testing.assert_array_equal(batch['state'][:, 0], batch['action'])
+
 
 @testing.parameterize(*testing.product({
     'replay_buffer_type': ['ReplayBuffer', 'PrioritizedReplayBuffer'],
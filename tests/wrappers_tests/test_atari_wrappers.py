@@ -1,5 +1,5 @@
-"""Currently this script tests `chainerrl.wrappers.atari_wrappers.FrameStack`
-only."""
+"""Currently this script tests `chainerrl.wrappers.atari_wrappers.FrameStack`,
+`LazyFrames` and `ScaledFloatFrame` only."""
 
 from __future__ import print_function
 from __future__ import unicode_literals
@@ -96,6 +96,32 @@ class TestFrameStack(unittest.TestCase):
             self.assertEqual(done, fs_done)
 
 
+@testing.parameterize(*testing.product({
+    'dtype': [np.uint8, np.float32],
+    'stack_axis': [0, 2],
+}))
+class TestLazyFrames(unittest.TestCase):
+
+    def test_materialize(self):
+        frame_shape = [84, 84]
+        frame_shape.insert(self.stack_axis, 1)
+        frames = [np.random.rand(*frame_shape).astype(self.dtype)
+                  for _ in range(3)]
+        lazy_frames = LazyFrames(frames, stack_axis=self.stack_axis)
+        expected = np.concatenate(frames, axis=self.stack_axis)
+
+        self.assertEqual(lazy_frames.shape, expected.shape)
+        self.assertEqual(lazy_frames.dtype, expected.dtype)
+        np.testing.assert_array_equal(np.asarray(lazy_frames), expected)
+        np.testing.assert_array_equal(lazy_frames.materialize(), expected)
+
+        # Write into a row of a batch
+        out = np.zeros((2,) + expected.shape, dtype=self.dtype)
+        lazy_frames.materialize(out=out[1])
+        np.testing.assert_array_equal(out[0], 0)
+        np.testing.assert_array_equal(out[1], expected)
+
+
 @testing.parameterize(*testing.product({
     'dtype': [np.uint8, np.float32],
 }))
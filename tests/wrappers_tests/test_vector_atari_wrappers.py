@@ -0,0 +1,179 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+from __future__ import division
+from __future__ import absolute_import
+from builtins import *  # NOQA
+from future import standard_library
+standard_library.install_aliases()  # NOQA
+
+import functools
+import mock
+import unittest
+
+from chainer import testing
+import gym
+import gym.spaces
+import numpy as np
+
+import chainerrl
+from chainerrl.wrappers import atari_wrappers
+from chainerrl.wrappers.atari_wrappers import ClipRewardEnv
+from chainerrl.wrappers.atari_wrappers import WarpFrame
+from chainerrl.wrappers.vector_atari_wrappers import VectorClipReward
+from chainerrl.wrappers.vector_atari_wrappers import VectorWarpFrame
+
+
+def _make_mock_env(idx, steps):
+    # Mock env that returns raw atari-like frames
+    env = mock.Mock()
+    np_random = np.random.RandomState(idx)
+
+    def rand_frame():
+        return np_random.randint(
+            low=0, high=256, size=(210, 160, 3), dtype=np.uint8)
+    env.reset.side_effect = [rand_frame() for _ in range(steps)]
+    env.step.side_effect = [
+        (
+            rand_frame(),
+            np_random.randint(-3, 4),
+            bool(np_random.randint(2)),
+            {},
+        )
+        for _ in range(steps)]
+    env.action_space = gym.spaces.Discrete(2)
+    env.observation_space = gym.spaces.Box(
+        low=0, high=255, shape=(210, 160, 3), dtype=np.uint8)
+    return env
+
+
+@unittest.skipUnless(atari_wrappers._is_cv2_available, 'cv2 is required')
+@testing.parameterize(*testing.product({
+    'num_envs': [1, 3],
+    'channel_order': ['hwc', 'chw'],
+}))
+class TestVectorWarpFrame(unittest.TestCase):
+
+    def test(self):
+
+        steps = 5
+
+        # Wrap each env by WarpFrame
+        envs = chainerrl.envs.SerialVectorEnv([
+            WarpFrame(_make_mock_env(idx, steps),
+                      channel_order=self.channel_order)
+            for idx in range(self.num_envs)])
+
+        # Wrap the VectorEnv by VectorWarpFrame
+        vec_env = VectorWarpFrame(
+            chainerrl.envs.SerialVectorEnv([
+                _make_mock_env(idx, steps) for idx in range(self.num_envs)]),
+            channel_order=self.channel_order)
+
+        self.assertEqual(envs.observation_space, vec_env.observation_space)
+
+        obs = envs.reset()
+        vec_obs = vec_env.reset()
+        self.assertEqual(len(vec_obs), self.num_envs)
+        for ob, vec_ob in zip(obs, vec_obs):
+            self.assertEqual(vec_ob.dtype, np.uint8)
+            np.testing.assert_array_equal(ob, vec_ob)
+
+        batch_action = [0] * self.num_envs
+        for _ in range(steps - 1):
+            obs, r, done, _ = envs.step(batch_action)
+            vec_obs, vec_r, vec_done, _ = vec_env.step(batch_action)
+            for ob, vec_ob in zip(obs, vec_obs):
+                np.testing.assert_array_equal(ob, vec_ob)
+            np.testing.assert_array_equal(r, vec_r)
+            np.testing.assert_array_equal(done, vec_done)
+
+        # Reset only the first env
+        mask = np.ones(self.num_envs, dtype=bool)
+        mask[0] = False
+        obs = envs.reset(mask)
+        new_vec_obs = vec_env.reset(mask)
+        for ob, vec_ob in zip(obs, new_vec_obs):
+            np.testing.assert_array_equal(ob, vec_ob)
+        # Observations of the other envs are not warped again
+        for vec_ob, new_vec_ob in zip(vec_obs[1:], new_vec_obs[1:]):
+            self.assertIs(vec_ob, new_vec_ob)
+
+
+@unittest.skipUnless(atari_wrappers._is_cv2_available, 'cv2 is required')
+@testing.parameterize(*testing.product({
+    'num_envs': [1, 3],
+    'channel_order': ['hwc', 'chw'],
+}))
+class TestWarpFrameWithSharedObs(unittest.TestCase):
+
+    def test(self):
+
+        steps = 5
+
+        def make_env(idx):
+            return WarpFrame(_make_mock_env(idx, steps),
+                             channel_order=self.channel_order)
+
+        envs = chainerrl.envs.SerialVectorEnv(
+            [make_env(idx) for idx in range(self.num_envs)])
+
+        # Frames are warped by subprocesses and passed through shared memory
+        vec_env = chainerrl.envs.MultiprocessVectorEnv(
+            [functools.partial(make_env, idx)
+             for idx in range(self.num_envs)],
+            observation_space=envs.observation_space)
+
+        obs = envs.reset()
+        vec_obs = vec_env.reset()
+        for ob, vec_ob in zip(obs, vec_obs):
+            self.assertEqual(vec_ob.dtype, np.uint8)
+            np.testing.assert_array_equal(ob, vec_ob)
+
+        batch_action = [0] * self.num_envs
+        for _ in range(steps - 1):
+            obs, r, done, _ = envs.step(batch_action)
+            vec_obs, vec_r, vec_done, _ = vec_env.step(batch_action)
+            for ob, vec_ob in zip(obs, vec_obs):
+                np.testing.assert_array_equal(ob, vec_ob)
+            np.testing.assert_array_equal(r, vec_r)
+            np.testing.assert_array_equal(done, vec_done)
+
+        # Reset only the first env
+        mask = np.ones(self.num_envs, dtype=bool)
+        mask[0] = False
+        obs = envs.reset(mask)
+        new_vec_obs = vec_env.reset(mask)
+        for ob, vec_ob in zip(obs, new_vec_obs):
+            np.testing.assert_array_equal(ob, vec_ob)
+        # Observations returned before are not overwritten
+        for vec_ob, new_vec_ob in zip(vec_obs[1:], new_vec_obs[1:]):
+            self.assertIs(vec_ob, new_vec_ob)
+        self.assertFalse(np.array_equal(vec_obs[0], new_vec_obs[0]))
+
+        vec_env.close()
+
+
+@testing.parameterize(*testing.product({
+    'num_envs': [1, 3],
+}))
+class TestVectorClipReward(unittest.TestCase):
+
+    def test(self):
+
+        steps = 5
+
+        envs = chainerrl.envs.SerialVectorEnv([
+            ClipRewardEnv(_make_mock_env(idx, steps))
+            for idx in range(self.num_envs)])
+        vec_env = VectorClipReward(
+            chainerrl.envs.SerialVectorEnv([
+                _make_mock_env(idx, steps) for idx in range(self.num_envs)]))
+
+        envs.reset()
+        vec_env.reset()
+        batch_action = [0] * self.num_envs
+        for _ in range(steps - 1):
+            _, r, _, _ = envs.step(batch_action)
+            _, vec_r, _, _ = vec_env.step(batch_action)
+            np.testing.assert_array_equal(r, vec_r)
+            self.assertTrue(np.all(np.isin(vec_r, [-1, 0, 1])))